@@ -27,7 +27,23 @@ CONFIG_VARS = (
     constants.S3_REGION_NAME,
     constants.S3_BUCKET,
     constants.S3_PRESIGNED_TIMEOUT,
+    constants.S3_MAX_POOL_CONNECTIONS,
+    constants.S3_TRANSFER_THRESHOLD,
+    constants.S3_TRANSFER_CHUNK_SIZE,
+    constants.S3_TRANSFER_CONCURRENCY,
+    constants.S3_URL_CACHE_SIZE,
+    constants.S3_URL_CACHE_REUSE,
+    constants.API_KEY_CACHE_TTL,
+    constants.API_KEY_CACHE_SIZE,
+    constants.PASSWORD_HASH_SCHEME,
+    constants.PASSWORD_HASH_ITERATIONS,
+    constants.PASSWORD_HASH_SCRYPT_N,
     constants.AUTH_HOSTNAME,
+    constants.AUTH_JWT_SECRET,
+    constants.AUTH_MEMBERSHIP_CACHE_TTL,
+    constants.AUTH_MEMBERSHIP_CACHE_SIZE,
+    constants.AUTH_MEMBERSHIP_POLL_INTERVAL,
+    constants.AUTH_MEMBERSHIP_CHANGES_KEY,
     constants.WORKFLOW_HOSTNAME,
     constants.WORKFLOW_API_TOKEN,
 )
@@ -1,9 +1,34 @@
 from blob_utils.constants import *
+from application_roles.constants import *
+from password_hashing.constants import *
 
 # Configurable application keys:
 SECRET_KEY = "SECRET_KEY"
 SQLALCHEMY_DATABASE_URI = "SQLALCHEMY_DATABASE_URI"
 MAX_CONTENT_LENGTH = "MAX_CONTENT_LENGTH"
 AUTH_HOSTNAME = "AUTH_HOSTNAME"
+# Key the auth service signs JWT tokens with (its SECRET_KEY). When set, tokens
+# are verified locally:
+AUTH_JWT_SECRET = "AUTH_JWT_SECRET"
+AUTH_MEMBERSHIP_CACHE_TTL = "AUTH_MEMBERSHIP_CACHE_TTL"
+AUTH_MEMBERSHIP_CACHE_SIZE = "AUTH_MEMBERSHIP_CACHE_SIZE"
+AUTH_MEMBERSHIP_POLL_INTERVAL = "AUTH_MEMBERSHIP_POLL_INTERVAL"
+# Key the auth service requires to poll membership changes (its
+# MEMBERSHIP_CHANGES_KEY):
+AUTH_MEMBERSHIP_CHANGES_KEY = "AUTH_MEMBERSHIP_CHANGES_KEY"
 WORKFLOW_HOSTNAME = "WORKFLOW_HOSTNAME"
 WORKFLOW_API_TOKEN = "WORKFLOW_API_TOKEN"
+
+# Application constants:
+JWT_ALGORITHM = "HS256"
+# Lifetime of the JWT tokens of the auth service:
+JWT_EXPIRATION_DAYS = 14
+# Direct input file uploads are split into parts of at least this many bytes
+# (S3 allows at most 10000 parts per upload):
+INPUT_FILE_PART_SIZE = 16 * 1024 * 1024
+INPUT_FILE_MAX_PARTS = 10000
+# Maximum (and default, once paging with after) number of pipeline runs listed
+# at once, and the workflow service response header holding where the next page
+# starts:
+RUN_LIST_MAX_LIMIT = 1000
+RUN_LIST_NEXT_HEADER = "X-Next-After"
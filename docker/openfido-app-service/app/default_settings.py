@@ -2,3 +2,6 @@ SQLALCHEMY_TRACK_MODIFICATIONS = False
 S3_BUCKET = "openfido-app-service"
 S3_REGION_NAME = "us-east-1"
 S3_PRESIGNED_TIMEOUT = 604800
+AUTH_MEMBERSHIP_CACHE_TTL = 60
+AUTH_MEMBERSHIP_CACHE_SIZE = 10000
+AUTH_MEMBERSHIP_POLL_INTERVAL = 10
@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+
+class MembershipCache:
+    """The organizations of users, keyed by the JWT token they were fetched with.
+
+    Entries expire ttl seconds after they are cached, and the least recently
+    used entries beyond max_size are evicted. The entries of a user are
+    forgotten when the auth service reports that their memberships changed
+    (changed_at is when it was last asked, see record_changes()).
+
+    The membership_version of those users is kept to revoke the organization
+    claims of older JWT tokens (see is_claim_current()), until those tokens
+    have expired.
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.changed_at = None
+        self.polled_at = None
+        self._membership_versions = {}
+        self._organizations = OrderedDict()
+        self._tokens_by_user = {}
+        self._next_poll_at = 0
+        self._lock = threading.Lock()
+
+    def get(self, jwt_token):
+        """ Return the organization uuids cached for jwt_token, or None. """
+        now = time.time()
+        with self._lock:
+            entry = self._organizations.get(jwt_token)
+            if entry is None:
+                return None
+            if entry[2] <= now:
+                self._forget(jwt_token)
+                return None
+
+            self._organizations.move_to_end(jwt_token)
+            return entry[1]
+
+    def set(self, jwt_token, user_uuid, organization_uuids):
+        """ Cache the organization uuids of the user of jwt_token. """
+        with self._lock:
+            self._forget(jwt_token)
+            self._organizations[jwt_token] = (
+                user_uuid,
+                organization_uuids,
+                time.time() + self.ttl,
+            )
+            self._tokens_by_user.setdefault(user_uuid, set()).add(jwt_token)
+            while len(self._organizations) > self.max_size:
+                self._forget(next(iter(self._organizations)))
+
+    def _forget(self, jwt_token):
+        entry = self._organizations.pop(jwt_token, None)
+        if entry is None:
+            return
+
+        tokens = self._tokens_by_user[entry[0]]
+        tokens.discard(jwt_token)
+        if len(tokens) == 0:
+            del self._tokens_by_user[entry[0]]
+
+    def _forget_user(self, user_uuid):
+        for jwt_token in list(self._tokens_by_user.get(user_uuid, ())):
+            self._forget(jwt_token)
+
+    def invalidate(self, user_uuids=None):
+        """ Forget the organizations of user_uuids, or of every user. """
+        with self._lock:
+            if user_uuids is None:
+                self._organizations.clear()
+                self._tokens_by_user.clear()
+                return
+
+            for user_uuid in user_uuids:
+                self._forget_user(user_uuid)
+
+    def record_changes(self, user_uuids, membership_versions, changed_at, lifetime):
+        """Record the membership changes reported by the auth service.
+
+        The organizations of user_uuids are forgotten, and their
+        membership_versions are kept for the lifetime (in seconds) of JWT
+        tokens: older tokens have expired by then. Expired entries are pruned.
+        """
+        now = time.time()
+        with self._lock:
+            for user_uuid in user_uuids:
+                self._forget_user(user_uuid)
+            for (user_uuid, membership_version) in membership_versions.items():
+                self._membership_versions[user_uuid] = (
+                    membership_version,
+                    now + lifetime,
+                )
+
+            for (user_uuid, (_, expires_at)) in list(self._membership_versions.items()):
+                if expires_at <= now:
+                    del self._membership_versions[user_uuid]
+            for (jwt_token, entry) in list(self._organizations.items()):
+                if entry[2] <= now:
+                    self._forget(jwt_token)
+
+            self.changed_at = changed_at
+            self.polled_at = now
+
+    def claim_poll(self, interval):
+        """Returns True when the auth service should be polled for changes.
+
+        Only one caller is told to poll every interval seconds.
+        """
+        now = time.time()
+        with self._lock:
+            if now < self._next_poll_at:
+                return False
+
+            self._next_poll_at = now + interval
+            return True
+
+    def poll_since(self, interval, lifetime):
+        """The date to poll the auth service for changes since.
+
+        Polls overlap by interval seconds. The first poll covers the lifetime
+        (in seconds) of JWT tokens, so that the versions of every valid token
+        are known.
+        """
+        with self._lock:
+            changed_at = self.changed_at
+        if changed_at is None:
+            return datetime.utcfromtimestamp(time.time() - lifetime)
+
+        return changed_at - timedelta(seconds=interval)
+
+    def is_claim_current(self, user_uuid, membership_version):
+        """Returns True when organization claims of membership_version can be
+        trusted: the auth service was polled in the last ttl seconds, and the
+        memberships of user_uuid haven't changed since.
+        """
+        now = time.time()
+        with self._lock:
+            if self.polled_at is None or self.polled_at + self.ttl <= now:
+                return False
+
+            (current_version, _) = self._membership_versions.get(user_uuid, (0, None))
+        return membership_version >= current_version
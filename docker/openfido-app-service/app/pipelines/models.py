@@ -12,6 +12,14 @@ class OrganizationPipeline(CommonColumnsMixin, db.Model):
     pipeline_uuid = db.Column(db.String(32), nullable=False, server_default="")
     is_deleted = db.Column(db.Boolean(), default=False, nullable=False)
 
+    __table_args__ = (
+        db.Index(
+            "ix_organization_pipeline_organization_active",
+            "organization_uuid",
+            postgresql_where=db.text("is_deleted = false"),
+        ),
+    )
+
     organization_pipeline_runs = db.relationship(
         "OrganizationPipelineRun", backref="organization_pipeline", lazy="immediate"
     )
@@ -35,13 +43,28 @@ class OrganizationPipelineInputFile(CommonColumnsMixin, db.Model):
     __tablename__ = "organization_pipeline_input_file"
 
     name = db.Column(db.String(200), nullable=False, server_default="")
+    size = db.Column(db.BigInteger, nullable=True)
+    checksum = db.Column(db.String(128), nullable=True)
+    # Files uploaded directly to blob storage are only usable once the upload
+    # has been confirmed:
+    upload_id = db.Column(db.String(1024), nullable=True)
+    is_uploaded = db.Column(db.Boolean(), default=True, nullable=False)
 
     organization_pipeline_run_id = db.Column(
         db.Integer, db.ForeignKey("organization_pipeline_run.id"), nullable=True
     )
 
     organization_pipeline_id = db.Column(
-        db.Integer, db.ForeignKey("organization_pipeline.id"), nullable=False
+        db.Integer,
+        db.ForeignKey("organization_pipeline.id"),
+        nullable=False,
+        index=True,
+    )
+
+    __table_args__ = (
+        db.Index(
+            "ix_organization_pipeline_input_file_run_id", "organization_pipeline_run_id"
+        ),
     )
 
 
@@ -51,10 +74,13 @@ class OrganizationPipelineRun(CommonColumnsMixin, db.Model):
     __tablename__ = "organization_pipeline_run"
 
     organization_pipeline_id = db.Column(
-        db.Integer, db.ForeignKey("organization_pipeline.id"), nullable=False
+        db.Integer,
+        db.ForeignKey("organization_pipeline.id"),
+        nullable=False,
+        index=True,
     )
 
-    pipeline_run_uuid = db.Column(db.String(32), nullable=True)
+    pipeline_run_uuid = db.Column(db.String(32), nullable=True, index=True)
 
     post_processing_pipeline_run_uuid = db.Column(
         db.String(32), nullable=False, server_default=""
@@ -69,6 +95,15 @@ class OrganizationPipelineRun(CommonColumnsMixin, db.Model):
 
     is_deleted = db.Column(db.Boolean(), default=False, nullable=False)
 
+    __table_args__ = (
+        db.Index(
+            "ix_organization_pipeline_run_pipeline_created_active",
+            "organization_pipeline_id",
+            "created_at",
+            postgresql_where=db.text("is_deleted = false"),
+        ),
+    )
+
     organization_pipeline_run_post_processing_states = db.relationship(
         "OrganizationPipelineRunPostProcessingState",
         backref="organization_pipeline_run",
@@ -90,7 +125,10 @@ class ArtifactChart(CommonColumnsMixin, db.Model):
     name = db.Column(db.String(128), nullable=False)
     is_deleted = db.Column(db.Boolean(), default=False, nullable=True)
     organization_pipeline_run_id = db.Column(
-        db.Integer, db.ForeignKey("organization_pipeline_run.id"), nullable=False
+        db.Integer,
+        db.ForeignKey("organization_pipeline_run.id"),
+        nullable=False,
+        index=True,
     )
 
     artifact_uuid = db.Column(db.String(32), nullable=False)
@@ -125,3 +163,10 @@ class OrganizationPipelineRunPostProcessingState(CommonColumnsMixin, db.Model):
     post_processing_state_id = db.Column(
         db.Integer, db.ForeignKey("post_processing_state.id"), nullable=False
     )
+
+    __table_args__ = (
+        db.Index(
+            "ix_organization_pipeline_run_post_processing_state_run_id",
+            "organization_pipeline_run_id",
+        ),
+    )
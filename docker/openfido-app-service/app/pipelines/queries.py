@@ -4,7 +4,8 @@ from app.pipelines.models import (
     OrganizationPipelineRun,
     db,
 )
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import lazyload
 
 
 def find_organization_pipelines(organization_uuid):
@@ -16,12 +17,22 @@ def find_organization_pipelines(organization_uuid):
 
 
 def find_organization_pipeline(organization_uuid, organization_pipeline_uuid):
-    """ Fetch a OrganizationPipeline """
-    return OrganizationPipeline.query.filter(
-        OrganizationPipeline.organization_uuid == organization_uuid,
-        OrganizationPipeline.uuid == organization_pipeline_uuid,
-        OrganizationPipeline.is_deleted == False,
-    ).one_or_none()
+    """Fetch a OrganizationPipeline
+
+    Its runs and input files are only loaded when they are used.
+    """
+    return (
+        OrganizationPipeline.query.options(
+            lazyload(OrganizationPipeline.organization_pipeline_runs),
+            lazyload(OrganizationPipeline.organization_pipeline_input_files),
+        )
+        .filter(
+            OrganizationPipeline.organization_uuid == organization_uuid,
+            OrganizationPipeline.uuid == organization_pipeline_uuid,
+            OrganizationPipeline.is_deleted == False,
+        )
+        .one_or_none()
+    )
 
 
 def find_organization_pipeline_by_id(organization_pipeline_id):
@@ -40,7 +51,18 @@ def find_organization_pipeline_input_files(organization_pipeline_id):
     """ Search for Organization Pipeline Input Files """
     return OrganizationPipelineInputFile.query.filter(
         OrganizationPipelineInputFile.organization_pipeline_id
-        == organization_pipeline_id
+        == organization_pipeline_id,
+        OrganizationPipelineInputFile.is_uploaded == True,
+    ).all()
+
+
+def find_organization_pipeline_run_input_files(organization_pipeline_run_ids):
+    """ Find the Input Files of several Organization Pipeline Runs """
+    return OrganizationPipelineInputFile.query.filter(
+        OrganizationPipelineInputFile.organization_pipeline_run_id.in_(
+            organization_pipeline_run_ids
+        ),
+        OrganizationPipelineInputFile.is_uploaded == True,
     ).all()
 
 
@@ -50,9 +72,20 @@ def search_organization_pipeline_input_files(organization_pipeline_id, uuids):
         OrganizationPipelineInputFile.organization_pipeline_id
         == organization_pipeline_id,
         OrganizationPipelineInputFile.uuid.in_(uuids),
+        OrganizationPipelineInputFile.is_uploaded == True,
     ).all()
 
 
+def find_organization_pipeline_input_file_upload(organization_pipeline_id, uuid):
+    """ Find an Organization Pipeline Input File that is still being uploaded """
+    return OrganizationPipelineInputFile.query.filter(
+        OrganizationPipelineInputFile.organization_pipeline_id
+        == organization_pipeline_id,
+        OrganizationPipelineInputFile.uuid == uuid,
+        OrganizationPipelineInputFile.is_uploaded == False,
+    ).one_or_none()
+
+
 def find_organization_pipeline_run(organization_pipeline_id, uuid):
     """Find an Organization Pipeline Run
     NOTE: or used for backward compatibility.
@@ -70,18 +103,38 @@ def find_organization_pipeline_run(organization_pipeline_id, uuid):
     ).one_or_none()
 
 
-def find_latest_organization_pipeline_run(organization_pipeline_id):
-    """Find the latest Organization Pipeline Run for an Organization Pipeline. """
-    return (
-        OrganizationPipelineRun.query.join(OrganizationPipeline)
+def find_latest_organization_pipeline_runs(organization_pipeline_ids):
+    """Find the latest Organization Pipeline Run of each Organization Pipeline.
+
+    NOTE: runs created at the same time are all returned, ordered by id.
+    """
+    latest = (
+        db.session.query(
+            OrganizationPipelineRun.organization_pipeline_id,
+            func.max(OrganizationPipelineRun.created_at).label("created_at"),
+        )
         .filter(
-            OrganizationPipelineRun.organization_pipeline_id
-            == organization_pipeline_id,
-            OrganizationPipeline.is_deleted == False,
+            OrganizationPipelineRun.organization_pipeline_id.in_(
+                organization_pipeline_ids
+            ),
             OrganizationPipelineRun.is_deleted == False,
         )
-        .order_by(OrganizationPipelineRun.created_at.desc())
-        .first()
+        .group_by(OrganizationPipelineRun.organization_pipeline_id)
+        .subquery()
+    )
+
+    return (
+        OrganizationPipelineRun.query.join(
+            latest,
+            and_(
+                OrganizationPipelineRun.organization_pipeline_id
+                == latest.c.organization_pipeline_id,
+                OrganizationPipelineRun.created_at == latest.c.created_at,
+            ),
+        )
+        .filter(OrganizationPipelineRun.is_deleted == False)
+        .order_by(OrganizationPipelineRun.id)
+        .all()
     )
 
 
@@ -90,14 +143,22 @@ def search_organization_pipeline_runs(organization_pipeline_id, uuids):
     NOTE: or used for backward compatibility.
 
     """
-    return OrganizationPipelineRun.query.filter(
-        and_(
-            OrganizationPipelineRun.organization_pipeline_id
-            == organization_pipeline_id,
-            OrganizationPipelineRun.is_deleted == False,
-            or_(
-                OrganizationPipelineRun.pipeline_run_uuid.in_(uuids),
-                OrganizationPipelineRun.uuid.in_(uuids),
-            ),
+    return (
+        OrganizationPipelineRun.query.options(
+            lazyload(
+                OrganizationPipelineRun.organization_pipeline_run_post_processing_states
+            )
         )
-    ).all()
+        .filter(
+            and_(
+                OrganizationPipelineRun.organization_pipeline_id
+                == organization_pipeline_id,
+                OrganizationPipelineRun.is_deleted == False,
+                or_(
+                    OrganizationPipelineRun.pipeline_run_uuid.in_(uuids),
+                    OrganizationPipelineRun.uuid.in_(uuids),
+                ),
+            )
+        )
+        .all()
+    )
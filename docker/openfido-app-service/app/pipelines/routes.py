@@ -2,15 +2,19 @@ import logging
 
 from flask import Blueprint, jsonify, request
 
+from app.constants import RUN_LIST_NEXT_HEADER
 from app.utils import any_application_required, validate_organization
 from marshmallow.exceptions import ValidationError
 from requests import HTTPError
 
 from .queries import find_organization_pipeline, find_organization_pipeline_run
 from .services import (
+    abort_pipeline_input_file_upload,
+    complete_pipeline_input_file_upload,
     create_artifact_chart,
     create_pipeline,
     create_pipeline_input_file,
+    create_pipeline_input_file_upload,
     create_pipeline_run,
     delete_artifact_chart,
     delete_pipeline,
@@ -358,6 +362,182 @@ def upload_input_file(organization_uuid, organization_pipeline_uuid):
         return {"message": http_error.args[0]}, 503
 
 
+@organization_pipeline_bp.route(
+    "/<organization_uuid>/pipelines/<organization_pipeline_uuid>/input_files/uploads",
+    methods=["POST"],
+)
+@any_application_required
+@validate_organization(False)
+def create_input_file_upload(organization_uuid, organization_pipeline_uuid):
+    """Start uploading an input file directly to blob storage.
+
+    Each part of the file should be PUT to its presigned URL, and then the
+    upload confirmed with the complete endpoint.
+    ---
+    tags:
+      - pipelines
+    parameters:
+      - in: header
+        name: Workflow-API-Key
+        description: Requires key type REACT_CLIENT
+        schema:
+          type: string
+    requestBody:
+      description: "The input file name and size in bytes"
+      required: true
+      content:
+        application/json:
+          schema:
+            type: object
+            properties:
+              name:
+                type: string
+              size:
+                type: integer
+    responses:
+      "200":
+        description: "OK"
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                uuid:
+                  type: string
+                name:
+                  type: string
+                part_size:
+                  type: integer
+                urls:
+                  type: array
+                  description: Presigned URL to PUT each part to, in order.
+                  items:
+                    type: string
+      "400":
+        description: "Bad request"
+    """
+    organization_pipeline = find_organization_pipeline(
+        organization_uuid, organization_pipeline_uuid
+    )
+    if not organization_pipeline:
+        return {"message": "No such pipeline found"}, 400
+
+    try:
+        return jsonify(
+            create_pipeline_input_file_upload(organization_pipeline, request.json)
+        )
+    except ValidationError as validation_err:
+        return {"message": "Validation error", "errors": validation_err.messages}, 400
+
+
+@organization_pipeline_bp.route(
+    "/<organization_uuid>/pipelines/<organization_pipeline_uuid>/input_files/<input_file_uuid>/complete",
+    methods=["POST"],
+)
+@any_application_required
+@validate_organization(False)
+def complete_input_file_upload(
+    organization_uuid, organization_pipeline_uuid, input_file_uuid
+):
+    """Confirm that an input file has been uploaded directly to blob storage.
+    ---
+    tags:
+      - pipelines
+    parameters:
+      - in: header
+        name: Workflow-API-Key
+        description: Requires key type REACT_CLIENT
+        schema:
+          type: string
+    requestBody:
+      description: "The uploaded parts, and optionally a checksum of the file"
+      required: true
+      content:
+        application/json:
+          schema:
+            type: object
+            properties:
+              parts:
+                type: array
+                items:
+                  type: object
+                  properties:
+                    part_number:
+                      type: integer
+                    etag:
+                      type: string
+              checksum:
+                type: string
+    responses:
+      "200":
+        description: "OK"
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                uuid:
+                  type: string
+                name:
+                  type: string
+      "400":
+        description: "Bad request"
+    """
+    organization_pipeline = find_organization_pipeline(
+        organization_uuid, organization_pipeline_uuid
+    )
+    if not organization_pipeline:
+        return {"message": "No such pipeline found"}, 400
+
+    try:
+        input_file = complete_pipeline_input_file_upload(
+            organization_pipeline, input_file_uuid, request.json
+        )
+        return jsonify(uuid=input_file.uuid, name=input_file.name)
+    except ValueError as value_error:
+        return jsonify(value_error.args[0]), 400
+    except ValidationError as validation_err:
+        return {"message": "Validation error", "errors": validation_err.messages}, 400
+
+
+@organization_pipeline_bp.route(
+    "/<organization_uuid>/pipelines/<organization_pipeline_uuid>/input_files/<input_file_uuid>/abort",
+    methods=["POST"],
+)
+@any_application_required
+@validate_organization(False)
+def abort_input_file_upload(
+    organization_uuid, organization_pipeline_uuid, input_file_uuid
+):
+    """Abandon an input file that is being uploaded directly to blob storage.
+    ---
+    tags:
+      - pipelines
+    parameters:
+      - in: header
+        name: Workflow-API-Key
+        description: Requires key type REACT_CLIENT
+        schema:
+          type: string
+    responses:
+      "200":
+        description: "OK"
+      "400":
+        description: "Bad request"
+    """
+    organization_pipeline = find_organization_pipeline(
+        organization_uuid, organization_pipeline_uuid
+    )
+    if not organization_pipeline:
+        return {"message": "No such pipeline found"}, 400
+
+    try:
+        abort_pipeline_input_file_upload(organization_pipeline, input_file_uuid)
+        return {}, 200
+    except ValueError as value_error:
+        return jsonify(value_error.args[0]), 400
+
+
 @organization_pipeline_bp.route(
     "/<organization_uuid>/pipelines/<organization_pipeline_uuid>/runs",
     methods=["POST"],
@@ -427,7 +607,7 @@ def create_pipeline_runs(organization_uuid, organization_pipeline_uuid):
 @any_application_required
 @validate_organization(False)
 def pipeline_runs(organization_uuid, organization_pipeline_uuid):
-    """List all Organization Pipeline Runs.
+    """List all Organization Pipeline Runs, ordered by sequence.
     ---
     tags:
       - pipeline runs
@@ -437,9 +617,44 @@ def pipeline_runs(organization_uuid, organization_pipeline_uuid):
         description: Requires key type REACT_CLIENT
         schema:
           type: string
+      - in: query
+        name: after
+        description: Only return runs with a greater sequence number (the X-Next-After header of the previous page).
+        schema:
+          type: integer
+      - in: query
+        name: limit
+        description: Maximum number of runs to return (at most 1000). Without after or limit, every run is returned.
+        schema:
+          type: integer
+      - in: query
+        name: state
+        description: Only return runs currently in this state (e.g. RUNNING).
+        schema:
+          type: string
+      - in: query
+        name: created_after
+        description: Only return runs created at or after this time.
+        schema:
+          type: string
+      - in: query
+        name: created_before
+        description: Only return runs created before this time.
+        schema:
+          type: string
+      - in: query
+        name: view
+        description: "'summary' returns only the uuid, sequence, dates and current state of each run."
+        schema:
+          type: string
     responses:
       "200":
         description: "List of pipeline runs"
+        headers:
+          X-Next-After:
+            description: The after parameter of the next page, when there is one.
+            schema:
+              type: integer
         content:
           application/json:
             schema:
@@ -473,9 +688,26 @@ def pipeline_runs(organization_uuid, organization_pipeline_uuid):
     """
 
     try:
-        return jsonify(
-            fetch_pipeline_runs(organization_uuid, organization_pipeline_uuid)
+        (pipeline_runs, next_after) = fetch_pipeline_runs(
+            organization_uuid,
+            organization_pipeline_uuid,
+            {
+                param: request.args[param]
+                for param in (
+                    "after",
+                    "limit",
+                    "state",
+                    "created_after",
+                    "created_before",
+                    "view",
+                )
+                if param in request.args
+            },
         )
+        response = jsonify(pipeline_runs)
+        if next_after is not None:
+            response.headers[RUN_LIST_NEXT_HEADER] = str(next_after)
+        return response
     except ValueError as value_error:
         return jsonify(value_error.args[0]), 400
     except HTTPError as http_error:
@@ -610,6 +842,26 @@ def pipeline_run_console(
         description: Requires key type REACT_CLIENT
         schema:
           type: string
+      - in: query
+        name: stream
+        description: Only return one stream (std_out or std_err).
+        schema:
+          type: string
+      - in: query
+        name: offset
+        description: Character offset to begin returning output from.
+        schema:
+          type: integer
+      - in: query
+        name: limit
+        description: Maximum number of characters to return per stream.
+        schema:
+          type: integer
+      - in: query
+        name: tail
+        description: Return this many characters from the end of the output.
+        schema:
+          type: integer
     responses:
       "200":
         description: "Get a Pipeline Run"
@@ -620,8 +872,16 @@ def pipeline_run_console(
               properties:
                 std_out:
                   type: string
+                std_out_offset:
+                  type: integer
+                std_out_length:
+                  type: integer
                 std_err:
                   type: string
+                std_err_offset:
+                  type: integer
+                std_err_length:
+                  type: integer
       "400":
         description: "Bad request"
       "503":
@@ -641,6 +901,11 @@ def pipeline_run_console(
                 organization_uuid,
                 organization_pipeline_uuid,
                 organization_pipeline_run_uuid,
+                {
+                    param: request.args[param]
+                    for param in ("stream", "offset", "limit", "tail")
+                    if param in request.args
+                },
             )
         )
     except ValueError as value_error:
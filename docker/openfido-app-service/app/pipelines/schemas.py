@@ -1,7 +1,7 @@
 from blob_utils.schemas import UUID
 from marshmallow import Schema, fields, validate
 
-from .models import ArtifactChart
+from .models import ArtifactChart, OrganizationPipelineInputFile
 
 
 class CreateArtifactChart(Schema):
@@ -17,3 +17,34 @@ class CreateArtifactChart(Schema):
         validate=validate.Length(min=1, max=ArtifactChart.chart_type_code.type.length),
     )
     chart_config = fields.Field(missing={})
+
+
+class CreateInputFileUpload(Schema):
+    """ Validation schema for create_pipeline_input_file_upload() """
+
+    name = fields.Str(
+        required=True,
+        validate=validate.Length(
+            min=2, max=OrganizationPipelineInputFile.name.type.length
+        ),
+    )
+    size = fields.Int(required=True, validate=validate.Range(min=0))
+
+
+class InputFileUploadPart(Schema):
+    """ An uploaded part of an input file. """
+
+    part_number = fields.Int(required=True, validate=validate.Range(min=1))
+    etag = fields.Str(required=True)
+
+
+class CompleteInputFileUpload(Schema):
+    """ Validation schema for complete_pipeline_input_file_upload() """
+
+    parts = fields.Nested(InputFileUploadPart, many=True, required=True)
+    checksum = fields.Str(
+        missing=None,
+        validate=validate.Length(
+            max=OrganizationPipelineInputFile.checksum.type.length
+        ),
+    )
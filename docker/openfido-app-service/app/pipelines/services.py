@@ -1,3 +1,4 @@
+import math
 import uuid
 from datetime import datetime, timedelta
 
@@ -5,13 +6,30 @@ from flask import current_app
 from urllib.parse import quote
 
 import requests
-from app.constants import S3_BUCKET, WORKFLOW_API_TOKEN, WORKFLOW_HOSTNAME
+from app.constants import (
+    INPUT_FILE_MAX_PARTS,
+    INPUT_FILE_PART_SIZE,
+    RUN_LIST_MAX_LIMIT,
+    RUN_LIST_NEXT_HEADER,
+    S3_BUCKET,
+    WORKFLOW_API_TOKEN,
+    WORKFLOW_HOSTNAME,
+)
 from application_roles.decorators import ROLES_KEY
-from blob_utils import create_url, upload_stream
+from blob_utils import (
+    abort_multipart_upload,
+    complete_multipart_upload,
+    create_multipart_upload,
+    create_upload_part_urls,
+    create_url,
+    delete_file,
+    get_file_size,
+    upload_stream,
+)
+from botocore.exceptions import ClientError
 from requests import HTTPError
 
-from ..utils import make_hash
-from .schemas import CreateArtifactChart
+from .schemas import CreateArtifactChart, CompleteInputFileUpload, CreateInputFileUpload
 from .models import (
     ArtifactChart,
     OrganizationPipeline,
@@ -21,12 +39,13 @@ from .models import (
 )
 from .queries import (
     find_organization_pipeline,
-    find_organization_pipeline_input_files,
+    find_organization_pipeline_input_file_upload,
     find_organization_pipeline_run,
     find_organization_pipelines,
-    find_latest_organization_pipeline_run,
-    search_organization_pipeline_input_files,
+    find_latest_organization_pipeline_runs,
+    find_organization_pipeline_run_input_files,
     search_organization_pipeline_runs,
+    search_organization_pipeline_input_files,
 )
 
 
@@ -169,7 +188,7 @@ def fetch_pipelines(organization_uuid):
     args[0] contains the json message from the backing server)
     """
 
-    organization_pipelines = find_organization_pipelines(organization_uuid)
+    organization_pipelines = find_organization_pipelines(organization_uuid).all()
 
     # TODO timeouts - enforce a strict timeout.
     response = requests.post(
@@ -189,39 +208,96 @@ def fetch_pipelines(organization_uuid):
         # Match up the pipelines returned in the json_value with the
         # organization_pipelines in organization_pipelines - they should match
         # exactly. If they don't, throw an error.
-        for pipeline in json_value:
-            organization_pipeline = next(
-                (
-                    op
-                    for op in organization_pipelines
-                    if op.pipeline_uuid == pipeline["uuid"]
-                )
-            )
+        by_pipeline_uuid = {op.pipeline_uuid: op for op in organization_pipelines}
+        matches = [
+            (pipeline, by_pipeline_uuid[pipeline["uuid"]]) for pipeline in json_value
+        ]
+    except ValueError as value_error:
+        raise HTTPError("Non JSON payload returned") from value_error
+    except HTTPError as http_error:
+        raise ValueError(json_value) from http_error
+    except KeyError as key_error:
+        raise ValueError(
+            "Unable to match Pipeline to OrganizationPipeline"
+        ) from key_error
 
-            pipeline["uuid"] = organization_pipeline.uuid
-            latest_pipeline_run = find_latest_organization_pipeline_run(
-                organization_pipeline.id
-            )
+    latest_pipeline_runs = fetch_latest_pipeline_runs(organization_pipelines)
+    for (pipeline, organization_pipeline) in matches:
+        pipeline["uuid"] = organization_pipeline.uuid
+        pipeline_run = latest_pipeline_runs.get(organization_pipeline.id)
 
-            if not latest_pipeline_run:
-                continue
+        if pipeline_run:
+            pipeline["last_pipeline_run"] = pipeline_run
 
-            pipeline_run = fetch_pipeline_run(
-                organization_uuid, organization_pipeline.uuid, latest_pipeline_run.uuid
-            )
+    return json_value
 
-            if pipeline_run:
-                pipeline["last_pipeline_run"] = pipeline_run
 
-        return json_value
+def _organization_run_inputs(organization_pipeline_uuid, input_files):
+    """ Download URLs of the input files of an OrganizationPipelineRun. """
+    inputs = []
+    for opf in input_files:
+        sname = quote(opf.name)
+        url = create_url(f"{organization_pipeline_uuid}/{opf.uuid}-{sname}", sname)
+        inputs.append({"url": url, "name": opf.name, "uuid": opf.uuid})
+
+    return inputs
+
+
+def fetch_latest_pipeline_runs(organization_pipelines):
+    """Find the latest pipeline run of several OrganizationPipelines.
+
+    Returns a dict of pipeline runs (as fetch_pipeline_run() returns them) by
+    OrganizationPipeline id. Uses one request to the workflow service however
+    many pipelines there are.
+    """
+    org_pipeline_uuids = {op.id: op.uuid for op in organization_pipelines}
+    # of runs created at the same time, the last one created is the latest.
+    latest_org_pipeline_runs = {
+        opr.organization_pipeline_id: opr
+        for opr in find_latest_organization_pipeline_runs(list(org_pipeline_uuids))
+        if opr.pipeline_run_uuid
+    }
+    if len(latest_org_pipeline_runs) == 0:
+        return {}
+
+    org_pipeline_runs = {
+        opr.pipeline_run_uuid: opr for opr in latest_org_pipeline_runs.values()
+    }
+
+    response = requests.post(
+        f"{current_app.config[WORKFLOW_HOSTNAME]}/v1/pipelines/runs/search",
+        headers={
+            "Content-Type": "application/json",
+            ROLES_KEY: current_app.config[WORKFLOW_API_TOKEN],
+        },
+        json={"uuids": list(org_pipeline_runs)},
+    )
+
+    try:
+        pipeline_runs = response.json()
+        response.raise_for_status()
     except ValueError as value_error:
         raise HTTPError("Non JSON payload returned") from value_error
     except HTTPError as http_error:
-        raise ValueError(json_value) from http_error
-    except StopIteration as stop_iteration:
-        raise ValueError(
-            "Unable to match Pipeline to OrganizationPipeline"
-        ) from stop_iteration
+        raise ValueError(pipeline_runs) from http_error
+
+    input_files = {}
+    for opf in find_organization_pipeline_run_input_files(
+        [opr.id for opr in org_pipeline_runs.values()]
+    ):
+        input_files.setdefault(opf.organization_pipeline_run_id, []).append(opf)
+
+    latest_pipeline_runs = {}
+    for pipeline_run in pipeline_runs:
+        opr = org_pipeline_runs[pipeline_run["uuid"]]
+        pipeline_run["uuid"] = opr.uuid
+        pipeline_run["inputs"] = _organization_run_inputs(
+            org_pipeline_uuids[opr.organization_pipeline_id],
+            input_files.get(opr.id, []),
+        )
+        latest_pipeline_runs[opr.organization_pipeline_id] = pipeline_run
+
+    return latest_pipeline_runs
 
 
 def create_pipeline_input_file(organization_pipeline, filename, stream):
@@ -246,6 +322,101 @@ def create_pipeline_input_file(organization_pipeline, filename, stream):
     return input_file
 
 
+def create_pipeline_input_file_upload(organization_pipeline, request_json):
+    """Start a direct upload of an OrganizationPipelineInputFile.
+
+    Returns presigned URLs that each part of the file should be PUT to. The
+    input file can't be used until complete_pipeline_input_file_upload() is
+    called.
+    """
+    data = CreateInputFileUpload().load(request_json)
+    part_size = max(
+        INPUT_FILE_PART_SIZE, math.ceil(data["size"] / INPUT_FILE_MAX_PARTS)
+    )
+    part_count = max(1, math.ceil(data["size"] / part_size))
+
+    input_file_uuid = uuid.uuid4().hex
+    key = f"{organization_pipeline.uuid}/{input_file_uuid}-{quote(data['name'])}"
+    upload_id = create_multipart_upload(key)
+
+    input_file = OrganizationPipelineInputFile(
+        uuid=input_file_uuid,
+        name=data["name"],
+        size=data["size"],
+        upload_id=upload_id,
+        is_uploaded=False,
+    )
+    organization_pipeline.organization_pipeline_input_files.append(input_file)
+
+    db.session.commit()
+
+    return {
+        "uuid": input_file.uuid,
+        "name": input_file.name,
+        "part_size": part_size,
+        "urls": create_upload_part_urls(key, upload_id, part_count),
+    }
+
+
+def complete_pipeline_input_file_upload(
+    organization_pipeline, input_file_uuid, request_json
+):
+    """ Confirm that a direct upload of an OrganizationPipelineInputFile is done. """
+    data = CompleteInputFileUpload().load(request_json)
+
+    input_file = find_organization_pipeline_input_file_upload(
+        organization_pipeline.id, input_file_uuid
+    )
+    if input_file is None:
+        raise ValueError({"message": "No such input file upload found"})
+
+    key = f"{organization_pipeline.uuid}/{input_file.uuid}-{quote(input_file.name)}"
+    try:
+        complete_multipart_upload(
+            key,
+            input_file.upload_id,
+            [(part["part_number"], part["etag"]) for part in data["parts"]],
+        )
+        size = get_file_size(key)
+    except ClientError:
+        raise ValueError({"message": "Unable to complete the upload"})
+
+    if size != input_file.size:
+        # the file can't be used, forget about it.
+        delete_file(key)
+        db.session.delete(input_file)
+        db.session.commit()
+        raise ValueError({"message": "Uploaded file size does not match"})
+
+    input_file.checksum = data["checksum"]
+    input_file.upload_id = None
+    input_file.is_uploaded = True
+
+    db.session.commit()
+
+    return input_file
+
+
+def abort_pipeline_input_file_upload(organization_pipeline, input_file_uuid):
+    """ Abandon a direct upload of an OrganizationPipelineInputFile. """
+    input_file = find_organization_pipeline_input_file_upload(
+        organization_pipeline.id, input_file_uuid
+    )
+    if input_file is None:
+        raise ValueError({"message": "No such input file upload found"})
+
+    key = f"{organization_pipeline.uuid}/{input_file.uuid}-{quote(input_file.name)}"
+    try:
+        abort_multipart_upload(key, input_file.upload_id)
+    except ClientError as client_err:
+        # (an upload that no longer exists is already aborted)
+        if client_err.response["Error"]["Code"] != "NoSuchUpload":
+            raise ValueError({"message": "Unable to abort the upload"})
+
+    db.session.delete(input_file)
+    db.session.commit()
+
+
 def create_pipeline_run(organization_uuid, pipeline_uuid, request_json):
     """Creates OrganizationPipelineRuns for a pipline."""
     org_pipeline = find_organization_pipeline(organization_uuid, pipeline_uuid)
@@ -515,12 +686,11 @@ def fetch_artifact_charts(organization_pipeline_run):
     return results
 
 
-def fetch_pipeline_runs(organization_uuid, pipeline_uuid):
-    """Find all OrganizationPipelineRuns for a pipline."""
-    org_pipeline = find_organization_pipeline(organization_uuid, pipeline_uuid)
-
+def _fetch_pipeline_runs_page(org_pipeline, runs_query):
+    """ Fetch one page of the pipeline runs of the workflow service. """
     response = requests.get(
         f"{current_app.config[WORKFLOW_HOSTNAME]}/v1/pipelines/{org_pipeline.pipeline_uuid}/runs",
+        params=runs_query,
         headers={
             "Content-Type": "application/json",
             ROLES_KEY: current_app.config[WORKFLOW_API_TOKEN],
@@ -530,33 +700,83 @@ def fetch_pipeline_runs(organization_uuid, pipeline_uuid):
     try:
         pipeline_runs = response.json()
         response.raise_for_status()
+    except ValueError as value_error:
+        raise HTTPError("Non JSON payload returned") from value_error
+    except HTTPError as http_error:
+        raise ValueError(pipeline_runs) from http_error
+
+    return (pipeline_runs, response.headers.get(RUN_LIST_NEXT_HEADER))
+
+
+def fetch_pipeline_runs(organization_uuid, pipeline_uuid, runs_query=None):
+    """Find a page of the OrganizationPipelineRuns of a pipline.
+
+    runs_query optionally selects the page of runs, and how they are viewed
+    (the after, limit, state, created_after, created_before and view parameters
+    of the workflow service runs endpoint). Summaries of runs have no inputs.
+    Without after or limit, every run is returned.
+
+    Returns (pipeline_runs, next_after): next_after is the after parameter of
+    the next page, or None when this is the last page.
+    """
+    org_pipeline = find_organization_pipeline(organization_uuid, pipeline_uuid)
+    runs_query = dict(runs_query or {})
+    if "after" in runs_query:
+        runs_query.setdefault("limit", RUN_LIST_MAX_LIMIT)
+    with_inputs = runs_query.get("view") != "summary"
+
+    # runs deleted from this organization are left out, so pages of the
+    # workflow service are fetched until the page is full.
+    organization_pipeline_runs = []
+    while True:
+        (pipeline_runs, next_after) = _fetch_pipeline_runs_page(
+            org_pipeline, runs_query
+        )
+        # (the limit is valid once the workflow service accepted it)
+        limit = int(runs_query["limit"]) if "limit" in runs_query else None
+
+        # NOTE: older runs used the pipeline run uuid as their own uuid.
+        org_pipeline_runs = {}
+        for opr in search_organization_pipeline_runs(
+            org_pipeline.id, [pr.get("uuid") for pr in pipeline_runs]
+        ):
+            org_pipeline_runs[opr.uuid] = opr
+            if opr.pipeline_run_uuid:
+                org_pipeline_runs[opr.pipeline_run_uuid] = opr
+
+        input_files = {}
+        if with_inputs:
+            for opf in find_organization_pipeline_run_input_files(
+                list({opr.id for opr in org_pipeline_runs.values()})
+            ):
+                input_files.setdefault(opf.organization_pipeline_run_id, []).append(
+                    opf
+                )
 
-        # update with org uuids
+        # update with org uuids, and generate download urls of the inputs.
         for pr in pipeline_runs:
-            opr = search_organization_pipeline_runs(org_pipeline.id, [pr.get("uuid")])[
-                0
-            ]
-            pr["uuid"] = opr.uuid
-            org_pipeline_input_files = find_organization_pipeline_input_files(
-                org_pipeline.id
-            )
+            opr = org_pipeline_runs.get(pr.get("uuid"))
+            if opr is None:
+                continue
 
-            inputs = []
+            pr["uuid"] = opr.uuid
+            if with_inputs:
+                pr["inputs"] = _organization_run_inputs(
+                    pipeline_uuid, input_files.get(opr.id, [])
+                )
+            organization_pipeline_runs.append(pr)
 
-            # generate download urls and add uuid
-            for opf in org_pipeline_input_files:
-                if opf.organization_pipeline_run_id == opr.id:
-                    sname = quote(opf.name)
-                    url = create_url(f"{pipeline_uuid}/{opf.uuid}-{sname}", sname)
-                    inputs.append({"url": url, "name": opf.name, "uuid": opf.uuid})
+        if next_after is None or (
+            limit is not None and len(organization_pipeline_runs) >= limit
+        ):
+            break
+        runs_query["after"] = next_after
 
-            pr["inputs"] = inputs
+    if limit is not None and len(organization_pipeline_runs) > limit:
+        organization_pipeline_runs = organization_pipeline_runs[:limit]
+        next_after = organization_pipeline_runs[-1]["sequence"]
 
-        return pipeline_runs
-    except ValueError as value_error:
-        raise HTTPError("Non JSON payload returned") from value_error
-    except HTTPError as http_error:
-        raise ValueError(pipeline_runs) from http_error
+    return (organization_pipeline_runs, next_after)
 
 
 def fetch_pipeline_run(
@@ -591,21 +811,10 @@ def fetch_pipeline_run(
             org_pipeline.id, str(pipeline_run.get("uuid"))
         )
         pipeline_run["uuid"] = opr.uuid
-        org_pipeline_input_files = find_organization_pipeline_input_files(
-            org_pipeline.id
+        pipeline_run["inputs"] = _organization_run_inputs(
+            organization_pipeline_uuid,
+            find_organization_pipeline_run_input_files([opr.id]),
         )
-        inputs = []
-
-        # generate download urls and add uuid
-        for opf in org_pipeline_input_files:
-            if opf.organization_pipeline_run_id == opr.id:
-                sname = quote(opf.name)
-                url = create_url(
-                    f"{organization_pipeline_uuid}/{opf.uuid}-{sname}", sname
-                )
-                inputs.append({"url": url, "name": opf.name, "uuid": opf.uuid})
-
-        pipeline_run["inputs"] = inputs
 
         return pipeline_run
     except ValueError as value_error:
@@ -615,9 +824,16 @@ def fetch_pipeline_run(
 
 
 def fetch_pipeline_run_console(
-    organization_uuid, organization_pipeline_uuid, organization_pipeline_run_uuid
+    organization_uuid,
+    organization_pipeline_uuid,
+    organization_pipeline_run_uuid,
+    console_query=None,
 ):
-    """Fetches console output for an OrganizationPipelineRun."""
+    """Fetches console output for an OrganizationPipelineRun.
+
+    console_query optionally selects a range of the output (the stream, offset,
+    limit and tail parameters of the workflow service console endpoint).
+    """
     org_pipeline = find_organization_pipeline(
         organization_uuid, organization_pipeline_uuid
     )
@@ -631,6 +847,7 @@ def fetch_pipeline_run_console(
 
     response = requests.get(
         f"{current_app.config[WORKFLOW_HOSTNAME]}/v1/pipelines/{org_pipeline.pipeline_uuid}/runs/{org_pipeline_run.pipeline_run_uuid}/console",
+        params=console_query,
         headers={
             "Content-Type": "application/json",
             ROLES_KEY: current_app.config[WORKFLOW_API_TOKEN],
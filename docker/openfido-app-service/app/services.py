@@ -1,19 +1,135 @@
+import logging
+from datetime import datetime, timedelta
+
 import requests
 from flask import current_app
+from requests.exceptions import RequestException
 
-from .constants import AUTH_HOSTNAME
+from .constants import (
+    AUTH_HOSTNAME,
+    AUTH_MEMBERSHIP_CHANGES_KEY,
+    AUTH_MEMBERSHIP_CACHE_SIZE,
+    AUTH_MEMBERSHIP_CACHE_TTL,
+    AUTH_MEMBERSHIP_POLL_INTERVAL,
+    JWT_EXPIRATION_DAYS,
+)
+from .membership_cache import MembershipCache
 
+logger = logging.getLogger("services")
 
-def fetch_is_user_in_org(organization_uuid, jwt_token, user_uuid):
-    """ Verify user_uuid is a member of organization_uuid by calling AUTH_HOSTNAME API. """
+
+def _auth_headers(jwt_token):
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {jwt_token}",
+    }
+
+
+def get_membership_cache():
+    """ The MembershipCache of the current app. """
+    membership_cache = current_app.extensions.get("membership_cache")
+    if membership_cache is None:
+        membership_cache = current_app.extensions.setdefault(
+            "membership_cache",
+            MembershipCache(
+                int(current_app.config[AUTH_MEMBERSHIP_CACHE_TTL]),
+                int(current_app.config[AUTH_MEMBERSHIP_CACHE_SIZE]),
+            ),
+        )
+
+    return membership_cache
+
+
+def poll_membership_changes():
+    """Forget the cached organizations of users whose memberships changed.
+
+    AUTH_HOSTNAME is asked at most every AUTH_MEMBERSHIP_POLL_INTERVAL seconds
+    (0, or no AUTH_MEMBERSHIP_CHANGES_KEY, disables polling). Each poll overlaps
+    the previous one by that interval, so that changes committed while it ran
+    aren't missed.
+    """
+    interval = int(current_app.config[AUTH_MEMBERSHIP_POLL_INTERVAL])
+    key = current_app.config.get(AUTH_MEMBERSHIP_CHANGES_KEY)
+    membership_cache = get_membership_cache()
+    if interval <= 0 or not key or not membership_cache.claim_poll(interval):
+        return
+
+    lifetime = timedelta(days=JWT_EXPIRATION_DAYS).total_seconds()
+    since = membership_cache.poll_since(interval, lifetime)
+    try:
+        response = requests.get(
+            f"{current_app.config[AUTH_HOSTNAME]}/users/membership-changes",
+            headers={"Membership-Changes-Key": key},
+            params={"since": since.isoformat()},
+        )
+        response.raise_for_status()
+        changes = response.json()
+    except (RequestException, ValueError):
+        # entries still expire after AUTH_MEMBERSHIP_CACHE_TTL.
+        logger.warning("Unable to poll membership changes")
+        return
+
+    membership_cache.record_changes(
+        changes["user_uuids"],
+        changes["membership_versions"],
+        datetime.fromisoformat(changes["changed_at"]),
+        lifetime,
+    )
+
+
+def fetch_user_organizations(jwt_token, user_uuid):
+    """ Fetch the uuids of the organizations of user_uuid from AUTH_HOSTNAME. """
     response = requests.get(
         f"{current_app.config[AUTH_HOSTNAME]}/users/{user_uuid}/organizations",
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {jwt_token}",
-        },
+        headers=_auth_headers(jwt_token),
         json={"uuid": user_uuid},
     )
     response.raise_for_status()
 
-    return organization_uuid in [org["uuid"] for org in response.json()]
+    return frozenset(org["uuid"] for org in response.json())
+
+
+def fetch_is_user_in_org(organization_uuid, jwt_token, user_uuid):
+    """Verify user_uuid is a member of organization_uuid by calling AUTH_HOSTNAME API.
+
+    The organizations of a user are cached (see MembershipCache). Users that
+    aren't in a cached organization are checked again, in case they just
+    joined it.
+    """
+    poll_membership_changes()
+
+    membership_cache = get_membership_cache()
+    organization_uuids = membership_cache.get(jwt_token)
+    if organization_uuids is not None and organization_uuid in organization_uuids:
+        return True
+
+    organization_uuids = fetch_user_organizations(jwt_token, user_uuid)
+    membership_cache.set(jwt_token, user_uuid, organization_uuids)
+
+    return organization_uuid in organization_uuids
+
+
+def find_is_user_in_org_claim(organization_uuid, decoded_token):
+    """Verify user_uuid is a member of organization_uuid with the organization
+    claims of a verified JWT token (see the auth service's JWT_MEMBERSHIP_CLAIMS).
+
+    Returns None when the token has no claims, or when they can't be trusted:
+    the memberships of its user changed since it was issued, or the auth
+    service couldn't be polled for changes recently.
+    """
+    if (
+        "organizations" not in decoded_token
+        or "membership_version" not in decoded_token
+    ):
+        return None
+
+    poll_membership_changes()
+    if not get_membership_cache().is_claim_current(
+        decoded_token["uuid"], int(decoded_token["membership_version"])
+    ):
+        return None
+
+    return any(
+        organization["uuid"] == organization_uuid
+        for organization in decoded_token["organizations"]
+    )
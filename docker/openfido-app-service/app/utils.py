@@ -1,19 +1,19 @@
-import hashlib
 import logging
 import re
-import secrets
+from calendar import timegm
+from datetime import datetime
 from enum import IntEnum, unique
 from functools import wraps
 
 import jwt
-import secrets
 from application_roles.decorators import make_permission_decorator
-from flask import g, request
-from jwt.exceptions import DecodeError
+from flask import current_app, g, request
+from jwt.exceptions import InvalidTokenError
 from requests import HTTPError
 from simplejson.errors import JSONDecodeError
 
-from .services import fetch_is_user_in_org
+from .constants import AUTH_JWT_SECRET, JWT_ALGORITHM
+from .services import fetch_is_user_in_org, find_is_user_in_org_claim
 
 logger = logging.getLogger("utils")
 
@@ -29,6 +29,24 @@ permissions_required = make_permission_decorator(ApplicationsEnum)
 any_application_required = permissions_required(list(ApplicationsEnum))
 
 
+def decode_jwt(jwt_token):
+    """Decode a JWT token from the auth service.
+
+    When AUTH_JWT_SECRET is configured the token is verified like the auth
+    service does (signature, exp and max-exp); otherwise only the auth service
+    verifies it, when organization memberships are fetched.
+    """
+    secret = current_app.config.get(AUTH_JWT_SECRET)
+    if not secret:
+        return jwt.decode(jwt_token, verify=False)
+
+    decoded_token = jwt.decode(jwt_token, secret, algorithms=[JWT_ALGORITHM])
+    if int(decoded_token.get("max-exp", 0)) < timegm(datetime.now().utctimetuple()):
+        raise InvalidTokenError("max-exp has passed")
+
+    return decoded_token
+
+
 def validate_organization(requires_json=True):
     """Decorator enforcing that organization_uuid is valid, and that the
     content type is application/json.
@@ -36,6 +54,9 @@ def validate_organization(requires_json=True):
     Note: assumes that the method called has <organization_uuid> as the first
     argument in its route pattern, and is the first parameter.
 
+    Verified tokens with current organization claims are authorized without
+    asking the auth service (see find_is_user_in_org_claim()).
+
     Assigns g.organization_uuid to the organization uuid
     Assigns g.jwt_token on success to JWT token.
     Assigns g.user_uuid on success to user's uuid decoded from JWT token.
@@ -62,14 +83,22 @@ def validate_organization(requires_json=True):
 
             g.jwt_token = matches.group(1)
             try:
-                decoded_token = jwt.decode(g.jwt_token, verify=False)
+                decoded_token = decode_jwt(g.jwt_token)
 
                 g.user_uuid = decoded_token["uuid"]
                 g.organization_uuid = kwargs["organization_uuid"]
 
-                if not fetch_is_user_in_org(
-                    kwargs["organization_uuid"], g.jwt_token, g.user_uuid
-                ):
+                is_user_in_org = None
+                if current_app.config.get(AUTH_JWT_SECRET):
+                    is_user_in_org = find_is_user_in_org_claim(
+                        kwargs["organization_uuid"], decoded_token
+                    )
+                if is_user_in_org is None:
+                    is_user_in_org = fetch_is_user_in_org(
+                        kwargs["organization_uuid"], g.jwt_token, g.user_uuid
+                    )
+
+                if not is_user_in_org:
                     logger.warning("Could not find organization")
                     return {
                         "message": "Unable to find organization by uuid provided"
@@ -79,7 +108,7 @@ def validate_organization(requires_json=True):
             except HTTPError:
                 logger.warning("Failing to access auth server")
                 return {}, 503
-            except DecodeError:
+            except InvalidTokenError:
                 logger.warning("unable to decode JWT")
                 return {}, 401
             except JSONDecodeError:
@@ -89,27 +118,3 @@ def validate_organization(requires_json=True):
         return wrapper
 
     return decorator
-
-
-def make_hash(password, salt=None):
-    """Make a hash of a password.
-    If a salt is not provided, a random one is created.
-    Returns the hash and salt."""
-    # NIST guidelines for password storage:
-    #  * salt > 32 bits
-    #  * PBKDF2
-    #  * iterate at least 10,000 times.
-    #  * TODO consider adding pepper (probably SECRET_KEY?)
-    if salt is None:
-        salt = secrets.token_urlsafe(32)
-    return (
-        hashlib.pbkdf2_hmac(
-            "sha256", password.encode("utf-8"), salt.encode("utf-8"), 10000
-        ).hex(),
-        salt,
-    )
-
-
-def verify_hash(password, p_hash, salt):
-    """ Returns True when 'password' matches a value from make_hash(). """
-    return make_hash(password, salt)[0] == p_hash
@@ -12,6 +12,14 @@ class OrganizationWorkflow(CommonColumnsMixin, db.Model):
     workflow_uuid = db.Column(db.String(32), nullable=False, server_default="")
     is_deleted = db.Column(db.Boolean(), default=False, nullable=False)
 
+    __table_args__ = (
+        db.Index(
+            "ix_organization_workflow_organization_active",
+            "organization_uuid",
+            postgresql_where=db.text("is_deleted = false"),
+        ),
+    )
+
 
 class OrganizationWorkflowPipeline(CommonColumnsMixin, db.Model):
     """ Organization workflow pipeline. """
@@ -19,10 +27,13 @@ class OrganizationWorkflowPipeline(CommonColumnsMixin, db.Model):
     __tablename__ = "organization_workflow_pipeline"
 
     organization_workflow_uuid = db.Column(
-        db.String(32), nullable=False, server_default=""
+        db.String(32), nullable=False, server_default="", index=True
     )
     organization_pipeline_id = db.Column(
-        db.Integer, db.ForeignKey("organization_pipeline.id"), nullable=False
+        db.Integer,
+        db.ForeignKey("organization_pipeline.id"),
+        nullable=False,
+        index=True,
     )
     workflow_pipeline_uuid = db.Column(db.String(32), nullable=False, server_default="")
     is_deleted = db.Column(db.Boolean(), default=False, nullable=False)
@@ -48,7 +59,10 @@ class OrganizationWorkflowPipelineRun(CommonColumnsMixin, db.Model):
     __tablename__ = "organization_workflow_pipeline_run"
 
     organization_workflow_id = db.Column(
-        db.Integer, db.ForeignKey("organization_workflow.id"), nullable=False
+        db.Integer,
+        db.ForeignKey("organization_workflow.id"),
+        nullable=False,
+        index=True,
     )
     organization_pipeline_run_id = db.Column(
         db.Integer, db.ForeignKey("organization_pipeline_run.id"), nullable=False
@@ -57,9 +71,22 @@ class OrganizationWorkflowPipelineRun(CommonColumnsMixin, db.Model):
     organization_workflow_run_id = db.Column(
         db.Integer, db.ForeignKey("organization_workflow_run.id"), nullable=False
     )
-    workflow_run_uuid = db.Column(db.String(32), nullable=True, server_default="")
+    workflow_run_uuid = db.Column(
+        db.String(32), nullable=True, server_default="", index=True
+    )
     is_deleted = db.Column(db.Boolean(), default=False, nullable=False)
 
+    __table_args__ = (
+        db.Index(
+            "ix_organization_workflow_pipeline_run_pipeline_run_id",
+            "organization_pipeline_run_id",
+        ),
+        db.Index(
+            "ix_organization_workflow_pipeline_run_workflow_run_id",
+            "organization_workflow_run_id",
+        ),
+    )
+
 
 class OrganizationWorkflowRun(CommonColumnsMixin, db.Model):
     """ Organization workflow run """
@@ -67,7 +94,7 @@ class OrganizationWorkflowRun(CommonColumnsMixin, db.Model):
     __tablename__ = "organization_workflow_run"
 
     organization_workflow_uuid = db.Column(
-        db.String(32), nullable=False, server_default=""
+        db.String(32), nullable=False, server_default="", index=True
     )
     workflow_run_uuid = db.Column(db.String(32), nullable=False, server_default="")
     is_deleted = db.Column(db.Boolean(), default=False, nullable=False)
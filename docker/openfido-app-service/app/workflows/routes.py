@@ -16,6 +16,8 @@ from app.workflows.services import (
     fetch_workflow_pipeline,
     update_workflow_pipeline,
     delete_workflow_pipeline,
+    fetch_workflow_graph,
+    update_workflow_graph,
     create_workflow_run,
     fetch_workflow_run,
 )
@@ -569,6 +571,117 @@ def workflow_pipeline_delete(
         return jsonify(value_error.args[0]), 400
 
 
+@organization_workflow_bp.route(
+    "/<organization_uuid>/workflows/<organization_workflow_uuid>/graph",
+    methods=["GET"],
+)
+@any_application_required
+@validate_organization(False)
+def workflow_graph(organization_uuid, organization_workflow_uuid):
+    """Export the Organization Pipelines of a workflow and their dependencies.
+    ---
+    tags:
+      - workflows
+    parameters:
+      - in: header
+        name: Workflow-API-Key
+        description: Requires key type REACT_CLIENT
+        schema:
+          type: string
+    responses:
+      "200":
+        description: "Get Organization Workflow graph."
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                pipelines:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      pipeline_uuid:
+                        type: string
+                      workflow_pipeline_uuid:
+                        type: string
+                      dependencies:
+                        type: array
+                        items:
+                          type: string
+      "400":
+        description: "Bad request"
+      "503":
+        description: "Http error"
+    """
+    try:
+        return jsonify(
+            fetch_workflow_graph(organization_uuid, organization_workflow_uuid)
+        )
+    except HTTPError as http_error:
+        return {"message": http_error.args[0]}, 503
+    except ValueError as value_error:
+        return jsonify(value_error.args[0]), 400
+
+
+@organization_workflow_bp.route(
+    "/<organization_uuid>/workflows/<organization_workflow_uuid>/graph",
+    methods=["PUT"],
+)
+@any_application_required
+@validate_organization()
+def workflow_graph_update(organization_uuid, organization_workflow_uuid):
+    """Replace the Organization Pipelines of a workflow and their dependencies.
+    ---
+    tags:
+      - workflows
+    parameters:
+      - in: header
+        name: Workflow-API-Key
+        description: Requires key type REACT_CLIENT
+        schema:
+          type: string
+    requestBody:
+      description: "Organization Pipelines and the Organization Pipelines they depend on"
+      required: true
+      content:
+        application/json:
+          schema:
+            type: object
+            properties:
+              pipelines:
+                type: array
+                items:
+                  type: object
+                  properties:
+                    pipeline_uuid:
+                      type: string
+                    dependencies:
+                      type: array
+                      items:
+                        type: string
+    responses:
+      "200":
+        description: "Updated, with the same content as GET"
+      "400":
+        description: "Bad request"
+      "503":
+        description: "Http error"
+    """
+    try:
+        return jsonify(
+            update_workflow_graph(
+                organization_uuid, organization_workflow_uuid, request.json
+            )
+        )
+    except HTTPError as http_error:
+        return {"message": http_error.args[0]}, 503
+    except ValueError as value_error:
+        return jsonify(value_error.args[0]), 400
+    except ValidationError as validation_err:
+        return {"message": "Validation error", "errors": validation_err.messages}, 400
+
+
 @organization_workflow_bp.route(
     "/<organization_uuid>/workflows/<organization_workflow_uuid>/runs",
     methods=["POST"],
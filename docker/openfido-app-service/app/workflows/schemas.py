@@ -8,3 +8,16 @@ class CreateWorkflowPipelineSchema(Schema):
     pipeline_uuid = UUID(required=True)
     source_workflow_pipelines = fields.List(UUID(), required=True)
     destination_workflow_pipelines = fields.List(UUID(), required=True)
+
+
+class WorkflowGraphPipelineSchema(Schema):
+    """ An organization pipeline of a workflow graph, and those it depends on. """
+
+    pipeline_uuid = UUID(required=True)
+    dependencies = fields.List(UUID(), missing=[])
+
+
+class WorkflowGraphSchema(Schema):
+    """ Schema for update_workflow_graph() service. """
+
+    pipelines = fields.Nested(WorkflowGraphPipelineSchema, many=True, required=True)
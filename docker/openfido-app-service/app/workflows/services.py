@@ -32,21 +32,25 @@ from app.workflows.queries import (
     find_organization_workflow_pipeline_run_by_workflow_run_uuid,
 )
 
-from .schemas import CreateWorkflowPipelineSchema
+from .schemas import CreateWorkflowPipelineSchema, WorkflowGraphSchema
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger("workflows.services")
 
 
 def create_workflow(organization_uuid, request_json):
-    """ Create a new workflow associated with an organization. """
+    """Create a new workflow associated with an organization.
+
+    The workflow service is told the organization, so that the workflows of an
+    organization share its limit of running pipelines.
+    """
     response = requests.post(
         f"{current_app.config[WORKFLOW_HOSTNAME]}/v1/workflows",
         headers={
             "Content-Type": "application/json",
             ROLES_KEY: current_app.config[WORKFLOW_API_TOKEN],
         },
-        json=request_json,
+        json=dict(request_json, organization_uuid=organization_uuid),
     )
 
     try:
@@ -158,7 +162,7 @@ def update_workflow(organization_uuid, organization_workflow_uuid, request_json)
             "Content-Type": "application/json",
             ROLES_KEY: current_app.config[WORKFLOW_API_TOKEN],
         },
-        json=request_json,
+        json=dict(request_json, organization_uuid=organization_uuid),
     )
 
     try:
@@ -521,6 +525,153 @@ def delete_workflow_pipeline(
     db.session.commit()
 
 
+def _workflow_graph_to_org_graph(organization_workflow, org_pipelines, graph):
+    """Convert a workflow graph from the workflow server to the equivalent
+    OrganizationPipelines and OrganizationWorkflowPipelines.
+
+    Pipelines the organization doesn't have (e.g. deleted ones) are left out.
+    """
+    op_uuids = {o_p.pipeline_uuid: o_p.uuid for o_p in org_pipelines}
+    wp_to_owp = {
+        owp.workflow_pipeline_uuid: owp.uuid
+        for owp in organization_workflow.organization_workflow_pipelines
+        if not owp.is_deleted
+    }
+
+    nodes = []
+    for node in graph["pipelines"]:
+        if (
+            node["pipeline_uuid"] not in op_uuids
+            or node["workflow_pipeline_uuid"] not in wp_to_owp
+        ):
+            continue
+
+        node["pipeline_uuid"] = op_uuids[node["pipeline_uuid"]]
+        node["workflow_pipeline_uuid"] = wp_to_owp[node["workflow_pipeline_uuid"]]
+        node["dependencies"] = [
+            op_uuids[uuid] for uuid in node["dependencies"] if uuid in op_uuids
+        ]
+        nodes.append(node)
+    graph["pipelines"] = nodes
+
+    return graph
+
+
+def fetch_workflow_graph(organization_uuid, organization_workflow_uuid):
+    """Fetches the Organization Pipelines of an Organization Workflow and
+    their dependencies."""
+
+    organization_workflow = find_organization_workflow(
+        organization_uuid, organization_workflow_uuid
+    )
+
+    if not organization_workflow:
+        raise ValueError("Organization Workflow not found.")
+
+    response = requests.get(
+        f"{current_app.config[WORKFLOW_HOSTNAME]}/v1/workflows/{organization_workflow.workflow_uuid}/graph",
+        headers={
+            "Content-Type": "application/json",
+            ROLES_KEY: current_app.config[WORKFLOW_API_TOKEN],
+        },
+    )
+
+    try:
+        graph = response.json()
+        response.raise_for_status()
+
+        return _workflow_graph_to_org_graph(
+            organization_workflow, find_organization_pipelines(organization_uuid), graph
+        )
+    except ValueError as value_error:
+        raise HTTPError("Non JSON payload returned") from value_error
+    except HTTPError as http_error:
+        raise ValueError(graph) from http_error
+
+
+def update_workflow_graph(organization_uuid, organization_workflow_uuid, request_json):
+    """Replaces the Organization Pipelines of an Organization Workflow and
+    their dependencies, with a single request to the workflow server.
+
+    OrganizationWorkflowPipelines are added or deleted along with the
+    workflow pipelines of the graph.
+    """
+
+    data = WorkflowGraphSchema().load(request_json)
+
+    organization_workflow = find_organization_workflow(
+        organization_uuid, organization_workflow_uuid
+    )
+
+    if not organization_workflow:
+        raise ValueError("Organization Workflow not found.")
+
+    org_pipelines = {
+        o_p.uuid: o_p for o_p in find_organization_pipelines(organization_uuid)
+    }
+    for node in data["pipelines"]:
+        for org_pipeline_uuid in [node["pipeline_uuid"]] + node["dependencies"]:
+            if org_pipeline_uuid not in org_pipelines:
+                raise ValueError("Organization Pipeline not found.")
+
+    response = requests.put(
+        f"{current_app.config[WORKFLOW_HOSTNAME]}/v1/workflows/{organization_workflow.workflow_uuid}/graph",
+        headers={
+            "Content-Type": "application/json",
+            ROLES_KEY: current_app.config[WORKFLOW_API_TOKEN],
+        },
+        json={
+            "pipelines": [
+                {
+                    "pipeline_uuid": org_pipelines[node["pipeline_uuid"]].pipeline_uuid,
+                    "dependencies": [
+                        org_pipelines[uuid].pipeline_uuid
+                        for uuid in node["dependencies"]
+                    ],
+                }
+                for node in data["pipelines"]
+            ]
+        },
+    )
+
+    try:
+        graph = response.json()
+        response.raise_for_status()
+
+        pipeline_to_op = {o_p.pipeline_uuid: o_p for o_p in org_pipelines.values()}
+        wp_to_owp = {
+            owp.workflow_pipeline_uuid: owp
+            for owp in organization_workflow.organization_workflow_pipelines
+            if not owp.is_deleted
+        }
+        workflow_pipeline_uuids = {
+            node["workflow_pipeline_uuid"] for node in graph["pipelines"]
+        }
+        for (workflow_pipeline_uuid, owp) in wp_to_owp.items():
+            if workflow_pipeline_uuid not in workflow_pipeline_uuids:
+                owp.is_deleted = True
+        for node in graph["pipelines"]:
+            if node["workflow_pipeline_uuid"] not in wp_to_owp:
+                db.session.add(
+                    OrganizationWorkflowPipeline(
+                        organization_workflow_uuid=organization_workflow.uuid,
+                        organization_pipeline_id=pipeline_to_op[
+                            node["pipeline_uuid"]
+                        ].id,
+                        workflow_pipeline_uuid=node["workflow_pipeline_uuid"],
+                    )
+                )
+        db.session.commit()
+
+        return _workflow_graph_to_org_graph(
+            organization_workflow, org_pipelines.values(), graph
+        )
+    except ValueError as value_error:
+        raise HTTPError("Non JSON payload returned") from value_error
+    except HTTPError as http_error:
+        raise ValueError(graph) from http_error
+
+
 def create_workflow_run(organization_uuid, organization_workflow_uuid, request_json):
     """Creates an OrganizationWorkflowRun."""
 
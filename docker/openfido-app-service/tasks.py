@@ -75,3 +75,109 @@ def create_organization_pipeline(c, organization_uuid, pipeline_uuid):
     with app.app_context():
         organization_pipeline = create_organization_pipeline(organization_uuid, pipeline_uuid)
         print(organization_pipeline.uuid)
+
+
+@task
+def sync_workflow_organizations(c):
+    """Tell the workflow service the organization of every workflow.
+
+    Workflows created before the workflow service knew their organization
+    don't share its limit of running pipelines until then.
+    """
+    from app import create_app
+    from app.workflows.models import OrganizationWorkflow
+    from app.workflows.services import fetch_workflow, update_workflow
+
+    (app, db, _) = create_app()
+    with app.app_context():
+        for organization_workflow in OrganizationWorkflow.query.filter(
+            OrganizationWorkflow.is_deleted == False
+        ):
+            workflow = fetch_workflow(
+                organization_workflow.organization_uuid, organization_workflow.uuid
+            )
+            update_workflow(
+                organization_workflow.organization_uuid,
+                organization_workflow.uuid,
+                {"name": workflow["name"], "description": workflow["description"]},
+            )
+            print(organization_workflow.uuid)
+
+
+@task
+def benchmark_pipeline_runs(c, counts="100,1000,5000"):
+    """Time fetch_pipeline_runs() for pipelines with increasing numbers of runs.
+
+    Uses an in memory database, and a stubbed workflow service. The time per
+    run should stay about the same as the number of runs grows.
+    """
+    import time
+    import uuid
+    from datetime import datetime
+    from unittest.mock import patch
+
+    import responses
+    from app import create_app
+    from app.constants import WORKFLOW_API_TOKEN, WORKFLOW_HOSTNAME
+    from app.pipelines.models import (
+        OrganizationPipeline,
+        OrganizationPipelineInputFile,
+        OrganizationPipelineRun,
+    )
+    from app.pipelines.services import fetch_pipeline_runs
+
+    (app, db, _) = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": "sqlite://",
+            WORKFLOW_HOSTNAME: "http://workflow",
+            WORKFLOW_API_TOKEN: "benchmark",
+        }
+    )
+    with app.app_context(), responses.RequestsMock() as rsps, patch(
+        "app.pipelines.services.create_url", return_value="http://example.com"
+    ):
+        db.create_all()
+        for count in map(int, counts.split(",")):
+            organization_pipeline = OrganizationPipeline(
+                organization_uuid=uuid.uuid4().hex, pipeline_uuid=uuid.uuid4().hex
+            )
+            db.session.add(organization_pipeline)
+            db.session.flush()
+            runs_json = []
+            for sequence in range(1, count + 1):
+                opr = OrganizationPipelineRun(
+                    organization_pipeline_id=organization_pipeline.id,
+                    pipeline_run_uuid=uuid.uuid4().hex,
+                    status_update_token=uuid.uuid4().hex,
+                    status_update_token_expires_at=datetime.now(),
+                    share_token=uuid.uuid4().hex,
+                )
+                db.session.add(opr)
+                db.session.flush()
+                db.session.add(
+                    OrganizationPipelineInputFile(
+                        organization_pipeline_id=organization_pipeline.id,
+                        organization_pipeline_run_id=opr.id,
+                        name="input.csv",
+                    )
+                )
+                runs_json.append(
+                    {"uuid": opr.pipeline_run_uuid, "sequence": sequence, "inputs": []}
+                )
+            db.session.commit()
+
+            rsps.add(
+                responses.GET,
+                f"http://workflow/v1/pipelines/{organization_pipeline.pipeline_uuid}/runs",
+                json=runs_json,
+            )
+            start = time.perf_counter()
+            fetch_pipeline_runs(
+                organization_pipeline.organization_uuid,
+                organization_pipeline.uuid,
+                {"limit": count},
+            )
+            elapsed = time.perf_counter() - start
+            print(
+                f"{count} runs: {elapsed:.3f}s ({elapsed / count * 1000:.3f}ms per run)"
+            )
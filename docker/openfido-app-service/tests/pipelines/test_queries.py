@@ -1,3 +1,6 @@
+import uuid
+from datetime import datetime, timedelta
+
 from ..conftest import ORGANIZATION_UUID, PIPELINE_UUID
 from app.pipelines.queries import (
     find_organization_pipeline,
@@ -5,11 +8,11 @@ from app.pipelines.queries import (
     find_organization_pipelines,
     find_organization_pipeline_input_files,
     find_organization_pipeline_run,
-    find_latest_organization_pipeline_run,
+    find_latest_organization_pipeline_runs,
     search_organization_pipeline_input_files,
     search_organization_pipeline_runs,
 )
-from app.pipelines.models import db
+from app.pipelines.models import OrganizationPipeline, OrganizationPipelineRun, db
 
 
 def test_find_organization_pipelines(app, organization_pipeline):
@@ -99,6 +102,43 @@ def test_find_latest_organization_pipeline_run(
     assert pipeline_run == organization_pipeline_run
 
 
+def test_find_latest_organization_pipeline_runs(
+    app, organization_pipeline, organization_pipeline_run
+):
+    def add_run(pipeline, created_at, is_deleted=False):
+        opr = OrganizationPipelineRun(
+            organization_pipeline_id=pipeline.id,
+            pipeline_run_uuid=uuid.uuid4().hex,
+            status_update_token=uuid.uuid4().hex,
+            status_update_token_expires_at=created_at,
+            share_token=uuid.uuid4().hex,
+            created_at=created_at,
+            is_deleted=is_deleted,
+        )
+        db.session.add(opr)
+        db.session.commit()
+        return opr
+
+    other_pipeline = OrganizationPipeline(
+        organization_uuid=ORGANIZATION_UUID, pipeline_uuid=PIPELINE_UUID
+    )
+    empty_pipeline = OrganizationPipeline(
+        organization_uuid=ORGANIZATION_UUID, pipeline_uuid=PIPELINE_UUID
+    )
+    db.session.add_all([other_pipeline, empty_pipeline])
+    db.session.commit()
+
+    now = datetime.now()
+    latest = add_run(organization_pipeline, now + timedelta(hours=1))
+    add_run(organization_pipeline, now + timedelta(hours=2), is_deleted=True)
+    other_latest = add_run(other_pipeline, now)
+    add_run(other_pipeline, now - timedelta(hours=1))
+
+    assert find_latest_organization_pipeline_runs(
+        [organization_pipeline.id, other_pipeline.id, empty_pipeline.id]
+    ) == [latest, other_latest]
+
+
 def test_search_organization_pipeline_runs(
     app, organization_pipeline, organization_pipeline_run
 ):
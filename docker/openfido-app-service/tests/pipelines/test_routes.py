@@ -1,4 +1,5 @@
 import io
+import uuid
 from unittest.mock import patch
 
 import responses
@@ -108,32 +109,35 @@ def test_pipelines_bad_search(app, client, client_application):
     assert result.json == json_response
 
 
-@patch("app.pipelines.services.fetch_pipeline_run")
 @responses.activate
 def test_pipelines(
-    mock_runs,
     app,
     client,
     client_application,
     organization_pipeline,
     organization_pipeline_run,
 ):
-    mock_runs.return_value = PIPELINE_RUN_RESPONSE_JSON
+    pipeline_run_json = dict(PIPELINE_RUN_RESPONSE_JSON, inputs=[])
     pipeline_json = dict(PIPELINE_JSON)
     pipeline_json.update(
         {
             "created_at": "2020-10-08T12:20:36.564095",
             "updated_at": "2020-10-08T12:20:36.564100",
             "uuid": organization_pipeline.pipeline_uuid,
-            "last_pipeline_run": PIPELINE_RUN_RESPONSE_JSON,
         }
     )
+    del pipeline_json["last_pipeline_run"]
     json_response = [pipeline_json]
     responses.add(
         responses.POST,
         f"{app.config[WORKFLOW_HOSTNAME]}/v1/pipelines/search",
         json=json_response,
     )
+    responses.add(
+        responses.POST,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/pipelines/runs/search",
+        json=[pipeline_run_json],
+    )
 
     result = client.get(
         f"/v1/organizations/{ORGANIZATION_UUID}/pipelines",
@@ -146,6 +150,7 @@ def test_pipelines(
 
     assert result.status_code == 200
     json_response[0]["uuid"] = organization_pipeline.uuid
+    json_response[0]["last_pipeline_run"] = pipeline_run_json
     assert result.json == json_response
 
 
@@ -554,6 +559,124 @@ def test_upload_input_file(
     assert len(organization_pipeline.organization_pipeline_input_files) == 1
 
 
+@patch("app.pipelines.services.get_file_size")
+@patch("app.pipelines.services.complete_multipart_upload")
+@patch("app.pipelines.services.create_upload_part_urls")
+@patch("app.pipelines.services.create_multipart_upload")
+@responses.activate
+def test_input_file_upload(
+    create_mock,
+    urls_mock,
+    complete_mock,
+    size_mock,
+    app,
+    client,
+    client_application,
+    organization_pipeline,
+):
+    create_mock.return_value = "anid"
+    urls_mock.return_value = ["http://s3/1"]
+    size_mock.return_value = 9
+    input_files_url = (
+        f"/v1/organizations/{ORGANIZATION_UUID}/pipelines/"
+        f"{organization_pipeline.uuid}/input_files"
+    )
+    headers = {
+        "Authorization": f"Bearer {JWT_TOKEN}",
+        ROLES_KEY: client_application.api_key,
+    }
+
+    result = client.post(
+        f"/v1/organizations/{ORGANIZATION_UUID}/pipelines/nouuid/input_files/uploads",
+        headers=headers,
+        json={"name": "afile.txt", "size": 9},
+    )
+    assert result.status_code == 400
+
+    result = client.post(
+        f"{input_files_url}/uploads", headers=headers, json={"name": "afile.txt"}
+    )
+    assert result.status_code == 400
+
+    result = client.post(
+        f"{input_files_url}/uploads",
+        headers=headers,
+        json={"name": "afile.txt", "size": 9},
+    )
+    assert result.status_code == 200
+    assert result.json["urls"] == ["http://s3/1"]
+    input_file_uuid = result.json["uuid"]
+
+    result = client.post(
+        f"{input_files_url}/nouuid/complete",
+        headers=headers,
+        json={"parts": [{"part_number": 1, "etag": "e1"}]},
+    )
+    assert result.status_code == 400
+
+    result = client.post(
+        f"{input_files_url}/{input_file_uuid}/complete",
+        headers=headers,
+        json={"parts": [{"etag": "e1"}]},
+    )
+    assert result.status_code == 400
+
+    result = client.post(
+        f"{input_files_url}/{input_file_uuid}/complete",
+        headers=headers,
+        json={"parts": [{"part_number": 1, "etag": "e1"}], "checksum": "abc"},
+    )
+    assert result.status_code == 200
+    assert result.json == {"uuid": input_file_uuid, "name": "afile.txt"}
+    assert organization_pipeline.organization_pipeline_input_files[0].checksum == "abc"
+
+
+@patch("app.pipelines.services.abort_multipart_upload")
+@patch("app.pipelines.services.create_upload_part_urls")
+@patch("app.pipelines.services.create_multipart_upload")
+@responses.activate
+def test_abort_input_file_upload(
+    create_mock,
+    urls_mock,
+    abort_mock,
+    app,
+    client,
+    client_application,
+    organization_pipeline,
+):
+    create_mock.return_value = "anid"
+    urls_mock.return_value = ["http://s3/1"]
+    input_files_url = (
+        f"/v1/organizations/{ORGANIZATION_UUID}/pipelines/"
+        f"{organization_pipeline.uuid}/input_files"
+    )
+    headers = {
+        "Authorization": f"Bearer {JWT_TOKEN}",
+        ROLES_KEY: client_application.api_key,
+    }
+    result = client.post(
+        f"{input_files_url}/uploads",
+        headers=headers,
+        json={"name": "afile.txt", "size": 9},
+    )
+    input_file_uuid = result.json["uuid"]
+
+    result = client.post(
+        f"/v1/organizations/{ORGANIZATION_UUID}/pipelines/nouuid/input_files/"
+        f"{input_file_uuid}/abort",
+        headers=headers,
+    )
+    assert result.status_code == 400
+
+    result = client.post(f"{input_files_url}/{input_file_uuid}/abort", headers=headers)
+    assert result.status_code == 200
+    assert abort_mock.call_args[0][1] == "anid"
+    assert organization_pipeline.organization_pipeline_input_files == []
+
+    result = client.post(f"{input_files_url}/{input_file_uuid}/abort", headers=headers)
+    assert result.status_code == 400
+
+
 @patch("app.pipelines.services.create_url")
 @responses.activate
 def test_create_pipeline_run(
@@ -566,7 +689,8 @@ def test_create_pipeline_run(
 ):
 
     mock_url.return_value = "http://somefileurl.com"
-    json_response = dict(PIPELINE_RUN_RESPONSE_JSON)
+    # a new run (organization_pipeline_input_file's run has the default uuid)
+    json_response = dict(PIPELINE_RUN_RESPONSE_JSON, uuid=uuid.uuid4().hex)
 
     pipeline = OrganizationPipeline.query.order_by(
         OrganizationPipeline.id.desc()
@@ -696,6 +820,50 @@ def test_list_pipeline_runs(
     assert result.json == json_response
 
 
+@patch("app.pipelines.services.create_url")
+@responses.activate
+def test_list_pipeline_runs_page(
+    mock_url,
+    app,
+    client,
+    client_application,
+    organization_pipeline,
+    organization_pipeline_run,
+    organization_pipeline_input_file,
+):
+    summary_json = {
+        "uuid": organization_pipeline_run.pipeline_run_uuid,
+        "sequence": 2,
+        "created_at": "2020-10-28T22:01:48.950370",
+        "started_at": None,
+        "completed_at": None,
+        "state": "RUNNING",
+    }
+    responses.add(
+        responses.GET,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/pipelines/{organization_pipeline.pipeline_uuid}/runs",
+        json=[summary_json],
+        headers={"X-Next-After": "2"},
+    )
+
+    result = client.get(
+        f"/v1/organizations/{organization_pipeline.organization_uuid}/pipelines/{organization_pipeline.uuid}/runs?after=1&limit=1&state=RUNNING&view=summary&other=1",
+        headers={
+            "Authorization": f"Bearer {JWT_TOKEN}",
+            ROLES_KEY: client_application.api_key,
+        },
+    )
+
+    assert result.status_code == 200
+    # summaries have no inputs, so no download URLs are created.
+    assert result.json == [dict(summary_json, uuid=organization_pipeline_run.uuid)]
+    assert result.headers["X-Next-After"] == "2"
+    assert not mock_url.called
+    assert responses.calls[-1].request.url.endswith(
+        "/runs?after=1&limit=1&state=RUNNING&view=summary"
+    )
+
+
 @patch("app.pipelines.routes.fetch_pipeline_runs")
 @patch("flask.jsonify")
 @responses.activate
@@ -1172,6 +1340,39 @@ def test_pipeline_run_console(
     assert result.json == json_response
 
 
+@responses.activate
+def test_pipeline_run_console_range(
+    app, client, client_application, organization_pipeline, organization_pipeline_run
+):
+    json_response = dict(PIPELINE_RUN_CONSOLE_RESPONSE_JSON)
+
+    pipeline = OrganizationPipeline.query.order_by(
+        OrganizationPipeline.id.desc()
+    ).first()
+
+    pipeline_run = pipeline.organization_pipeline_runs[0]
+
+    responses.add(
+        responses.GET,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/pipelines/{organization_pipeline.pipeline_uuid}/runs/{organization_pipeline_run.pipeline_run_uuid}/console",
+        json=json_response,
+    )
+
+    result = client.get(
+        f"/v1/organizations/{pipeline.organization_uuid}/pipelines/{pipeline.uuid}/runs/{pipeline_run.uuid}/console?stream=std_out&offset=10&limit=20&other=1",
+        headers={
+            "Authorization": f"Bearer {JWT_TOKEN}",
+            ROLES_KEY: client_application.api_key,
+        },
+    )
+
+    assert result.status_code == 200
+    assert result.json == json_response
+    assert responses.calls[-1].request.url.endswith(
+        "/console?stream=std_out&offset=10&limit=20"
+    )
+
+
 @responses.activate
 def test_create_chart_no_organization_pipeline(
     app, client, client_application, organization_pipeline
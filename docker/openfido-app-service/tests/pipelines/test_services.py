@@ -1,19 +1,26 @@
 import io
+import json
+import uuid
+from datetime import datetime
 from unittest.mock import patch
 
 import pytest
 import responses
-from app.constants import WORKFLOW_API_TOKEN, WORKFLOW_HOSTNAME
+from app.constants import INPUT_FILE_PART_SIZE, WORKFLOW_API_TOKEN, WORKFLOW_HOSTNAME
 from app.pipelines.models import (
     OrganizationPipeline,
+    OrganizationPipelineInputFile,
     OrganizationPipelineRun,
     ArtifactChart,
     db,
 )
 from app.pipelines.services import (
+    abort_pipeline_input_file_upload,
     create_artifact_chart,
     create_pipeline,
+    complete_pipeline_input_file_upload,
     create_pipeline_input_file,
+    create_pipeline_input_file_upload,
     create_pipeline_run,
     delete_artifact_chart,
     delete_pipeline,
@@ -26,11 +33,14 @@ from app.pipelines.services import (
     update_artifact_chart,
     update_pipeline,
 )
+from app.pipelines.queries import find_organization_pipeline_input_files
 from application_roles.decorators import ROLES_KEY
+from botocore.exceptions import ClientError
 from requests import HTTPError
 from marshmallow.exceptions import ValidationError
 
 from ..conftest import (
+    count_queries,
     ORGANIZATION_UUID,
     PIPELINE_RUN_INPUT_FILE_UUID,
     PIPELINE_RUN_UUID,
@@ -153,12 +163,8 @@ def test_fetch_pipelines_bad_workflow_response(app, organization_pipeline):
         fetch_pipelines(ORGANIZATION_UUID)
 
 
-@patch("app.pipelines.services.fetch_pipeline_run")
 @patch("app.pipelines.services.requests.post")
-def test_fetch_pipelines_bad_workflow_json(
-    post_mock, mock_runs, app, organization_pipeline
-):
-    mock_runs.return_value = None
+def test_fetch_pipelines_bad_workflow_json(post_mock, app, organization_pipeline):
     pipeline_list = [
         {"uuid": organization_pipeline.pipeline_uuid, "name": "name 1"},
         {"uuid": "12345", "name": "name 2"},
@@ -169,10 +175,8 @@ def test_fetch_pipelines_bad_workflow_json(
         fetch_pipelines(ORGANIZATION_UUID)
 
 
-@patch("app.pipelines.services.fetch_pipeline_run")
 @patch("app.pipelines.services.requests.post")
-def test_fetch_pipelines_no_runs(post_mock, mock_runs, app, organization_pipeline):
-    mock_runs.return_value = None
+def test_fetch_pipelines_no_runs(post_mock, app, organization_pipeline):
     pipeline_list = [
         {"uuid": organization_pipeline.pipeline_uuid, "name": "name 1"},
     ]
@@ -194,7 +198,6 @@ def test_fetch_pipelines_no_runs(post_mock, mock_runs, app, organization_pipelin
 
     post_mock().raise_for_status.assert_called()
     post_mock().json.assert_called()
-    assert not mock_runs.called
 
 
 def test_fetch_pipeline_no_org_run(app):
@@ -220,25 +223,33 @@ def test_fetch_pipeline(app, organization_pipeline, organization_pipeline_run):
     )
 
 
-@patch("app.pipelines.services.fetch_pipeline_run")
-@patch("app.pipelines.services.requests.post")
+@patch("app.pipelines.services.create_url")
 @responses.activate
 def test_fetch_pipelines(
-    post_mock, mock_runs, app, organization_pipeline, organization_pipeline_run
+    mock_url,
+    app,
+    organization_pipeline,
+    organization_pipeline_run,
+    organization_pipeline_input_file,
 ):
-    mock_runs.return_value = PIPELINE_RUN_RESPONSE_JSON
-    pipeline_list = [
-        {
-            "uuid": organization_pipeline.pipeline_uuid,
-            "name": "name 1",
-            "last_pipeline_run": PIPELINE_RUN_RESPONSE_JSON,
-        }
-    ]
-    post_mock().json.return_value = pipeline_list
+    mock_url.return_value = "http://somefileurl.com"
+    other_pipeline = OrganizationPipeline(
+        organization_uuid=ORGANIZATION_UUID, pipeline_uuid="1" * 32
+    )
+    db.session.add(other_pipeline)
+    db.session.commit()
     responses.add(
-        responses.GET,
-        f"{app.config[WORKFLOW_HOSTNAME]}/v1/pipelines/{organization_pipeline.pipeline_uuid}/runs/{organization_pipeline_run.pipeline_run_uuid}",
-        json=PIPELINE_RUN_RESPONSE_JSON,
+        responses.POST,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/pipelines/search",
+        json=[
+            {"uuid": organization_pipeline.pipeline_uuid, "name": "name 1"},
+            {"uuid": other_pipeline.pipeline_uuid, "name": "name 2"},
+        ],
+    )
+    responses.add(
+        responses.POST,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/pipelines/runs/search",
+        json=[dict(PIPELINE_RUN_RESPONSE_JSON, inputs=[])],
     )
 
     expected_result = [
@@ -246,18 +257,61 @@ def test_fetch_pipelines(
             "uuid": organization_pipeline.uuid,
             "name": "name 1",
             "last_pipeline_run": PIPELINE_RUN_RESPONSE_JSON,
-        }
+        },
+        {
+            "uuid": other_pipeline.uuid,
+            "name": "name 2",
+        },
     ]
     assert fetch_pipelines(ORGANIZATION_UUID) == expected_result
-    post_mock.assert_called()
-    get_call = post_mock.call_args
-    assert get_call[0][0].startswith(app.config[WORKFLOW_HOSTNAME])
-    assert get_call[1]["headers"][ROLES_KEY] == app.config[WORKFLOW_API_TOKEN]
-    assert get_call[1]["json"] == {"uuids": [organization_pipeline.pipeline_uuid]}
 
-    post_mock().raise_for_status.assert_called()
-    post_mock().json.assert_called()
-    mock_runs.assert_called()
+    # the latest runs of all pipelines are fetched with one request.
+    assert len(responses.calls) == 2
+    assert responses.calls[1].request.headers[ROLES_KEY] == (
+        app.config[WORKFLOW_API_TOKEN]
+    )
+    assert json.loads(responses.calls[1].request.body) == {
+        "uuids": [organization_pipeline_run.pipeline_run_uuid]
+    }
+
+
+@responses.activate
+def test_fetch_pipelines_bad_runs_response(
+    app, organization_pipeline, organization_pipeline_run
+):
+    responses.add(
+        responses.POST,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/pipelines/search",
+        json=[{"uuid": organization_pipeline.pipeline_uuid, "name": "name 1"}],
+    )
+    responses.add(
+        responses.POST,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/pipelines/runs/search",
+        status=500,
+    )
+
+    with pytest.raises(HTTPError):
+        fetch_pipelines(ORGANIZATION_UUID)
+
+
+@responses.activate
+def test_fetch_pipelines_runs_error(
+    app, organization_pipeline, organization_pipeline_run
+):
+    responses.add(
+        responses.POST,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/pipelines/search",
+        json=[{"uuid": organization_pipeline.pipeline_uuid, "name": "name 1"}],
+    )
+    responses.add(
+        responses.POST,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/pipelines/runs/search",
+        json={"message": "Validation error"},
+        status=400,
+    )
+
+    with pytest.raises(ValueError):
+        fetch_pipelines(ORGANIZATION_UUID)
 
 
 @responses.activate
@@ -359,12 +413,148 @@ def test_create_pipeline_input_file(upload_stream_mock, app, organization_pipeli
     assert set(organization_pipeline.organization_pipeline_input_files) == {input_file}
 
 
+@patch("app.pipelines.services.get_file_size")
+@patch("app.pipelines.services.complete_multipart_upload")
+@patch("app.pipelines.services.create_upload_part_urls")
+@patch("app.pipelines.services.create_multipart_upload")
+def test_pipeline_input_file_upload(
+    create_mock, urls_mock, complete_mock, size_mock, app, organization_pipeline
+):
+    create_mock.return_value = "anid"
+    urls_mock.return_value = ["http://s3/1", "http://s3/2"]
+
+    upload = create_pipeline_input_file_upload(
+        organization_pipeline, {"name": "a name.csv", "size": INPUT_FILE_PART_SIZE + 1}
+    )
+    assert upload["name"] == "a name.csv"
+    assert upload["part_size"] == INPUT_FILE_PART_SIZE
+    assert upload["urls"] == ["http://s3/1", "http://s3/2"]
+    key = f"{organization_pipeline.uuid}/{upload['uuid']}-a%20name.csv"
+    assert urls_mock.call_args[0] == (key, "anid", 2)
+
+    # the file can't be used until its upload is complete.
+    assert find_organization_pipeline_input_files(organization_pipeline.id) == []
+
+    size_mock.return_value = INPUT_FILE_PART_SIZE + 1
+    input_file = complete_pipeline_input_file_upload(
+        organization_pipeline,
+        upload["uuid"],
+        {"parts": [{"part_number": 1, "etag": "e1"}, {"part_number": 2, "etag": "e2"}]},
+    )
+    assert complete_mock.call_args[0] == (key, "anid", [(1, "e1"), (2, "e2")])
+    assert input_file.is_uploaded
+    assert input_file.upload_id is None
+    assert find_organization_pipeline_input_files(organization_pipeline.id) == [
+        input_file
+    ]
+
+    # an upload can only be completed once.
+    with pytest.raises(ValueError):
+        complete_pipeline_input_file_upload(
+            organization_pipeline, upload["uuid"], {"parts": []}
+        )
+
+
+@patch("app.pipelines.services.delete_file")
+@patch("app.pipelines.services.get_file_size")
+@patch("app.pipelines.services.complete_multipart_upload")
+@patch("app.pipelines.services.create_upload_part_urls")
+@patch("app.pipelines.services.create_multipart_upload")
+def test_pipeline_input_file_upload_invalid(
+    create_mock,
+    urls_mock,
+    complete_mock,
+    size_mock,
+    delete_mock,
+    app,
+    organization_pipeline,
+):
+    create_mock.return_value = "anid"
+    with pytest.raises(ValidationError):
+        create_pipeline_input_file_upload(
+            organization_pipeline, {"name": "1", "size": 10}
+        )
+    with pytest.raises(ValidationError):
+        create_pipeline_input_file_upload(organization_pipeline, {"name": "a.csv"})
+
+    upload = create_pipeline_input_file_upload(
+        organization_pipeline, {"name": "a.csv", "size": 10}
+    )
+    assert urls_mock.call_args[0][2] == 1
+
+    size_mock.return_value = 9
+    with pytest.raises(ValueError):
+        complete_pipeline_input_file_upload(
+            organization_pipeline,
+            upload["uuid"],
+            {"parts": [{"part_number": 1, "etag": "e1"}], "checksum": "abc"},
+        )
+    assert find_organization_pipeline_input_files(organization_pipeline.id) == []
+    # the uploaded file is deleted, along with its upload.
+    key = f"{organization_pipeline.uuid}/{upload['uuid']}-a.csv"
+    delete_mock.assert_called_once_with(key)
+    assert organization_pipeline.organization_pipeline_input_files == []
+
+    upload = create_pipeline_input_file_upload(
+        organization_pipeline, {"name": "a.csv", "size": 10}
+    )
+    complete_mock.side_effect = ClientError(
+        {"Error": {"Code": "NoSuchUpload"}}, "CompleteMultipartUpload"
+    )
+    with pytest.raises(ValueError):
+        complete_pipeline_input_file_upload(
+            organization_pipeline,
+            upload["uuid"],
+            {"parts": [{"part_number": 1, "etag": "e1"}]},
+        )
+
+
+@patch("app.pipelines.services.abort_multipart_upload")
+@patch("app.pipelines.services.create_upload_part_urls")
+@patch("app.pipelines.services.create_multipart_upload")
+def test_abort_pipeline_input_file_upload(
+    create_mock, urls_mock, abort_mock, app, organization_pipeline
+):
+    create_mock.return_value = "anid"
+    upload = create_pipeline_input_file_upload(
+        organization_pipeline, {"name": "a.csv", "size": 10}
+    )
+
+    abort_pipeline_input_file_upload(organization_pipeline, upload["uuid"])
+    abort_mock.assert_called_once_with(
+        f"{organization_pipeline.uuid}/{upload['uuid']}-a.csv", "anid"
+    )
+    assert organization_pipeline.organization_pipeline_input_files == []
+    with pytest.raises(ValueError):
+        abort_pipeline_input_file_upload(organization_pipeline, upload["uuid"])
+
+    # uploads that S3 no longer knows about are already aborted.
+    abort_mock.side_effect = ClientError(
+        {"Error": {"Code": "NoSuchUpload"}}, "AbortMultipartUpload"
+    )
+    upload = create_pipeline_input_file_upload(
+        organization_pipeline, {"name": "a.csv", "size": 10}
+    )
+    abort_pipeline_input_file_upload(organization_pipeline, upload["uuid"])
+    assert organization_pipeline.organization_pipeline_input_files == []
+
+    abort_mock.side_effect = ClientError(
+        {"Error": {"Code": "AccessDenied"}}, "AbortMultipartUpload"
+    )
+    upload = create_pipeline_input_file_upload(
+        organization_pipeline, {"name": "a.csv", "size": 10}
+    )
+    with pytest.raises(ValueError):
+        abort_pipeline_input_file_upload(organization_pipeline, upload["uuid"])
+
+
 @patch("app.pipelines.services.create_url")
 @responses.activate
 def test_create_pipeline_run(
     mock_url, app, organization_pipeline, organization_pipeline_input_file
 ):
-    json_response = dict(PIPELINE_RUN_RESPONSE_JSON)
+    # a new run (organization_pipeline_input_file's run has the default uuid)
+    json_response = dict(PIPELINE_RUN_RESPONSE_JSON, uuid=uuid.uuid4().hex)
     mock_url.return_value = "http://somefileurl.com"
 
     pipeline = OrganizationPipeline.query.order_by(
@@ -495,10 +685,132 @@ def test_fetch_pipeline_runs(
         json=json_response,
     )
 
-    pipeline_runs = fetch_pipeline_runs(pipeline.organization_uuid, pipeline.uuid)
+    (pipeline_runs, next_after) = fetch_pipeline_runs(
+        pipeline.organization_uuid, pipeline.uuid
+    )
 
     assert pipeline_runs is not None
     assert pipeline_runs == json_response
+    assert next_after is None
+
+
+def add_organization_pipeline_runs(organization_pipeline, count):
+    """ Add count runs (with an input file each) to organization_pipeline. """
+    runs_json = []
+    for _ in range(count):
+        opr = OrganizationPipelineRun(
+            organization_pipeline_id=organization_pipeline.id,
+            pipeline_run_uuid=uuid.uuid4().hex,
+            status_update_token=uuid.uuid4().hex,
+            status_update_token_expires_at=datetime.now(),
+            share_token=uuid.uuid4().hex,
+        )
+        db.session.add(opr)
+        db.session.flush()
+        db.session.add(
+            OrganizationPipelineInputFile(
+                organization_pipeline_id=organization_pipeline.id,
+                organization_pipeline_run_id=opr.id,
+                name=f"{opr.uuid}.csv",
+            )
+        )
+        runs_json.append(dict(PIPELINE_RUN_RESPONSE_JSON, uuid=opr.pipeline_run_uuid))
+    db.session.commit()
+
+    return runs_json
+
+
+@patch("app.pipelines.services.create_url")
+@responses.activate
+def test_fetch_pipeline_runs_queries(mock_url, app, organization_pipeline):
+    mock_url.return_value = "http://somefileurl.com"
+    runs_json = add_organization_pipeline_runs(organization_pipeline, 2)
+    # runs that were deleted from the organization are left out.
+    deleted_json = dict(PIPELINE_RUN_RESPONSE_JSON, uuid=uuid.uuid4().hex)
+    responses.add(
+        responses.GET,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/pipelines/{organization_pipeline.pipeline_uuid}/runs",
+        json=runs_json + [deleted_json],
+    )
+
+    with count_queries() as statements:
+        (pipeline_runs, _) = fetch_pipeline_runs(
+            organization_pipeline.organization_uuid, organization_pipeline.uuid
+        )
+    assert len(pipeline_runs) == 2
+    assert [len(pr["inputs"]) for pr in pipeline_runs] == [1, 1]
+    query_count = len(statements)
+
+    # the number of queries doesn't depend on the number of runs.
+    runs_json += add_organization_pipeline_runs(organization_pipeline, 20)
+    responses.replace(
+        responses.GET,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/pipelines/{organization_pipeline.pipeline_uuid}/runs",
+        json=runs_json,
+    )
+    with count_queries() as statements:
+        (pipeline_runs, _) = fetch_pipeline_runs(
+            organization_pipeline.organization_uuid, organization_pipeline.uuid
+        )
+    assert len(pipeline_runs) == 22
+    assert len(statements) == query_count
+    assert mock_url.call_count == 24
+
+
+@patch("app.pipelines.services.create_url")
+@responses.activate
+def test_fetch_pipeline_runs_pages(mock_url, app, organization_pipeline):
+    mock_url.return_value = "http://somefileurl.com"
+    runs_json = [
+        dict(run_json, sequence=sequence)
+        for (sequence, run_json) in enumerate(
+            add_organization_pipeline_runs(organization_pipeline, 4), 1
+        )
+    ]
+    deleted_json = dict(PIPELINE_RUN_RESPONSE_JSON, uuid=uuid.uuid4().hex)
+    url = f"{app.config[WORKFLOW_HOSTNAME]}/v1/pipelines/{organization_pipeline.pipeline_uuid}/runs"
+    # runs deleted from the organization don't take up room in a page.
+    responses.add(
+        responses.GET,
+        url,
+        json=[runs_json[0], deleted_json],
+        headers={"X-Next-After": "2"},
+    )
+    responses.add(
+        responses.GET, url, json=runs_json[1:3], headers={"X-Next-After": "4"}
+    )
+
+    (pipeline_runs, next_after) = fetch_pipeline_runs(
+        organization_pipeline.organization_uuid,
+        organization_pipeline.uuid,
+        {"limit": "2"},
+    )
+    assert [pr["sequence"] for pr in pipeline_runs] == [1, 2]
+    assert next_after == 2
+    assert len(responses.calls) == 2
+    assert responses.calls[0].request.url.endswith("/runs?limit=2")
+    assert responses.calls[1].request.url.endswith("/runs?limit=2&after=2")
+
+    # without a limit the workflow service's maximum is used.
+    responses.replace(responses.GET, url, json=runs_json[3:])
+    (pipeline_runs, next_after) = fetch_pipeline_runs(
+        organization_pipeline.organization_uuid,
+        organization_pipeline.uuid,
+        {"after": "3"},
+    )
+    assert [pr["sequence"] for pr in pipeline_runs] == [4]
+    assert next_after is None
+    assert responses.calls[-1].request.url.endswith("/runs?after=3&limit=1000")
+
+    # without after or limit every run is listed, more than a page holds.
+    responses.replace(responses.GET, url, json=runs_json)
+    with patch("app.pipelines.services.RUN_LIST_MAX_LIMIT", 2):
+        (pipeline_runs, next_after) = fetch_pipeline_runs(
+            organization_pipeline.organization_uuid, organization_pipeline.uuid
+        )
+    assert [pr["sequence"] for pr in pipeline_runs] == [1, 2, 3, 4]
+    assert next_after is None
+    assert responses.calls[-1].request.url.endswith("/runs")
 
 
 @responses.activate
@@ -617,6 +929,29 @@ def test_fetch_pipeline_run_console(
     assert console_output == json_response
 
 
+@responses.activate
+def test_fetch_pipeline_run_console_tail(
+    app, organization_pipeline, organization_pipeline_run
+):
+    json_response = dict(PIPELINE_RUN_CONSOLE_RESPONSE_JSON)
+
+    responses.add(
+        responses.GET,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/pipelines/{organization_pipeline.pipeline_uuid}/runs/{organization_pipeline_run.pipeline_run_uuid}/console",
+        json=json_response,
+    )
+
+    console_output = fetch_pipeline_run_console(
+        organization_pipeline.organization_uuid,
+        organization_pipeline.uuid,
+        organization_pipeline_run.uuid,
+        {"tail": 100},
+    )
+
+    assert console_output == json_response
+    assert responses.calls[0].request.url.endswith("/console?tail=100")
+
+
 @responses.activate
 def test_fetch_pipeline_run_error(
     app, organization_pipeline, organization_pipeline_run
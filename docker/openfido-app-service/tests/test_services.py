@@ -1,6 +1,14 @@
+from datetime import datetime
 from unittest.mock import MagicMock, patch
 
-from app.constants import AUTH_HOSTNAME
+import responses
+from app.constants import (
+    AUTH_HOSTNAME,
+    AUTH_MEMBERSHIP_CHANGES_KEY,
+    AUTH_MEMBERSHIP_POLL_INTERVAL,
+)
+from app.membership_cache import MembershipCache
+from app.services import find_is_user_in_org_claim, get_membership_cache
 from app.utils import fetch_is_user_in_org
 
 from .conftest import JWT_TOKEN, ORGANIZATION_UUID, USER_UUID
@@ -8,6 +16,7 @@ from .conftest import JWT_TOKEN, ORGANIZATION_UUID, USER_UUID
 
 @patch("app.pipelines.services.requests.get")
 def test_fetch_is_user_in_org_false(get_mock, app):
+    app.config[AUTH_MEMBERSHIP_POLL_INTERVAL] = 0
     get_mock().json.return_value = [
         {
             "created_at": "Wed, 07 Oct 2020 19:50:00 GMT",
@@ -27,6 +36,7 @@ def test_fetch_is_user_in_org_false(get_mock, app):
 
 @patch("app.pipelines.services.requests.get")
 def test_fetch_is_user_in_org(get_mock, app):
+    app.config[AUTH_MEMBERSHIP_POLL_INTERVAL] = 0
     get_mock().json.return_value = [
         {
             "created_at": "Wed, 07 Oct 2020 19:50:00 GMT",
@@ -42,3 +52,187 @@ def test_fetch_is_user_in_org(get_mock, app):
     get_call = get_mock.call_args
     assert get_call[0][0].startswith(app.config[AUTH_HOSTNAME])
     assert get_call[1]["headers"]["Authorization"] == f"Bearer {JWT_TOKEN}"
+
+
+def add_organizations_response(app, organization_uuids):
+    responses.add(
+        responses.GET,
+        f"{app.config[AUTH_HOSTNAME]}/users/{USER_UUID}/organizations",
+        json=[{"name": "An org", "uuid": uuid} for uuid in organization_uuids],
+    )
+
+
+# the first poll covers the lifetime of JWT tokens, when time.time() is 1000.
+FIRST_POLL_SINCE = "1969-12-18T00:16:40"
+
+
+def add_membership_changes_response(
+    app, user_uuids, changed_at, since=FIRST_POLL_SINCE, membership_versions=None
+):
+    responses.add(
+        responses.GET,
+        f"{app.config[AUTH_HOSTNAME]}/users/membership-changes?since={since}",
+        match_querystring=True,
+        json={
+            "changed_at": changed_at,
+            "user_uuids": user_uuids,
+            "membership_versions": membership_versions or {},
+        },
+    )
+
+
+@responses.activate
+def test_fetch_is_user_in_org_cached(app):
+    app.config[AUTH_MEMBERSHIP_POLL_INTERVAL] = 0
+    add_organizations_response(app, [ORGANIZATION_UUID])
+
+    assert fetch_is_user_in_org(ORGANIZATION_UUID, JWT_TOKEN, USER_UUID)
+    assert fetch_is_user_in_org(ORGANIZATION_UUID, JWT_TOKEN, USER_UUID)
+    assert len(responses.calls) == 1
+
+    # organizations the user isn't known to be in are checked again.
+    assert not fetch_is_user_in_org("another-org", JWT_TOKEN, USER_UUID)
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+@patch("app.membership_cache.time.time")
+def test_fetch_is_user_in_org_poll(time_mock, app):
+    time_mock.return_value = 1000
+    add_membership_changes_response(app, [], "2021-03-29T10:00:00")
+    add_organizations_response(app, [ORGANIZATION_UUID])
+    add_organizations_response(app, [])
+    assert fetch_is_user_in_org(ORGANIZATION_UUID, JWT_TOKEN, USER_UUID)
+
+    # the auth service is only polled every AUTH_MEMBERSHIP_POLL_INTERVAL.
+    time_mock.return_value = 1005
+    assert fetch_is_user_in_org(ORGANIZATION_UUID, JWT_TOKEN, USER_UUID)
+    assert len(responses.calls) == 2
+
+    # the user left the organization: their cached organizations are forgotten.
+    time_mock.return_value = 1010
+    add_membership_changes_response(
+        app, [USER_UUID], "2021-03-29T10:00:10", since="2021-03-29T09:59:50"
+    )
+    assert not fetch_is_user_in_org(ORGANIZATION_UUID, JWT_TOKEN, USER_UUID)
+    assert len(responses.calls) == 4
+    # the auth service is polled with its key rather than the user's token.
+    assert (
+        responses.calls[2].request.headers["Membership-Changes-Key"]
+        == "membership-changes-key"
+    )
+    assert "Authorization" not in responses.calls[2].request.headers
+
+
+@responses.activate
+def test_fetch_is_user_in_org_poll_no_key(app):
+    app.config[AUTH_MEMBERSHIP_CHANGES_KEY] = None
+    add_organizations_response(app, [ORGANIZATION_UUID])
+
+    # without a key the auth service can't be polled.
+    assert fetch_is_user_in_org(ORGANIZATION_UUID, JWT_TOKEN, USER_UUID)
+    assert len(responses.calls) == 1
+    assert get_membership_cache().changed_at is None
+
+
+@responses.activate
+def test_fetch_is_user_in_org_poll_error(app):
+    responses.add(
+        responses.GET,
+        f"{app.config[AUTH_HOSTNAME]}/users/membership-changes",
+        status=404,
+    )
+    add_organizations_response(app, [ORGANIZATION_UUID])
+
+    # memberships are still fetched when the auth service can't be polled.
+    assert fetch_is_user_in_org(ORGANIZATION_UUID, JWT_TOKEN, USER_UUID)
+    assert get_membership_cache().changed_at is None
+
+
+@responses.activate
+@patch("app.membership_cache.time.time")
+def test_find_is_user_in_org_claim(time_mock, app):
+    time_mock.return_value = 1000
+    add_membership_changes_response(
+        app, [USER_UUID], "2021-03-29T10:00:00", membership_versions={USER_UUID: 2}
+    )
+    decoded_token = {
+        "uuid": USER_UUID,
+        "organizations": [{"uuid": ORGANIZATION_UUID, "role": "USER"}],
+        "membership_version": 2,
+    }
+
+    assert find_is_user_in_org_claim(ORGANIZATION_UUID, decoded_token)
+    assert find_is_user_in_org_claim("another-org", decoded_token) is False
+    assert len(responses.calls) == 1
+
+    # tokens without claims, or issued before the memberships changed, can't
+    # be trusted.
+    assert find_is_user_in_org_claim(ORGANIZATION_UUID, {}) is None
+    stale_token = dict(decoded_token, membership_version=1)
+    assert find_is_user_in_org_claim(ORGANIZATION_UUID, stale_token) is None
+
+    # neither can any token once polling fails for AUTH_MEMBERSHIP_CACHE_TTL.
+    time_mock.return_value = 1060
+    responses.add(
+        responses.GET,
+        f"{app.config[AUTH_HOSTNAME]}/users/membership-changes",
+        status=503,
+    )
+    assert find_is_user_in_org_claim(ORGANIZATION_UUID, decoded_token) is None
+    assert len(responses.calls) == 2
+
+
+@patch("app.membership_cache.time.time")
+def test_membership_cache(time_mock):
+    membership_cache = MembershipCache(60, 2)
+    time_mock.return_value = 1000
+    membership_cache.set("token-1", "user-1", {"org-1"})
+    membership_cache.set("token-2", "user-1", {"org-1"})
+    membership_cache.set("token-3", "user-2", {"org-2"})
+
+    # the least recently used token is evicted.
+    assert membership_cache.get("token-1") is None
+    assert membership_cache.get("token-2") == {"org-1"}
+
+    membership_cache.invalidate(["user-1"])
+    assert membership_cache.get("token-2") is None
+    assert membership_cache.get("token-3") == {"org-2"}
+
+    time_mock.return_value = 1060
+    assert membership_cache.get("token-3") is None
+
+    # every user can be forgotten at once.
+    membership_cache.set("token-1", "user-1", {"org-1"})
+    membership_cache.set("token-3", "user-2", {"org-2"})
+    membership_cache.invalidate()
+    assert membership_cache.get("token-1") is None
+    assert membership_cache.get("token-3") is None
+    membership_cache.set("token-1", "user-1", {"org-1"})
+    assert membership_cache.get("token-1") == {"org-1"}
+
+
+@patch("app.membership_cache.time.time")
+def test_membership_cache_record_changes(time_mock):
+    membership_cache = MembershipCache(60, 10)
+    time_mock.return_value = 1000
+    membership_cache.set("token-1", "user-1", {"org-1"})
+    membership_cache.set("token-2", "user-2", {"org-2"})
+
+    membership_cache.record_changes(
+        ["user-1"], {"user-1": 2}, datetime(2021, 3, 29, 10), 100
+    )
+    assert membership_cache.get("token-1") is None
+    assert membership_cache.get("token-2") == {"org-2"}
+    assert membership_cache.changed_at == datetime(2021, 3, 29, 10)
+    assert not membership_cache.is_claim_current("user-1", 1)
+    assert membership_cache.is_claim_current("user-1", 2)
+
+    # versions are kept until the tokens they revoke have expired, and
+    # expired organizations are pruned.
+    time_mock.return_value = 1100
+    membership_cache.record_changes([], {}, datetime(2021, 3, 29, 10, 1), 100)
+    assert membership_cache.is_claim_current("user-1", 1)
+    assert membership_cache._membership_versions == {}
+    assert membership_cache._tokens_by_user == {}
+    assert len(membership_cache._organizations) == 0
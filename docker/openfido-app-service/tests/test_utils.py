@@ -1,9 +1,15 @@
 import flask
 import secrets
+from datetime import datetime, timedelta
 from unittest.mock import patch
+
+import jwt
+from password_hashing import make_hash, verify_hash
 from requests import HTTPError
 
-from app.utils import validate_organization, make_hash, verify_hash
+from app.constants import AUTH_JWT_SECRET, AUTH_MEMBERSHIP_POLL_INTERVAL
+from app.services import get_membership_cache
+from app.utils import validate_organization
 from .conftest import JWT_TOKEN, USER_UUID
 
 
@@ -71,6 +77,49 @@ def test_validate_organization(in_org_mock, app):
         assert in_org_mock.called
 
 
+def make_token(secret="auth-secret", expires_in=1, max_expires_in=2, **claims):
+    now = datetime.utcnow()
+    return jwt.encode(
+        {
+            "uuid": USER_UUID,
+            "exp": now + timedelta(days=expires_in),
+            "max-exp": int((now + timedelta(days=max_expires_in)).timestamp()),
+            **claims,
+        },
+        secret,
+        algorithm="HS256",
+    ).decode("utf-8")
+
+
+@patch("app.utils.fetch_is_user_in_org")
+def test_validate_organization_verified(in_org_mock, app):
+    app.config[AUTH_JWT_SECRET] = "auth-secret"
+    in_org_mock.return_value = True
+
+    @validate_organization()
+    def a_view(organization_uuid):
+        return {}, 200
+
+    def call_view(token):
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {token}",
+        }
+        with app.test_request_context("/a/view", headers=headers):
+            return a_view(organization_uuid=12)[1]
+
+    assert call_view(make_token()) == 200
+
+    # tokens that the auth service didn't sign, or that expired, are refused
+    # without asking the auth service.
+    in_org_mock.reset_mock()
+    assert call_view(make_token(secret="another-secret")) == 401
+    assert call_view(make_token(expires_in=-1)) == 401
+    assert call_view(make_token(max_expires_in=-1)) == 401
+    assert call_view(JWT_TOKEN) == 401
+    assert not in_org_mock.called
+
+
 def test_make_hash():
     hash_p, hash_s = make_hash("password")
 
@@ -91,3 +140,39 @@ def test_verify_hash():
     hash_p, hash_s = make_hash(pw)
 
     assert verify_hash(pw, hash_p, hash_s) is True
+
+
+@patch("app.utils.fetch_is_user_in_org")
+def test_validate_organization_claims(in_org_mock, app):
+    app.config[AUTH_JWT_SECRET] = "auth-secret"
+    app.config[AUTH_MEMBERSHIP_POLL_INTERVAL] = 0
+    in_org_mock.return_value = True
+
+    @validate_organization()
+    def a_view(organization_uuid):
+        return {}, 200
+
+    def call_view(token, organization_uuid="org-1"):
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {token}",
+        }
+        with app.test_request_context("/a/view", headers=headers):
+            return a_view(organization_uuid=organization_uuid)[1]
+
+    token = make_token(
+        organizations=[{"uuid": "org-1", "role": "USER"}], membership_version=3
+    )
+    with app.app_context():
+        membership_cache = get_membership_cache()
+    membership_cache.record_changes([], {USER_UUID: 3}, datetime.utcnow(), 3600)
+
+    # current claims are trusted without asking the auth service.
+    assert call_view(token) == 200
+    assert call_view(token, "org-2") == 404
+    assert not in_org_mock.called
+
+    # revoked claims are not.
+    membership_cache.record_changes([], {USER_UUID: 4}, datetime.utcnow(), 3600)
+    assert call_view(token, "org-2") == 200
+    assert in_org_mock.called
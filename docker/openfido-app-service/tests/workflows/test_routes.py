@@ -17,6 +17,7 @@ from app.workflows.models import (
 )
 from app.workflows.queries import find_organization_workflows
 from application_roles.decorators import ROLES_KEY
+from marshmallow.exceptions import ValidationError
 from requests import HTTPError
 
 from ..conftest import (
@@ -1068,3 +1069,106 @@ def test_workflow_run(
 
     assert result.status_code == 200
     assert result.json == org_workflow_run
+
+
+@patch("app.workflows.routes.fetch_workflow_graph")
+@responses.activate
+def test_workflow_graph(
+    fetch_mock, app, client, client_application, organization_workflow
+):
+    fetch_mock.return_value = {"pipelines": []}
+    result = client.get(
+        f"/v1/organizations/{ORGANIZATION_UUID}/workflows/{organization_workflow.uuid}/graph",
+        content_type="application/json",
+        headers={
+            "Authorization": f"Bearer {JWT_TOKEN}",
+            ROLES_KEY: client_application.api_key,
+        },
+    )
+    assert result.status_code == 200
+    assert result.json == {"pipelines": []}
+
+    fetch_mock.side_effect = HTTPError("something is wrong")
+    result = client.get(
+        f"/v1/organizations/{ORGANIZATION_UUID}/workflows/{organization_workflow.uuid}/graph",
+        content_type="application/json",
+        headers={
+            "Authorization": f"Bearer {JWT_TOKEN}",
+            ROLES_KEY: client_application.api_key,
+        },
+    )
+    assert result.status_code == 503
+
+    message = {"message": "error"}
+    fetch_mock.side_effect = ValueError(message)
+    result = client.get(
+        f"/v1/organizations/{ORGANIZATION_UUID}/workflows/{organization_workflow.uuid}/graph",
+        content_type="application/json",
+        headers={
+            "Authorization": f"Bearer {JWT_TOKEN}",
+            ROLES_KEY: client_application.api_key,
+        },
+    )
+    assert result.status_code == 400
+    assert result.json == message
+
+
+@patch("app.workflows.routes.update_workflow_graph")
+@responses.activate
+def test_workflow_graph_update(
+    update_mock, app, client, client_application, organization_workflow
+):
+    update_mock.return_value = {"pipelines": []}
+    result = client.put(
+        f"/v1/organizations/{ORGANIZATION_UUID}/workflows/{organization_workflow.uuid}/graph",
+        content_type="application/json",
+        headers={
+            "Authorization": f"Bearer {JWT_TOKEN}",
+            ROLES_KEY: client_application.api_key,
+        },
+        json={"pipelines": []},
+    )
+    assert result.status_code == 200
+    assert result.json == {"pipelines": []}
+    update_mock.assert_called_once_with(
+        ORGANIZATION_UUID, organization_workflow.uuid, {"pipelines": []}
+    )
+
+    message = {"message": "error"}
+    update_mock.side_effect = ValueError(message)
+    result = client.put(
+        f"/v1/organizations/{ORGANIZATION_UUID}/workflows/{organization_workflow.uuid}/graph",
+        content_type="application/json",
+        headers={
+            "Authorization": f"Bearer {JWT_TOKEN}",
+            ROLES_KEY: client_application.api_key,
+        },
+        json={"pipelines": []},
+    )
+    assert result.status_code == 400
+    assert result.json == message
+
+    update_mock.side_effect = HTTPError("something is wrong")
+    result = client.put(
+        f"/v1/organizations/{ORGANIZATION_UUID}/workflows/{organization_workflow.uuid}/graph",
+        content_type="application/json",
+        headers={
+            "Authorization": f"Bearer {JWT_TOKEN}",
+            ROLES_KEY: client_application.api_key,
+        },
+        json={"pipelines": []},
+    )
+    assert result.status_code == 503
+
+    update_mock.side_effect = ValidationError({"pipelines": ["Missing data."]})
+    result = client.put(
+        f"/v1/organizations/{ORGANIZATION_UUID}/workflows/{organization_workflow.uuid}/graph",
+        content_type="application/json",
+        headers={
+            "Authorization": f"Bearer {JWT_TOKEN}",
+            ROLES_KEY: client_application.api_key,
+        },
+        json={},
+    )
+    assert result.status_code == 400
+    assert result.json["errors"] == {"pipelines": ["Missing data."]}
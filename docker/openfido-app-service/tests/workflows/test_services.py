@@ -1,4 +1,5 @@
 import copy
+import json
 
 from marshmallow.exceptions import ValidationError
 from unittest.mock import patch
@@ -6,9 +7,11 @@ from unittest.mock import patch
 import pytest
 import responses
 from app.constants import WORKFLOW_API_TOKEN, WORKFLOW_HOSTNAME
+from app.pipelines.models import OrganizationPipeline
 from app.workflows.models import (
     OrganizationWorkflow,
     OrganizationWorkflowPipeline,
+    db,
 )
 from app.workflows.services import (
     create_workflow,
@@ -21,6 +24,8 @@ from app.workflows.services import (
     fetch_workflow_pipeline,
     update_workflow_pipeline,
     delete_workflow_pipeline,
+    fetch_workflow_graph,
+    update_workflow_graph,
     create_workflow_run,
     fetch_workflow_run,
 )
@@ -172,6 +177,11 @@ def test_create_workflow(app):
     ).first()
     json_response["uuid"] = workflow.uuid
     assert created_workflow == json_response
+    # the workflow service is told the organization of the workflow.
+    assert (
+        json.loads(responses.calls[0].request.body)["organization_uuid"]
+        == ORGANIZATION_UUID
+    )
 
 
 @responses.activate
@@ -287,6 +297,9 @@ def test_update_workflow(app, organization_workflow):
 
     json_response["uuid"] = organization_workflow.uuid
     assert updated_workflow == json_response
+    assert json.loads(responses.calls[0].request.body) == dict(
+        updates, organization_uuid=ORGANIZATION_UUID
+    )
 
 
 @responses.activate
@@ -389,6 +402,28 @@ def test_create_workflow_pipeline_invalid_org_pipeline(
         )
 
 
+def test_create_workflow_pipeline_invalid_uuids(
+    app, organization_workflow, organization_pipeline, organization_workflow_pipeline
+):
+    data = {
+        "pipeline_uuid": organization_pipeline.uuid,
+        "destination_workflow_pipelines": [],
+        "source_workflow_pipelines": [],
+    }
+    with pytest.raises(ValueError):
+        create_workflow_pipeline(
+            organization_workflow.organization_uuid, "0" * 32, data
+        )
+
+    for invalid in ("source_workflow_pipelines", "destination_workflow_pipelines"):
+        with pytest.raises(ValueError):
+            create_workflow_pipeline(
+                organization_workflow.organization_uuid,
+                organization_workflow.uuid,
+                dict(data, **{invalid: ["1" * 32]}),
+            )
+
+
 @responses.activate
 def test_create_workflow_pipeline_bad_json(
     app, organization_workflow, organization_pipeline, organization_workflow_pipeline
@@ -686,6 +721,25 @@ def test_update_workflow_pipeline_invalid_org_workflow_pipeline(
         )
 
 
+def test_update_workflow_pipeline_invalid_uuids(
+    app, organization_workflow, organization_pipeline, organization_workflow_pipeline
+):
+    for invalid in ("source_workflow_pipelines", "destination_workflow_pipelines"):
+        data = {
+            "pipeline_uuid": organization_pipeline.uuid,
+            "destination_workflow_pipelines": [],
+            "source_workflow_pipelines": [],
+        }
+        data[invalid] = ["1" * 32]
+        with pytest.raises(ValueError):
+            update_workflow_pipeline(
+                organization_workflow.organization_uuid,
+                organization_workflow.uuid,
+                organization_workflow_pipeline.uuid,
+                data,
+            )
+
+
 @responses.activate
 def test_update_workflow_pipeline_bad_json(
     app, organization_workflow, organization_pipeline, organization_workflow_pipeline
@@ -1099,3 +1153,175 @@ def test_fetch_workflow_run(
     ] = organization_workflow_run.uuid
 
     assert org_workflow_run == ORGANIZATION_WORKFLOW_RUN_RESPONSE
+
+
+def _workflow_graph_json(*nodes):
+    return {
+        "pipelines": [
+            {
+                "pipeline_uuid": pipeline_uuid,
+                "workflow_pipeline_uuid": workflow_pipeline_uuid,
+                "dependencies": dependencies,
+            }
+            for (pipeline_uuid, workflow_pipeline_uuid, dependencies) in nodes
+        ]
+    }
+
+
+@responses.activate
+def test_fetch_workflow_graph(
+    app, organization_workflow, organization_pipeline, organization_workflow_pipeline
+):
+    with pytest.raises(ValueError):
+        fetch_workflow_graph(ORGANIZATION_UUID, "0" * 32)
+
+    responses.add(
+        responses.GET,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/workflows/{WORKFLOW_UUID}/graph",
+        json=_workflow_graph_json((PIPELINE_UUID, WORKFLOW_PIPELINE_UUID, [])),
+    )
+    assert fetch_workflow_graph(
+        ORGANIZATION_UUID, organization_workflow.uuid
+    ) == _workflow_graph_json(
+        (organization_pipeline.uuid, organization_workflow_pipeline.uuid, [])
+    )
+
+    # pipelines the organization doesn't have are left out.
+    responses.replace(
+        responses.GET,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/workflows/{WORKFLOW_UUID}/graph",
+        json=_workflow_graph_json(
+            (PIPELINE_UUID, WORKFLOW_PIPELINE_UUID, ["1" * 32]),
+            ("1" * 32, WORKFLOW_PIPELINE_RESPONSE_UUID, []),
+        ),
+    )
+    assert fetch_workflow_graph(
+        ORGANIZATION_UUID, organization_workflow.uuid
+    ) == _workflow_graph_json(
+        (organization_pipeline.uuid, organization_workflow_pipeline.uuid, [])
+    )
+
+
+@responses.activate
+def test_fetch_workflow_graph_bad_response(app, organization_workflow):
+    responses.add(
+        responses.GET,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/workflows/{WORKFLOW_UUID}/graph",
+        body="not json",
+    )
+    with pytest.raises(HTTPError):
+        fetch_workflow_graph(ORGANIZATION_UUID, organization_workflow.uuid)
+
+    responses.replace(
+        responses.GET,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/workflows/{WORKFLOW_UUID}/graph",
+        json={"message": "Workflow not found"},
+        status=404,
+    )
+    with pytest.raises(ValueError):
+        fetch_workflow_graph(ORGANIZATION_UUID, organization_workflow.uuid)
+
+
+@responses.activate
+def test_update_workflow_graph(
+    app, organization_workflow, organization_pipeline, organization_workflow_pipeline
+):
+    another_pipeline = OrganizationPipeline(
+        organization_uuid=ORGANIZATION_UUID, pipeline_uuid="1" * 32
+    )
+    db.session.add(another_pipeline)
+    db.session.commit()
+
+    responses.add(
+        responses.PUT,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/workflows/{WORKFLOW_UUID}/graph",
+        json=_workflow_graph_json(
+            (PIPELINE_UUID, WORKFLOW_PIPELINE_UUID, []),
+            ("1" * 32, WORKFLOW_PIPELINE_RESPONSE_UUID, [PIPELINE_UUID]),
+        ),
+    )
+    graph = update_workflow_graph(
+        ORGANIZATION_UUID,
+        organization_workflow.uuid,
+        {
+            "pipelines": [
+                {"pipeline_uuid": organization_pipeline.uuid},
+                {
+                    "pipeline_uuid": another_pipeline.uuid,
+                    "dependencies": [organization_pipeline.uuid],
+                },
+            ]
+        },
+    )
+    assert responses.calls[0].request.body == (
+        b'{"pipelines": [{"pipeline_uuid": "' + PIPELINE_UUID.encode() + b'", '
+        b'"dependencies": []}, {"pipeline_uuid": "' + b"1" * 32 + b'", '
+        b'"dependencies": ["' + PIPELINE_UUID.encode() + b'"]}]}'
+    )
+
+    new_owp = OrganizationWorkflowPipeline.query.filter(
+        OrganizationWorkflowPipeline.workflow_pipeline_uuid
+        == WORKFLOW_PIPELINE_RESPONSE_UUID
+    ).one()
+    assert new_owp.organization_pipeline_id == another_pipeline.id
+    assert graph == _workflow_graph_json(
+        (organization_pipeline.uuid, organization_workflow_pipeline.uuid, []),
+        (another_pipeline.uuid, new_owp.uuid, [organization_pipeline.uuid]),
+    )
+
+    # pipelines that aren't in the graph are removed.
+    responses.replace(
+        responses.PUT,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/workflows/{WORKFLOW_UUID}/graph",
+        json=_workflow_graph_json(("1" * 32, WORKFLOW_PIPELINE_RESPONSE_UUID, [])),
+    )
+    graph = update_workflow_graph(
+        ORGANIZATION_UUID,
+        organization_workflow.uuid,
+        {"pipelines": [{"pipeline_uuid": another_pipeline.uuid}]},
+    )
+    assert organization_workflow_pipeline.is_deleted
+    assert graph == _workflow_graph_json((another_pipeline.uuid, new_owp.uuid, []))
+
+
+@responses.activate
+def test_update_workflow_graph_invalid(
+    app, organization_workflow, organization_pipeline
+):
+    with pytest.raises(ValidationError):
+        update_workflow_graph(ORGANIZATION_UUID, organization_workflow.uuid, {})
+    with pytest.raises(ValueError):
+        update_workflow_graph(ORGANIZATION_UUID, "0" * 32, {"pipelines": []})
+    with pytest.raises(ValueError):
+        update_workflow_graph(
+            ORGANIZATION_UUID,
+            organization_workflow.uuid,
+            {"pipelines": [{"pipeline_uuid": "1" * 32}]},
+        )
+
+    responses.add(
+        responses.PUT,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/workflows/{WORKFLOW_UUID}/graph",
+        json={"message": "Validation error"},
+        status=400,
+    )
+    with pytest.raises(ValueError):
+        update_workflow_graph(
+            ORGANIZATION_UUID,
+            organization_workflow.uuid,
+            {"pipelines": [{"pipeline_uuid": organization_pipeline.uuid}]},
+        )
+    assert OrganizationWorkflowPipeline.query.count() == 0
+
+    responses.replace(
+        responses.PUT,
+        f"{app.config[WORKFLOW_HOSTNAME]}/v1/workflows/{WORKFLOW_UUID}/graph",
+        body="not json",
+    )
+    with pytest.raises(HTTPError):
+        update_workflow_graph(
+            ORGANIZATION_UUID,
+            organization_workflow.uuid,
+            {"pipelines": [{"pipeline_uuid": organization_pipeline.uuid}]},
+        )
+    assert OrganizationWorkflowPipeline.query.count() == 0
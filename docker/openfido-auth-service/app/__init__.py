@@ -9,11 +9,16 @@ from .org import org_bp
 from .models import db
 
 from blob_utils import constants
+from password_hashing import constants as password_constants
 
 # Allow a specific set of environmental variables to be configurable:
 CONFIG_VARS = (
     "SECRET_KEY",
     "SQLALCHEMY_DATABASE_URI",
+    "JWT_MEMBERSHIP_CLAIMS",
+    "MEMBERSHIP_CHANGES_KEY",
+    "LAST_ACTIVE_FLUSH_INTERVAL",
+    "LAST_ACTIVE_GRANULARITY_MINUTES",
     constants.FLASK_ENV,
     constants.S3_ACCESS_KEY_ID,
     constants.S3_SECRET_ACCESS_KEY,
@@ -21,6 +26,15 @@ CONFIG_VARS = (
     constants.S3_REGION_NAME,
     constants.S3_BUCKET,
     constants.S3_PRESIGNED_TIMEOUT,
+    constants.S3_MAX_POOL_CONNECTIONS,
+    constants.S3_TRANSFER_THRESHOLD,
+    constants.S3_TRANSFER_CHUNK_SIZE,
+    constants.S3_TRANSFER_CONCURRENCY,
+    password_constants.PASSWORD_HASH_SCHEME,
+    password_constants.PASSWORD_HASH_ITERATIONS,
+    password_constants.PASSWORD_HASH_SCRYPT_N,
+    password_constants.PASSWORD_HASH_WORKERS,
+    password_constants.PASSWORD_HASH_QUEUE_SIZE,
 )
 
 
@@ -0,0 +1,79 @@
+import threading
+import time
+from datetime import timedelta
+
+
+class ActivityBuffer:
+    """Buffers the last_active_at dates of users until they are flushed.
+
+    A user's activity is only recorded when their last_active_at is more than
+    granularity minutes old, and pending dates are written in a single UPDATE
+    at most every flush_interval seconds (see services.record_user_activity()),
+    and at least flush_interval seconds after they are recorded.
+    """
+
+    def __init__(self, flush_interval, granularity):
+        self.flush_interval = flush_interval
+        self.granularity = timedelta(minutes=granularity)
+        self._pending = {}
+        self._next_flush_at = 0
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def record(self, user_id, last_active_at, now):
+        """Record that user_id was active at now.
+
+        last_active_at is the date stored for the user, which is older than
+        any pending one.
+        """
+        with self._lock:
+            last_active_at = self._pending.get(user_id, last_active_at)
+            if last_active_at is not None and now - last_active_at < self.granularity:
+                return
+
+            self._pending[user_id] = now
+
+    def claim_flush(self):
+        """Returns True when the pending dates should be flushed.
+
+        Only one caller is told to flush every flush_interval seconds.
+        """
+        now = time.time()
+        with self._lock:
+            if len(self._pending) == 0 or now < self._next_flush_at:
+                return False
+
+            self._next_flush_at = now + self.flush_interval
+            return True
+
+    def schedule_flush(self, flush):
+        """Call flush in flush_interval seconds, unless a call is scheduled
+        already (so that pending dates are written without later activity).
+        """
+        with self._lock:
+            if self._timer is not None or len(self._pending) == 0:
+                return
+
+            self._timer = threading.Timer(
+                self.flush_interval, self._scheduled_flush, (flush,)
+            )
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _scheduled_flush(self, flush):
+        with self._lock:
+            self._timer = None
+        flush()
+
+    def take(self):
+        """ Remove and return the pending dates, by user id. """
+        with self._lock:
+            (pending, self._pending) = (self._pending, {})
+            return pending
+
+    def restore(self, pending):
+        """ Put back dates that couldn't be flushed, unless newer ones exist. """
+        with self._lock:
+            for (user_id, last_active_at) in pending.items():
+                if self._pending.get(user_id, last_active_at) <= last_active_at:
+                    self._pending[user_id] = last_active_at
@@ -1,11 +1,14 @@
 """Users/autentication endpoints
 """
+from datetime import datetime
 from functools import wraps
+import hmac
 import re
 import logging
 import json
 
-from flask import Blueprint, jsonify, request, g, send_file
+from flask import Blueprint, current_app, jsonify, request, g, send_file
+from password_hashing import PasswordHashBusy, needs_rehash, verify_hash_bounded
 from . import models, queries, services, utils
 from .utils import BadRequestError
 from werkzeug.exceptions import BadRequest
@@ -100,7 +103,28 @@ def jwt_required(view):
             utils.log("invalid JWT token", logging.WARN)
             return {}, 401
 
-        services.update_user_last_active_at(g.user)
+        services.record_user_activity(g.user)
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def membership_changes_key_required(view):
+    """Decorator to require the MEMBERSHIP_CHANGES_KEY shared with the services
+    that poll membership changes (in the Membership-Changes-Key header).
+
+    Returns a 401 when the key doesn't match, or isn't configured.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = current_app.config.get("MEMBERSHIP_CHANGES_KEY")
+        if not key or not hmac.compare_digest(
+            request.headers.get("Membership-Changes-Key", ""), key
+        ):
+            utils.log("invalid membership changes key", logging.WARN)
+            return {}, 401
+
         return view(*args, **kwargs)
 
     return wrapper
@@ -437,6 +461,70 @@ def get_user_organizations(user_uuid):
     return jsonify([m.serialize_organization_role() for m in memberships])
 
 
+@auth_bp.route("/membership-changes", methods=["GET"])
+@membership_changes_key_required
+def get_membership_changes():
+    """Get the users whose organization memberships changed.
+    ---
+
+    Services that cache organization memberships poll this to know which
+    users to forget. It is also the revocation list of membership claims
+    (see make_jwt()): tokens of these users with an older membership_version
+    are stale.
+
+    parameters:
+      - in: header
+        name: Membership-Changes-Key
+        description: The MEMBERSHIP_CHANGES_KEY of the auth service
+        schema:
+          type: string
+      - in: query
+        name: since
+        description: "ISO8601 date of the last poll (changed_at)"
+        schema:
+          type: string
+          format: date-time
+    responses:
+      "200":
+        description: "Described"
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                changed_at:
+                  type: string
+                  format: date-time
+                user_uuids:
+                  type: array
+                membership_versions:
+                  type: object
+      "400":
+        description: "Bad request"
+      "401":
+        description: "Invalid input"
+    """
+    changed_at = datetime.utcnow()
+    if "since" not in request.args:
+        return {
+            "changed_at": utils.to_iso8601(changed_at),
+            "user_uuids": [],
+            "membership_versions": {},
+        }
+
+    try:
+        since = datetime.fromisoformat(request.args["since"])
+    except ValueError:
+        return {"message": "invalid since date"}, 400
+
+    users = queries.find_users_with_membership_changes(since).all()
+    return {
+        "changed_at": utils.to_iso8601(changed_at),
+        "user_uuids": [user.uuid for user in users],
+        "membership_versions": {user.uuid: user.membership_version for user in users},
+    }
+
+
 @auth_bp.route("/auth", methods=["POST"])
 @verify_content_type_and_params(["email", "password"], [])
 def auth_user():
@@ -479,6 +567,8 @@ def auth_user():
         description: "Bad request"
       "401":
         description: "Invalid input"
+      "503":
+        description: "Too many logins in progress, retry later"
     """
     email = request.json["email"]
     password = request.json["password"]
@@ -487,10 +577,19 @@ def auth_user():
         utils.log("user does not exist", logging.WARN)
         return {}, 401
 
-    if not utils.verify_hash(password, user.password_hash, user.password_salt):
+    try:
+        verified = verify_hash_bounded(password, user.password_hash, user.password_salt)
+    except PasswordHashBusy:
+        utils.log("too many logins in progress", logging.WARN)
+        return {}, 503, {"Retry-After": "1"}
+
+    if not verified:
         utils.log("verify hash failed", logging.WARN)
         return {}, 401
 
+    if needs_rehash(user.password_hash):
+        services.update_password_hash(user, password)
+
     utils.log("authorized user")
     response = user.serialize()
     response["token"] = token = utils.make_jwt(user).decode("utf-8")
@@ -1,2 +1,6 @@
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 S3_REGION_NAME = "us-east-1"
+# Seconds between writes of the last_active_at of users:
+LAST_ACTIVE_FLUSH_INTERVAL = 30
+# The last_active_at of users is only updated when it is older than this:
+LAST_ACTIVE_GRANULARITY_MINUTES = 5
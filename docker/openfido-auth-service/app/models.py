@@ -1,3 +1,4 @@
+import uuid as uuid_lib
 from datetime import datetime
 
 from flask_sqlalchemy import SQLAlchemy
@@ -19,20 +20,33 @@ class User(db.Model):
 
     __tablename__ = "users"
     id = db.Column(db.Integer, primary_key=True)
-    uuid = db.Column(db.String(32), nullable=False, server_default="")
+    uuid = db.Column(
+        db.String(32),
+        nullable=False,
+        server_default="",
+        default=lambda: uuid_lib.uuid4().hex,
+        unique=True,
+        index=True,
+    )
     is_system_admin = db.Column(db.Boolean, nullable=False, default=False)
     first_name = db.Column(db.String(30), nullable=False)
     last_name = db.Column(db.String(60), nullable=False)
-    email = db.Column(db.String(255), nullable=False)
+    email = db.Column(db.String(255), nullable=False, index=True)
     password_hash = db.Column(db.String(127), nullable=False)
     password_salt = db.Column(db.String(127), nullable=False)
-    reset_token = db.Column(db.String(32), nullable=True)
+    reset_token = db.Column(db.String(32), nullable=True, index=True)
     reset_token_expires_at = db.Column(
         db.DateTime, nullable=True, default=lambda: datetime.utcnow()
     )
     last_active_at = db.Column(
         db.DateTime, nullable=False, default=lambda: datetime.utcnow()
     )
+    # When the user last joined, left or changed role in an organization:
+    memberships_changed_at = db.Column(db.DateTime, nullable=True, index=True)
+    # Incremented with each of those changes (see make_jwt()):
+    membership_version = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
     created_at = db.Column(
         db.DateTime, nullable=False, default=lambda: datetime.utcnow()
     )
@@ -71,7 +85,14 @@ class Organization(db.Model):
     __tablename__ = "organizations"
 
     id = db.Column(db.Integer, primary_key=True)
-    uuid = db.Column(db.String(32), nullable=False, server_default="")
+    uuid = db.Column(
+        db.String(32),
+        nullable=False,
+        server_default="",
+        default=lambda: uuid_lib.uuid4().hex,
+        unique=True,
+        index=True,
+    )
     name = db.Column(db.String(60), nullable=False)
     is_deleted = db.Column(db.Boolean, nullable=False, default=False)
     created_at = db.Column(
@@ -110,14 +131,23 @@ class OrganizationMember(db.Model):
     __tablename__ = "organization_member"
 
     id = db.Column(db.Integer, primary_key=True)
-    uuid = db.Column(db.String(32), nullable=False, server_default="")
+    uuid = db.Column(
+        db.String(32),
+        nullable=False,
+        server_default="",
+        default=lambda: uuid_lib.uuid4().hex,
+        unique=True,
+        index=True,
+    )
     organization_id = db.Column(
-        db.Integer, db.ForeignKey("organizations.id"), nullable=False
+        db.Integer, db.ForeignKey("organizations.id"), nullable=False, index=True
+    )
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id"), nullable=False, index=True
     )
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     is_deleted = db.Column(db.Boolean, nullable=False, default=False)
     organization_role_id = db.Column(
-        db.Integer, db.ForeignKey("organization_role.id"), nullable=False
+        db.Integer, db.ForeignKey("organization_role.id"), nullable=False, index=True
     )
     created_at = db.Column(
         db.DateTime, nullable=False, default=lambda: datetime.utcnow()
@@ -129,6 +159,15 @@ class OrganizationMember(db.Model):
         onupdate=lambda: datetime.utcnow(),
     )
 
+    __table_args__ = (
+        db.Index(
+            "ix_organization_member_organization_user_active",
+            "organization_id",
+            "user_id",
+            postgresql_where=db.text("is_deleted = false"),
+        ),
+    )
+
     def serialize_organization_role(self):
         """ Serialize OrganizationMember """
         result = self.organization.serialize()
@@ -159,7 +198,14 @@ class OrganizationRole(db.Model):
     __tablename__ = "organization_role"
 
     id = db.Column(db.Integer, primary_key=True)
-    uuid = db.Column(db.String(32), nullable=False, server_default="")
+    uuid = db.Column(
+        db.String(32),
+        nullable=False,
+        server_default="",
+        default=lambda: uuid_lib.uuid4().hex,
+        unique=True,
+        index=True,
+    )
     name = db.Column(db.String(20), nullable=False)
     code = db.Column(db.String(20), nullable=False)
     created_at = db.Column(
@@ -186,12 +232,21 @@ class OrganizationInvitation(db.Model):
     __tablename__ = "organization_invitations"
 
     id = db.Column(db.Integer, primary_key=True)
-    uuid = db.Column(db.String(32), nullable=False, server_default="")
+    uuid = db.Column(
+        db.String(32),
+        nullable=False,
+        server_default="",
+        default=lambda: uuid_lib.uuid4().hex,
+        unique=True,
+        index=True,
+    )
     organization_id = db.Column(
-        db.Integer, db.ForeignKey("organizations.id"), nullable=False
+        db.Integer, db.ForeignKey("organizations.id"), nullable=False, index=True
     )
     email_address = db.Column(db.String(255), nullable=False)
-    invitation_token = db.Column(db.String(32), nullable=False, server_default="")
+    invitation_token = db.Column(
+        db.String(32), nullable=False, server_default="", index=True
+    )
     accepted = db.Column("accepted", db.Boolean, default=False)
     cancelled = db.Column("cancelled", db.Boolean, default=False)
     rejected = db.Column("rejected", db.Boolean, default=False)
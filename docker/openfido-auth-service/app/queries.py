@@ -29,6 +29,11 @@ def find_user_by_uuid(user_uuid):
     return User.query.filter(User.uuid == user_uuid).one_or_none()
 
 
+def find_users_with_membership_changes(since):
+    """ Find the users whose organization memberships changed since a datetime """
+    return User.query.filter(User.memberships_changed_at >= since)
+
+
 def find_organization_by_uuid(organization_uuid):
     """ Find an organization by their uuid, or return None """
     return Organization.query.filter(
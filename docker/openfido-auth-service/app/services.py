@@ -1,15 +1,22 @@
+import atexit
+import logging
 import uuid
 import os
 from io import StringIO
 from datetime import datetime, timedelta
 from email.utils import parseaddr
+from functools import partial
 from flask import current_app
 from botocore.exceptions import ClientError
 from blob_utils import upload_stream, get_file
 
 from flanker.addresslib import address
+from password_hashing import make_hash, verify_hash
+from sqlalchemy import bindparam
+from sqlalchemy.exc import SQLAlchemyError
 
 from . import mail, utils
+from .activity import ActivityBuffer
 from .utils import BadRequestError, to_iso8601
 from .models import (
     ROLE_ADMINISTRATOR_CODE,
@@ -52,6 +59,7 @@ def create_organization(name, user=None):
                 organization_role=find_organization_role(ROLE_ADMINISTRATOR_CODE),
             )
         )
+        _memberships_changed(user)
     db.session.add(organization)
     db.session.commit()
     return organization
@@ -74,7 +82,9 @@ def delete_organization(organization):
         raise BadRequestError("Invalid organization")
 
     for o in organization.organization_members:
-        o.is_deleted = True
+        if not o.is_deleted:
+            o.is_deleted = True
+            _memberships_changed(o.user)
 
     for i in organization.organization_invitations:
         if not i.accepted and not i.rejected and not i.cancelled:
@@ -134,6 +144,7 @@ def accept_invitation(invitation_token):
         )
     )
     invitation.accepted = True
+    _memberships_changed(user)
     db.session.commit()
 
 
@@ -171,6 +182,7 @@ def remove_organization_member(organization, user):
 
     for member in memberships:
         member.is_deleted = True
+    _memberships_changed(user)
 
     db.session.commit()
 
@@ -204,6 +216,7 @@ def update_organization_member_role(organization, user, role_code):
         organization_role=new_role,
     )
     organization.organization_members.append(new_membership)
+    _memberships_changed(user)
     db.session.commit()
 
 
@@ -218,7 +231,7 @@ def create_user(email, password, first_name, last_name):
         )
     _validate_user_fields(email, first_name, last_name)
 
-    p_hash, p_salt = utils.make_hash(password)
+    p_hash, p_salt = make_hash(password)
     user = User(
         uuid=uuid.uuid4().hex,
         email=email,
@@ -246,13 +259,76 @@ def update_user(user, email, first_name, last_name):
     return user
 
 
-def update_user_last_active_at(user):
+def _flush_app_user_activity(app):
+    """ Flush the user activity of app, outside of a request. """
+    with app.app_context():
+        flush_user_activity()
+        db.session.remove()
+
+
+def get_activity_buffer():
+    """The ActivityBuffer of the current app.
+
+    Its pending dates are also flushed when the app exits.
+    """
+    activity_buffer = current_app.extensions.get("activity_buffer")
+    if activity_buffer is None:
+        activity_buffer = current_app.extensions.setdefault(
+            "activity_buffer",
+            ActivityBuffer(
+                int(current_app.config["LAST_ACTIVE_FLUSH_INTERVAL"]),
+                int(current_app.config["LAST_ACTIVE_GRANULARITY_MINUTES"]),
+            ),
+        )
+        atexit.register(_flush_app_user_activity, current_app._get_current_object())
+
+    return activity_buffer
+
+
+def record_user_activity(user):
+    """Update the last_active_at of a user, in batches.
+
+    Nothing is committed, except when the pending dates of every user are due
+    to be flushed. Otherwise a flush is scheduled, so that they are written
+    even when no other user is active.
+    """
     if not isinstance(user, User):
         raise BadRequestError("Invalid user")
 
-    user.last_active_at = datetime.utcnow()
-    db.session.commit()
-    return user
+    activity_buffer = get_activity_buffer()
+    activity_buffer.record(user.id, user.last_active_at, datetime.utcnow())
+    if activity_buffer.claim_flush():
+        flush_user_activity()
+    else:
+        activity_buffer.schedule_flush(
+            partial(_flush_app_user_activity, current_app._get_current_object())
+        )
+
+
+def flush_user_activity():
+    """ Write the pending last_active_at dates of users in a single UPDATE. """
+    activity_buffer = get_activity_buffer()
+    pending = activity_buffer.take()
+    if len(pending) == 0:
+        return
+
+    users = User.__table__
+    try:
+        db.session.execute(
+            users.update()
+            .where(users.c.id == bindparam("user_id"))
+            .where(users.c.last_active_at < bindparam("active_at"))
+            .values(last_active_at=bindparam("active_at")),
+            [
+                {"user_id": user_id, "active_at": active_at}
+                for (user_id, active_at) in pending.items()
+            ],
+        )
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        activity_buffer.restore(pending)
+        utils.log("unable to flush user activity", logging.WARN)
 
 
 def update_user_avatar(user, data):
@@ -296,7 +372,7 @@ def get_organization_logo(organization):
 def change_password(user, old_password, new_password):
     if user is None or not isinstance(user, User):
         raise BadRequestError("Invalid user")
-    if not utils.verify_hash(old_password, user.password_hash, user.password_salt):
+    if not verify_hash(old_password, user.password_hash, user.password_salt):
         raise BadRequestError("Incorrect password")
 
     if old_password == new_password:
@@ -307,7 +383,16 @@ def change_password(user, old_password, new_password):
             f"Passwords must have length of at least {MIN_PASSWORD_LENGTH}"
         )
 
-    p_hash, p_salt = utils.make_hash(new_password)
+    p_hash, p_salt = make_hash(new_password)
+    user.password_hash = p_hash
+    user.password_salt = p_salt
+
+    db.session.commit()
+
+
+def update_password_hash(user, password):
+    """ Hash a verified password again, with the current scheme. """
+    p_hash, p_salt = make_hash(password)
     user.password_hash = p_hash
     user.password_salt = p_salt
 
@@ -346,7 +431,7 @@ def reset_password(user, password, reset_token):
             f"Passwords must have length of at least {MIN_PASSWORD_LENGTH}"
         )
 
-    p_hash, p_salt = utils.make_hash(password)
+    p_hash, p_salt = make_hash(password)
     user.password_hash = p_hash
     user.password_salt = p_salt
     user.reset_token = ""
@@ -354,6 +439,12 @@ def reset_password(user, password, reset_token):
     db.session.commit()
 
 
+def _memberships_changed(user):
+    """ Record that the organization memberships of a user changed. """
+    user.memberships_changed_at = datetime.utcnow()
+    user.membership_version = User.membership_version + 1
+
+
 def _validate_organization_fields(name):
     """ Validate an organization's params fields """
     if not isinstance(name, str):
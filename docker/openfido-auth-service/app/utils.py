@@ -1,9 +1,6 @@
-import hashlib
 import logging
-import secrets
 from datetime import datetime, timedelta, timezone
 from calendar import timegm
-from typing import Tuple
 
 import jwt
 import os
@@ -37,32 +34,13 @@ def to_iso8601(date):
     return date.isoformat()
 
 
-def make_hash(password: str, salt: str = None) -> Tuple[str, str]:
-    """Make a hash of a password.
-
-    If a salt is not provided, a random one is created.
-
-    Returns the hash and salt."""
-    # NIST guidelines for password storage:
-    #  * salt > 32 bits
-    #  * PBKDF2
-    #  * iterate at least 10,000 times.
-    #  * TODO consider adding pepper (probably SECRET_KEY?)
-    if salt is None:
-        salt = secrets.token_urlsafe(32)
-    return (
-        hashlib.pbkdf2_hmac(
-            "sha256", password.encode("utf-8"), salt.encode("utf-8"), 10000
-        ).hex(),
-        salt,
+def _membership_claims_enabled():
+    return str(current_app.config.get("JWT_MEMBERSHIP_CLAIMS", "")).lower() in (
+        "1",
+        "true",
     )
 
 
-def verify_hash(password: str, p_hash: str, salt: str) -> bool:
-    """ Returns True when 'password' matches a value from make_hash(). """
-    return make_hash(password, salt)[0] == p_hash
-
-
 def make_jwt(user, max_expiration=None):
     """Create a JWT token for a user.
 
@@ -71,20 +49,34 @@ def make_jwt(user, max_expiration=None):
      * max-exp: the maximum date that we want to allow one to be able to refresh
                 their JWT token (enforced by verify_jwt()). Formatted as seconds
                 since the Unix epoch (same as exp field)
+
+    When JWT_MEMBERSHIP_CLAIMS is enabled it also includes:
+     * organizations: the uuid and role code of each organization of the user.
+     * membership_version: the user's membership_version. Tokens with an older
+                           version than the one listed by /users/membership-changes
+                           have stale organizations, and should be refreshed.
     """
     if max_expiration is None:
         max_expiration = datetime.now() + timedelta(days=JWT_MAX_EXPIRATION_DAYS)
 
     expiration = datetime.utcnow() + timedelta(days=JWT_EXPIRATION_DAYS)
     max_expiration = _s_since_epoch(max_expiration)
+    claims = {
+        "uuid": user.uuid,
+        "exp": expiration,
+        "max-exp": max_expiration,
+        "iss": current_app.name,
+        "iat": datetime.utcnow(),
+    }
+    if _membership_claims_enabled():
+        claims["organizations"] = [
+            {"uuid": m.organization.uuid, "role": m.organization_role.code}
+            for m in user.organization_memberships.filter_by(is_deleted=False)
+        ]
+        claims["membership_version"] = user.membership_version
+
     return jwt.encode(
-        {
-            "uuid": user.uuid,
-            "exp": expiration,
-            "max-exp": max_expiration,
-            "iss": current_app.name,
-            "iat": datetime.utcnow(),
-        },
+        claims,
         current_app.config["SECRET_KEY"],
         algorithm=JWT_ALGORITHM,
     )
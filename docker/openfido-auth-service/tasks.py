@@ -70,3 +70,76 @@ def create_organization(c, name, email):
         organization = services.create_organization(name, user)
         models.db.session.commit()
         print(organization.uuid)
+
+
+@task
+def benchmark_logins(c, seconds=5, clients=0, iterations=0):
+    """Report the logins/sec of /users/auth, in total and per core.
+
+    Logs in from a single client, then from 'clients' concurrent ones (default:
+    twice the number of cores), against a temporary sqlite database. Passwords
+    are verified by PASSWORD_HASH_WORKERS threads; logins refused with a 503
+    (PASSWORD_HASH_QUEUE_SIZE) are counted separately.
+    """
+    import logging
+    import os
+    import tempfile
+    import threading
+    import time
+
+    from app import create_app, models
+    from password_hashing import make_hash
+
+    logging.getLogger("auth").setLevel(logging.ERROR)
+    cores = os.cpu_count() or 1
+    clients = clients or 2 * cores
+    config = {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'benchmark.db')}",
+        "SECRET_KEY": "benchmark",
+    }
+    if iterations:
+        config["PASSWORD_HASH_ITERATIONS"] = iterations
+    (app, db, _) = create_app(config)
+
+    password = "a benchmark password"
+    with app.app_context():
+        db.create_all()
+        p_hash, p_salt = make_hash(password)
+        user = models.User(
+            email="benchmark@example.com",
+            first_name="Bench",
+            last_name="Mark",
+            password_hash=p_hash,
+            password_salt=p_salt,
+        )
+        db.session.add(user)
+        db.session.commit()
+        print(f"hash: {p_hash.rsplit('$', 1)[0]}, cores: {cores}")
+
+    def login(deadline, counts):
+        client = app.test_client()
+        while time.time() < deadline:
+            response = client.post(
+                "/users/auth",
+                json={"email": "benchmark@example.com", "password": password},
+            )
+            counts[response.status_code] = counts.get(response.status_code, 0) + 1
+
+    for count in (1, clients):
+        deadline = time.time() + seconds
+        counts = [{} for _ in range(count)]
+        threads = [
+            threading.Thread(target=login, args=(deadline, counts[i]))
+            for i in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        logins = sum(c.get(200, 0) for c in counts) / seconds
+        refused = sum(c.get(503, 0) for c in counts)
+        print(
+            f"{count} clients: {logins:.1f} logins/sec, "
+            f"{logins / min(count, cores):.1f} per core, {refused} refused"
+        )
@@ -13,10 +13,12 @@ from app.models import (
     OrganizationMember,
     db,
 )
-from app.utils import make_hash, make_jwt
+from app.services import flush_user_activity
+from app.utils import make_jwt
 from app.queries import find_organization_role
 from flanker.addresslib import address
 from flask_migrate import upgrade
+from password_hashing import make_hash
 
 USER_PASSWORD = "atestpass"
 USER_TWO_PASSWORD = "betestpass"
@@ -38,6 +40,7 @@ def app():
             "DEBUG": True,
             "SECRET_KEY": "PYTEST",
             "EMAIL_DRIVER": "null",
+            "MEMBERSHIP_CHANGES_KEY": "membership-changes-key",
         }
     )
 
@@ -46,6 +49,8 @@ def app():
 
         yield app
 
+        # (pending activity would otherwise be flushed once the tests exit)
+        flush_user_activity()
         db.session.remove()
         db.drop_all()
 
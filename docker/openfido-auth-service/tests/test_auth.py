@@ -8,9 +8,12 @@ from app.models import db
 from app.utils import decode_jwt, make_jwt, verify_jwt
 from app.queries import find_user_by_email
 from app.services import (
+    accept_invitation,
     create_invitation,
 )
 from freezegun import freeze_time
+from password_hashing import PasswordHashBusy, verify_hash
+from password_hashing.constants import PASSWORD_HASH_ITERATIONS
 
 from .conftest import (
     ADMIN_PASSWORD,
@@ -59,6 +62,35 @@ def test_seed_user(client, admin):
     assert admin_seed_response.status_code == 200
 
 
+def test_auth_rehash(app, client, user):
+    app.config[PASSWORD_HASH_ITERATIONS] = 20000
+
+    # passwords are hashed again with the current parameters on login.
+    result = client.post(
+        "/users/auth",
+        headers={"Content-Type": "application/json"},
+        json={"email": user.email, "password": USER_PASSWORD},
+    )
+    assert result.status_code == 200
+    assert user.password_hash.startswith("pbkdf2_sha256$20000$")
+    assert verify_hash(USER_PASSWORD, user.password_hash, user.password_salt)
+
+
+def test_auth_busy(client, user, monkeypatch):
+    def verify_hash_bounded(*args):
+        raise PasswordHashBusy()
+
+    monkeypatch.setattr(auth, "verify_hash_bounded", verify_hash_bounded)
+
+    result = client.post(
+        "/users/auth",
+        headers={"Content-Type": "application/json"},
+        json={"email": user.email, "password": USER_PASSWORD},
+    )
+    assert result.status_code == 503
+    assert result.headers["Retry-After"] == "1"
+
+
 def test_error_auth_headers_no_content_type(client, admin):
     admin_seed_response = ""
     admin_seed_response = client.post(
@@ -464,6 +496,26 @@ def test_refresh(client, user):
     assert result_jwt["max-exp"] == calling_jwt["max-exp"]
 
 
+def test_refresh_membership_claims(app, client, user, organization):
+    app.config["JWT_MEMBERSHIP_CLAIMS"] = "true"
+    calling_token = make_jwt(user, TOMORROW).decode("utf-8")
+    assert decode_jwt(calling_token)["organizations"] == []
+
+    create_invitation(organization, user.email)
+    accept_invitation(organization.organization_invitations[0].invitation_token)
+
+    # a refreshed token lists the new organization of the user.
+    result = client.post(
+        "/users/auth/refresh",
+        content_type="application/json",
+        headers={"Authorization": f"Bearer {calling_token}"},
+    )
+    assert result.status_code == 200
+    result_jwt = decode_jwt(result.json["token"])
+    assert [o["uuid"] for o in result_jwt["organizations"]] == [organization.uuid]
+    assert result_jwt["membership_version"] == 1
+
+
 @freeze_time("2020-05-05")
 def test_refresh_max_exp(client, user):
     db.session.add(user)
@@ -679,3 +731,68 @@ def test_change_password_invalid_auth(client, user, organization):
         json={"email": user.email, "password": USER_PASSWORD},
     )
     assert auth_user_response.status_code == 200
+
+
+MEMBERSHIP_CHANGES_HEADERS = {"Membership-Changes-Key": "membership-changes-key"}
+
+
+def test_get_membership_changes(client, user, organization):
+    headers = MEMBERSHIP_CHANGES_HEADERS
+
+    # the first poll only returns when it was made.
+    result = client.get("/users/membership-changes", headers=headers)
+    assert result.status_code == 200
+    assert result.json["user_uuids"] == []
+    changed_at = result.json["changed_at"]
+
+    create_invitation(organization, user.email)
+    result = client.get(
+        "/users/membership-changes", headers=headers, query_string={"since": changed_at}
+    )
+    assert result.json["user_uuids"] == []
+
+    accept_invitation(organization.organization_invitations[0].invitation_token)
+    result = client.get(
+        "/users/membership-changes", headers=headers, query_string={"since": changed_at}
+    )
+    assert result.status_code == 200
+    assert result.json["user_uuids"] == [user.uuid]
+    # tokens with an older membership_version are revoked.
+    assert result.json["membership_versions"] == {user.uuid: 1}
+
+    result = client.get(
+        "/users/membership-changes",
+        headers=headers,
+        query_string={"since": result.json["changed_at"]},
+    )
+    assert result.json["user_uuids"] == []
+
+
+def test_get_membership_changes_400(client):
+    result = client.get(
+        "/users/membership-changes",
+        headers=MEMBERSHIP_CHANGES_HEADERS,
+        query_string={"since": "yesterday"},
+    )
+    assert result.status_code == 400
+
+
+def test_get_membership_changes_401(app, client, user_auth_token):
+    result = client.get("/users/membership-changes")
+    assert result.status_code == 401
+
+    # the JWT tokens of users aren't accepted.
+    result = client.get(
+        "/users/membership-changes", headers={"Authorization": user_auth_token}
+    )
+    assert result.status_code == 401
+
+    result = client.get(
+        "/users/membership-changes", headers={"Membership-Changes-Key": "wrong"}
+    )
+    assert result.status_code == 401
+
+    # without a key nobody can poll.
+    app.config["MEMBERSHIP_CHANGES_KEY"] = None
+    result = client.get("/users/membership-changes", headers=MEMBERSHIP_CHANGES_HEADERS)
+    assert result.status_code == 401
@@ -7,8 +7,10 @@ from botocore.exceptions import ClientError
 
 import pytest
 from freezegun import freeze_time
+from password_hashing import verify_hash
 
 from app import services, utils
+from app.activity import ActivityBuffer
 from app.models import db, OrganizationMember, ROLE_ADMINISTRATOR_CODE, ROLE_USER_CODE
 from app.queries import find_organization_role, find_organization_members
 
@@ -73,7 +75,7 @@ def test_create_user(app, organization):
     assert user.last_name == A_LAST
     assert len(user.password_salt) > 0
     # and the hash would return true if verified
-    assert utils.verify_hash(A_PASSWORD, user.password_hash, user.password_salt)
+    assert verify_hash(A_PASSWORD, user.password_hash, user.password_salt)
 
 
 def test_update_user(app, organization):
@@ -258,6 +260,7 @@ def test_remove_organization_member(organization, user, admin):
 
     members = find_organization_members(organization)
     assert user not in [om.user for om in members]
+    assert user.memberships_changed_at is not None
 
 
 def test_remove_organization_member_must_belong(organization, user, admin):
@@ -337,7 +340,7 @@ def test_reset_password_expired_token(app, user):
     ), pytest.raises(ValueError):
         services.reset_password(user, A_PASSWORD, user.reset_token)
 
-    utils.verify_hash(A_PASSWORD, user.password_hash, user.password_salt)
+    verify_hash(A_PASSWORD, user.password_hash, user.password_salt)
 
 
 def test_reset_password(app, user):
@@ -346,7 +349,7 @@ def test_reset_password(app, user):
     services.reset_password(user, A_PASSWORD, user.reset_token)
 
     # Then: the user's password is updated and the reset_token cannot be reused.
-    assert utils.verify_hash(A_PASSWORD, user.password_hash, user.password_salt)
+    assert verify_hash(A_PASSWORD, user.password_hash, user.password_salt)
     assert user.reset_token == ""
 
 
@@ -392,7 +395,7 @@ def test_change_password(app, user):
     services.change_password(user, USER_PASSWORD, A_PASSWORD)
 
     # Then: the user's password is updated and the reset_token cannot be reused.
-    assert utils.verify_hash(A_PASSWORD, user.password_hash, user.password_salt)
+    assert verify_hash(A_PASSWORD, user.password_hash, user.password_salt)
 
 
 def test_accept_invitation_error(app, organization, user):
@@ -484,9 +487,84 @@ def test_get_organization_logo(get_file_mock, app, organization):
     get_file_mock.assert_called_once_with(path)
 
 
-def test_update_user_last_active_at_bad_user(app):
+def test_record_user_activity_bad_user(app):
     with pytest.raises(BadRequestError):
-        services.update_user_last_active_at(None)
+        services.record_user_activity(None)
+
+
+@patch("app.activity.time.time")
+def test_record_user_activity(time_mock, app, user, user_two):
+    app.config["LAST_ACTIVE_FLUSH_INTERVAL"] = 30
+    time_mock.return_value = 1000
+    an_hour_ago = datetime.utcnow() - timedelta(hours=1)
+    user.last_active_at = user_two.last_active_at = an_hour_ago
+    db.session.add(user_two)
+    db.session.commit()
+
+    # the first activity is flushed immediately.
+    services.record_user_activity(user)
+    assert user.last_active_at > an_hour_ago
+
+    # later ones are flushed together after LAST_ACTIVE_FLUSH_INTERVAL.
+    time_mock.return_value = 1010
+    services.record_user_activity(user_two)
+    db.session.expire_all()
+    assert user_two.last_active_at == an_hour_ago
+
+    time_mock.return_value = 1030
+    services.record_user_activity(user)
+    assert user_two.last_active_at > an_hour_ago
+
+
+@patch("app.activity.threading.Timer")
+@patch("app.activity.time.time")
+def test_record_user_activity_scheduled(time_mock, timer_mock, app, user, user_two):
+    time_mock.return_value = 1000
+    an_hour_ago = datetime.utcnow() - timedelta(hours=1)
+    user.last_active_at = user_two.last_active_at = an_hour_ago
+    db.session.add(user_two)
+    db.session.commit()
+    services.record_user_activity(user)
+    assert not timer_mock.called
+
+    # activity that isn't due to be flushed is flushed later, once.
+    services.record_user_activity(user_two)
+    timer_mock.assert_called_once()
+    services.record_user_activity(user_two)
+    timer_mock.assert_called_once()
+    (interval, scheduled_flush, args) = timer_mock.call_args[0]
+    assert interval == app.config["LAST_ACTIVE_FLUSH_INTERVAL"]
+
+    scheduled_flush(*args)
+    # (the flush removes the session, as it runs outside of requests)
+    db.session.add(user_two)
+    assert user_two.last_active_at > an_hour_ago
+    assert services.get_activity_buffer().take() == {}
+
+    # a new flush is scheduled for the next activity.
+    user_two.last_active_at = an_hour_ago
+    db.session.commit()
+    services.record_user_activity(user_two)
+    assert timer_mock.call_count == 2
+
+
+def test_activity_buffer():
+    activity_buffer = ActivityBuffer(30, 5)
+    now = datetime.utcnow()
+
+    # activity is recorded at most every 5 minutes.
+    activity_buffer.record(1, now - timedelta(minutes=4), now)
+    activity_buffer.record(2, now - timedelta(minutes=6), now)
+    activity_buffer.record(2, now, now + timedelta(minutes=1))
+    assert activity_buffer.claim_flush()
+    assert not activity_buffer.claim_flush()
+    assert activity_buffer.take() == {2: now}
+    assert activity_buffer.take() == {}
+
+    # dates that couldn't be flushed are put back, unless newer ones exist.
+    activity_buffer.record(1, None, now + timedelta(minutes=10))
+    activity_buffer.restore({1: now, 2: now})
+    assert activity_buffer.take() == {1: now + timedelta(minutes=10), 2: now}
 
 
 def test_update_user_avatar_bad_user(app):
@@ -4,26 +4,27 @@ import jwt
 from freezegun import freeze_time
 from unittest.mock import patch
 from app import utils
+from password_hashing import make_hash, verify_hash
 
 A_PASSWORD = "apassword!"
 
 
 def test_hashing():
     # Encrypted password generate different hashes/salts every time
-    hashed_pw, salt = utils.make_hash(A_PASSWORD)
-    hashed_pw2, salt2 = utils.make_hash(A_PASSWORD)
+    hashed_pw, salt = make_hash(A_PASSWORD)
+    hashed_pw2, salt2 = make_hash(A_PASSWORD)
     assert hashed_pw != hashed_pw2
     assert salt != salt2
 
     # Both hashes are valid
-    assert utils.verify_hash(A_PASSWORD, hashed_pw, salt)
-    assert utils.verify_hash(A_PASSWORD, hashed_pw2, salt2)
+    assert verify_hash(A_PASSWORD, hashed_pw, salt)
+    assert verify_hash(A_PASSWORD, hashed_pw2, salt2)
 
     # Mixed hashes are not valid:
-    assert not utils.verify_hash(A_PASSWORD, hashed_pw2, salt)
+    assert not verify_hash(A_PASSWORD, hashed_pw2, salt)
 
     # Strings are acceptable parameters
-    assert utils.verify_hash(A_PASSWORD, hashed_pw2, salt2)
+    assert verify_hash(A_PASSWORD, hashed_pw2, salt2)
 
 
 @freeze_time("2020-04-01")
@@ -84,6 +85,19 @@ def test_generate_jwt(app, user):
         assert not utils.verify_jwt(user, a_jwt)
 
 
+def test_generate_jwt_membership_claims(app, organization_admin, organization):
+    # organizations are only included when JWT_MEMBERSHIP_CLAIMS is enabled.
+    decoded_jwt = utils.decode_jwt(utils.make_jwt(organization_admin).decode("utf-8"))
+    assert "organizations" not in decoded_jwt
+
+    app.config["JWT_MEMBERSHIP_CLAIMS"] = "1"
+    decoded_jwt = utils.decode_jwt(utils.make_jwt(organization_admin).decode("utf-8"))
+    assert decoded_jwt["organizations"] == [
+        {"uuid": organization.uuid, "role": "ADMINISTRATOR"}
+    ]
+    assert decoded_jwt["membership_version"] == 0
+
+
 @freeze_time("2020-04-01")
 def test_time_conversion(app):
     unix_time = utils._s_since_epoch(datetime.utcnow())
@@ -0,0 +1,6 @@
+API_KEY_CACHE_TTL = "API_KEY_CACHE_TTL"
+API_KEY_CACHE_SIZE = "API_KEY_CACHE_SIZE"
+
+# Defaults used when an application doesn't configure the keys above:
+DEFAULT_API_KEY_CACHE_TTL = 60
+DEFAULT_API_KEY_CACHE_SIZE = 1000
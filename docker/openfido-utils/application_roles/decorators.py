@@ -4,7 +4,7 @@ from functools import wraps
 
 from flask import g, request
 
-from .queries import is_permitted
+from .queries import find_permission_codes
 
 logger = logging.getLogger("application_roles")
 
@@ -28,11 +28,12 @@ def make_permission_decorator(permissions_enum):
                     return {"message": message}, 401
 
                 g.api_key = request.headers[ROLES_KEY]
+                codes = find_permission_codes(g.api_key)
 
                 for permission in permissions:
                     required_permission = permissions_enum(permission)
 
-                    if not is_permitted(g.api_key, required_permission):
+                    if required_permission.value not in codes:
                         message = f"no permission found for {required_permission.name}"
                         logger.warning(message)
                         return {"message": message}, 401
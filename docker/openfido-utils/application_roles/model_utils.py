@@ -26,6 +26,8 @@ class CommonColumnsMixin:
         nullable=False,
         server_default="",
         default=lambda: uuid_lib.uuid4().hex,
+        unique=True,
+        index=True,
     )
     created_at = db.Column(
         db.DateTime, nullable=False, default=lambda: datetime.utcnow()
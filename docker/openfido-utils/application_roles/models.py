@@ -16,6 +16,8 @@ class Application(CommonColumnsMixin, db.Model):
         nullable=False,
         server_default="",
         default=lambda: uuid.uuid4().hex,
+        unique=True,
+        index=True,
     )
 
     application_system_permissions = db.relationship(
@@ -42,7 +44,7 @@ class ApplicationSystemPermission(CommonColumnsMixin, db.Model):
     __tablename__ = "applicationsystempermission"
 
     application_id = db.Column(
-        db.Integer, db.ForeignKey("application.id"), nullable=False
+        db.Integer, db.ForeignKey("application.id"), nullable=False, index=True
     )
     system_permission_id = db.Column(
         db.Integer, db.ForeignKey("systempermission.id"), nullable=False
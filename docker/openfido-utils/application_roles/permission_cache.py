@@ -0,0 +1,47 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class PermissionCache:
+    """The permission codes of applications, keyed by their api_key.
+
+    Entries expire ttl seconds after they are cached, and the least recently
+    used entries beyond max_size are evicted.
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._permissions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, api_key):
+        """ Return the permission codes cached for api_key, or None. """
+        now = time.time()
+        with self._lock:
+            entry = self._permissions.get(api_key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._permissions[api_key]
+                return None
+
+            self._permissions.move_to_end(api_key)
+            return entry[0]
+
+    def set(self, api_key, codes):
+        """ Cache the permission codes of api_key. """
+        with self._lock:
+            self._permissions[api_key] = (codes, time.time() + self.ttl)
+            self._permissions.move_to_end(api_key)
+            while len(self._permissions) > self.max_size:
+                self._permissions.popitem(last=False)
+
+    def invalidate(self, api_key=None):
+        """ Forget the permissions of api_key, or of every application. """
+        with self._lock:
+            if api_key is None:
+                self._permissions.clear()
+            else:
+                self._permissions.pop(api_key, None)
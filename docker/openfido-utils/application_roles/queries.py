@@ -1,27 +1,69 @@
+from flask import current_app
+
+from .constants import (
+    API_KEY_CACHE_SIZE,
+    API_KEY_CACHE_TTL,
+    DEFAULT_API_KEY_CACHE_SIZE,
+    DEFAULT_API_KEY_CACHE_TTL,
+)
 from .models import db, Application, ApplicationSystemPermission, SystemPermission
+from .permission_cache import PermissionCache
 
 
-def is_permitted(api_key, permission):
-    """ Returns True when the Application associated with permission_code exists. """
-    permission_subquery = (
-        db.session.query(ApplicationSystemPermission.id)
-        .join(SystemPermission)
-        .filter(SystemPermission.code == permission.value)
-        .subquery("permission_subquery")
-    )
-    application = (
-        Application.query.join(Application.application_system_permissions)
-        .filter(Application.api_key == api_key)
-        .filter(
-            Application.application_system_permissions.any(
-                ApplicationSystemPermission.system_permission_id.in_(
-                    permission_subquery
-                )
-            )
+def _config_int(key, default):
+    value = current_app.config.get(key)
+    return default if value is None else int(value)
+
+
+def get_permission_cache():
+    """ The PermissionCache of the current app. """
+    permission_cache = current_app.extensions.get("permission_cache")
+    if permission_cache is None:
+        permission_cache = current_app.extensions.setdefault(
+            "permission_cache",
+            PermissionCache(
+                _config_int(API_KEY_CACHE_TTL, DEFAULT_API_KEY_CACHE_TTL),
+                _config_int(API_KEY_CACHE_SIZE, DEFAULT_API_KEY_CACHE_SIZE),
+            ),
         )
+
+    return permission_cache
+
+
+def invalidate_permissions(api_key=None):
+    """ Forget the cached permissions of api_key, or of every application. """
+    get_permission_cache().invalidate(api_key)
+
+
+def find_permission_codes(api_key):
+    """Find the SystemPermission codes of the Application with api_key.
+
+    The codes are cached for API_KEY_CACHE_TTL seconds. Unknown api_keys are not
+    cached, so that new applications can be used right away.
+    """
+    permission_cache = get_permission_cache()
+    codes = permission_cache.get(api_key)
+    if codes is not None:
+        return codes
+
+    rows = (
+        db.session.query(Application.id, SystemPermission.code)
+        .outerjoin(Application.application_system_permissions)
+        .outerjoin(ApplicationSystemPermission.system_permission)
+        .filter(Application.api_key == api_key)
+        .all()
     )
+    if len(rows) == 0:
+        return frozenset()
 
-    return application.one_or_none() is not None
+    codes = frozenset(code for (_, code) in rows if code is not None)
+    permission_cache.set(api_key, codes)
+    return codes
+
+
+def is_permitted(api_key, permission):
+    """ Returns True when the Application associated with permission_code exists. """
+    return permission.value in find_permission_codes(api_key)
 
 
 def get_system_permission(permission):
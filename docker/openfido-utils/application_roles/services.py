@@ -1,5 +1,5 @@
 from .models import db, Application, ApplicationSystemPermission, SystemPermission
-from .queries import get_system_permission
+from .queries import get_system_permission, invalidate_permissions
 
 
 def create_application(name, permissions):
@@ -12,5 +12,7 @@ def create_application(name, permissions):
     application.application_system_permissions.append(application_system_permission)
 
     db.session.add(application)
+    # the api_key is only assigned when the application is flushed:
+    invalidate_permissions()
 
     return application
@@ -1,7 +1,11 @@
+import os
+import threading
+
 from flask import request, current_app
 
 import boto3
 
+from boto3.s3.transfer import TransferConfig
 from botocore.client import Config
 from .constants import (
     S3_ACCESS_KEY_ID,
@@ -10,28 +14,112 @@ from .constants import (
     S3_ENDPOINT_URL,
     S3_REGION_NAME,
     S3_PRESIGNED_TIMEOUT,
+    S3_MAX_POOL_CONNECTIONS,
+    S3_TRANSFER_THRESHOLD,
+    S3_TRANSFER_CHUNK_SIZE,
+    S3_TRANSFER_CONCURRENCY,
+    S3_URL_CACHE_SIZE,
+    S3_URL_CACHE_REUSE,
+    S3_URL_CACHE_BACKEND,
     FLASK_ENV,
+    DEFAULT_S3_MAX_POOL_CONNECTIONS,
+    DEFAULT_S3_TRANSFER_THRESHOLD,
+    DEFAULT_S3_TRANSFER_CHUNK_SIZE,
+    DEFAULT_S3_TRANSFER_CONCURRENCY,
+    DEFAULT_S3_URL_CACHE_SIZE,
+    DEFAULT_S3_URL_CACHE_REUSE,
+    TEMPORARY_CREDENTIALS_LIFETIME,
 )
+from .url_cache import PresignedUrlCache
 
+# boto3 clients are thread safe, but expensive to create: share one per
+# configuration in each process.
+_s3_clients = {}
+_s3_clients_lock = threading.Lock()
 
-def get_s3():
-    """ Get access to the Boto s3 service. """
+
+def reset_s3_clients():
+    """Forget all cached s3 clients.
+
+    Connections can't be shared with a forked process, so this is called in the
+    child after every fork (celery and gunicorn workers).
+    """
+    global _s3_clients_lock
+
+    _s3_clients.clear()
+    _s3_clients_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_s3_clients)
+
+
+def _config_int(key, default):
+    value = current_app.config.get(key)
+    return default if value is None else int(value)
+
+
+def _config_float(key, default):
+    value = current_app.config.get(key)
+    return default if value is None else float(value)
+
+
+def _s3_client_params():
+    """ The boto3.client parameters for the current app's configuration. """
+    config = {
+        "max_pool_connections": _config_int(
+            S3_MAX_POOL_CONNECTIONS, DEFAULT_S3_MAX_POOL_CONNECTIONS
+        ),
+    }
 
     # For local development we need to explicitly set the S3 keys:
     if (
         FLASK_ENV in current_app.config
         and current_app.config[FLASK_ENV] != "production"
     ):
-        params = {
+        return {
             "aws_access_key_id": current_app.config[S3_ACCESS_KEY_ID],
             "aws_secret_access_key": current_app.config[S3_SECRET_ACCESS_KEY],
             "endpoint_url": current_app.config[S3_ENDPOINT_URL],
-            "config": Config(signature_version="s3v4"),
+            "config": dict(config, signature_version="s3v4"),
             "region_name": current_app.config[S3_REGION_NAME],
         }
-        return boto3.client("s3", **params)
 
-    return boto3.client("s3")
+    return {"config": config}
+
+
+def get_s3():
+    """ Get access to the Boto s3 service (shared by all threads). """
+    params = _s3_client_params()
+    key = tuple(
+        (name, tuple(sorted(value.items())) if name == "config" else value)
+        for (name, value) in sorted(params.items())
+    )
+
+    with _s3_clients_lock:
+        s3_client = _s3_clients.get(key)
+        if s3_client is None:
+            s3_client = boto3.client(
+                "s3", **dict(params, config=Config(**params["config"]))
+            )
+            _s3_clients[key] = s3_client
+
+    return s3_client
+
+
+def get_transfer_config():
+    """ The TransferConfig for managed (multipart) uploads and downloads. """
+    return TransferConfig(
+        multipart_threshold=_config_int(
+            S3_TRANSFER_THRESHOLD, DEFAULT_S3_TRANSFER_THRESHOLD
+        ),
+        multipart_chunksize=_config_int(
+            S3_TRANSFER_CHUNK_SIZE, DEFAULT_S3_TRANSFER_CHUNK_SIZE
+        ),
+        max_concurrency=_config_int(
+            S3_TRANSFER_CONCURRENCY, DEFAULT_S3_TRANSFER_CONCURRENCY
+        ),
+    )
 
 
 def upload_stream(key, stream, s3_client=None):
@@ -44,27 +132,167 @@ def upload_stream(key, stream, s3_client=None):
         stream,
         current_app.config[S3_BUCKET],
         key,
+        Config=get_transfer_config(),
     )
 
 
+def get_url_cache():
+    """ The PresignedUrlCache of the current app. """
+    url_cache = current_app.extensions.get("presigned_url_cache")
+    if url_cache is None:
+        url_cache = current_app.extensions.setdefault(
+            "presigned_url_cache",
+            PresignedUrlCache(
+                _config_int(S3_URL_CACHE_SIZE, DEFAULT_S3_URL_CACHE_SIZE),
+                current_app.config.get(S3_URL_CACHE_BACKEND),
+            ),
+        )
+
+    return url_cache
+
+
+def _credentials_lifetime(s3_client):
+    """Return the number of seconds until the credentials that sign the
+    requests of s3_client expire, or None when they don't.
+    """
+    credentials = s3_client._request_signer._credentials
+    if credentials is None:
+        return None
+    # (refreshable credentials, e.g. those of an ECS task role)
+    if hasattr(credentials, "_seconds_remaining"):
+        return max(credentials._seconds_remaining(), 0)
+    if credentials.token is not None:
+        return TEMPORARY_CREDENTIALS_LIFETIME
+
+    return None
+
+
 def create_url(key, filename=None, s3_client=None):
-    """ Generate a publicly visible URL for this key. """
+    """Generate a publicly visible URL for this key.
+
+    URLs are cached, and reused until S3_URL_CACHE_REUSE of their lifetime has
+    elapsed. A URL can't outlive the credentials that signed it, so temporary
+    credentials shorten its lifetime.
+    """
+    bucket = current_app.config[S3_BUCKET]
+    expires_in = int(current_app.config[S3_PRESIGNED_TIMEOUT])
+    reuse = _config_float(S3_URL_CACHE_REUSE, DEFAULT_S3_URL_CACHE_REUSE)
+    cache_key = (bucket, key, filename)
+
+    if reuse > 0:
+        url = get_url_cache().get(cache_key)
+        if url is not None:
+            return url
 
     if not s3_client:
         s3_client = get_s3()
 
     params = {
-        "Bucket": current_app.config[S3_BUCKET],
+        "Bucket": bucket,
         "Key": key,
     }
     if filename:
         params["ResponseContentDisposition"] = f"attachment; filename = {filename}"
 
-    return s3_client.generate_presigned_url(
+    url = s3_client.generate_presigned_url(
         "get_object",
         Params=params,
-        ExpiresIn=current_app.config[S3_PRESIGNED_TIMEOUT],
+        ExpiresIn=expires_in,
     )
+    if reuse > 0:
+        lifetime = expires_in
+        credentials_lifetime = _credentials_lifetime(s3_client)
+        if credentials_lifetime is not None:
+            lifetime = min(lifetime, credentials_lifetime)
+        if lifetime * reuse > 0:
+            get_url_cache().set(cache_key, url, lifetime * reuse)
+
+    return url
+
+
+def create_multipart_upload(key, s3_client=None):
+    """ Start a multipart upload to key, returning its upload id. """
+
+    if not s3_client:
+        s3_client = get_s3()
+
+    return s3_client.create_multipart_upload(
+        Bucket=current_app.config[S3_BUCKET], Key=key
+    )["UploadId"]
+
+
+def create_upload_part_urls(key, upload_id, part_count, s3_client=None):
+    """ Generate presigned URLs to upload each part of a multipart upload. """
+
+    if not s3_client:
+        s3_client = get_s3()
+
+    return [
+        s3_client.generate_presigned_url(
+            "upload_part",
+            Params={
+                "Bucket": current_app.config[S3_BUCKET],
+                "Key": key,
+                "UploadId": upload_id,
+                "PartNumber": part_number,
+            },
+            ExpiresIn=current_app.config[S3_PRESIGNED_TIMEOUT],
+        )
+        for part_number in range(1, part_count + 1)
+    ]
+
+
+def complete_multipart_upload(key, upload_id, parts, s3_client=None):
+    """Complete a multipart upload.
+
+    parts is a list of (part_number, etag) tuples of the uploaded parts.
+    """
+
+    if not s3_client:
+        s3_client = get_s3()
+
+    s3_client.complete_multipart_upload(
+        Bucket=current_app.config[S3_BUCKET],
+        Key=key,
+        UploadId=upload_id,
+        MultipartUpload={
+            "Parts": [
+                {"PartNumber": part_number, "ETag": etag}
+                for (part_number, etag) in parts
+            ]
+        },
+    )
+
+
+def abort_multipart_upload(key, upload_id, s3_client=None):
+    """ Abort a multipart upload, discarding any uploaded parts. """
+
+    if not s3_client:
+        s3_client = get_s3()
+
+    s3_client.abort_multipart_upload(
+        Bucket=current_app.config[S3_BUCKET], Key=key, UploadId=upload_id
+    )
+
+
+def delete_file(key, s3_client=None):
+    """ Delete key. """
+
+    if not s3_client:
+        s3_client = get_s3()
+
+    s3_client.delete_object(Bucket=current_app.config[S3_BUCKET], Key=key)
+
+
+def get_file_size(key, s3_client=None):
+    """ Return the size in bytes of key. """
+
+    if not s3_client:
+        s3_client = get_s3()
+
+    return s3_client.head_object(Bucket=current_app.config[S3_BUCKET], Key=key)[
+        "ContentLength"
+    ]
 
 
 def get_file(key, s3_client=None):
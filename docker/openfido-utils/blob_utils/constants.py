@@ -4,5 +4,24 @@ S3_ENDPOINT_URL = "S3_ENDPOINT_URL"
 S3_REGION_NAME = "S3_REGION_NAME"
 S3_BUCKET = "S3_BUCKET"
 S3_PRESIGNED_TIMEOUT = "S3_PRESIGNED_TIMEOUT"
+S3_MAX_POOL_CONNECTIONS = "S3_MAX_POOL_CONNECTIONS"
+S3_TRANSFER_THRESHOLD = "S3_TRANSFER_THRESHOLD"
+S3_TRANSFER_CHUNK_SIZE = "S3_TRANSFER_CHUNK_SIZE"
+S3_TRANSFER_CONCURRENCY = "S3_TRANSFER_CONCURRENCY"
+S3_URL_CACHE_SIZE = "S3_URL_CACHE_SIZE"
+S3_URL_CACHE_REUSE = "S3_URL_CACHE_REUSE"
+S3_URL_CACHE_BACKEND = "S3_URL_CACHE_BACKEND"
 
 FLASK_ENV = "FLASK_ENV"
+
+# Defaults used when an application doesn't configure the keys above:
+DEFAULT_S3_MAX_POOL_CONNECTIONS = 10
+DEFAULT_S3_TRANSFER_THRESHOLD = 8 * 1024 * 1024
+DEFAULT_S3_TRANSFER_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_S3_TRANSFER_CONCURRENCY = 10
+DEFAULT_S3_URL_CACHE_SIZE = 10000
+# Presigned URLs are reused for this fraction of S3_PRESIGNED_TIMEOUT:
+DEFAULT_S3_URL_CACHE_REUSE = 0.5
+# Presigned URLs stop working when the credentials that signed them expire.
+# Temporary credentials that don't say when they expire are assumed to last:
+TEMPORARY_CREDENTIALS_LIFETIME = 15 * 60
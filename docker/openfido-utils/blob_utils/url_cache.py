@@ -0,0 +1,64 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class PresignedUrlCache:
+    """Presigned URLs, reused until a fraction of their lifetime has elapsed.
+
+    URLs are kept in memory, evicting the least recently used URLs beyond
+    max_size. When a backend is given (any object with the get(key) and
+    set(key, value, timeout) methods of a cachelib cache, e.g. a RedisCache)
+    URLs are shared through it, so that every process serving the API reuses
+    the same URLs.
+    """
+
+    def __init__(self, max_size, backend=None):
+        self.max_size = max_size
+        self.backend = backend
+        self._urls = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _backend_key(key):
+        name = "\n".join("" if part is None else str(part) for part in key)
+        return f"presigned-url:{hashlib.sha256(name.encode('utf-8')).hexdigest()}"
+
+    def get(self, key):
+        """ Return the URL cached for key, or None if it should be signed again. """
+        now = time.time()
+        with self._lock:
+            entry = self._urls.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._urls.move_to_end(key)
+                    return entry[0]
+                del self._urls[key]
+
+        if self.backend is None:
+            return None
+
+        entry = self.backend.get(self._backend_key(key))
+        if entry is None or entry[1] <= now:
+            return None
+        self._remember(key, entry)
+        return entry[0]
+
+    def set(self, key, url, reuse_for):
+        """ Cache url for key, to be reused for reuse_for seconds. """
+        entry = (url, time.time() + reuse_for)
+        self._remember(key, entry)
+        if self.backend is not None:
+            self.backend.set(self._backend_key(key), entry, timeout=int(reuse_for))
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._urls[key] = entry
+            self._urls.move_to_end(key)
+            while len(self._urls) > self.max_size:
+                self._urls.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._urls.clear()
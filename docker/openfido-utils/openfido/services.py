@@ -1,7 +1,5 @@
 import logging
 
-from collections import defaultdict
-
 logger = logging.getLogger('openfido.services')
 
 def _call_api(session, url, method="get", json_data=None):
@@ -49,16 +47,36 @@ def list_workflows(app_session, app_url):
         print()
 
 
+def _fetch_workflow_graph(app_session, app_url, uuid):
+    """ Fetch the workflow pipelines of a workflow, with the workflow pipelines
+    they depend on. """
+    graph_json = _call_api(
+        app_session,
+        f"{app_url}/v1/organizations/{app_session.headers['X-Organization']}/workflows/{uuid}/graph"
+    )
+    pipeline_to_workflow_pipeline = {
+        node['pipeline_uuid']: node['workflow_pipeline_uuid'] for node in graph_json['pipelines']
+    }
+
+    return [
+        {
+            'uuid': node['workflow_pipeline_uuid'],
+            'pipeline_uuid': node['pipeline_uuid'],
+            'source_workflow_pipelines': [
+                pipeline_to_workflow_pipeline[dependency] for dependency in node['dependencies']
+            ],
+        }
+        for node in graph_json['pipelines']
+    ]
+
+
 def dot_workflow(app_session, app_url, uuid):
     """ Create a graphviz dot file. """
     workflow_json = _call_api(
         app_session,
         f"{app_url}/v1/organizations/{app_session.headers['X-Organization']}/workflows/{uuid}",
     )
-    workflow_pipelines = _call_api(
-        app_session,
-        f"{app_url}/v1/organizations/{app_session.headers['X-Organization']}/workflows/{uuid}/pipelines"
-    )
+    workflow_pipelines = _fetch_workflow_graph(app_session, app_url, uuid)
 
     print("digraph G {")
     print('  labelloc="t";')
@@ -66,13 +84,9 @@ def dot_workflow(app_session, app_url, uuid):
     print(f"  graph[ranksep=2,splines=true];")
 
     for wp in workflow_pipelines:
-        workflow_pipeline = _call_api(
-            app_session,
-            f"{app_url}/v1/organizations/{app_session.headers['X-Organization']}/workflows/{uuid}/pipelines/{wp['uuid']}"
-        )
         # TODO fetch name.
         print(f"  \"{wp['uuid']}\" {{}};")
-        for source in workflow_pipeline["source_workflow_pipelines"]:
+        for source in wp["source_workflow_pipelines"]:
             print(f"  \"{source}\" -> \"{wp['uuid']}\";")
     print("}")
 
@@ -82,94 +96,39 @@ def view_workflow(app_session, app_url, uuid):
         app_session,
         f"{app_url}/v1/organizations/{app_session.headers['X-Organization']}/workflows/{uuid}",
     )
-    workflow_pipelines = _call_api(
-        app_session,
-        f"{app_url}/v1/organizations/{app_session.headers['X-Organization']}/workflows/{uuid}/pipelines"
-    )
+    workflow_pipelines = _fetch_workflow_graph(app_session, app_url, uuid)
 
     print(f"Name: {workflow_json['name']}")
     print(f"ID: {workflow_json['uuid']}")
     print()
     print("Pipelines:")
     for wp in workflow_pipelines:
-        workflow_pipeline = _call_api(
-            app_session,
-            f"{app_url}/v1/organizations/{app_session.headers['X-Organization']}/workflows/{uuid}/pipelines/{wp['uuid']}"
-        )
         # TODO fetch name.
         print(f"ID: {wp['uuid']} ({wp['pipeline_uuid']})")
-        if len(workflow_pipeline["source_workflow_pipelines"]) > 0:
+        if len(wp["source_workflow_pipelines"]) > 0:
             print("Dependencies:")
-        for source in workflow_pipeline["source_workflow_pipelines"]:
+        for source in wp["source_workflow_pipelines"]:
             print(source)
 
 
 def _update_workflow_pipelines(app_session, app_url, create_workflow_data, workflow_uuid):
-    workflow_pipelines = _call_api(
-        app_session,
-        f"{app_url}/v1/organizations/{app_session.headers['X-Organization']}/workflows/{workflow_uuid}/pipelines"
-    )
-
-    # Create a workflow pipeline in the workflow if it doesn't already exist:
-    server_pipelines = {wp['pipeline_uuid'] for wp in workflow_pipelines}
-    data_pipelines = {p['uuid'] for p in create_workflow_data['pipelines']}
-    for pipeline_uuid in data_pipelines - server_pipelines:
-        _call_api(
-            app_session,
-            f"{app_url}/v1/organizations/{app_session.headers['X-Organization']}/workflows/{workflow_uuid}/pipelines",
-            'post',
-            {
-                'pipeline_uuid': pipeline_uuid,
-                'source_workflow_pipelines': [],
-                'destination_workflow_pipelines': [],
-            }
-        )
-
-    # Remove any pipelines that should no longer exist:
-    for pipeline_uuid in server_pipelines - data_pipelines:
-        wp = next(wp['uuid'] for wp in workflow_pipelines if wp['pipeline_uuid'] == pipeline_uuid)
-        _call_api(
-            app_session,
-            f"{app_url}/v1/organizations/{app_session.headers['X-Organization']}/workflows/{workflow_uuid}/pipelines/{wp}",
-            'delete'
-        )
-
-    workflow_pipelines = _call_api(
+    """ Replace the pipelines of a workflow and their dependencies, with a single
+    request. """
+    _call_api(
         app_session,
-        f"{app_url}/v1/organizations/{app_session.headers['X-Organization']}/workflows/{workflow_uuid}/pipelines"
+        f"{app_url}/v1/organizations/{app_session.headers['X-Organization']}/workflows/{workflow_uuid}/graph",
+        'put',
+        {
+            'pipelines': [
+                {
+                    'pipeline_uuid': pipeline['uuid'],
+                    'dependencies': pipeline.get('dependencies', []),
+                }
+                for pipeline in create_workflow_data['pipelines']
+            ]
+        }
     )
 
-    # Update the workflow pipeline relationships
-    pipeline_to_workflow_pipeline = {
-        wp['pipeline_uuid']: wp['uuid'] for wp in workflow_pipelines
-    }
-    source_to_dests = defaultdict(list)
-    dests_to_sources = defaultdict(list)
-    for pipeline in create_workflow_data['pipelines']:
-        pipeline_wp = pipeline_to_workflow_pipeline[pipeline['uuid']]
-        for dependency in pipeline.get('dependencies', []):
-            dependency_wp = pipeline_to_workflow_pipeline[dependency]
-            source_to_dests[dependency].append(pipeline_wp)
-            dests_to_sources[pipeline['uuid']].append(dependency_wp)
-
-    logger.debug("source_to_dests")
-    logger.debug(source_to_dests)
-    logger.debug("dests_to_sources")
-    logger.debug(dests_to_sources)
-
-    for pipeline in create_workflow_data['pipelines']:
-        workflow_pipeline_uuid = next(wp['uuid'] for wp in workflow_pipelines if wp['pipeline_uuid'] == pipeline['uuid'])
-        _call_api(
-            app_session,
-            f"{app_url}/v1/organizations/{app_session.headers['X-Organization']}/workflows/{workflow_uuid}/pipelines/{workflow_pipeline_uuid}",
-            'put',
-            {
-                'pipeline_uuid': pipeline['uuid'],
-                'source_workflow_pipelines': dests_to_sources[pipeline['uuid']],
-                'destination_workflow_pipelines': source_to_dests[pipeline['uuid']]
-            }
-        )
-
 
 def create_workflow(app_session, app_url, create_workflow_data):
     """ Create a new Workflow. Returns workflow UUID. """
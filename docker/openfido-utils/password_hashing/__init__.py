@@ -0,0 +1,124 @@
+import hmac
+import os
+import secrets
+import threading
+
+from flask import current_app, has_app_context
+
+from .constants import (
+    DEFAULT_PASSWORD_HASH_QUEUE_SIZE,
+    DEFAULT_PASSWORD_HASH_SCHEME,
+    DEFAULT_PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_QUEUE_SIZE,
+    PASSWORD_HASH_SCHEME,
+    PASSWORD_HASH_WORKERS,
+)
+from .executor import BoundedExecutor, PasswordHashBusy
+from .schemes import SCHEMES, register_scheme
+
+# Hashes made before schemes were stored with them are a bare hex digest:
+LEGACY_SCHEME = "pbkdf2_sha256"
+LEGACY_PARAMS = (10000,)
+
+# Threads don't survive a fork: share one executor per configuration in each
+# process, and forget them in the child after every fork (gunicorn workers).
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def reset_hash_executors():
+    """ Forget all password hash executors. """
+    global _executors_lock
+
+    _executors.clear()
+    _executors_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_hash_executors)
+
+
+def _config():
+    return current_app.config if has_app_context() else {}
+
+
+def _current_scheme():
+    scheme = SCHEMES[
+        _config().get(PASSWORD_HASH_SCHEME) or DEFAULT_PASSWORD_HASH_SCHEME
+    ]
+    return (scheme, scheme.params(_config()))
+
+
+def _parse_hash(p_hash):
+    """Split a value from make_hash() into its scheme, params and digest.
+
+    Returns None when the scheme isn't known (or the params aren't numbers).
+    """
+    if "$" not in p_hash:
+        return (SCHEMES[LEGACY_SCHEME], LEGACY_PARAMS, p_hash)
+
+    (name, *params, digest) = p_hash.split("$")
+    if name not in SCHEMES or not all(param.isdigit() for param in params):
+        return None
+
+    return (SCHEMES[name], tuple(int(param) for param in params), digest)
+
+
+def make_hash(password, salt=None):
+    """Make a hash of a password, with the configured PASSWORD_HASH_SCHEME.
+
+    If a salt is not provided, a random one is created.
+
+    Returns the hash (which includes its scheme and parameters) and salt.
+    """
+    if salt is None:
+        salt = secrets.token_urlsafe(32)
+
+    (scheme, params) = _current_scheme()
+    digest = scheme.digest(password, salt, params)
+    return ("$".join([scheme.name, *(str(param) for param in params), digest]), salt)
+
+
+def verify_hash(password, p_hash, salt):
+    """Returns True when 'password' matches a value from make_hash().
+
+    Hashes of unknown schemes never match.
+    """
+    parsed = _parse_hash(p_hash)
+    if parsed is None:
+        return False
+
+    (scheme, params, digest) = parsed
+    return hmac.compare_digest(scheme.digest(password, salt, params), digest)
+
+
+def needs_rehash(p_hash):
+    """Returns True when a value from make_hash() was made with another scheme
+    or parameters than the configured ones (rehash the password on login).
+    """
+    parsed = _parse_hash(p_hash)
+    return parsed is None or parsed[:2] != _current_scheme()
+
+
+def get_hash_executor():
+    """ The BoundedExecutor of the current process and app configuration. """
+    config = _config()
+    key = (
+        config.get(PASSWORD_HASH_WORKERS) or DEFAULT_PASSWORD_HASH_WORKERS,
+        int(config.get(PASSWORD_HASH_QUEUE_SIZE) or DEFAULT_PASSWORD_HASH_QUEUE_SIZE),
+    )
+    with _executors_lock:
+        if key not in _executors:
+            _executors[key] = BoundedExecutor(
+                None if key[0] is None else int(key[0]), key[1]
+            )
+
+        return _executors[key]
+
+
+def verify_hash_bounded(password, p_hash, salt):
+    """Like verify_hash(), in a worker of get_hash_executor().
+
+    Raises PasswordHashBusy when too many hashes are waiting for a worker.
+    """
+    return get_hash_executor().call(verify_hash, password, p_hash, salt)
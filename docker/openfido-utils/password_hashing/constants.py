@@ -0,0 +1,14 @@
+PASSWORD_HASH_SCHEME = "PASSWORD_HASH_SCHEME"
+PASSWORD_HASH_ITERATIONS = "PASSWORD_HASH_ITERATIONS"
+PASSWORD_HASH_SCRYPT_N = "PASSWORD_HASH_SCRYPT_N"
+PASSWORD_HASH_WORKERS = "PASSWORD_HASH_WORKERS"
+PASSWORD_HASH_QUEUE_SIZE = "PASSWORD_HASH_QUEUE_SIZE"
+
+# Defaults used when an application doesn't configure the keys above:
+DEFAULT_PASSWORD_HASH_SCHEME = "pbkdf2_sha256"
+DEFAULT_PASSWORD_HASH_ITERATIONS = 10000
+DEFAULT_PASSWORD_HASH_SCRYPT_N = 2 ** 14
+# Defaults to the number of cores:
+DEFAULT_PASSWORD_HASH_WORKERS = None
+# Verifications waiting for a worker beyond this are refused:
+DEFAULT_PASSWORD_HASH_QUEUE_SIZE = 32
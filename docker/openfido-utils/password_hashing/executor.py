@@ -0,0 +1,45 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PasswordHashBusy(Exception):
+    """ Raised when too many password hashes are already waiting for a worker. """
+
+
+class BoundedExecutor:
+    """A pool of max_workers threads, refusing work beyond queue_size waiting
+    calls (so that a burst of logins is answered quickly instead of queueing
+    up behind each other).
+
+    hashlib releases the GIL while hashing, so the workers use up to
+    max_workers cores and other requests keep being served.
+    """
+
+    def __init__(self, max_workers, queue_size):
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="password-hash"
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + queue_size)
+
+    def call(self, fn, *args):
+        """Call fn(*args) in a worker, and return its result.
+
+        Raises PasswordHashBusy when the queue is full.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashBusy("Too many password hashes are in progress")
+
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        return future.result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
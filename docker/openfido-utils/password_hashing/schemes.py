@@ -0,0 +1,77 @@
+import hashlib
+
+from .constants import (
+    DEFAULT_PASSWORD_HASH_ITERATIONS,
+    DEFAULT_PASSWORD_HASH_SCRYPT_N,
+    PASSWORD_HASH_ITERATIONS,
+    PASSWORD_HASH_SCRYPT_N,
+)
+
+
+class Pbkdf2Sha256:
+    """PBKDF2-HMAC-SHA256, with a configurable number of iterations.
+
+    NIST guidelines for password storage:
+     * salt > 32 bits
+     * PBKDF2
+     * iterate at least 10,000 times.
+     * TODO consider adding pepper (probably SECRET_KEY?)
+    """
+
+    name = "pbkdf2_sha256"
+
+    def params(self, config):
+        """ The parameters of new hashes: (iterations,). """
+        return (
+            int(
+                config.get(PASSWORD_HASH_ITERATIONS) or DEFAULT_PASSWORD_HASH_ITERATIONS
+            ),
+        )
+
+    def digest(self, password, salt, params):
+        (iterations,) = params
+        return hashlib.pbkdf2_hmac(
+            "sha256", password.encode("utf-8"), salt.encode("utf-8"), iterations
+        ).hex()
+
+
+class Scrypt:
+    """ scrypt, with a configurable CPU/memory cost (n). """
+
+    name = "scrypt"
+
+    def params(self, config):
+        """ The parameters of new hashes: (n, r, p). """
+        return (
+            int(config.get(PASSWORD_HASH_SCRYPT_N) or DEFAULT_PASSWORD_HASH_SCRYPT_N),
+            8,
+            1,
+        )
+
+    def digest(self, password, salt, params):
+        (n, r, p) = params
+        return hashlib.scrypt(
+            password.encode("utf-8"),
+            salt=salt.encode("utf-8"),
+            n=n,
+            r=r,
+            p=p,
+            maxmem=256 * n * r * p,
+            dklen=32,
+        ).hex()
+
+
+SCHEMES = {}
+
+
+def register_scheme(scheme):
+    """Make a hash scheme available to make_hash() and verify_hash().
+
+    A scheme has a unique name, a params(config) method returning the integer
+    parameters of new hashes, and a digest(password, salt, params) method.
+    """
+    SCHEMES[scheme.name] = scheme
+
+
+register_scheme(Pbkdf2Sha256())
+register_scheme(Scrypt())
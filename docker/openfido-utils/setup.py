@@ -12,7 +12,7 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/slacgismo/openfido-utils",
-    packages=['application_roles', 'blob_utils', 'openfido'],
+    packages=['application_roles', 'blob_utils', 'openfido', 'password_hashing'],
     entry_points={
         'console_scripts': ['openfido = openfido.script:main'],
     },
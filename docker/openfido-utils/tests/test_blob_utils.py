@@ -1,12 +1,22 @@
-from datetime import datetime
-from unittest.mock import patch
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock, patch
 
 import blob_utils
+from botocore.credentials import Credentials, RefreshableCredentials
 
 from blob_utils.constants import (
+    FLASK_ENV,
+    S3_ACCESS_KEY_ID,
     S3_BUCKET,
     S3_ENDPOINT_URL,
+    S3_MAX_POOL_CONNECTIONS,
+    S3_PRESIGNED_TIMEOUT,
     S3_REGION_NAME,
+    S3_SECRET_ACCESS_KEY,
+    S3_TRANSFER_CHUNK_SIZE,
+    S3_URL_CACHE_BACKEND,
+    S3_URL_CACHE_SIZE,
+    TEMPORARY_CREDENTIALS_LIFETIME,
 )
 from tests.fixtures.s3 import s3_client
 
@@ -17,5 +27,217 @@ def test_get_s3(client_mock, app):
     app.config[S3_ENDPOINT_URL] = "http://example.com"
     app.config[S3_REGION_NAME] = "a-region"
 
+    blob_utils.reset_s3_clients()
     assert blob_utils.get_s3() is not None
     client_mock.assert_called()
+
+
+@patch("blob_utils.boto3.client")
+def test_get_s3_cached(client_mock, app):
+    """Tests s3 clients are shared for the same configuration."""
+    client_mock.side_effect = lambda *args, **kwargs: Mock()
+    app.config[FLASK_ENV] = "development"
+    app.config[S3_ACCESS_KEY_ID] = "a-key"
+    app.config[S3_SECRET_ACCESS_KEY] = "a-secret"
+    app.config[S3_ENDPOINT_URL] = "http://example.com"
+    app.config[S3_REGION_NAME] = "a-region"
+    app.config[S3_MAX_POOL_CONNECTIONS] = "25"
+
+    blob_utils.reset_s3_clients()
+    s3_client = blob_utils.get_s3()
+    assert blob_utils.get_s3() is s3_client
+    assert client_mock.call_count == 1
+    assert client_mock.call_args[1]["endpoint_url"] == "http://example.com"
+    assert client_mock.call_args[1]["config"].max_pool_connections == 25
+    assert client_mock.call_args[1]["config"].signature_version == "s3v4"
+
+    # a different configuration gets its own client.
+    app.config[S3_ENDPOINT_URL] = "http://other.example.com"
+    assert blob_utils.get_s3() is not s3_client
+    assert client_mock.call_count == 2
+
+    app.config[S3_ENDPOINT_URL] = "http://example.com"
+    assert blob_utils.get_s3() is s3_client
+
+    # after a fork the clients are created again.
+    blob_utils.reset_s3_clients()
+    assert blob_utils.get_s3() is not s3_client
+    assert client_mock.call_count == 3
+
+
+def test_upload_stream(app):
+    """Tests upload_stream uses the configured transfer settings."""
+    app.config[S3_BUCKET] = "a-bucket"
+    app.config[S3_TRANSFER_CHUNK_SIZE] = "1048576"
+    s3_client = Mock()
+
+    blob_utils.upload_stream("a/key", "a-stream", s3_client)
+    (args, kwargs) = s3_client.upload_fileobj.call_args
+    assert args == ("a-stream", "a-bucket", "a/key")
+    assert kwargs["Config"].multipart_chunksize == 1048576
+
+
+def test_multipart_upload(app):
+    """Tests multipart upload helpers."""
+    app.config[S3_BUCKET] = "a-bucket"
+    app.config[S3_PRESIGNED_TIMEOUT] = 60
+    s3_client = Mock()
+    s3_client.create_multipart_upload.return_value = {"UploadId": "an-upload"}
+    s3_client.generate_presigned_url.side_effect = lambda method, Params, ExpiresIn: (
+        f"http://example.com/{Params['Key']}?partNumber={Params['PartNumber']}"
+    )
+
+    assert blob_utils.create_multipart_upload("a/key", s3_client) == "an-upload"
+    assert blob_utils.create_upload_part_urls("a/key", "an-upload", 2, s3_client) == [
+        "http://example.com/a/key?partNumber=1",
+        "http://example.com/a/key?partNumber=2",
+    ]
+
+    blob_utils.complete_multipart_upload(
+        "a/key", "an-upload", [(1, "etag1"), (2, "etag2")], s3_client
+    )
+    s3_client.complete_multipart_upload.assert_called_once_with(
+        Bucket="a-bucket",
+        Key="a/key",
+        UploadId="an-upload",
+        MultipartUpload={
+            "Parts": [
+                {"PartNumber": 1, "ETag": "etag1"},
+                {"PartNumber": 2, "ETag": "etag2"},
+            ]
+        },
+    )
+
+    blob_utils.abort_multipart_upload("a/key", "an-upload", s3_client)
+    s3_client.abort_multipart_upload.assert_called_once_with(
+        Bucket="a-bucket", Key="a/key", UploadId="an-upload"
+    )
+
+
+def test_get_file_size(app):
+    """Tests get_file_size."""
+    app.config[S3_BUCKET] = "a-bucket"
+    s3_client = Mock()
+    s3_client.head_object.return_value = {"ContentLength": 123}
+
+    assert blob_utils.get_file_size("a/key", s3_client) == 123
+    s3_client.head_object.assert_called_once_with(Bucket="a-bucket", Key="a/key")
+
+
+def test_delete_file(app):
+    """Tests delete_file."""
+    app.config[S3_BUCKET] = "a-bucket"
+    s3_client = Mock()
+
+    blob_utils.delete_file("a/key", s3_client)
+    s3_client.delete_object.assert_called_once_with(Bucket="a-bucket", Key="a/key")
+
+
+class DictCache:
+    """ A cachelib-like backend, shared by several apps. """
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, timeout=None):
+        self.values[key] = value
+
+
+def signing_client(credentials=Credentials("an-id", "a-secret")):
+    s3_client = Mock()
+    s3_client._request_signer._credentials = credentials
+    s3_client.generate_presigned_url.side_effect = lambda method, Params, ExpiresIn: (
+        f"http://example.com/{Params['Key']}?sig={s3_client.generate_presigned_url.call_count}"
+    )
+    return s3_client
+
+
+@patch("blob_utils.url_cache.time.time")
+def test_create_url_cached(time_mock, app):
+    """Tests presigned URLs are reused for part of their lifetime."""
+    app.config[S3_BUCKET] = "a-bucket"
+    app.config[S3_PRESIGNED_TIMEOUT] = 100
+    s3_client = signing_client()
+
+    time_mock.return_value = 1000
+    url = blob_utils.create_url("a/key", "a.csv", s3_client)
+    assert url == "http://example.com/a/key?sig=1"
+    assert s3_client.generate_presigned_url.call_args[1]["Params"] == {
+        "Bucket": "a-bucket",
+        "Key": "a/key",
+        "ResponseContentDisposition": "attachment; filename = a.csv",
+    }
+
+    time_mock.return_value = 1049
+    assert blob_utils.create_url("a/key", "a.csv", s3_client) == url
+    # the content disposition is part of the URL.
+    assert blob_utils.create_url("a/key", None, s3_client) != url
+
+    time_mock.return_value = 1050
+    assert blob_utils.create_url("a/key", "a.csv", s3_client) != url
+    assert s3_client.generate_presigned_url.call_count == 3
+
+
+@patch("blob_utils.url_cache.time.time")
+def test_create_url_temporary_credentials(time_mock, app):
+    """Tests presigned URLs aren't reused after their credentials expire."""
+    app.config[S3_BUCKET] = "a-bucket"
+    app.config[S3_PRESIGNED_TIMEOUT] = 604800
+    time_mock.return_value = 1000
+
+    # the expiry of the credentials of a role is known.
+    credentials = RefreshableCredentials(
+        "an-id",
+        "a-secret",
+        "a-token",
+        datetime.now(timezone.utc) + timedelta(seconds=100),
+        Mock(),
+        "assume-role",
+    )
+    s3_client = signing_client(credentials)
+    url = blob_utils.create_url("a/key", None, s3_client)
+    time_mock.return_value = 1040
+    assert blob_utils.create_url("a/key", None, s3_client) == url
+    time_mock.return_value = 1060
+    assert blob_utils.create_url("a/key", None, s3_client) != url
+
+    # otherwise temporary credentials are assumed to be short lived.
+    s3_client = signing_client(Credentials("an-id", "a-secret", "a-token"))
+    url = blob_utils.create_url("b/key", None, s3_client)
+    time_mock.return_value = 1060 + TEMPORARY_CREDENTIALS_LIFETIME
+    assert blob_utils.create_url("b/key", None, s3_client) != url
+
+
+def test_create_url_evicted(app):
+    """Tests the least recently used URLs are evicted."""
+    app.config[S3_BUCKET] = "a-bucket"
+    app.config[S3_PRESIGNED_TIMEOUT] = 100
+    app.config[S3_URL_CACHE_SIZE] = 2
+    s3_client = signing_client()
+
+    for key in ["one", "two", "one", "three", "one", "two"]:
+        blob_utils.create_url(key, None, s3_client)
+    assert [
+        call[1]["Params"]["Key"]
+        for call in s3_client.generate_presigned_url.call_args_list
+    ] == ["one", "two", "three", "two"]
+
+
+def test_create_url_shared(app):
+    """Tests presigned URLs are shared with other apps through a backend."""
+    backend = DictCache()
+    app.config[S3_BUCKET] = "a-bucket"
+    app.config[S3_PRESIGNED_TIMEOUT] = 100
+    app.config[S3_URL_CACHE_BACKEND] = backend
+    s3_client = signing_client()
+
+    url = blob_utils.create_url("a/key", None, s3_client)
+    assert len(backend.values) == 1
+
+    # another API server, with its own memory.
+    blob_utils.get_url_cache().clear()
+    assert blob_utils.create_url("a/key", None, s3_client) == url
+    assert s3_client.generate_presigned_url.call_count == 1
@@ -0,0 +1,119 @@
+import hashlib
+import threading
+import time
+
+import pytest
+
+import password_hashing
+from password_hashing import (
+    PasswordHashBusy,
+    make_hash,
+    needs_rehash,
+    verify_hash,
+    verify_hash_bounded,
+)
+from password_hashing.constants import (
+    PASSWORD_HASH_ITERATIONS,
+    PASSWORD_HASH_QUEUE_SIZE,
+    PASSWORD_HASH_SCHEME,
+    PASSWORD_HASH_SCRYPT_N,
+    PASSWORD_HASH_WORKERS,
+)
+from password_hashing.executor import BoundedExecutor
+
+A_PASSWORD = "apassword!"
+
+
+def test_make_hash(app):
+    p_hash, salt = make_hash(A_PASSWORD)
+    assert p_hash.startswith("pbkdf2_sha256$10000$")
+    assert verify_hash(A_PASSWORD, p_hash, salt)
+    assert not verify_hash("another password", p_hash, salt)
+    assert not needs_rehash(p_hash)
+
+    # hashes of other schemes, or with other parameters, are still verified.
+    app.config[PASSWORD_HASH_ITERATIONS] = "20000"
+    assert verify_hash(A_PASSWORD, p_hash, salt)
+    assert needs_rehash(p_hash)
+
+    app.config[PASSWORD_HASH_SCHEME] = "scrypt"
+    app.config[PASSWORD_HASH_SCRYPT_N] = 1024
+    scrypt_hash, scrypt_salt = make_hash(A_PASSWORD)
+    assert scrypt_hash.startswith("scrypt$1024$8$1$")
+    assert len(scrypt_hash) < 127
+    assert verify_hash(A_PASSWORD, scrypt_hash, scrypt_salt)
+    assert verify_hash(A_PASSWORD, p_hash, salt)
+    assert not needs_rehash(scrypt_hash)
+
+
+def test_make_hash_legacy(app):
+    # hashes made before the scheme was stored with them.
+    salt = "a-salt"
+    legacy_hash = hashlib.pbkdf2_hmac(
+        "sha256", A_PASSWORD.encode("utf-8"), salt.encode("utf-8"), 10000
+    ).hex()
+
+    assert make_hash(A_PASSWORD, salt)[0].endswith(f"${legacy_hash}")
+    assert verify_hash(A_PASSWORD, legacy_hash, salt)
+    assert not needs_rehash(legacy_hash)
+
+
+def test_verify_hash_unknown_scheme(app):
+    p_hash, salt = make_hash(A_PASSWORD)
+
+    # hashes that can't be parsed fail verification, rather than raising.
+    for unknown_hash in (
+        p_hash.replace("pbkdf2_sha256$", "md5$"),
+        p_hash.replace("$10000$", "$many$"),
+    ):
+        assert not verify_hash(A_PASSWORD, unknown_hash, salt)
+        assert not verify_hash_bounded(A_PASSWORD, unknown_hash, salt)
+        assert needs_rehash(unknown_hash)
+
+
+def test_verify_hash_bounded(app):
+    p_hash, salt = make_hash(A_PASSWORD)
+    assert verify_hash_bounded(A_PASSWORD, p_hash, salt)
+    assert not verify_hash_bounded("another password", p_hash, salt)
+
+    # executors are shared by apps with the same configuration.
+    app.config[PASSWORD_HASH_WORKERS] = "2"
+    app.config[PASSWORD_HASH_QUEUE_SIZE] = "0"
+    executor = password_hashing.get_hash_executor()
+    assert password_hashing.get_hash_executor() is executor
+    password_hashing.reset_hash_executors()
+    assert password_hashing.get_hash_executor() is not executor
+
+
+def test_bounded_executor():
+    executor = BoundedExecutor(1, 1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+        return "done"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(executor.call(block)))]
+    threads[0].start()
+    started.wait()
+    threads.append(
+        threading.Thread(target=lambda: results.append(executor.call(block)))
+    )
+    threads[1].start()
+
+    while executor._slots._value > 0:
+        time.sleep(0.01)
+
+    # one call runs, one waits: any other is refused.
+    with pytest.raises(PasswordHashBusy):
+        executor.call(block)
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["done", "done"]
+    assert executor.call(lambda: 1) == 1
+    executor.shutdown()
@@ -1,9 +1,15 @@
+from unittest.mock import patch
+
 from application_roles import queries
+from application_roles.constants import API_KEY_CACHE_SIZE
+from application_roles.models import db, ApplicationSystemPermission
+from application_roles.services import create_application
 from enum import IntEnum
 
 
 class ExampleEnum(IntEnum):
     A_ROLE = 1
+    ANOTHER_ROLE = 2
 
 
 def test_get_system_permission(app):
@@ -17,3 +23,67 @@ def test_get_system_permission(app):
     perm = queries.get_system_permission(ExampleEnum.A_ROLE)
     assert perm.name == ExampleEnum.A_ROLE.name
     assert perm.code == ExampleEnum.A_ROLE.value
+
+
+def test_is_permitted(app):
+    application = create_application("app", ExampleEnum.A_ROLE)
+    db.session.commit()
+
+    assert queries.is_permitted(application.api_key, ExampleEnum.A_ROLE)
+    assert not queries.is_permitted(application.api_key, ExampleEnum.ANOTHER_ROLE)
+    assert not queries.is_permitted("unknown", ExampleEnum.A_ROLE)
+
+
+def test_find_permission_codes_cached(app):
+    application = create_application("app", ExampleEnum.A_ROLE)
+    db.session.commit()
+    assert queries.find_permission_codes(application.api_key) == {1}
+
+    ApplicationSystemPermission.query.delete()
+    db.session.commit()
+    assert queries.find_permission_codes(application.api_key) == {1}
+
+    queries.invalidate_permissions(application.api_key)
+    assert queries.find_permission_codes(application.api_key) == set()
+
+
+def test_find_permission_codes_unknown_not_cached(app):
+    assert queries.find_permission_codes("unknown") == set()
+    assert queries.get_permission_cache().get("unknown") is None
+
+
+def test_create_application_invalidates(app):
+    application = create_application("app", ExampleEnum.A_ROLE)
+    db.session.commit()
+    queries.find_permission_codes(application.api_key)
+
+    create_application("another app", ExampleEnum.ANOTHER_ROLE)
+    assert queries.get_permission_cache().get(application.api_key) is None
+
+
+@patch("application_roles.permission_cache.time.time")
+def test_find_permission_codes_ttl(time_mock, app):
+    application = create_application("app", ExampleEnum.A_ROLE)
+    db.session.commit()
+
+    time_mock.return_value = 1000
+    queries.find_permission_codes(application.api_key)
+    ApplicationSystemPermission.query.delete()
+    db.session.commit()
+
+    time_mock.return_value = 1059
+    assert queries.find_permission_codes(application.api_key) == {1}
+    time_mock.return_value = 1060
+    assert queries.find_permission_codes(application.api_key) == set()
+
+
+def test_find_permission_codes_max_size(app):
+    app.config[API_KEY_CACHE_SIZE] = 2
+    applications = [create_application(str(i), ExampleEnum.A_ROLE) for i in range(3)]
+    db.session.commit()
+
+    for application in applications:
+        queries.find_permission_codes(application.api_key)
+    permission_cache = queries.get_permission_cache()
+    assert permission_cache.get(applications[0].api_key) is None
+    assert permission_cache.get(applications[2].api_key) == {1}
@@ -39,9 +39,10 @@ def _test_empty(method, session, extra_param=""):
         json=workflow_json,
     )
     responses.add(
-        responses.GET,
-        f"http://app-api/v1/organizations/organization-1/workflows/workflow-1/pipelines",
-        json=[],
+        responses.PUT,
+        f"http://app-api/v1/organizations/organization-1/workflows/workflow-1/graph",
+        match=[responses.json_params_matcher({"pipelines": []})],
+        json={"pipelines": []},
     )
     # view the results:
     responses.add(
@@ -49,6 +50,11 @@ def _test_empty(method, session, extra_param=""):
         f"http://app-api/v1/organizations/organization-1/workflows/workflow-1",
         json=workflow_json,
     )
+    responses.add(
+        responses.GET,
+        f"http://app-api/v1/organizations/organization-1/workflows/workflow-1/graph",
+        json={"pipelines": []},
+    )
 
 
 @responses.activate
@@ -84,73 +90,32 @@ def _test_line(method, session, extra_param=""):
         ],
         json=workflow_json,
     )
-    responses.add(
-        responses.GET,
-        f"http://app-api/v1/organizations/organization-1/workflows/workflow-1/pipelines",
-        json=[
+    graph_json = {
+        "pipelines": [
             {
-                "created_at": "2020-12-10T16:46:10.965112",
-                "destination_workflow_pipelines": [],
                 "pipeline_uuid": "pipeline-1",
-                "source_workflow_pipelines": [],
-                "updated_at": "2020-12-10T16:46:10.965127",
-                "uuid": "workflow-pipeline-1",
+                "workflow_pipeline_uuid": "workflow-pipeline-1",
+                "dependencies": [],
             },
             {
-                "created_at": "2020-12-10T16:46:10.965112",
-                "destination_workflow_pipelines": [],
                 "pipeline_uuid": "pipeline-2",
-                "source_workflow_pipelines": [],
-                "updated_at": "2020-12-10T16:46:10.965127",
-                "uuid": "workflow-pipeline-2",
+                "workflow_pipeline_uuid": "workflow-pipeline-2",
+                "dependencies": ["pipeline-1"],
             },
-        ],
-    )
-
-    for pipeline in LINE["pipelines"]:
-        responses.add(
-            responses.POST,
-            f"http://app-api/v1/organizations/organization-1/workflows/workflow-1/pipelines",
-            json={},
-            match=[
-                responses.json_params_matcher(
-                    {
-                        "pipeline_uuid": pipeline["uuid"],
-                        "source_workflow_pipelines": [],
-                        "destination_workflow_pipelines": [],
-                    }
-                )
-            ],
-        )
-
-    responses.add(
-        responses.PUT,
-        f"http://app-api/v1/organizations/organization-1/workflows/workflow-1/pipelines/workflow-{LINE['pipelines'][0]['uuid']}",
-        json={},
-        match=[
-            responses.json_params_matcher(
-                {
-                    "pipeline_uuid": LINE["pipelines"][0]["uuid"],
-                    "source_workflow_pipelines": [],
-                    "destination_workflow_pipelines": [
-                        f"workflow-{LINE['pipelines'][1]['uuid']}"
-                    ],
-                }
-            )
-        ],
-    )
+        ]
+    }
+    # the whole graph is applied at once.
     responses.add(
         responses.PUT,
-        f"http://app-api/v1/organizations/organization-1/workflows/workflow-1/pipelines/workflow-{LINE['pipelines'][1]['uuid']}",
-        json={},
+        f"http://app-api/v1/organizations/organization-1/workflows/workflow-1/graph",
+        json=graph_json,
         match=[
             responses.json_params_matcher(
                 {
-                    "pipeline_uuid": LINE["pipelines"][1]["uuid"],
-                    "source_workflow_pipelines": [
-                        f"workflow-{LINE['pipelines'][0]['uuid']}"
-                    ],
-                    "destination_workflow_pipelines": [],
+                    "pipelines": [
+                        {"pipeline_uuid": "pipeline-1", "dependencies": []},
+                        {"pipeline_uuid": "pipeline-2", "dependencies": ["pipeline-1"]},
+                    ]
                 }
             )
         ],
@@ -163,24 +128,17 @@ def _test_line(method, session, extra_param=""):
     )
     responses.add(
         responses.GET,
-        f"http://app-api/v1/organizations/organization-1/workflows/workflow-1/pipelines/workflow-{LINE['pipelines'][0]['uuid']}",
-        json={
-            "source_workflow_pipelines": [],
-        },
-    )
-    responses.add(
-        responses.GET,
-        f"http://app-api/v1/organizations/organization-1/workflows/workflow-1/pipelines/workflow-{LINE['pipelines'][1]['uuid']}",
-        json={
-            "source_workflow_pipelines": [],
-        },
+        f"http://app-api/v1/organizations/organization-1/workflows/workflow-1/graph",
+        json=graph_json,
     )
 
 
 @responses.activate
-def test_create_workflow_line(session):
+def test_create_workflow_line(session, capsys):
     _test_line(responses.POST, session)
     services.create_workflow(session, "http://app-api", LINE)
+    assert len(responses.calls) == 4
+    assert "Dependencies:\nworkflow-pipeline-1\n" in capsys.readouterr().out
 
 
 @responses.activate
@@ -10,6 +10,7 @@ from application_roles.model_utils import get_db
 from . import constants
 from .pipelines import models as pipeline_models
 from .pipelines import pipeline_bp, run_bp
+from .pipelines.queries import warm_run_state_type_cache
 from .workflows import workflow_bp, workflow_pipeline_bp, workflow_run_bp
 from .tasks import make_celery
 
@@ -31,6 +32,23 @@ CONFIG_VARS = (
     constants.S3_REGION_NAME,
     constants.S3_BUCKET,
     constants.S3_PRESIGNED_TIMEOUT,
+    constants.S3_MAX_POOL_CONNECTIONS,
+    constants.S3_TRANSFER_THRESHOLD,
+    constants.S3_TRANSFER_CHUNK_SIZE,
+    constants.S3_TRANSFER_CONCURRENCY,
+    constants.S3_URL_CACHE_SIZE,
+    constants.S3_URL_CACHE_REUSE,
+    constants.API_KEY_CACHE_TTL,
+    constants.API_KEY_CACHE_SIZE,
+    constants.WORKER_CACHE_DIR,
+    constants.DOCKER_IMAGE_CACHE_TTL,
+    constants.DOCKER_IMAGE_CACHE_MAX_SIZE,
+    constants.INPUT_CACHE_MAX_SIZE,
+    constants.ARTIFACT_MULTIPART_THRESHOLD,
+    constants.WORKFLOW_RUN_MAX_RUNNING_PIPELINES,
+    constants.WORKFLOW_MAX_RUNNING_PIPELINES,
+    constants.WORKFLOW_ORGANIZATION_MAX_RUNNING_PIPELINES,
+    constants.WORKFLOW_STARTED_PIPELINE_TIMEOUT,
 )
 
 
@@ -52,12 +70,25 @@ def create_app(config=None):
         app.config[constants.MAX_CONTENT_LENGTH] = int(
             app.config[constants.MAX_CONTENT_LENGTH]
         )
+    for key in (
+        constants.DOCKER_IMAGE_CACHE_TTL,
+        constants.DOCKER_IMAGE_CACHE_MAX_SIZE,
+        constants.INPUT_CACHE_MAX_SIZE,
+        constants.ARTIFACT_MULTIPART_THRESHOLD,
+        constants.WORKFLOW_RUN_MAX_RUNNING_PIPELINES,
+        constants.WORKFLOW_MAX_RUNNING_PIPELINES,
+        constants.WORKFLOW_ORGANIZATION_MAX_RUNNING_PIPELINES,
+        constants.WORKFLOW_STARTED_PIPELINE_TIMEOUT,
+    ):
+        app.config[key] = int(app.config[key])
 
     db.init_app(app)
     migrate = Migrate(app, db)
 
     celery = make_celery(app)
 
+    app.before_first_request(warm_run_state_type_cache)
+
     app.register_blueprint(pipeline_bp, url_prefix="/v1/pipelines")
     app.register_blueprint(run_bp, url_prefix="/v1/pipelines")
     app.register_blueprint(workflow_bp, url_prefix="/v1/workflows")
@@ -1,4 +1,5 @@
 from blob_utils.constants import *
+from application_roles.constants import *
 
 # Configurable application keys:
 SECRET_KEY = "SECRET_KEY"
@@ -9,6 +10,44 @@ MAX_CONTENT_LENGTH = "MAX_CONTENT_LENGTH"
 WORKER_API_SERVER = "WORKER_API_SERVER"
 WORKER_API_TOKEN = "WORKER_API_TOKEN"
 S3_PRESIGNED_TIMEOUT = "S3_PRESIGNED_TIMEOUT"
+WORKER_CACHE_DIR = "WORKER_CACHE_DIR"
+DOCKER_IMAGE_CACHE_TTL = "DOCKER_IMAGE_CACHE_TTL"
+DOCKER_IMAGE_CACHE_MAX_SIZE = "DOCKER_IMAGE_CACHE_MAX_SIZE"
+INPUT_CACHE_MAX_SIZE = "INPUT_CACHE_MAX_SIZE"
+ARTIFACT_MULTIPART_THRESHOLD = "ARTIFACT_MULTIPART_THRESHOLD"
+WORKFLOW_RUN_MAX_RUNNING_PIPELINES = "WORKFLOW_RUN_MAX_RUNNING_PIPELINES"
+WORKFLOW_MAX_RUNNING_PIPELINES = "WORKFLOW_MAX_RUNNING_PIPELINES"
+WORKFLOW_ORGANIZATION_MAX_RUNNING_PIPELINES = (
+    "WORKFLOW_ORGANIZATION_MAX_RUNNING_PIPELINES"
+)
+WORKFLOW_STARTED_PIPELINE_TIMEOUT = "WORKFLOW_STARTED_PIPELINE_TIMEOUT"
 
 # Application constants:
 CALLBACK_TIMEOUT = 100
+# Workers send console output once this many characters are buffered, or once
+# this many seconds have passed since the last update:
+CONSOLE_FLUSH_SIZE = 65536
+CONSOLE_FLUSH_INTERVAL = 5
+# Console output is stored in chunks of at most this many characters:
+CONSOLE_CHUNK_SIZE = 65536
+CONSOLE_STREAMS = ("std_out", "std_err")
+# Number of run inputs a worker downloads at the same time:
+INPUT_DOWNLOAD_WORKERS = 4
+# Multipart artifact uploads are split into parts of at least this many bytes
+# (S3 allows at most 10000 parts per upload):
+ARTIFACT_PART_SIZE = 16 * 1024 * 1024
+ARTIFACT_MAX_PARTS = 10000
+# Number of artifacts a worker uploads at the same time, and how many times
+# each upload is attempted (waiting this many seconds longer before each retry):
+ARTIFACT_UPLOAD_WORKERS = 4
+ARTIFACT_UPLOAD_ATTEMPTS = 3
+ARTIFACT_UPLOAD_RETRY_DELAY = 2
+# Cached RunStateType ids are forgotten after this many seconds (a migration run
+# by another process may have recreated them):
+RUN_STATE_TYPE_CACHE_TTL = 300
+# Maximum (and default, once paging with after) number of pipeline runs returned
+# by one page of a run listing:
+RUN_LIST_MAX_LIMIT = 1000
+# Response header of a run listing, holding the sequence to list the next page
+# of runs after:
+RUN_LIST_NEXT_HEADER = "X-Next-After"
@@ -3,3 +3,12 @@ S3_BUCKET = "workflow-service"
 S3_REGION_NAME = "us-east-1"
 S3_PRESIGNED_TIMEOUT = 604800
 CALLBACK_TIMEOUT = 100
+WORKER_CACHE_DIR = "/tmp/openfido-cache"
+DOCKER_IMAGE_CACHE_TTL = 3600
+DOCKER_IMAGE_CACHE_MAX_SIZE = 20 * 1024 * 1024 * 1024
+INPUT_CACHE_MAX_SIZE = 20 * 1024 * 1024 * 1024
+ARTIFACT_MULTIPART_THRESHOLD = 64 * 1024 * 1024
+WORKFLOW_RUN_MAX_RUNNING_PIPELINES = 0
+WORKFLOW_MAX_RUNNING_PIPELINES = 0
+WORKFLOW_ORGANIZATION_MAX_RUNNING_PIPELINES = 0
+WORKFLOW_STARTED_PIPELINE_TIMEOUT = 24 * 60 * 60
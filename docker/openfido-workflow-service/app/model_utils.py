@@ -1,11 +1,20 @@
 import importlib
 import os
+import time
 import uuid as uuid_lib
 from datetime import datetime
 from enum import IntEnum, unique
 
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
 
+from .constants import RUN_STATE_TYPE_CACHE_TTL
+
+# app.extensions keys of the {RunStateEnum: RunStateType.id} cache, and of the
+# time.monotonic() it expires at.
+RUN_STATE_TYPE_CACHE = "run_state_type_ids"
+RUN_STATE_TYPE_CACHE_EXPIRES = "run_state_type_ids_expires"
+
 
 @unique
 class SystemPermissionEnum(IntEnum):
@@ -57,3 +66,41 @@ class RunStateEnum(IntEnum):
             RunStateEnum.COMPLETED,
             RunStateEnum.CANCELLED,
         ]
+
+
+def clear_run_state_type_cache():
+    """ Forget the cached RunStateType ids (e.g. after a migration). """
+    current_app.extensions[RUN_STATE_TYPE_CACHE] = {}
+    current_app.extensions[RUN_STATE_TYPE_CACHE_EXPIRES] = (
+        time.monotonic() + RUN_STATE_TYPE_CACHE_TTL
+    )
+
+
+def run_state_type_ids():
+    """Return the cached {RunStateEnum: RunStateType.id} of the app.
+
+    RunStateTypes never change once they are created, but migrations run by
+    other processes may recreate them: the cache is cleared every
+    RUN_STATE_TYPE_CACHE_TTL seconds.
+    """
+    expires = current_app.extensions.get(RUN_STATE_TYPE_CACHE_EXPIRES)
+    if expires is None or expires <= time.monotonic():
+        clear_run_state_type_cache()
+
+    return current_app.extensions[RUN_STATE_TYPE_CACHE]
+
+
+def find_run_state_enum(run_state_type_id):
+    """ Find the RunStateEnum of a RunStateType id. """
+    # (imported here: the models import this module)
+    from .pipelines.models import RunStateType
+
+    cache = run_state_type_ids()
+    for (run_state_enum, cached_id) in cache.items():
+        if cached_id == run_state_type_id:
+            return run_state_enum
+
+    run_state_type = RunStateType.query.get(run_state_type_id)
+    run_state_enum = RunStateEnum(int(run_state_type.code))
+    cache[run_state_enum] = run_state_type_id
+    return run_state_enum
@@ -1,3 +1,4 @@
+from datetime import datetime
 from flask import current_app
 from urllib.parse import quote
 
@@ -21,12 +22,27 @@ class Pipeline(CommonColumnsMixin, db.Model):
     repository_branch = db.Column(db.String(100), nullable=True)
     repository_script = db.Column(db.String(4096), nullable=True)
     is_deleted = db.Column(db.Boolean(), default=False, nullable=False)
+    # the sequence of the last PipelineRun, see next_run_sequence().
+    last_run_sequence = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
 
     pipeline_runs = db.relationship("PipelineRun", backref="pipeline", lazy="select")
     workflow_pipelines = db.relationship(
         "WorkflowPipeline", backref="pipeline", lazy="select"
     )
 
+    def next_run_sequence(self):
+        """Allocate the sequence of a new PipelineRun of this pipeline.
+
+        The counter is incremented in the database, which locks the pipeline's
+        row until the transaction ends: concurrent runs get consecutive
+        sequences.
+        """
+        self.last_run_sequence = Pipeline.last_run_sequence + 1
+        db.session.flush()
+        return self.last_run_sequence
+
 
 class RunStateType(CommonColumnsMixin, db.Model):
     """ Lookup table of run states. """
@@ -37,11 +53,12 @@ class RunStateType(CommonColumnsMixin, db.Model):
     description = db.Column(db.String(300), nullable=False)
     code = db.Column(db.Numeric(), nullable=False)
 
+    # every state of every run has a type: never load these collections.
     pipeline_run_states = db.relationship(
-        "PipelineRunState", backref="run_state_type", lazy="immediate"
+        "PipelineRunState", backref="run_state_type", lazy="dynamic"
     )
     workflow_run_states = db.relationship(
-        "WorkflowRunState", backref="run_state_type", lazy="immediate"
+        "WorkflowRunState", backref="run_state_type", lazy="dynamic"
     )
 
 
@@ -57,7 +74,7 @@ class PipelineRunState(CommonColumnsMixin, db.Model):
         db.Integer, db.ForeignKey("runstatetype.id"), nullable=False
     )
     pipeline_run_id = db.Column(
-        db.Integer, db.ForeignKey("pipelinerun.id"), nullable=False
+        db.Integer, db.ForeignKey("pipelinerun.id"), nullable=False, index=True
     )
 
 
@@ -69,7 +86,7 @@ class PipelineRunArtifact(CommonColumnsMixin, db.Model):
     name = db.Column(db.String(255), nullable=False)
 
     pipeline_run_id = db.Column(
-        db.Integer, db.ForeignKey("pipelinerun.id"), nullable=False
+        db.Integer, db.ForeignKey("pipelinerun.id"), nullable=False, index=True
     )
 
     def public_url(self):
@@ -89,6 +106,30 @@ class PipelineRunInput(CommonColumnsMixin, db.Model):
     filename = db.Column(db.String(255), nullable=False)
     url = db.Column(db.String(2000), nullable=False)
 
+    pipeline_run_id = db.Column(
+        db.Integer, db.ForeignKey("pipelinerun.id"), nullable=False, index=True
+    )
+
+
+class PipelineRunConsoleChunk(CommonColumnsMixin, db.Model):
+    """ An ordered chunk of the console output of a PipelineRun. """
+
+    __tablename__ = "pipelinerunconsolechunk"
+    __table_args__ = (
+        db.Index(
+            "ix_pipelinerunconsolechunk_run_stream_position",
+            "pipeline_run_id",
+            "stream",
+            "position",
+            unique=True,
+        ),
+    )
+
+    stream = db.Column(db.String(10), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    length = db.Column(db.Integer, nullable=False)
+    content = db.Column(db.Unicode, nullable=False)
+
     pipeline_run_id = db.Column(
         db.Integer, db.ForeignKey("pipelinerun.id"), nullable=False
     )
@@ -104,26 +145,54 @@ class PipelineRun(CommonColumnsMixin, db.Model):
     callback_url = db.Column(db.String(2000), nullable=True)
     started_at = db.Column(db.DateTime, nullable=True)
     completed_at = db.Column(db.DateTime, nullable=True)
-    std_out = db.Column(db.Unicode, nullable=True)
-    std_err = db.Column(db.Unicode, nullable=True)
     is_deleted = db.Column(db.Boolean(), default=False, nullable=False)
 
-    pipeline_id = db.Column(db.Integer, db.ForeignKey("pipeline.id"), nullable=False)
+    pipeline_id = db.Column(
+        db.Integer, db.ForeignKey("pipeline.id"), nullable=False, index=True
+    )
 
+    # the code of the last run state, see add_run_state().
+    current_state = db.Column(db.Integer, nullable=True)
+    state_changed_at = db.Column(db.DateTime, nullable=True)
+
+    # queries choose which of these to load (see queries.PIPELINE_RUN_LOADERS).
     pipeline_run_states = db.relationship(
-        "PipelineRunState", backref="pipeline_run", lazy="immediate"
+        "PipelineRunState",
+        backref="pipeline_run",
+        lazy="select",
+        order_by="PipelineRunState.id",
     )
     pipeline_run_artifacts = db.relationship(
-        "PipelineRunArtifact", backref="pipeline_run", lazy="immediate"
+        "PipelineRunArtifact", backref="pipeline_run", lazy="select"
     )
     pipeline_run_inputs = db.relationship(
-        "PipelineRunInput", backref="pipeline_run", lazy="immediate"
+        "PipelineRunInput", backref="pipeline_run", lazy="select"
     )
 
     workflow_pipeline_run = db.relationship(
-        "WorkflowPipelineRun", backref="pipeline_run", lazy="immediate", uselist=False
+        "WorkflowPipelineRun", backref="pipeline_run", lazy="select", uselist=False
+    )
+
+    __table_args__ = (
+        db.Index(
+            "ix_pipelinerun_current_state",
+            "current_state",
+            "state_changed_at",
+        ),
+        db.Index(
+            "ix_pipelinerun_pipeline_sequence",
+            "pipeline_id",
+            "sequence",
+            unique=True,
+        ),
     )
 
+    def add_run_state(self, pipeline_run_state):
+        """ Add a state to this run, making it the current state. """
+        pipeline_run_state.pipeline_run = self
+        self.current_state = pipeline_run_state.code
+        self.state_changed_at = datetime.utcnow()
+
     def run_state_enum(self):
         """ Return the current stat of this run (the last run state) """
-        return RunStateEnum(self.pipeline_run_states[-1].code)
+        return RunStateEnum(self.current_state)
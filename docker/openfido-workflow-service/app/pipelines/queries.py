@@ -1,7 +1,40 @@
-from sqlalchemy import and_
+import logging
 
-from .models import Pipeline, PipelineRun, RunStateType, db
-from .schemas import SearchPipelinesSchema
+from sqlalchemy import and_, func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
+
+from ..constants import RUN_LIST_MAX_LIMIT
+from .models import (
+    Pipeline,
+    PipelineRun,
+    PipelineRunArtifact,
+    PipelineRunConsoleChunk,
+    RunStateType,
+    db,
+)
+from ..model_utils import RunStateEnum, run_state_type_ids
+from .schemas import SearchPipelineRunsSchema, SearchPipelinesSchema
+
+logger = logging.getLogger("pipelines")
+
+# How the relationships of PipelineRuns are loaded for each view of them: a
+# summary (PipelineRunSummarySchema) only shows the current state of runs,
+# lists of runs all that PipelineRunSchema shows. A single run joins its states
+# rather than selecting them separately.
+PIPELINE_RUN_LOADERS = {
+    "summary": (),
+    "list": (
+        selectinload(PipelineRun.pipeline_run_states),
+        selectinload(PipelineRun.pipeline_run_inputs),
+        selectinload(PipelineRun.pipeline_run_artifacts),
+    ),
+    "detail": (
+        joinedload(PipelineRun.pipeline_run_states),
+        selectinload(PipelineRun.pipeline_run_inputs),
+        selectinload(PipelineRun.pipeline_run_artifacts),
+    ),
+}
 
 
 def find_pipeline(uuid):
@@ -44,10 +77,49 @@ def find_run_state_type(run_state_enum):
     return run_state_type
 
 
-def find_pipeline_run(uuid):
-    """ Find a PipelineRun. """
+def warm_run_state_type_cache():
+    """ Cache the ids of all existing RunStateTypes. """
+    try:
+        run_state_types = RunStateType.query.all()
+    except SQLAlchemyError as sql_error:
+        # the database isn't migrated yet: ids are cached as they're found.
+        logger.warning(f"unable to cache run state types: {sql_error}")
+        db.session.rollback()
+        return
+
+    run_state_type_ids().update(
+        (RunStateEnum(int(rst.code)), rst.id) for rst in run_state_types
+    )
+
+
+def find_run_state_type_id(run_state_enum):
+    """Find the id of a specific RunStateType.
+
+    RunStateTypes never change once they are created, so their ids are cached
+    (see run_state_type_ids()).
+    """
+    cache = run_state_type_ids()
+    if run_state_enum not in cache:
+        run_state_type = find_run_state_type(run_state_enum)
+        if run_state_type.id is None:
+            # not committed yet: only cache it once the next lookup finds it.
+            db.session.flush()
+            return run_state_type.id
+        cache[run_state_enum] = run_state_type.id
+
+    return cache[run_state_enum]
+
+
+def find_pipeline_run(uuid, view=None):
+    """Find a PipelineRun.
+
+    view selects the PIPELINE_RUN_LOADERS used to load its relationships (by
+    default they are loaded when they are first used).
+    """
     return (
         PipelineRun.query.join(Pipeline)
+        .options(contains_eager(PipelineRun.pipeline))
+        .options(*PIPELINE_RUN_LOADERS.get(view, ()))
         .filter(
             and_(
                 PipelineRun.uuid == uuid,
@@ -57,3 +129,138 @@ def find_pipeline_run(uuid):
         )
         .one_or_none()
     )
+
+
+def find_pipeline_runs(uuids):
+    """ Find a list of PipelineRuns. """
+    data = SearchPipelineRunsSchema().load(uuids)
+    return (
+        PipelineRun.query.join(Pipeline)
+        .options(contains_eager(PipelineRun.pipeline))
+        .options(*PIPELINE_RUN_LOADERS["list"])
+        .filter(
+            and_(
+                PipelineRun.uuid.in_(map(str, data["uuids"])),
+                PipelineRun.is_deleted == False,
+                Pipeline.is_deleted == False,
+            )
+        )
+        .all()
+    )
+
+
+def find_pipeline_runs_page(pipeline, query):
+    """Find a page of the PipelineRuns of a pipeline, ordered by sequence.
+
+    query is loaded by RunListQuerySchema: runs after a sequence number, in a
+    state, or created within a range of dates. Without after or limit, every
+    run is returned (as before runs were paged).
+
+    Returns (pipeline_runs, next_after): next_after is the sequence to find the
+    next page after, or None when this is the last page.
+    """
+    pipeline_runs = PipelineRun.query.filter(
+        PipelineRun.pipeline_id == pipeline.id,
+        PipelineRun.is_deleted == False,
+    )
+
+    if query["after"] is not None:
+        pipeline_runs = pipeline_runs.filter(PipelineRun.sequence > query["after"])
+    if query["created_after"] is not None:
+        pipeline_runs = pipeline_runs.filter(
+            PipelineRun.created_at >= query["created_after"]
+        )
+    if query["created_before"] is not None:
+        pipeline_runs = pipeline_runs.filter(
+            PipelineRun.created_at < query["created_before"]
+        )
+    if query["state"] is not None:
+        pipeline_runs = pipeline_runs.filter(
+            PipelineRun.current_state == query["state"].value
+        )
+
+    pipeline_runs = pipeline_runs.options(
+        *PIPELINE_RUN_LOADERS["summary" if query["view"] == "summary" else "list"]
+    ).order_by(PipelineRun.sequence)
+    limit = query["limit"]
+    if limit is None:
+        if query["after"] is None:
+            return (pipeline_runs.all(), None)
+        limit = RUN_LIST_MAX_LIMIT
+
+    # (one more run than the page holds tells whether there is a next page)
+    pipeline_runs = pipeline_runs.limit(limit + 1).all()
+    if len(pipeline_runs) <= limit:
+        return (pipeline_runs, None)
+
+    pipeline_runs = pipeline_runs[:limit]
+    return (pipeline_runs, pipeline_runs[-1].sequence)
+
+
+def find_pipeline_runs_by_state(run_state_enums, view=None):
+    """Find the PipelineRuns currently in any of run_state_enums.
+
+    Runs are ordered by when they changed to their current state, oldest first.
+    """
+    return (
+        PipelineRun.query.join(Pipeline)
+        .options(contains_eager(PipelineRun.pipeline))
+        .options(*PIPELINE_RUN_LOADERS.get(view, ()))
+        .filter(
+            and_(
+                PipelineRun.current_state.in_([rse.value for rse in run_state_enums]),
+                PipelineRun.is_deleted == False,
+                Pipeline.is_deleted == False,
+            )
+        )
+        .order_by(PipelineRun.state_changed_at, PipelineRun.id)
+    )
+
+
+def find_pipeline_run_artifact(pipeline_run, uuid):
+    """ Find a PipelineRunArtifact of a PipelineRun. """
+    return PipelineRunArtifact.query.filter(
+        and_(
+            PipelineRunArtifact.pipeline_run_id == pipeline_run.id,
+            PipelineRunArtifact.uuid == uuid,
+        )
+    ).one_or_none()
+
+
+def find_pipeline_run_output_length(pipeline_run, stream):
+    """ Find the number of characters of console output stored for a stream. """
+    return (
+        db.session.query(
+            func.max(PipelineRunConsoleChunk.position + PipelineRunConsoleChunk.length)
+        )
+        .filter(
+            and_(
+                PipelineRunConsoleChunk.pipeline_run_id == pipeline_run.id,
+                PipelineRunConsoleChunk.stream == stream,
+            )
+        )
+        .scalar()
+        or 0
+    )
+
+
+def find_pipeline_run_output(pipeline_run, stream, offset=0, limit=None):
+    """ Find the console output of a stream, starting at offset. """
+    query = PipelineRunConsoleChunk.query.filter(
+        and_(
+            PipelineRunConsoleChunk.pipeline_run_id == pipeline_run.id,
+            PipelineRunConsoleChunk.stream == stream,
+            PipelineRunConsoleChunk.position + PipelineRunConsoleChunk.length > offset,
+        )
+    )
+    if limit is not None:
+        query = query.filter(PipelineRunConsoleChunk.position < offset + limit)
+
+    chunks = query.order_by(PipelineRunConsoleChunk.position).all()
+    if len(chunks) == 0:
+        return ""
+
+    output = "".join(chunk.content for chunk in chunks)
+    start = offset - chunks[0].position
+    end = None if limit is None else start + limit
+    return output[start:end]
@@ -3,13 +3,30 @@ import logging
 from flask import Blueprint, jsonify, request
 from marshmallow.exceptions import ValidationError
 
+from ..constants import CONSOLE_STREAMS, RUN_LIST_NEXT_HEADER
 from ..model_utils import SystemPermissionEnum
 from ..utils import permissions_required, verify_content_type_and_params
-from .queries import find_pipeline, find_pipeline_run
-from .schemas import PipelineRunSchema
+from .queries import (
+    find_pipeline,
+    find_pipeline_run,
+    find_pipeline_runs,
+    find_pipeline_runs_page,
+)
+from .schemas import (
+    AppendRunOutputSchema,
+    PipelineRunSchema,
+    PipelineRunSummarySchema,
+    RunListQuerySchema,
+    RunOutputQuerySchema,
+)
 from .services import (
+    abort_artifact_upload,
+    complete_artifact_upload,
+    create_artifact_upload,
     create_pipeline_run,
     create_pipeline_run_artifact,
+    get_pipeline_run_output,
+    replace_pipeline_run_output,
     update_pipeline_run_output,
     update_pipeline_run_state,
     delete_pipeline_run,
@@ -179,7 +196,7 @@ def get_run(pipeline_uuid, pipeline_run_uuid):
         logger.warning("no pipeline found")
         return {}, 404
 
-    pipeline_run = find_pipeline_run(pipeline_run_uuid)
+    pipeline_run = find_pipeline_run(pipeline_run_uuid, "detail")
     if pipeline_run is None:
         logger.warning("no pipeline run found")
         return {}, 404
@@ -219,7 +236,7 @@ def delete_run(pipeline_uuid, pipeline_run_uuid):
 @run_bp.route("/<pipeline_uuid>/runs", methods=["GET"])
 @permissions_required([SystemPermissionEnum.PIPELINES_CLIENT])
 def get_runs(pipeline_uuid):
-    """Get a all pipeline runs for a pipeline.
+    """Get a all pipeline runs for a pipeline, ordered by sequence.
     ---
 
     tags:
@@ -230,9 +247,44 @@ def get_runs(pipeline_uuid):
         description: Requires key type PIPELINES_CLIENT
         schema:
           type: string
+      - in: query
+        name: after
+        description: Only return runs with a greater sequence number (the X-Next-After header of the previous page).
+        schema:
+          type: integer
+      - in: query
+        name: limit
+        description: Maximum number of runs to return (at most 1000). Without after or limit, every run is returned.
+        schema:
+          type: integer
+      - in: query
+        name: state
+        description: Only return runs currently in this state (e.g. RUNNING).
+        schema:
+          type: string
+      - in: query
+        name: created_after
+        description: Only return runs created at or after this time.
+        schema:
+          type: string
+      - in: query
+        name: created_before
+        description: Only return runs created before this time.
+        schema:
+          type: string
+      - in: query
+        name: view
+        description: "'summary' returns only the uuid, sequence, dates and current state of each run."
+        schema:
+          type: string
     responses:
       "200":
         description: "Fetched"
+        headers:
+          X-Next-After:
+            description: The after parameter of the next page, when there is one.
+            schema:
+              type: integer
         content:
           application/json:
             schema:
@@ -282,19 +334,100 @@ def get_runs(pipeline_uuid):
         logger.warning("no pipeline found")
         return {}, 404
 
-    return jsonify(
-        [
-            PipelineRunSchema().dump(pr)
-            for pr in pipeline.pipeline_runs
-            if not pr.is_deleted
-        ]
-    )
+    try:
+        data = RunListQuerySchema().load(request.args)
+        schema = (
+            PipelineRunSummarySchema()
+            if data["view"] == "summary"
+            else PipelineRunSchema()
+        )
+
+        (pipeline_runs, next_after) = find_pipeline_runs_page(pipeline, data)
+        response = jsonify([schema.dump(pr) for pr in pipeline_runs])
+        if next_after is not None:
+            response.headers[RUN_LIST_NEXT_HEADER] = str(next_after)
+        return response
+    except ValidationError as validation_err:
+        return {"message": "Validation error", "errors": validation_err.messages}, 400
+
+
+@run_bp.route("/runs/search", methods=["POST"])
+@verify_content_type_and_params(["uuids"], [])
+@permissions_required([SystemPermissionEnum.PIPELINES_CLIENT])
+def search_runs():
+    """Search for pipeline runs with specific UUIDs (of any pipeline).
+    ---
+
+    tags:
+      - pipeline runs
+    parameters:
+      - in: header
+        name: Workflow-API-Key
+        description: Requires key type PIPELINES_CLIENT
+        schema:
+          type: string
+    requestBody:
+      description: "Pipeline run UUIDs."
+      required: true
+      content:
+        application/json:
+          schema:
+            type: object
+            properties:
+              uuids:
+                type: array
+                items:
+                  type: string
+                  example: "uuid1"
+    responses:
+      "200":
+        description: "Matching pipeline runs"
+        content:
+          application/json:
+            schema:
+              type: array
+              items:
+                type: object
+                properties:
+                  uuid:
+                    type: string
+                    example: "5ea9102b2abd498f9830389debb21fb8"
+                  sequence:
+                    type: integer
+                    example: 1
+                  created_at:
+                    type: string
+                    example: "2020-08-05T08:15:30-05:00"
+                  inputs:
+                    type: array
+                    items:
+                      type: object
+                  states:
+                    type: array
+                    items:
+                      type: object
+                  artifacts:
+                    type: array
+                    items:
+                      type: object
+      "400":
+        description: "Bad request"
+    """
+    try:
+        pipeline_runs = find_pipeline_runs(request.json)
+
+        return jsonify([PipelineRunSchema().dump(pr) for pr in pipeline_runs])
+    except ValidationError as ve:
+        return {"message": "Unable to search pipeline runs", "errors": ve.messages}, 400
 
 
 @run_bp.route("/<pipeline_uuid>/runs/<pipeline_run_uuid>/console", methods=["GET"])
 @permissions_required([SystemPermissionEnum.PIPELINES_CLIENT])
 def get_run_output(pipeline_uuid, pipeline_run_uuid):
     """Get the console output of a run.
+
+    Pollers can pass the offset of output they have already received to only
+    fetch new output, or tail to fetch the end of the output.
     ---
 
     tags:
@@ -305,6 +438,26 @@ def get_run_output(pipeline_uuid, pipeline_run_uuid):
         description: Requires key type PIPELINES_CLIENT
         schema:
           type: string
+      - in: query
+        name: stream
+        description: Only return one stream (std_out or std_err).
+        schema:
+          type: string
+      - in: query
+        name: offset
+        description: Character offset to begin returning output from.
+        schema:
+          type: integer
+      - in: query
+        name: limit
+        description: Maximum number of characters to return per stream.
+        schema:
+          type: integer
+      - in: query
+        name: tail
+        description: Return this many characters from the end of the output.
+        schema:
+          type: integer
     responses:
       "200":
         description: "Fetched"
@@ -315,8 +468,20 @@ def get_run_output(pipeline_uuid, pipeline_run_uuid):
               properties:
                 std_out:
                   type: string
+                std_out_offset:
+                  type: integer
+                  description: Offset of the returned std_out.
+                std_out_length:
+                  type: integer
+                  description: Total length of std_out.
                 std_err:
                   type: string
+                std_err_offset:
+                  type: integer
+                  description: Offset of the returned std_err.
+                std_err_length:
+                  type: integer
+                  description: Total length of std_err.
       "400":
         description: "Bad request"
     """
@@ -330,10 +495,26 @@ def get_run_output(pipeline_uuid, pipeline_run_uuid):
         logger.warning("no pipeline run found")
         return {}, 404
 
-    return jsonify(
-        std_out=pipeline_run.std_out or "",
-        std_err=pipeline_run.std_err or "",
-    )
+    try:
+        data = RunOutputQuerySchema().load(request.args)
+        streams = CONSOLE_STREAMS if data["stream"] is None else [data["stream"]]
+
+        response = {}
+        for stream in streams:
+            (offset, output, length) = get_pipeline_run_output(
+                pipeline_run.uuid,
+                stream,
+                data["offset"],
+                data["limit"],
+                data["tail"],
+            )
+            response[stream] = output
+            response[f"{stream}_offset"] = offset
+            response[f"{stream}_length"] = length
+
+        return jsonify(response)
+    except ValidationError as validation_err:
+        return {"message": "Validation error", "errors": validation_err.messages}, 400
 
 
 @run_bp.route("/<pipeline_uuid>/runs/<pipeline_run_uuid>/console", methods=["PUT"])
@@ -379,13 +560,94 @@ def upload_run_output(pipeline_uuid, pipeline_run_uuid):
         logger.warning("no pipeline run found")
         return {}, 404
 
-    update_pipeline_run_output(
+    replace_pipeline_run_output(
         pipeline_run.uuid, request.json["std_out"], request.json["std_err"]
     )
 
     return {}, 200
 
 
+@run_bp.route(
+    "/<pipeline_uuid>/runs/<pipeline_run_uuid>/console/append", methods=["POST"]
+)
+@verify_content_type_and_params(
+    ["std_out", "std_err"], ["std_out_offset", "std_err_offset"]
+)
+@permissions_required([SystemPermissionEnum.PIPELINES_WORKER])
+def append_run_output(pipeline_uuid, pipeline_run_uuid):
+    """Append to the console output.
+    ---
+
+    tags:
+      - pipeline runs
+    parameters:
+      - in: header
+        name: Workflow-API-Key
+        description: Requires key type PIPELINES_WORKER
+        schema:
+          type: string
+    requestBody:
+      description: "new standard output and error since the supplied offsets"
+      required: true
+      content:
+        application/json:
+          schema:
+            type: object
+            properties:
+              std_out:
+                type: string
+              std_err:
+                type: string
+              std_out_offset:
+                type: integer
+                description: Length of std_out already recorded by the server.
+              std_err_offset:
+                type: integer
+                description: Length of std_err already recorded by the server.
+    responses:
+      "200":
+        description: "Updated"
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                std_out_offset:
+                  type: integer
+                std_err_offset:
+                  type: integer
+      "400":
+        description: "Bad request"
+    """
+    pipeline = find_pipeline(pipeline_uuid)
+    if pipeline is None:
+        logger.warning("no pipeline found")
+        return {}, 404
+
+    pipeline_run = find_pipeline_run(pipeline_run_uuid)
+    if pipeline_run is None:
+        logger.warning("no pipeline run found")
+        return {}, 404
+
+    try:
+        data = AppendRunOutputSchema().load(request.json)
+        (std_out_offset, std_err_offset) = update_pipeline_run_output(
+            pipeline_run.uuid,
+            data["std_out"],
+            data["std_err"],
+            data["std_out_offset"],
+            data["std_err_offset"],
+        )
+    except ValidationError as validation_err:
+        logger.warning(validation_err)
+        return {"message": "Validation error", "errors": validation_err.messages}, 400
+    except ValueError as value_err:
+        logger.warning(value_err)
+        return {"message": str(value_err)}, 400
+
+    return jsonify(std_out_offset=std_out_offset, std_err_offset=std_err_offset)
+
+
 @run_bp.route("/<pipeline_uuid>/runs/<pipeline_run_uuid>/state", methods=["PUT"])
 @verify_content_type_and_params(["state"], [])
 @permissions_required([SystemPermissionEnum.PIPELINES_WORKER])
@@ -493,3 +755,191 @@ def upload_run_artifact(pipeline_uuid, pipeline_run_uuid):
     except ValueError as value_err:
         logger.warning(value_err)
         return {}, 400
+
+
+@run_bp.route(
+    "/<pipeline_uuid>/runs/<pipeline_run_uuid>/artifacts/uploads", methods=["POST"]
+)
+@verify_content_type_and_params(["name", "size"], [])
+@permissions_required([SystemPermissionEnum.PIPELINES_WORKER])
+def create_run_artifact_upload(pipeline_uuid, pipeline_run_uuid):
+    """Start a multipart upload of an artifact directly to blob storage.
+    ---
+
+    tags:
+      - pipeline runs
+    parameters:
+      - in: header
+        name: Workflow-API-Key
+        description: Requires key type PIPELINES_WORKER
+        schema:
+          type: string
+    requestBody:
+      description: "The artifact name and size in bytes"
+      required: true
+      content:
+        application/json:
+          schema:
+            type: object
+            properties:
+              name:
+                type: string
+              size:
+                type: integer
+    responses:
+      "200":
+        description: "Created"
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                uuid:
+                  type: string
+                upload_id:
+                  type: string
+                part_size:
+                  type: integer
+                urls:
+                  type: array
+                  description: Presigned URL to PUT each part to, in order.
+                  items:
+                    type: string
+      "400":
+        description: "Bad request"
+    """
+    pipeline = find_pipeline(pipeline_uuid)
+    if pipeline is None:
+        logger.warning("no pipeline found")
+        return {}, 404
+
+    pipeline_run = find_pipeline_run(pipeline_run_uuid)
+    if pipeline_run is None:
+        logger.warning("no pipeline run found")
+        return {}, 404
+
+    try:
+        return jsonify(create_artifact_upload(pipeline_run.uuid, request.json))
+    except ValidationError as validation_err:
+        return {"message": "Validation error", "errors": validation_err.messages}, 400
+
+
+@run_bp.route(
+    "/<pipeline_uuid>/runs/<pipeline_run_uuid>/artifacts/uploads/<artifact_uuid>/complete",
+    methods=["POST"],
+)
+@verify_content_type_and_params(["name", "upload_id", "parts"], [])
+@permissions_required([SystemPermissionEnum.PIPELINES_WORKER])
+def complete_run_artifact_upload(pipeline_uuid, pipeline_run_uuid, artifact_uuid):
+    """Complete a multipart upload of an artifact.
+    ---
+
+    tags:
+      - pipeline runs
+    parameters:
+      - in: header
+        name: Workflow-API-Key
+        description: Requires key type PIPELINES_WORKER
+        schema:
+          type: string
+    requestBody:
+      description: "The uploaded parts"
+      required: true
+      content:
+        application/json:
+          schema:
+            type: object
+            properties:
+              name:
+                type: string
+              upload_id:
+                type: string
+              parts:
+                type: array
+                items:
+                  type: object
+                  properties:
+                    part_number:
+                      type: integer
+                    etag:
+                      type: string
+    responses:
+      "200":
+        description: "Completed"
+      "400":
+        description: "Bad request"
+    """
+    pipeline = find_pipeline(pipeline_uuid)
+    if pipeline is None:
+        logger.warning("no pipeline found")
+        return {}, 404
+
+    pipeline_run = find_pipeline_run(pipeline_run_uuid)
+    if pipeline_run is None:
+        logger.warning("no pipeline run found")
+        return {}, 404
+
+    try:
+        complete_artifact_upload(pipeline_run.uuid, artifact_uuid, request.json)
+        return {}, 200
+    except ValidationError as validation_err:
+        return {"message": "Validation error", "errors": validation_err.messages}, 400
+    except ValueError as value_err:
+        logger.warning(value_err)
+        return {"message": str(value_err)}, 400
+
+
+@run_bp.route(
+    "/<pipeline_uuid>/runs/<pipeline_run_uuid>/artifacts/uploads/<artifact_uuid>/abort",
+    methods=["POST"],
+)
+@verify_content_type_and_params(["name", "upload_id"], [])
+@permissions_required([SystemPermissionEnum.PIPELINES_WORKER])
+def abort_run_artifact_upload(pipeline_uuid, pipeline_run_uuid, artifact_uuid):
+    """Abort a multipart upload of an artifact.
+    ---
+
+    tags:
+      - pipeline runs
+    parameters:
+      - in: header
+        name: Workflow-API-Key
+        description: Requires key type PIPELINES_WORKER
+        schema:
+          type: string
+    requestBody:
+      description: "The upload to abort"
+      required: true
+      content:
+        application/json:
+          schema:
+            type: object
+            properties:
+              name:
+                type: string
+              upload_id:
+                type: string
+    responses:
+      "200":
+        description: "Aborted"
+      "400":
+        description: "Bad request"
+    """
+    pipeline = find_pipeline(pipeline_uuid)
+    if pipeline is None:
+        logger.warning("no pipeline found")
+        return {}, 404
+
+    pipeline_run = find_pipeline_run(pipeline_run_uuid)
+    if pipeline_run is None:
+        logger.warning("no pipeline run found")
+        return {}, 404
+
+    try:
+        abort_artifact_upload(pipeline_run.uuid, artifact_uuid, request.json)
+        return {}, 200
+    except ValidationError as validation_err:
+        return {"message": "Validation error", "errors": validation_err.messages}, 400
+    except ValueError as value_err:
+        logger.warning(value_err)
+        return {"message": str(value_err)}, 400
@@ -1,7 +1,8 @@
-from marshmallow import Schema, fields, validate
+from marshmallow import Schema, ValidationError, fields, validate, validates_schema
 from blob_utils.schemas import UUID
 from marshmallow_enum import EnumField
 
+from ..constants import CONSOLE_STREAMS, RUN_LIST_MAX_LIMIT
 from ..model_utils import RunStateEnum
 
 
@@ -43,6 +44,72 @@ class UpdateRunStateSchema(Schema):
     state = EnumField(RunStateEnum, required=True)
 
 
+class AppendRunOutputSchema(Schema):
+    """ Validation schema for append_run_output() """
+
+    std_out = fields.Str(required=True)
+    std_err = fields.Str(required=True)
+    std_out_offset = fields.Int(missing=None, validate=validate.Range(min=0))
+    std_err_offset = fields.Int(missing=None, validate=validate.Range(min=0))
+
+
+class RunOutputQuerySchema(Schema):
+    """ Validation schema for get_run_output() query parameters """
+
+    stream = fields.Str(missing=None, validate=validate.OneOf(CONSOLE_STREAMS))
+    offset = fields.Int(missing=None, validate=validate.Range(min=0))
+    limit = fields.Int(missing=None, validate=validate.Range(min=0))
+    tail = fields.Int(missing=None, validate=validate.Range(min=0))
+
+    @validates_schema
+    def validate_range(self, data, **kwargs):
+        """ offset and tail select different ranges of output. """
+        if data["offset"] is not None and data["tail"] is not None:
+            raise ValidationError("offset and tail cannot be used together.")
+
+
+class RunListQuerySchema(Schema):
+    """ Validation schema for get_runs() query parameters """
+
+    after = fields.Int(missing=None, validate=validate.Range(min=0))
+    limit = fields.Int(
+        missing=None, validate=validate.Range(min=1, max=RUN_LIST_MAX_LIMIT)
+    )
+    state = EnumField(RunStateEnum, missing=None)
+    created_after = fields.DateTime(missing=None)
+    created_before = fields.DateTime(missing=None)
+    view = fields.Str(missing="full", validate=validate.OneOf(["full", "summary"]))
+
+
+class CreateArtifactUploadSchema(Schema):
+    """ Validation schema for create_artifact_upload() """
+
+    name = fields.Str(required=True, validate=validate.Length(min=1, max=255))
+    size = fields.Int(required=True, validate=validate.Range(min=0))
+
+
+class ArtifactUploadPartSchema(Schema):
+    """ An uploaded part of a multipart artifact upload. """
+
+    part_number = fields.Int(required=True, validate=validate.Range(min=1))
+    etag = fields.Str(required=True)
+
+
+class CompleteArtifactUploadSchema(Schema):
+    """ Validation schema for complete_artifact_upload() """
+
+    name = fields.Str(required=True, validate=validate.Length(min=1, max=255))
+    upload_id = fields.Str(required=True)
+    parts = fields.Nested(ArtifactUploadPartSchema, many=True, required=True)
+
+
+class AbortArtifactUploadSchema(Schema):
+    """ Validation schema for abort_artifact_upload() """
+
+    name = fields.Str(required=True, validate=validate.Length(min=1, max=255))
+    upload_id = fields.Str(required=True)
+
+
 class RunStateSchema(Schema):
     """ Export RunState """
 
@@ -64,12 +131,29 @@ class PipelineSchema(Schema):
     updated_at = fields.DateTime()
 
 
+class PipelineRunSummarySchema(Schema):
+    """ Summary of a PipelineRun, without its inputs, states or artifacts """
+
+    uuid = UUID()
+    sequence = fields.Int()
+    created_at = fields.DateTime()
+    started_at = fields.DateTime()
+    completed_at = fields.DateTime()
+    state = fields.Function(lambda obj: obj.run_state_enum().name)
+
+
 class SearchPipelinesSchema(Schema):
     """ Schema for find_pipelines() queries. """
 
     uuids = fields.List(UUID(), required=True)
 
 
+class SearchPipelineRunsSchema(Schema):
+    """ Schema for find_pipeline_runs() queries. """
+
+    uuids = fields.List(UUID(), required=True)
+
+
 class ArtifactSchema(Schema):
     """ Schema of an artifact. """
 
@@ -1,28 +1,58 @@
 import json
 import logging
+import math
 import urllib
 import urllib.request
 import uuid
 from urllib.error import URLError
 from urllib.parse import quote
-from blob_utils import upload_stream
+from blob_utils import (
+    abort_multipart_upload,
+    complete_multipart_upload,
+    create_multipart_upload,
+    create_upload_part_urls,
+    upload_stream,
+)
 
+from botocore.exceptions import ClientError
 from flask import current_app
+from sqlalchemy.exc import IntegrityError
 from werkzeug.utils import secure_filename
 
-from ..constants import CALLBACK_TIMEOUT, S3_BUCKET
+from ..constants import (
+    ARTIFACT_MAX_PARTS,
+    ARTIFACT_PART_SIZE,
+    CALLBACK_TIMEOUT,
+    CONSOLE_CHUNK_SIZE,
+    S3_BUCKET,
+)
 from ..model_utils import RunStateEnum
 from ..tasks import execute_pipeline
 from .models import (
     Pipeline,
     PipelineRun,
     PipelineRunArtifact,
+    PipelineRunConsoleChunk,
     PipelineRunInput,
     PipelineRunState,
     db,
 )
-from .queries import find_pipeline, find_pipeline_run, find_run_state_type
-from .schemas import CreateRunSchema, UpdateRunStateSchema, CreatePipelineSchema
+from .queries import (
+    find_pipeline,
+    find_pipeline_run,
+    find_pipeline_run_artifact,
+    find_pipeline_run_output,
+    find_pipeline_run_output_length,
+    find_run_state_type_id,
+)
+from .schemas import (
+    AbortArtifactUploadSchema,
+    CompleteArtifactUploadSchema,
+    CreateArtifactUploadSchema,
+    CreatePipelineSchema,
+    CreateRunSchema,
+    UpdateRunStateSchema,
+)
 
 # make the request lib mockable for testing:
 urllib_request = urllib.request
@@ -109,15 +139,12 @@ def update_pipeline(pipeline_uuid, pipeline_json):
 
 
 def create_pipeline_run_state(run_state_enum):
-    run_state_type = find_run_state_type(run_state_enum)
-    pipeline_run_state = PipelineRunState(
-        name=run_state_type.name,
-        description=run_state_type.description,
-        code=int(run_state_type.code),
+    return PipelineRunState(
+        name=run_state_enum.name,
+        description=run_state_enum.name,
+        code=run_state_enum.value,
+        run_state_type_id=find_run_state_type_id(run_state_enum),
     )
-    run_state_type.pipeline_run_states.append(pipeline_run_state)
-
-    return pipeline_run_state
 
 
 def create_pipeline_run(pipeline_uuid, inputs_json, queued=False):
@@ -129,18 +156,18 @@ def create_pipeline_run(pipeline_uuid, inputs_json, queued=False):
     if pipeline is None:
         raise ValueError("no pipeline found")
 
-    sequence = len(pipeline.pipeline_runs) + 1
-    pipeline_run = PipelineRun(sequence=sequence, callback_url=data["callback_url"])
+    pipeline_run = PipelineRun(
+        sequence=pipeline.next_run_sequence(), callback_url=data["callback_url"]
+    )
 
     for i in data["inputs"]:
         pipeline_run.pipeline_run_inputs.append(
             PipelineRunInput(filename=i["name"], url=i["url"])
         )
 
-    pipeline_run.pipeline_run_states.append(
-        create_pipeline_run_state(RunStateEnum.QUEUED)
-    )
-    pipeline.pipeline_runs.append(pipeline_run)
+    pipeline_run.add_run_state(create_pipeline_run_state(RunStateEnum.QUEUED))
+    # (without loading the other runs of the pipeline)
+    pipeline_run.pipeline = pipeline
 
     if not queued:
         start_pipeline_run(pipeline_run)
@@ -153,44 +180,151 @@ def create_pipeline_run(pipeline_uuid, inputs_json, queued=False):
 
 def start_pipeline_run(pipeline_run):
     """ Begin the Celery process for a PipelineRun """
+    start_pipeline_runs([pipeline_run])
 
-    if pipeline_run.run_state_enum() != RunStateEnum.QUEUED:
-        raise ValueError("Only PipelineRun in state QUEUED can be started.")
+    return pipeline_run
 
-    pipeline = pipeline_run.pipeline
-    pipeline_run.pipeline_run_states.append(
-        create_pipeline_run_state(RunStateEnum.NOT_STARTED)
-    )
+
+def start_pipeline_runs(pipeline_runs):
+    """ Begin the Celery process for PipelineRuns, in a single commit. """
+
+    for pipeline_run in pipeline_runs:
+        if pipeline_run.run_state_enum() != RunStateEnum.QUEUED:
+            raise ValueError("Only PipelineRun in state QUEUED can be started.")
+
+        pipeline_run.add_run_state(create_pipeline_run_state(RunStateEnum.NOT_STARTED))
     db.session.commit()
 
-    execute_pipeline.delay(
-        pipeline.uuid,
-        pipeline_run.uuid,
-        [
-            {"name": pri.filename, "url": pri.url}
-            for pri in pipeline_run.pipeline_run_inputs
-        ],
-        pipeline.docker_image_url,
-        pipeline.repository_ssh_url,
-        pipeline.repository_branch,
-        pipeline.repository_script,
-    )
+    for pipeline_run in pipeline_runs:
+        pipeline = pipeline_run.pipeline
+        execute_pipeline.delay(
+            pipeline.uuid,
+            pipeline_run.uuid,
+            [
+                {"name": pri.filename, "url": pri.url}
+                for pri in pipeline_run.pipeline_run_inputs
+            ],
+            pipeline.docker_image_url,
+            pipeline.repository_ssh_url,
+            pipeline.repository_branch,
+            pipeline.repository_script,
+        )
 
-    return pipeline_run
+    return pipeline_runs
+
+
+def _add_output_chunks(pipeline_run, stream, position, output):
+    """ Store output as chunks starting at position. """
+    for index in range(0, len(output), CONSOLE_CHUNK_SIZE):
+        content = output[index : index + CONSOLE_CHUNK_SIZE]
+        db.session.add(
+            PipelineRunConsoleChunk(
+                pipeline_run_id=pipeline_run.id,
+                stream=stream,
+                position=position + index,
+                length=len(content),
+                content=content,
+            )
+        )
 
+    return position + len(output)
 
-def update_pipeline_run_output(pipeline_uuid, std_out, std_err):
-    """ Update the pipeline run output. """
-    pipeline_run = find_pipeline_run(pipeline_uuid)
+
+def _append_output(pipeline_run, stream, delta, offset):
+    """Append delta to the console output of a stream.
+
+    offset is where delta begins within the output. Any portion of delta that
+    was already recorded (a worker retrying a request) is skipped; a gap
+    between the existing output and offset raises a ValueError.
+
+    Returns the new length of the output.
+    """
+    length = find_pipeline_run_output_length(pipeline_run, stream)
+    if offset is None:
+        offset = length
+    if offset > length:
+        raise ValueError(f"Invalid output offset {offset}, expected {length}")
+
+    return _add_output_chunks(pipeline_run, stream, length, delta[length - offset :])
+
+
+def update_pipeline_run_output(
+    pipeline_run_uuid, std_out, std_err, std_out_offset=None, std_err_offset=None
+):
+    """Append output to the pipeline run output.
+
+    std_out_offset and std_err_offset are the lengths of the output the caller
+    believes has already been recorded.
+
+    Returns the new (std_out, std_err) lengths.
+    """
+    pipeline_run = find_pipeline_run(pipeline_run_uuid)
+    if pipeline_run is None:
+        raise ValueError("pipeline run not found")
+
+    # (appends to a run are serialized, so that they all see the current
+    # lengths of its output)
+    PipelineRun.query.filter(PipelineRun.id == pipeline_run.id).with_for_update().one()
+    try:
+        lengths = (
+            _append_output(pipeline_run, "std_out", std_out, std_out_offset),
+            _append_output(pipeline_run, "std_err", std_err, std_err_offset),
+        )
+        db.session.commit()
+    except ValueError:
+        db.session.rollback()
+        raise
+    except IntegrityError:
+        # another append recorded the same positions first.
+        db.session.rollback()
+        raise ValueError("Output was appended concurrently, retry the append")
+
+    return lengths
+
+
+def replace_pipeline_run_output(pipeline_run_uuid, std_out, std_err):
+    """ Replace the entire pipeline run output. """
+    pipeline_run = find_pipeline_run(pipeline_run_uuid)
     if pipeline_run is None:
         raise ValueError("pipeline run not found")
 
-    pipeline_run.std_out = std_out
-    pipeline_run.std_err = std_err
+    PipelineRunConsoleChunk.query.filter(
+        PipelineRunConsoleChunk.pipeline_run_id == pipeline_run.id
+    ).delete()
+    _add_output_chunks(pipeline_run, "std_out", 0, std_out)
+    _add_output_chunks(pipeline_run, "std_err", 0, std_err)
 
     db.session.commit()
 
 
+def get_pipeline_run_output(
+    pipeline_run_uuid, stream, offset=None, limit=None, tail=None
+):
+    """Get a range of the console output of a stream.
+
+    Either offset (optionally with limit) or tail (the number of characters at
+    the end of the output) selects the range; without either the entire output
+    is returned.
+
+    Returns the tuple (offset, output, length), where offset is where output
+    begins and length is the total length of the stream's output.
+    """
+    pipeline_run = find_pipeline_run(pipeline_run_uuid)
+    if pipeline_run is None:
+        raise ValueError("pipeline run not found")
+
+    length = find_pipeline_run_output_length(pipeline_run, stream)
+    if tail is not None:
+        offset = max(length - tail, 0)
+    offset = min(offset or 0, length)
+
+    return (
+        offset,
+        find_pipeline_run_output(pipeline_run, stream, offset, limit),
+        length,
+    )
+
+
 def notify_callback(pipeline_run):
     if not pipeline_run.callback_url:
         return
@@ -228,7 +362,7 @@ def update_pipeline_run_state(
             f"Invalid state transition: {pipeline_run.run_state_enum().name}->{data['state'].name}"
         )
 
-    pipeline_run.pipeline_run_states.append(create_pipeline_run_state(data["state"]))
+    pipeline_run.add_run_state(create_pipeline_run_state(data["state"]))
 
     db.session.commit()
 
@@ -250,19 +384,19 @@ def copy_pipeline_run_artifact(pipeline_run_artifact, to_pipeline_run):
     db.session.commit()
 
 
+def _artifact_key(pipeline_run, artifact_uuid, filename):
+    return f"{pipeline_run.pipeline.uuid}/{pipeline_run.uuid}/{artifact_uuid}-{quote(filename)}"
+
+
 def create_pipeline_run_artifact(run_uuid, filename, stream):
     """ Create a PipelineRunArtifact from a stream. """
     pipeline_run = find_pipeline_run(run_uuid)
     if pipeline_run is None:
         raise ValueError("pipeline run not found")
 
-    sname = quote(filename)
     artifact_uuid = uuid.uuid4().hex
 
-    upload_stream(
-        f"{pipeline_run.pipeline.uuid}/{run_uuid}/{artifact_uuid}-{sname}",
-        stream,
-    )
+    upload_stream(_artifact_key(pipeline_run, artifact_uuid, filename), stream)
 
     artifact = PipelineRunArtifact(uuid=artifact_uuid, name=filename)
     pipeline_run.pipeline_run_artifacts.append(artifact)
@@ -270,3 +404,76 @@ def create_pipeline_run_artifact(run_uuid, filename, stream):
     db.session.commit()
 
     return artifact
+
+
+def create_artifact_upload(run_uuid, upload_json):
+    """Start a multipart upload of an artifact straight to blob storage.
+
+    Returns the artifact uuid, the upload id, the part size and a presigned
+    URL to PUT each part to.
+    """
+    pipeline_run = find_pipeline_run(run_uuid)
+    if pipeline_run is None:
+        raise ValueError("pipeline run not found")
+
+    data = CreateArtifactUploadSchema().load(upload_json)
+    part_size = max(ARTIFACT_PART_SIZE, math.ceil(data["size"] / ARTIFACT_MAX_PARTS))
+    part_count = max(1, math.ceil(data["size"] / part_size))
+
+    artifact_uuid = uuid.uuid4().hex
+    key = _artifact_key(pipeline_run, artifact_uuid, data["name"])
+    upload_id = create_multipart_upload(key)
+
+    return {
+        "uuid": artifact_uuid,
+        "upload_id": upload_id,
+        "part_size": part_size,
+        "urls": create_upload_part_urls(key, upload_id, part_count),
+    }
+
+
+def complete_artifact_upload(run_uuid, artifact_uuid, upload_json):
+    """Complete a multipart upload, creating its PipelineRunArtifact.
+
+    Completing an upload again (a worker retrying a request) returns the
+    artifact created the first time.
+    """
+    pipeline_run = find_pipeline_run(run_uuid)
+    if pipeline_run is None:
+        raise ValueError("pipeline run not found")
+
+    data = CompleteArtifactUploadSchema().load(upload_json)
+    artifact = find_pipeline_run_artifact(pipeline_run, artifact_uuid)
+    if artifact is not None:
+        return artifact
+
+    try:
+        complete_multipart_upload(
+            _artifact_key(pipeline_run, artifact_uuid, data["name"]),
+            data["upload_id"],
+            [(part["part_number"], part["etag"]) for part in data["parts"]],
+        )
+    except ClientError as client_err:
+        raise ValueError(f"Unable to complete upload: {client_err}")
+
+    artifact = PipelineRunArtifact(uuid=artifact_uuid, name=data["name"])
+    pipeline_run.pipeline_run_artifacts.append(artifact)
+
+    db.session.commit()
+
+    return artifact
+
+
+def abort_artifact_upload(run_uuid, artifact_uuid, upload_json):
+    """ Abort a multipart upload. """
+    pipeline_run = find_pipeline_run(run_uuid)
+    if pipeline_run is None:
+        raise ValueError("pipeline run not found")
+
+    data = AbortArtifactUploadSchema().load(upload_json)
+    try:
+        abort_multipart_upload(
+            _artifact_key(pipeline_run, artifact_uuid, data["name"]), data["upload_id"]
+        )
+    except ClientError as client_err:
+        raise ValueError(f"Unable to abort upload: {client_err}")
@@ -1,8 +1,12 @@
+import codecs
 import json
 import os
 import subprocess
 import tempfile
+import threading
+import time
 import urllib
+from concurrent.futures import ThreadPoolExecutor
 from os.path import join
 from urllib.parse import quote
 
@@ -10,8 +14,22 @@ from celery import Celery, Task, shared_task
 from celery.utils.log import get_task_logger
 from flask import current_app
 
-from app.constants import WORKER_API_TOKEN
+from app.constants import (
+    ARTIFACT_MULTIPART_THRESHOLD,
+    ARTIFACT_UPLOAD_ATTEMPTS,
+    ARTIFACT_UPLOAD_RETRY_DELAY,
+    ARTIFACT_UPLOAD_WORKERS,
+    CONSOLE_FLUSH_INTERVAL,
+    CONSOLE_FLUSH_SIZE,
+    DOCKER_IMAGE_CACHE_MAX_SIZE,
+    DOCKER_IMAGE_CACHE_TTL,
+    INPUT_CACHE_MAX_SIZE,
+    INPUT_DOWNLOAD_WORKERS,
+    WORKER_API_TOKEN,
+    WORKER_CACHE_DIR,
+)
 from app.model_utils import RunStateEnum
+from app.worker_cache import DockerImageCache, GitMirrorCache, InputCache
 from application_roles.decorators import ROLES_KEY
 
 # make the request lib mockable for testing:
@@ -41,8 +59,14 @@ class RunExecutor:
     def __init__(self, uuid, run_uuid):
         self.uuid = uuid
         self.run_uuid = run_uuid
-        self.stdout = ""
-        self.stderr = ""
+
+        # Output that has not been sent yet, and how much has been sent so far
+        # (the offset the server expects the next append to start at).
+        self.pending = {"std_out": "", "std_err": ""}
+        self.offsets = {"std_out": 0, "std_err": 0}
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+        self.output_ready = threading.Event()
 
     def _make_request(self, path, data, additional_headers, method="PUT"):
         server = current_app.config["WORKER_API_SERVER"]
@@ -53,7 +77,8 @@ class RunExecutor:
         headers.update(additional_headers)
 
         request = urllib_request.Request(url, data, headers, method=method)
-        urllib_request.urlopen(request)
+        with urllib_request.urlopen(request) as response:
+            return response.read()
 
     def _put(self, path, data):
         self._make_request(
@@ -64,17 +89,84 @@ class RunExecutor:
             },
         )
 
+    def _post(self, path, data):
+        self._make_request(
+            path,
+            json.dumps(data).encode("ascii"),
+            {
+                "content-type": "application/json",
+            },
+            "POST",
+        )
+
+    def _post_json(self, path, data):
+        return json.loads(
+            self._make_request(
+                path,
+                json.dumps(data).encode("ascii"),
+                {
+                    "content-type": "application/json",
+                },
+                "POST",
+            )
+        )
+
+    def _buffer_output(self, stream, text):
+        """ Queue text to be sent to the server's std_out or std_err. """
+        with self.lock:
+            self.pending[stream] += text
+            if sum(len(p) for p in self.pending.values()) >= CONSOLE_FLUSH_SIZE:
+                self.output_ready.set()
+
+    def flush_output(self, force=True):
+        """Send any buffered output to the server.
+
+        Unless force is True, output is only sent once enough of it has been
+        buffered, or enough time has passed since the last update.
+        """
+        with self.lock:
+            size = sum(len(p) for p in self.pending.values())
+            elapsed = time.monotonic() - self.last_flush
+            if size == 0:
+                return
+            if not force and size < CONSOLE_FLUSH_SIZE:
+                if elapsed < CONSOLE_FLUSH_INTERVAL:
+                    return
+
+            pending = self.pending
+            self.pending = {"std_out": "", "std_err": ""}
+
+        data = dict(pending)
+        for stream in pending:
+            data[f"{stream}_offset"] = self.offsets[stream]
+
+        try:
+            self._post("console/append", data)
+        except urllib.error.URLError as url_e:
+            # keep the output around so that it is sent with the next update.
+            logger.warning(f"Unable to append console output: {url_e}")
+            with self.lock:
+                for stream in pending:
+                    self.pending[stream] = pending[stream] + self.pending[stream]
+            self.last_flush = time.monotonic()
+            return
+
+        for stream in pending:
+            self.offsets[stream] += len(pending[stream])
+        self.last_flush = time.monotonic()
+
     def update_run_output(self, stdout, stderr=""):
-        """ Append addition stdout/stderr to run's output. """
+        """ Append addition stdout/stderr lines to run's output. """
         if len(stdout) == 0 and len(stderr) == 0:
             # don't make an HTTP request that does nothing (many successful
             # commands actually don't produce any output at all)
             return
 
-        self.stdout += "\n" + stdout
-        self.stderr += "\n" + stderr
-        data = {"std_out": self.stdout, "std_err": self.stderr}
-        return self._put("console", data)
+        if len(stdout) > 0:
+            self._buffer_output("std_out", stdout + "\n")
+        if len(stderr) > 0:
+            self._buffer_output("std_err", stderr + "\n")
+        self.flush_output()
 
     def update_run_status(self, run_state_enum):
         return self._put("state", {"state": run_state_enum.name})
@@ -83,19 +175,141 @@ class RunExecutor:
         with open(location, "rb") as f:
             self._make_request(f"artifacts?name={quote(filename)}", f, {}, "POST")
 
-    def run(self, command, directory):
-        """ Execute a command, raise an exception on nonzero error codes. """
-        self.update_run_output(f"Run: {command}")
-        result = subprocess.run(command.split(" "), cwd=directory, capture_output=True)
+    def upload_artifact_multipart(self, filename, location):
+        """ Upload an artifact directly to blob storage, in parts. """
+        upload = self._post_json(
+            "artifacts/uploads",
+            {"name": filename, "size": os.path.getsize(location)},
+        )
+        upload_path = f"artifacts/uploads/{upload['uuid']}"
+
+        try:
+            parts = []
+            with open(location, "rb") as f:
+                for (part_number, url) in enumerate(upload["urls"], 1):
+                    request = urllib_request.Request(
+                        url, f.read(upload["part_size"]), method="PUT"
+                    )
+                    with urllib_request.urlopen(request) as response:
+                        parts.append(
+                            {
+                                "part_number": part_number,
+                                "etag": response.headers["ETag"],
+                            }
+                        )
+        except urllib.error.URLError:
+            self._post_json(
+                f"{upload_path}/abort",
+                {"name": filename, "upload_id": upload["upload_id"]},
+            )
+            raise
 
-        logger.debug(result)
+        self._post_json(
+            f"{upload_path}/complete",
+            {"name": filename, "upload_id": upload["upload_id"], "parts": parts},
+        )
+
+    def _read_pipe(self, pipe, stream):
+        """ Buffer the output of a subprocess pipe as it is produced. """
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        for chunk in iter(lambda: pipe.read1(4096), b""):
+            self._buffer_output(stream, decoder.decode(chunk))
+        self._buffer_output(stream, decoder.decode(b"", final=True))
+        self.output_ready.set()
+
+    def run(self, command, directory):
+        """Execute a command, raise an exception on nonzero error codes.
 
-        self.update_run_output(
-            result.stdout.decode("utf-8"), result.stderr.decode("utf-8")
+        The command's output is sent to the server while it runs.
+        """
+        self.update_run_output(f"Run: {command}")
+        process = subprocess.Popen(
+            command.split(" "),
+            cwd=directory,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
         )
 
-        if result.returncode != 0:
-            raise ValueError(f"Command returned nonzero code: {result.returncode}")
+        readers = [
+            threading.Thread(target=self._read_pipe, args=(process.stdout, "std_out")),
+            threading.Thread(target=self._read_pipe, args=(process.stderr, "std_err")),
+        ]
+        try:
+            for reader in readers:
+                reader.start()
+
+            # HTTP requests need the app context, so they are all made from
+            # this thread rather than the readers.
+            while any(reader.is_alive() for reader in readers):
+                self.output_ready.wait(CONSOLE_FLUSH_INTERVAL)
+                self.output_ready.clear()
+                self.flush_output(force=False)
+        except BaseException:
+            # the process is still running when the loop is interrupted.
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            for reader in readers:
+                if reader.is_alive():
+                    reader.join()
+            raise
+
+        returncode = process.wait()
+        logger.debug(f"{command}: {returncode}")
+        self.flush_output()
+
+        if returncode != 0:
+            raise ValueError(f"Command returned nonzero code: {returncode}")
+
+
+def _upload_with_retries(app, executor, filename, location, multipart_threshold):
+    with app.app_context():
+        for attempt in range(1, ARTIFACT_UPLOAD_ATTEMPTS + 1):
+            try:
+                if os.path.getsize(location) >= multipart_threshold:
+                    executor.upload_artifact_multipart(filename, location)
+                else:
+                    executor.upload_artifact(filename, location)
+                return
+            except urllib.error.URLError as url_e:
+                if attempt == ARTIFACT_UPLOAD_ATTEMPTS:
+                    raise
+                logger.warning(f"upload of {filename} failed: {url_e}")
+                time.sleep(ARTIFACT_UPLOAD_RETRY_DELAY * attempt)
+
+
+def upload_artifacts(executor, outputdir, multipart_threshold):
+    """Upload every file in outputdir (and its subdirectories) as an artifact.
+
+    Files are uploaded concurrently, and files of at least multipart_threshold
+    bytes are uploaded directly to blob storage in parts.
+    """
+    app = current_app._get_current_object()
+    artifacts = []
+    for (directory, _, filenames) in os.walk(outputdir):
+        for filename in filenames:
+            location = join(directory, filename)
+            name = os.path.relpath(location, outputdir).replace(os.sep, "/")
+            artifacts.append((name, location))
+
+    with ThreadPoolExecutor(max_workers=ARTIFACT_UPLOAD_WORKERS) as pool:
+        futures = [
+            (
+                name,
+                pool.submit(
+                    _upload_with_retries,
+                    app,
+                    executor,
+                    name,
+                    location,
+                    multipart_threshold,
+                ),
+            )
+            for (name, location) in artifacts
+        ]
+        for (name, future) in futures:
+            future.result()
+            executor.update_run_output(f"Uploaded artifact: {name}")
 
 
 @shared_task(ignore_result=True)
@@ -124,31 +338,38 @@ def execute_pipeline(
             inputdir = join(tmpdir, "input")
             outputdir = join(tmpdir, "output")
 
-            executor.run(f"docker pull {docker_image_url}", tmpdir)
-            executor.run(f"git clone --depth 1 {repository_ssh_url} gitrepo", tmpdir)
-            executor.run(f"git checkout {repository_branch}", gitdir)
+            cache_dir = current_app.config[WORKER_CACHE_DIR]
+            DockerImageCache(
+                cache_dir,
+                current_app.config[DOCKER_IMAGE_CACHE_TTL],
+                current_app.config[DOCKER_IMAGE_CACHE_MAX_SIZE],
+            ).pull(executor, docker_image_url)
+            mirror = GitMirrorCache(cache_dir).checkout(
+                executor, repository_ssh_url, repository_branch, gitdir
+            )
 
             if not os.path.exists(join(gitdir, repository_script)):
                 raise ValueError("Repository script does not exist in repository")
 
             executor.run("mkdir input", tmpdir)
             executor.run("mkdir output", tmpdir)
-
-            for input_file in input_files:
-                urllib_request.urlretrieve(
-                    input_file["url"], join(inputdir, input_file["name"])
-                )
-
             executor.run("chmod -R 777 .", tmpdir)
 
-            # TODO because these processes can take a long long time to run it'd
-            # be ideal to poll the output every interval to give viewers a sense
-            # of whether the job is doing.
+            # (inputs are linked to the files of the cache: they are added
+            # after the chmod, and can't be changed by the pipeline)
+            InputCache(
+                cache_dir,
+                current_app.config[INPUT_CACHE_MAX_SIZE],
+                INPUT_DOWNLOAD_WORKERS,
+            ).fetch(executor, input_files, inputdir)
+
             executor.run(
                 (
                     "docker run --rm "
                     f"-v {gitdir}:/tmp/gitrepo "
-                    f"-v {inputdir}:/tmp/input "
+                    # (the worktree's .git file refers to the mirror)
+                    f"-v {mirror}:{mirror}:ro "
+                    f"-v {inputdir}:/tmp/input:ro "
                     f"-v {outputdir}:/tmp/output "
                     f"-e OPENFIDO_INPUT=/tmp/input "
                     f"-e OPENFIDO_OUTPUT=/tmp/output "
@@ -158,10 +379,11 @@ def execute_pipeline(
                 gitdir,
             )
 
-            for f in os.listdir(outputdir):
-                if not os.path.isfile(join(outputdir, f)):
-                    next
-                executor.upload_artifact(f, join(outputdir, f))
+            upload_artifacts(
+                executor,
+                outputdir,
+                current_app.config[ARTIFACT_MULTIPART_THRESHOLD],
+            )
 
         executor.update_run_status(RunStateEnum.COMPLETED)
     except Exception as exc:
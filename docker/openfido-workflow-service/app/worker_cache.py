@@ -0,0 +1,328 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+import urllib
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from os.path import join
+from urllib.parse import urlsplit
+
+from celery.utils.log import get_task_logger
+
+# make the request lib mockable for testing:
+urllib_request = urllib.request
+
+logger = get_task_logger(__name__)
+
+
+@contextmanager
+def _locked(path, blocking=True):
+    """Hold an exclusive lock on path (shared by all worker processes).
+
+    Unless blocking is True, yields False instead of waiting for the lock when
+    another process holds it.
+    """
+    with open(path, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class GitMirrorCache:
+    """Bare mirrors of pipeline repositories, kept between runs.
+
+    Runs check out a worktree of the mirror rather than cloning the repository
+    each time; the mirror is only fetched to pick up new commits.
+    """
+
+    def __init__(self, directory):
+        self.directory = join(directory, "git")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def mirror_path(self, repository_url):
+        """ Location of the mirror of a repository. """
+        name = hashlib.sha256(repository_url.encode("utf-8")).hexdigest()
+        return join(self.directory, name)
+
+    def checkout(self, executor, repository_url, repository_branch, worktree):
+        """Check out repository_branch of a repository into worktree.
+
+        Returns the location of the mirror, which the worktree's .git file
+        refers to.
+        """
+        mirror = self.mirror_path(repository_url)
+
+        with _locked(f"{mirror}.lock"):
+            if os.path.exists(mirror):
+                executor.run("git fetch --prune origin", mirror)
+                # forget worktrees of earlier runs (their directories are gone).
+                executor.run("git worktree prune", mirror)
+            else:
+                # (cloned aside, so that a failed clone doesn't leave a broken
+                # mirror behind)
+                partial = f"{mirror}.{uuid.uuid4().hex}.tmp"
+                try:
+                    executor.run(
+                        f"git clone --mirror {repository_url} {partial}",
+                        self.directory,
+                    )
+                    os.rename(partial, mirror)
+                finally:
+                    shutil.rmtree(partial, ignore_errors=True)
+
+            executor.run(
+                f"git worktree add --detach {worktree} {repository_branch}", mirror
+            )
+
+        return mirror
+
+
+class DockerImageCache:
+    """Tracks the docker images pulled by this worker.
+
+    An image is only pulled again once it is older than ttl seconds (images
+    referenced by digest are never pulled again). When the images pulled by the
+    worker take up more than max_size bytes, the least recently used images are
+    removed.
+    """
+
+    def __init__(self, directory, ttl, max_size):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        os.makedirs(join(directory, "images"), exist_ok=True)
+        self.index_path = join(directory, "images.json")
+
+    def _image_lock_path(self, image):
+        name = hashlib.sha256(image.encode("utf-8")).hexdigest()
+        return join(self.directory, "images", f"{name}.lock")
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as index_file:
+                return json.load(index_file)
+        except FileNotFoundError:
+            return {}
+
+    def _save_index(self, index):
+        with open(f"{self.index_path}.tmp", "w") as index_file:
+            json.dump(index, index_file)
+        os.replace(f"{self.index_path}.tmp", self.index_path)
+
+    def _inspect(self, image):
+        """ Return the (id, size) of a local image, or None if it is missing. """
+        result = subprocess.run(
+            ["docker", "image", "inspect", "--format", "{{.Id}} {{.Size}}", image],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+        )
+        if result.returncode != 0:
+            return None
+
+        (image_id, size) = result.stdout.split()
+        return (image_id, int(size))
+
+    def _is_fresh(self, image, entry, now):
+        if entry is None or self._inspect(image) is None:
+            return False
+        if "@" in image:
+            return True
+
+        return now - entry["pulled_at"] < self.ttl
+
+    def _evict(self, index, keep):
+        """ Remove least recently used images until the cache fits max_size. """
+        by_use = sorted(index.items(), key=lambda item: item[1]["used_at"])
+        total = sum(entry["size"] for entry in index.values())
+        for (image, entry) in by_use:
+            if total <= self.max_size:
+                break
+            if image == keep:
+                continue
+
+            # (images that are being pulled right now are kept)
+            with _locked(self._image_lock_path(image), blocking=False) as locked:
+                if not locked:
+                    continue
+
+                logger.debug(f"evicting docker image {image}")
+                subprocess.run(
+                    ["docker", "rmi", image],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+            del index[image]
+            total -= entry["size"]
+
+    def pull(self, executor, image):
+        """Make sure image is available locally, pulling it if necessary.
+
+        Pulls of the same image wait for each other; the index is only locked
+        while it is read and updated, so different images are pulled at the
+        same time.
+        """
+        with _locked(self._image_lock_path(image)):
+            with _locked(f"{self.index_path}.lock"):
+                entry = self._load_index().get(image)
+            now = time.time()
+
+            if self._is_fresh(image, entry, now):
+                executor.update_run_output(f"Using cached image: {image}")
+            else:
+                executor.run(f"docker pull {image}", self.directory)
+                (image_id, size) = self._inspect(image) or (None, 0)
+                entry = {"id": image_id, "size": size, "pulled_at": now}
+
+            entry["used_at"] = now
+            with _locked(f"{self.index_path}.lock"):
+                index = self._load_index()
+                index[image] = entry
+                self._evict(index, image)
+                self._save_index(index)
+
+
+def _link(source, destination):
+    """ Hardlink source to destination, copying it when that isn't possible. """
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+class InputCache:
+    """Downloaded run inputs, keyed by their object location and ETag.
+
+    Workflows pass the artifacts of a pipeline run as inputs to several others,
+    so the same file is often downloaded by one worker many times. Inputs are
+    downloaded concurrently and hardlinked from the cache into each run's input
+    directory, which is mounted read-only into the pipeline's container. When
+    the cache takes up more than max_size bytes, the least recently used files
+    are removed.
+    """
+
+    def __init__(self, directory, max_size, workers):
+        self.directory = join(directory, "inputs")
+        self.max_size = max_size
+        self.workers = workers
+        os.makedirs(self.directory, exist_ok=True)
+        self.lock_path = join(self.directory, "evict.lock")
+
+    def _probe(self, url):
+        """ Return the (ETag, size) of a URL, without downloading all of it. """
+        request = urllib_request.Request(url, headers={"Range": "bytes=0-0"})
+        try:
+            with urllib_request.urlopen(request) as response:
+                headers = response.headers
+        except urllib.error.HTTPError as http_e:
+            # the range of an empty file can't be satisfied.
+            if http_e.code != 416:
+                raise
+            headers = http_e.headers
+
+        etag = headers.get("ETag")
+        content_range = headers.get("Content-Range")
+        if content_range is not None:
+            size = content_range.split("/")[-1]
+        else:
+            size = headers.get("Content-Length")
+
+        if size is None or not size.isdigit():
+            return (etag, None)
+        return (etag, int(size))
+
+    def _download(self, url, destination, size):
+        urllib_request.urlretrieve(url, destination)
+        if size is not None and os.path.getsize(destination) != size:
+            os.remove(destination)
+            raise ValueError(f"Downloaded size of {url} does not match {size}")
+
+    def _fetch(self, url, destination):
+        """Fetch one input into destination.
+
+        Returns True if the input was already cached.
+        """
+        (etag, size) = self._probe(url)
+        if etag is None:
+            # nothing identifies this version of the file, don't cache it.
+            self._download(url, destination, size)
+            return False
+
+        (scheme, netloc, path, _, _) = urlsplit(url)
+        key = f"{scheme}://{netloc}{path}\n{etag}"
+        cached = join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+        # (cached files are only looked at under the lock, so that they
+        # aren't evicted between being found and linked)
+        with _locked(self.lock_path):
+            hit = os.path.exists(cached) and size in (None, os.path.getsize(cached))
+            if hit:
+                # mark the file as recently used.
+                os.utime(cached)
+                _link(cached, destination)
+                return True
+
+        partial = f"{cached}.{uuid.uuid4().hex}.tmp"
+        try:
+            self._download(url, partial, size)
+            with _locked(self.lock_path):
+                os.replace(partial, cached)
+                _link(cached, destination)
+        finally:
+            # (a failed download doesn't leave its partial file behind)
+            if os.path.exists(partial):
+                os.remove(partial)
+        return False
+
+    def _evict(self):
+        """ Remove least recently used files until the cache fits max_size. """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp") or name.endswith(".lock"):
+                continue
+            stat = os.stat(join(self.directory, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for (_, size, _) in entries)
+        for (_, size, name) in sorted(entries):
+            if total <= self.max_size:
+                break
+            logger.debug(f"evicting input {name}")
+            os.remove(join(self.directory, name))
+            total -= size
+
+    def fetch(self, executor, input_files, input_directory):
+        """ Fetch all input_files into input_directory. """
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [
+                (
+                    input_file["name"],
+                    pool.submit(
+                        self._fetch,
+                        input_file["url"],
+                        join(input_directory, input_file["name"]),
+                    ),
+                )
+                for input_file in input_files
+            ]
+            for (name, future) in futures:
+                hit = future.result()
+                executor.update_run_output(
+                    f"Input {name}: {'cached' if hit else 'downloaded'}"
+                )
+
+        with _locked(self.lock_path):
+            self._evict()
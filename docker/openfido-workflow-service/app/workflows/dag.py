@@ -0,0 +1,91 @@
+class WorkflowDag:
+    """The dependencies between the pipelines of a workflow, as they were when
+    a WorkflowRun was created (see WorkflowRun.dag).
+
+    Nodes are WorkflowPipeline ids, and destinations lists the nodes that
+    depend on each node.
+    """
+
+    def __init__(self, destinations):
+        self.destinations = destinations
+
+    @classmethod
+    def compile(cls, workflow_pipeline_ids, dependencies):
+        """ Compile (from, to) WorkflowPipeline id pairs between some nodes. """
+        destinations = {
+            workflow_pipeline_id: [] for workflow_pipeline_id in workflow_pipeline_ids
+        }
+        for (from_id, to_id) in dependencies:
+            if from_id in destinations and to_id in destinations:
+                destinations[from_id].append(to_id)
+
+        return cls(destinations)
+
+    @classmethod
+    def from_dependencies(cls, dependencies):
+        """ Compile WorkflowPipelineDependencies between any nodes. """
+        destinations = {}
+        for dependency in dependencies:
+            destinations.setdefault(dependency.from_workflow_pipeline_id, []).append(
+                dependency.to_workflow_pipeline_id
+            )
+            destinations.setdefault(dependency.to_workflow_pipeline_id, [])
+
+        return cls(destinations)
+
+    @classmethod
+    def from_json(cls, dag_json):
+        return cls(
+            {
+                int(workflow_pipeline_id): destinations
+                for (workflow_pipeline_id, destinations) in dag_json.items()
+            }
+        )
+
+    def to_json(self):
+        return {
+            str(workflow_pipeline_id): destinations
+            for (workflow_pipeline_id, destinations) in self.destinations.items()
+        }
+
+    def in_degrees(self):
+        """ The number of sources of each node. """
+        in_degrees = {
+            workflow_pipeline_id: 0 for workflow_pipeline_id in self.destinations
+        }
+        for destinations in self.destinations.values():
+            for workflow_pipeline_id in destinations:
+                in_degrees[workflow_pipeline_id] += 1
+
+        return in_degrees
+
+    def reaches(self, from_id, to_id):
+        """ Returns True when there is a path from from_id to to_id. """
+        seen = {from_id}
+        stack = [from_id]
+        while len(stack) > 0:
+            workflow_pipeline_id = stack.pop()
+            if workflow_pipeline_id == to_id:
+                return True
+            for dest_id in self.destinations.get(workflow_pipeline_id, []):
+                if dest_id not in seen:
+                    seen.add(dest_id)
+                    stack.append(dest_id)
+
+        return False
+
+    def add_dependency(self, from_id, to_id):
+        """Add a dependency, unless it would introduce a cycle.
+
+        Only the nodes reachable from to_id are visited. Returns False when
+        from_id is one of them.
+        """
+        if self.reaches(to_id, from_id):
+            return False
+
+        self.destinations.setdefault(from_id, []).append(to_id)
+        self.destinations.setdefault(to_id, [])
+        return True
+
+    def remove_dependency(self, from_id, to_id):
+        self.destinations[from_id].remove(to_id)
@@ -1,6 +1,9 @@
+from datetime import datetime
+
 from application_roles.model_utils import CommonColumnsMixin, get_db
 
-from ..model_utils import RunStateEnum
+from ..model_utils import RunStateEnum, find_run_state_enum
+from .dag import WorkflowDag
 
 db = get_db()
 
@@ -13,6 +16,9 @@ class Workflow(CommonColumnsMixin, db.Model):
     name = db.Column(db.String(50), nullable=False)
     description = db.Column(db.String(300), nullable=False)
     is_deleted = db.Column(db.Boolean(), default=False, nullable=False)
+    # (the organization of the app service that owns the workflow; its
+    # workflows share WORKFLOW_ORGANIZATION_MAX_RUNNING_PIPELINES)
+    organization_uuid = db.Column(db.String(32), nullable=True, index=True)
 
     workflow_pipelines = db.relationship(
         "WorkflowPipeline", backref="workflow", lazy="select"
@@ -25,8 +31,12 @@ class WorkflowPipeline(CommonColumnsMixin, db.Model):
 
     __tablename__ = "workflowpipeline"
 
-    pipeline_id = db.Column(db.Integer, db.ForeignKey("pipeline.id"), nullable=False)
-    workflow_id = db.Column(db.Integer, db.ForeignKey("workflow.id"), nullable=False)
+    pipeline_id = db.Column(
+        db.Integer, db.ForeignKey("pipeline.id"), nullable=False, index=True
+    )
+    workflow_id = db.Column(
+        db.Integer, db.ForeignKey("workflow.id"), nullable=False, index=True
+    )
     is_deleted = db.Column(db.Boolean(), default=False, nullable=False)
 
     source_workflow_pipelines = db.relationship(
@@ -56,11 +66,11 @@ class WorkflowPipelineDependency(CommonColumnsMixin, db.Model):
     __tablename__ = "workflowpipelinedependency"
 
     from_workflow_pipeline_id = db.Column(
-        db.Integer, db.ForeignKey("workflowpipeline.id"), nullable=False
+        db.Integer, db.ForeignKey("workflowpipeline.id"), nullable=False, index=True
     )
 
     to_workflow_pipeline_id = db.Column(
-        db.Integer, db.ForeignKey("workflowpipeline.id"), nullable=False
+        db.Integer, db.ForeignKey("workflowpipeline.id"), nullable=False, index=True
     )
 
     def __repr__(self):
@@ -72,18 +82,51 @@ class WorkflowRun(CommonColumnsMixin, db.Model):
 
     __tablename__ = "workflowrun"
 
-    workflow_id = db.Column(db.Integer, db.ForeignKey("workflow.id"), nullable=False)
+    workflow_id = db.Column(
+        db.Integer, db.ForeignKey("workflow.id"), nullable=False, index=True
+    )
+
+    # the code of the last run state, see add_run_state().
+    current_state = db.Column(db.Integer, nullable=True)
+    state_changed_at = db.Column(db.DateTime, nullable=True)
+
+    # the WorkflowDag of the workflow when this run was created, and how many
+    # of its pipeline runs haven't completed yet.
+    dag = db.Column(db.JSON, nullable=True)
+    pending_pipeline_runs = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
 
     workflow_run_states = db.relationship(
-        "WorkflowRunState", backref="workflow_run", lazy="select"
+        "WorkflowRunState",
+        backref="workflow_run",
+        lazy="select",
+        order_by="WorkflowRunState.id",
     )
     workflow_pipeline_runs = db.relationship(
         "WorkflowPipelineRun", backref="workflow_run", lazy="select"
     )
 
+    __table_args__ = (
+        db.Index(
+            "ix_workflowrun_current_state",
+            "current_state",
+            "state_changed_at",
+        ),
+    )
+
+    def add_run_state(self, workflow_run_state):
+        """ Add a state to this run, making it the current state. """
+        workflow_run_state.workflow_run = self
+        self.current_state = workflow_run_state.run_state_enum().value
+        self.state_changed_at = datetime.utcnow()
+
     def run_state_enum(self):
         """ Return the current stat of this run (the last run state) """
-        return self.workflow_run_states[-1].run_state_enum()
+        return RunStateEnum(self.current_state)
+
+    def workflow_dag(self):
+        return WorkflowDag.from_json(self.dag or {})
 
 
 class WorkflowRunState(CommonColumnsMixin, db.Model):
@@ -92,7 +135,7 @@ class WorkflowRunState(CommonColumnsMixin, db.Model):
     __tablename__ = "workflowrunstate"
 
     workflow_run_id = db.Column(
-        db.Integer, db.ForeignKey("workflowrun.id"), nullable=False
+        db.Integer, db.ForeignKey("workflowrun.id"), nullable=False, index=True
     )
     run_state_type_id = db.Column(
         db.Integer, db.ForeignKey("runstatetype.id"), nullable=False
@@ -100,7 +143,7 @@ class WorkflowRunState(CommonColumnsMixin, db.Model):
 
     def run_state_enum(self):
         """ Return the current stat of this run """
-        return RunStateEnum(self.run_state_type.code)
+        return find_run_state_enum(self.run_state_type_id)
 
 
 class WorkflowPipelineRun(CommonColumnsMixin, db.Model):
@@ -109,13 +152,19 @@ class WorkflowPipelineRun(CommonColumnsMixin, db.Model):
     __tablename__ = "workflowpipelinerun"
 
     workflow_run_id = db.Column(
-        db.Integer, db.ForeignKey("workflowrun.id"), nullable=False
+        db.Integer, db.ForeignKey("workflowrun.id"), nullable=False, index=True
     )
     pipeline_run_id = db.Column(
-        db.Integer, db.ForeignKey("pipelinerun.id"), nullable=False
+        db.Integer, db.ForeignKey("pipelinerun.id"), nullable=False, index=True
     )
     workflow_pipeline_id = db.Column(
-        db.Integer, db.ForeignKey("workflowpipeline.id"), nullable=False
+        db.Integer, db.ForeignKey("workflowpipeline.id"), nullable=False, index=True
+    )
+
+    # how many of the sources of this run (in WorkflowRun.dag) haven't
+    # completed yet: it is started when none remain.
+    pending_sources = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
     )
 
     def run_state_enum(self):
@@ -1,17 +1,38 @@
-from sqlalchemy import and_, or_
-
-import networkx as nx
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
 
+from ..model_utils import RunStateEnum
+from ..pipelines.models import PipelineRun
 from .models import (
     db,
     Workflow,
     WorkflowPipeline,
     WorkflowPipelineDependency,
+    WorkflowPipelineRun,
     WorkflowRun,
 )
 from .schemas import SearchWorkflowsSchema
 
 
+# Everything WorkflowRunSchema shows of a WorkflowRun, including the pipeline
+# runs of the workflow run (backrefs are named by key).
+WORKFLOW_RUN_LOADERS = (
+    selectinload(WorkflowRun.workflow_run_states),
+    selectinload(WorkflowRun.workflow_pipeline_runs)
+    .joinedload("pipeline_run")
+    .joinedload("pipeline"),
+    selectinload(WorkflowRun.workflow_pipeline_runs)
+    .joinedload("pipeline_run")
+    .selectinload(PipelineRun.pipeline_run_states),
+    selectinload(WorkflowRun.workflow_pipeline_runs)
+    .joinedload("pipeline_run")
+    .selectinload(PipelineRun.pipeline_run_inputs),
+    selectinload(WorkflowRun.workflow_pipeline_runs)
+    .joinedload("pipeline_run")
+    .selectinload(PipelineRun.pipeline_run_artifacts),
+)
+
+
 def find_workflow(uuid):
     """ Find a workflow. """
     return Workflow.query.filter(
@@ -71,70 +92,60 @@ def find_workflow_pipeline_dependencies(workflow_uuid):
     )
 
 
-def find_workflow_pipeline_dependency(
-    workflow_pipeline, another_pipeline, is_another_source
-):
-    from_wp = workflow_pipeline
-    to_wp = another_pipeline
-    if is_another_source:
-        from_wp = another_pipeline
-        to_wp = workflow_pipeline
+def find_workflow_pipelines(workflow):
+    """ Find the WorkflowPipelines of a workflow, with their pipelines. """
+    return (
+        WorkflowPipeline.query.options(joinedload("pipeline"))
+        .filter(
+            WorkflowPipeline.workflow_id == workflow.id,
+            WorkflowPipeline.is_deleted == False,
+        )
+        .order_by(WorkflowPipeline.id)
+        .all()
+    )
 
-    return WorkflowPipelineDependency.query.filter(
-        WorkflowPipelineDependency.from_workflow_pipeline == from_wp,
-        WorkflowPipelineDependency.to_workflow_pipeline == to_wp,
-    ).one_or_none()
 
+def find_workflow_graph(workflow):
+    """Return the pipelines of a workflow and the pipelines they depend on, in
+    the format of WorkflowGraphSchema.
+    """
+    workflow_pipelines = find_workflow_pipelines(workflow)
+    pipeline_uuids = {wp.id: wp.pipeline.uuid for wp in workflow_pipelines}
+    dependencies = {wp.id: [] for wp in workflow_pipelines}
+    for dependency in find_workflow_pipeline_dependencies(workflow.uuid).order_by(
+        WorkflowPipelineDependency.id
+    ):
+        if dependency.from_workflow_pipeline_id in pipeline_uuids:
+            dependencies[dependency.to_workflow_pipeline_id].append(
+                pipeline_uuids[dependency.from_workflow_pipeline_id]
+            )
 
-def is_dag(workflow, from_workflow_pipeline=None, to_workflow_pipeline=None):
-    """Returns True if the graph supplied a directed acyclic graph and adding a
-    new edge would not introduce a cycle."""
+    return {
+        "pipelines": [
+            {
+                "pipeline_uuid": wp.pipeline.uuid,
+                "workflow_pipeline_uuid": wp.uuid,
+                "dependencies": dependencies[wp.id],
+            }
+            for wp in workflow_pipelines
+        ]
+    }
 
-    dependencies = find_workflow_pipeline_dependencies(workflow.uuid)
-    digraph = nx.DiGraph()
-    for dependency in dependencies:
-        digraph.add_edge(
-            dependency.from_workflow_pipeline_id, dependency.to_workflow_pipeline_id
-        )
 
-    if from_workflow_pipeline is not None and to_workflow_pipeline is not None:
-        digraph.add_edge(from_workflow_pipeline.id, to_workflow_pipeline.id)
-
-    return nx.is_directed_acyclic_graph(digraph)
-
-
-def find_dest_workflow_runs(workflow_pipeline_run):
-    """Find all PipelineRuns.dest_workflow_pipelines of a WorkflowPipelineRun"""
-    workflow_run = workflow_pipeline_run.workflow_run
-    result = []
-    for dest_wp in workflow_pipeline_run.workflow_pipeline.dest_workflow_pipelines:
-        if dest_wp.to_workflow_pipeline.is_deleted:
-            continue
-        result.extend(
-            [
-                wpr.pipeline_run
-                for wpr in dest_wp.to_workflow_pipeline.workflow_pipeline_runs
-                if wpr.workflow_run == workflow_run
-            ]
-        )
-    return result
-
-
-def find_source_workflow_runs(workflow_pipeline_run):
-    """Find all PipelineRuns.source_workflow_pipelines of a WorkflowPipelineRun"""
-    workflow_run = workflow_pipeline_run.workflow_run
-    result = []
-    for dest_wp in workflow_pipeline_run.workflow_pipeline.source_workflow_pipelines:
-        if dest_wp.from_workflow_pipeline.is_deleted:
-            continue
-        result.extend(
-            [
-                wpr.pipeline_run
-                for wpr in dest_wp.from_workflow_pipeline.workflow_pipeline_runs
-                if wpr.workflow_run == workflow_run
-            ]
+def find_workflow_pipeline_runs(workflow_run, workflow_pipeline_ids):
+    """ Find the WorkflowPipelineRuns of a WorkflowRun for some of its pipelines. """
+    if len(workflow_pipeline_ids) == 0:
+        return []
+
+    return (
+        WorkflowPipelineRun.query.options(joinedload("pipeline_run"))
+        .filter(
+            WorkflowPipelineRun.workflow_run_id == workflow_run.id,
+            WorkflowPipelineRun.workflow_pipeline_id.in_(workflow_pipeline_ids),
         )
-    return result
+        .order_by(WorkflowPipelineRun.id)
+        .all()
+    )
 
 
 def pipeline_has_workflow_pipeline(pipeline_id):
@@ -155,6 +166,7 @@ def find_workflow_run(workflow_run_uuid):
     """ Find a WorkflowRun. """
     return (
         WorkflowRun.query.join(Workflow)
+        .options(*WORKFLOW_RUN_LOADERS)
         .filter(
             and_(
                 WorkflowRun.uuid == workflow_run_uuid,
@@ -163,3 +175,83 @@ def find_workflow_run(workflow_run_uuid):
         )
         .one_or_none()
     )
+
+
+def find_workflow_runs_by_state(run_state_enums):
+    """Find the WorkflowRuns currently in any of run_state_enums.
+
+    Runs are ordered by when they changed to their current state, oldest first.
+    """
+    return (
+        WorkflowRun.query.join(Workflow)
+        .filter(
+            and_(
+                WorkflowRun.current_state.in_([rse.value for rse in run_state_enums]),
+                Workflow.is_deleted == False,
+            )
+        )
+        .order_by(WorkflowRun.state_changed_at, WorkflowRun.id)
+    )
+
+
+# WorkflowRuns whose PipelineRuns may still be started.
+UNFINISHED_WORKFLOW_RUN_STATES = [
+    RunStateEnum.NOT_STARTED.value,
+    RunStateEnum.RUNNING.value,
+]
+
+
+def find_ready_workflow_pipeline_runs(workflows):
+    """Find the WorkflowPipelineRuns of workflows that are waiting to be
+    started: their PipelineRun is QUEUED and none of their sources are pending.
+
+    Only unfinished WorkflowRuns are looked at. Runs are ordered by when they
+    were created, oldest first.
+    """
+    return (
+        WorkflowPipelineRun.query.join(WorkflowRun)
+        .join(PipelineRun, PipelineRun.id == WorkflowPipelineRun.pipeline_run_id)
+        .options(contains_eager("pipeline_run"), contains_eager("workflow_run"))
+        .filter(
+            WorkflowRun.workflow_id.in_([workflow.id for workflow in workflows]),
+            WorkflowRun.current_state.in_(UNFINISHED_WORKFLOW_RUN_STATES),
+            WorkflowPipelineRun.pending_sources == 0,
+            PipelineRun.current_state == RunStateEnum.QUEUED.value,
+        )
+        .order_by(WorkflowPipelineRun.id)
+        .all()
+    )
+
+
+def find_started_pipeline_run_counts(workflows, started_after=None):
+    """Return the number of NOT_STARTED or RUNNING PipelineRuns of each
+    unfinished WorkflowRun of workflows, by (Workflow id, WorkflowRun id).
+
+    When started_after is given, runs that have been in their state since
+    before then are not counted.
+    """
+    query = (
+        db.session.query(
+            WorkflowRun.workflow_id,
+            WorkflowPipelineRun.workflow_run_id,
+            func.count(WorkflowPipelineRun.id),
+        )
+        .join(WorkflowRun)
+        .join(PipelineRun, PipelineRun.id == WorkflowPipelineRun.pipeline_run_id)
+        .filter(
+            WorkflowRun.workflow_id.in_([workflow.id for workflow in workflows]),
+            WorkflowRun.current_state.in_(UNFINISHED_WORKFLOW_RUN_STATES),
+            PipelineRun.current_state.in_(
+                [RunStateEnum.NOT_STARTED.value, RunStateEnum.RUNNING.value]
+            ),
+        )
+    )
+    if started_after is not None:
+        query = query.filter(PipelineRun.state_changed_at >= started_after)
+
+    return {
+        (workflow_id, workflow_run_id): count
+        for (workflow_id, workflow_run_id, count) in query.group_by(
+            WorkflowRun.workflow_id, WorkflowPipelineRun.workflow_run_id
+        )
+    }
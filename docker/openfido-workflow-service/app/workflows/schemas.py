@@ -30,6 +30,7 @@ class CreateWorkflowSchema(Schema):
     description = fields.Str(
         required=True, validate=validate.Length(max=Workflow.description.type.length)
     )
+    organization_uuid = UUID(missing=None, allow_none=True)
 
 
 class CreateWorkflowPipelineSchema(Schema):
@@ -40,6 +41,20 @@ class CreateWorkflowPipelineSchema(Schema):
     destination_workflow_pipelines = fields.List(UUID(), required=True)
 
 
+class WorkflowGraphPipelineSchema(Schema):
+    """ A pipeline of a workflow graph, and the pipelines it depends on. """
+
+    pipeline_uuid = UUID(required=True)
+    workflow_pipeline_uuid = UUID(dump_only=True)
+    dependencies = fields.List(UUID(), missing=[])
+
+
+class WorkflowGraphSchema(Schema):
+    """ Schema for update_workflow_graph() service. """
+
+    pipelines = fields.Nested(WorkflowGraphPipelineSchema, many=True, required=True)
+
+
 class WorkflowPipelineSchema(Schema):
     """ Serialized public view of a WorkflowPipeline. """
 
@@ -1,16 +1,26 @@
 import logging
+from datetime import datetime, timedelta
 
+from flask import current_app
+
+from app.constants import (
+    WORKFLOW_MAX_RUNNING_PIPELINES,
+    WORKFLOW_ORGANIZATION_MAX_RUNNING_PIPELINES,
+    WORKFLOW_RUN_MAX_RUNNING_PIPELINES,
+    WORKFLOW_STARTED_PIPELINE_TIMEOUT,
+)
 from app.model_utils import RunStateEnum
-from app.pipelines.queries import find_pipeline, find_run_state_type
+from app.pipelines.queries import find_pipeline, find_pipelines, find_run_state_type_id
 from app.pipelines.schemas import CreateRunSchema
 from app.pipelines.services import (
     copy_pipeline_run_artifact,
     create_pipeline_run,
-    start_pipeline_run,
+    start_pipeline_runs,
     update_pipeline_run_state,
 )
 from marshmallow.exceptions import ValidationError
 
+from .dag import WorkflowDag
 from .models import (
     Workflow,
     WorkflowPipeline,
@@ -21,14 +31,20 @@ from .models import (
     db,
 )
 from .queries import (
-    find_dest_workflow_runs,
-    find_source_workflow_runs,
+    find_ready_workflow_pipeline_runs,
+    find_started_pipeline_run_counts,
     find_workflow,
     find_workflow_pipeline,
-    find_workflow_pipeline_dependency,
-    is_dag,
+    find_workflow_pipeline_dependencies,
+    find_workflow_pipeline_runs,
+    find_workflow_pipelines,
+    find_workflow_runs_by_state,
+)
+from .schemas import (
+    CreateWorkflowPipelineSchema,
+    CreateWorkflowSchema,
+    WorkflowGraphSchema,
 )
-from .schemas import CreateWorkflowPipelineSchema, CreateWorkflowSchema
 
 logger = logging.getLogger("workflow-services")
 
@@ -40,6 +56,7 @@ def create_workflow(workflow_json):
     workflow = Workflow(
         name=data["name"],
         description=data["description"],
+        organization_uuid=data["organization_uuid"],
     )
     db.session.add(workflow)
     db.session.commit()
@@ -57,6 +74,8 @@ def update_workflow(workflow_uuid, workflow_json):
 
     workflow.name = data["name"]
     workflow.description = data["description"]
+    if data["organization_uuid"] is not None:
+        workflow.organization_uuid = data["organization_uuid"]
     db.session.commit()
 
     return workflow
@@ -73,7 +92,7 @@ def delete_workflow(workflow_uuid):
 
 
 def _add_dependency(
-    workflow_pipeline, another_workflow_pipeline_uuid, is_another_source
+    dag, workflow_pipeline, another_workflow_pipeline_uuid, is_another_source
 ):
     """ Add a WorkflowPipelineDependency to workflow_pipeline as a source or destination. """
     another_workflow_pipeline = find_workflow_pipeline(another_workflow_pipeline_uuid)
@@ -82,12 +101,13 @@ def _add_dependency(
         db.session.rollback()
         raise ValueError(f"WorkflowPipeline {another_workflow_pipeline_uuid} not found")
 
-    workflow = another_workflow_pipeline.workflow
-    dag_args = [workflow, another_workflow_pipeline, workflow_pipeline]
+    from_wp = workflow_pipeline
+    to_wp = another_workflow_pipeline
     if is_another_source:
-        dag_args = [workflow, workflow_pipeline, another_workflow_pipeline]
+        from_wp = another_workflow_pipeline
+        to_wp = workflow_pipeline
 
-    if not is_dag(*dag_args):
+    if not dag.add_dependency(from_wp.id, to_wp.id):
         db.session.rollback()
         error_key = "source_workflow_pipelines"
         if is_another_source:
@@ -96,27 +116,49 @@ def _add_dependency(
             {error_key: f"Adding {another_workflow_pipeline_uuid} introduces a cycle."}
         )
 
-    wpd_qargs = {
-        "from_workflow_pipeline": workflow_pipeline,
-        "to_workflow_pipeline": another_workflow_pipeline,
-    }
-    if is_another_source:
-        wpd_qargs = {
-            "from_workflow_pipeline": another_workflow_pipeline,
-            "to_workflow_pipeline": workflow_pipeline,
-        }
+    db.session.add(
+        WorkflowPipelineDependency(
+            from_workflow_pipeline=from_wp, to_workflow_pipeline=to_wp
+        )
+    )
 
-    db.session.add(WorkflowPipelineDependency(**wpd_qargs))
 
+def _update_dependencies(workflow_pipeline, source_uuids, dest_uuids):
+    """Replace the sources and destinations of workflow_pipeline.
 
-def _remove_dependency(
-    workflow_pipeline, another_workflow_pipeline_uuid, is_another_source
-):
-    another_workflow_pipeline = find_workflow_pipeline(another_workflow_pipeline_uuid)
-    dependency = find_workflow_pipeline_dependency(
-        workflow_pipeline, another_workflow_pipeline, is_another_source
+    The dependencies of its workflow are loaded once: removed ones are
+    dropped before each new one is checked for cycles against the others.
+    """
+    db.session.flush()
+    dag = WorkflowDag.from_dependencies(
+        find_workflow_pipeline_dependencies(workflow_pipeline.workflow.uuid)
     )
-    db.session.delete(dependency)
+
+    existing_sources = {
+        wpd.from_workflow_pipeline.uuid: wpd
+        for wpd in workflow_pipeline.source_workflow_pipelines
+    }
+    existing_dests = {
+        wpd.to_workflow_pipeline.uuid: wpd
+        for wpd in workflow_pipeline.dest_workflow_pipelines
+    }
+    for (existing, new) in [
+        (existing_sources, source_uuids),
+        (existing_dests, dest_uuids),
+    ]:
+        for workflow_pipeline_uuid in existing.keys() - set(new):
+            dependency = existing[workflow_pipeline_uuid]
+            dag.remove_dependency(
+                dependency.from_workflow_pipeline_id, dependency.to_workflow_pipeline_id
+            )
+            db.session.delete(dependency)
+
+    for workflow_pipeline_uuid in dict.fromkeys(source_uuids):
+        if workflow_pipeline_uuid not in existing_sources:
+            _add_dependency(dag, workflow_pipeline, workflow_pipeline_uuid, True)
+    for workflow_pipeline_uuid in dict.fromkeys(dest_uuids):
+        if workflow_pipeline_uuid not in existing_dests:
+            _add_dependency(dag, workflow_pipeline, workflow_pipeline_uuid, False)
 
 
 def create_workflow_pipeline(workflow_uuid, pipeline_json):
@@ -134,11 +176,11 @@ def create_workflow_pipeline(workflow_uuid, pipeline_json):
     workflow_pipeline = WorkflowPipeline(workflow=workflow, pipeline=pipeline)
     db.session.add(workflow_pipeline)
 
-    for workflow_pipeline_uuid in data["source_workflow_pipelines"]:
-        _add_dependency(workflow_pipeline, workflow_pipeline_uuid, True)
-
-    for workflow_pipeline_uuid in data["destination_workflow_pipelines"]:
-        _add_dependency(workflow_pipeline, workflow_pipeline_uuid, False)
+    _update_dependencies(
+        workflow_pipeline,
+        data["source_workflow_pipelines"],
+        data["destination_workflow_pipelines"],
+    )
 
     db.session.commit()
 
@@ -162,37 +204,105 @@ def update_workflow_pipeline(workflow_uuid, workflow_pipeline_uuid, pipeline_jso
         raise ValueError(f"Pipeline {pipeline} not found")
     workflow_pipeline.pipeline = pipeline
 
-    existing_sources = {
-        wp.from_workflow_pipeline.uuid
-        for wp in workflow_pipeline.source_workflow_pipelines
-    }
-    new_sources = set(data["source_workflow_pipelines"])
-    for new_workflow_pipeline_uuid in new_sources - existing_sources:
-        _add_dependency(workflow_pipeline, new_workflow_pipeline_uuid, True)
-    for new_workflow_pipeline_uuid in existing_sources - new_sources:
-        _remove_dependency(workflow_pipeline, new_workflow_pipeline_uuid, True)
+    _update_dependencies(
+        workflow_pipeline,
+        data["source_workflow_pipelines"],
+        data["destination_workflow_pipelines"],
+    )
 
-    existing_dests = {
-        wp.to_workflow_pipeline.uuid for wp in workflow_pipeline.dest_workflow_pipelines
+    db.session.commit()
+
+    return workflow_pipeline
+
+
+def update_workflow_graph(workflow_uuid, graph_json):
+    """Replace the WorkflowPipelines of a workflow and their dependencies.
+
+    Pipelines identify the nodes of the graph: the WorkflowPipelines of those
+    already in the workflow are kept, and the others are created or deleted.
+    The whole graph is checked for cycles before any change is committed.
+    """
+    workflow = find_workflow(workflow_uuid)
+    if workflow is None:
+        raise ValueError("no workflow found")
+
+    data = WorkflowGraphSchema().load(graph_json)
+
+    dag = WorkflowDag({})
+    for node in data["pipelines"]:
+        if node["pipeline_uuid"] in dag.destinations:
+            raise ValidationError(
+                {"pipelines": f"Pipeline {node['pipeline_uuid']} is repeated."}
+            )
+        dag.destinations[node["pipeline_uuid"]] = []
+    for node in data["pipelines"]:
+        for pipeline_uuid in dict.fromkeys(node["dependencies"]):
+            if pipeline_uuid not in dag.destinations:
+                raise ValidationError(
+                    {"pipelines": f"Dependency {pipeline_uuid} is not in the graph."}
+                )
+            if not dag.add_dependency(pipeline_uuid, node["pipeline_uuid"]):
+                raise ValidationError(
+                    {"pipelines": f"Depending on {pipeline_uuid} introduces a cycle."}
+                )
+
+    pipelines = {
+        pipeline.uuid: pipeline
+        for pipeline in find_pipelines({"uuids": list(dag.destinations)})
     }
-    new_dests = set(data["destination_workflow_pipelines"])
-    for new_workflow_pipeline_uuid in new_dests - existing_dests:
-        _add_dependency(workflow_pipeline, new_workflow_pipeline_uuid, False)
-    for new_workflow_pipeline_uuid in existing_dests - new_dests:
-        _remove_dependency(workflow_pipeline, new_workflow_pipeline_uuid, False)
+    for pipeline_uuid in dag.destinations:
+        if pipeline_uuid not in pipelines:
+            raise ValueError(f"Pipeline {pipeline_uuid} not found")
+
+    workflow_pipelines = {}
+    for workflow_pipeline in find_workflow_pipelines(workflow):
+        pipeline_uuid = workflow_pipeline.pipeline.uuid
+        if pipeline_uuid in workflow_pipelines:
+            raise ValidationError(
+                {"pipelines": f"Pipeline {pipeline_uuid} is repeated in the workflow."}
+            )
+        workflow_pipelines[pipeline_uuid] = workflow_pipeline
+
+    for (pipeline_uuid, workflow_pipeline) in workflow_pipelines.items():
+        if pipeline_uuid not in dag.destinations:
+            workflow_pipeline.is_deleted = True
+    for pipeline_uuid in dag.destinations:
+        if pipeline_uuid not in workflow_pipelines:
+            workflow_pipelines[pipeline_uuid] = WorkflowPipeline(
+                workflow=workflow, pipeline=pipelines[pipeline_uuid]
+            )
+            db.session.add(workflow_pipelines[pipeline_uuid])
+    db.session.flush()
+
+    # the dependencies of deleted WorkflowPipelines are removed as well.
+    dependencies = dict.fromkeys(
+        (workflow_pipelines[from_uuid].id, workflow_pipelines[to_uuid].id)
+        for (from_uuid, to_uuids) in dag.destinations.items()
+        for to_uuid in to_uuids
+    )
+    existing_dependencies = {
+        (wpd.from_workflow_pipeline_id, wpd.to_workflow_pipeline_id): wpd
+        for wpd in find_workflow_pipeline_dependencies(workflow.uuid)
+    }
+    for (key, dependency) in existing_dependencies.items():
+        if key not in dependencies:
+            db.session.delete(dependency)
+    for (from_id, to_id) in dependencies:
+        if (from_id, to_id) not in existing_dependencies:
+            db.session.add(
+                WorkflowPipelineDependency(
+                    from_workflow_pipeline_id=from_id, to_workflow_pipeline_id=to_id
+                )
+            )
 
     db.session.commit()
 
-    return workflow_pipeline
+    return workflow
 
 
 def create_workflow_run_state(run_state_enum):
     """ Create a new WorkflowRunState """
-    run_state_type = find_run_state_type(run_state_enum)
-    workflow_run_state = WorkflowRunState()
-    run_state_type.workflow_run_states.append(workflow_run_state)
-
-    return workflow_run_state
+    return WorkflowRunState(run_state_type_id=find_run_state_type_id(run_state_enum))
 
 
 def update_workflow_run_state(workflow_run, run_state_enum):
@@ -209,7 +319,7 @@ def update_workflow_run_state(workflow_run, run_state_enum):
             f"Invalid state transition: {workflow_run.run_state_enum().name}->{run_state_enum.name}"
         )
 
-    workflow_run.workflow_run_states.append(create_workflow_run_state(run_state_enum))
+    workflow_run.add_run_state(create_workflow_run_state(run_state_enum))
     db.session.commit()
     return workflow_run
 
@@ -223,24 +333,33 @@ def create_workflow_run(workflow_uuid, run_json):
         raise ValueError("no workflow found")
 
     workflow_run = WorkflowRun(workflow=workflow)
-    workflow_run.workflow_run_states.append(
-        WorkflowRunState(run_state_type=find_run_state_type(RunStateEnum.NOT_STARTED))
+    workflow_run.add_run_state(create_workflow_run_state(RunStateEnum.NOT_STARTED))
+
+    workflow_pipelines = [wp for wp in workflow.workflow_pipelines if not wp.is_deleted]
+    dag = WorkflowDag.compile(
+        [wp.id for wp in workflow_pipelines],
+        [
+            (wpd.from_workflow_pipeline_id, wpd.to_workflow_pipeline_id)
+            for wpd in find_workflow_pipeline_dependencies(workflow.uuid)
+        ],
     )
+    workflow_run.dag = dag.to_json()
+    workflow_run.pending_pipeline_runs = len(workflow_pipelines)
+    in_degrees = dag.in_degrees()
 
     added_run = False
-    for workflow_pipeline in workflow.workflow_pipelines:
-        if workflow_pipeline.is_deleted:
-            continue
-        queue_run = len(workflow_pipeline.source_workflow_pipelines) > 0
+    for workflow_pipeline in workflow_pipelines:
+        in_degree = in_degrees[workflow_pipeline.id]
         no_input_data = {"callback_url": data["callback_url"], "inputs": []}
-        run_data = no_input_data if queue_run else data
+        run_data = no_input_data if in_degree > 0 else data
         pipeline_run = create_pipeline_run(
-            workflow_pipeline.pipeline.uuid, run_data, queue_run
+            workflow_pipeline.pipeline.uuid, run_data, True
         )
         workflow_pipeline_run = WorkflowPipelineRun(
             workflow_run=workflow_run,
             pipeline_run=pipeline_run,
             workflow_pipeline=workflow_pipeline,
+            pending_sources=in_degree,
         )
         db.session.add(workflow_pipeline_run)
         added_run = True
@@ -252,6 +371,9 @@ def create_workflow_run(workflow_uuid, run_json):
     db.session.add(workflow_run)
     db.session.commit()
 
+    start_ready_workflow_pipeline_runs(workflow)
+    db.session.add(workflow_run)
+
     return workflow_run
 
 
@@ -295,7 +417,10 @@ def update_workflow_run(pipeline_run):
                 apply_to_workflow_run=False,
             )
 
-        return update_workflow_run_state(workflow_run, RunStateEnum.CANCELLED)
+        update_workflow_run_state(workflow_run, RunStateEnum.CANCELLED)
+        start_ready_workflow_pipeline_runs(workflow_run.workflow)
+        db.session.add(workflow_run)
+        return workflow_run
 
     if pipeline_run.run_state_enum() != RunStateEnum.COMPLETED:
         error = f"Unexpected state encountered: {pipeline_run.run_state_enum()}"
@@ -303,22 +428,108 @@ def update_workflow_run(pipeline_run):
         raise ValueError(error)
 
     # When a PipelineRun has COMPLETED we can continue the workflow:
-    #  1. Pass its artifacts onward to any dest_workflow_pipelines
-    #  2. Start new PipelineRuns for those pipelines.
-    #  3. If there are none remaining, then this WorkflowRun is finished!
-
-    for run in find_dest_workflow_runs(workflow_pipeline_run):
+    #  1. Pass its artifacts onward to its destinations in the run's dag.
+    #  2. If there are no pending runs remaining, then this WorkflowRun is finished!
+    #  3. Start the runs that have no other pending sources, as slots allow.
+    destinations = workflow_run.workflow_dag().destinations.get(
+        workflow_pipeline_run.workflow_pipeline_id, []
+    )
+    for dest_workflow_pipeline_run in find_workflow_pipeline_runs(
+        workflow_run, destinations
+    ):
+        run = dest_workflow_pipeline_run.pipeline_run
         for artifact in pipeline_run.pipeline_run_artifacts:
             copy_pipeline_run_artifact(artifact, run)
 
-        sources = find_source_workflow_runs(run.workflow_pipeline_run)
-        if set([s.run_state_enum() for s in sources]) == set([RunStateEnum.COMPLETED]):
-            start_pipeline_run(run)
+        # (decremented in the database: sources can complete concurrently)
+        dest_workflow_pipeline_run.pending_sources = (
+            WorkflowPipelineRun.pending_sources - 1
+        )
 
-    run_states = [
-        wpr.pipeline_run.run_state_enum() for wpr in workflow_run.workflow_pipeline_runs
-    ]
-    if set(run_states) == set([RunStateEnum.COMPLETED]):
-        return update_workflow_run_state(workflow_run, RunStateEnum.COMPLETED)
+    workflow_run.pending_pipeline_runs = WorkflowRun.pending_pipeline_runs - 1
+    db.session.flush()
+    if workflow_run.pending_pipeline_runs == 0:
+        update_workflow_run_state(workflow_run, RunStateEnum.COMPLETED)
+    else:
+        db.session.commit()
 
+    start_ready_workflow_pipeline_runs(workflow_run.workflow)
+    db.session.add(workflow_run)
     return workflow_run
+
+
+def start_ready_workflow_pipeline_runs(workflow):
+    """Start the ready PipelineRuns of a workflow, oldest first (see
+    find_ready_workflow_pipeline_runs()).
+
+    At most WORKFLOW_RUN_MAX_RUNNING_PIPELINES runs of each WorkflowRun,
+    WORKFLOW_MAX_RUNNING_PIPELINES runs of each workflow, and
+    WORKFLOW_ORGANIZATION_MAX_RUNNING_PIPELINES runs of all the workflows of an
+    organization, are started at the same time (0 means no limit). The others
+    stay QUEUED until this is called again, when a started run finishes. With
+    an organization limit, the ready runs of all the workflows of the
+    workflow's organization are started, as they share its slots.
+
+    Runs that were started more than WORKFLOW_STARTED_PIPELINE_TIMEOUT seconds
+    ago (e.g. whose worker was lost) no longer hold a slot.
+    """
+    run_limit = current_app.config[WORKFLOW_RUN_MAX_RUNNING_PIPELINES]
+    workflow_limit = current_app.config[WORKFLOW_MAX_RUNNING_PIPELINES]
+    organization_limit = current_app.config[WORKFLOW_ORGANIZATION_MAX_RUNNING_PIPELINES]
+    timeout = current_app.config[WORKFLOW_STARTED_PIPELINE_TIMEOUT]
+    started_after = None
+    if timeout > 0:
+        started_after = datetime.utcnow() - timedelta(seconds=timeout)
+
+    # (the workflows are locked until the started runs are committed, so that
+    # concurrent completions don't both fill the same slot; always in id
+    # order, so that they don't deadlock)
+    workflows = Workflow.query.filter(Workflow.id == workflow.id)
+    if organization_limit > 0 and workflow.organization_uuid is not None:
+        workflows = Workflow.query.filter(
+            Workflow.organization_uuid == workflow.organization_uuid
+        )
+    workflows = workflows.order_by(Workflow.id).with_for_update().all()
+
+    run_counts = {}
+    workflow_counts = {}
+    for ((workflow_id, workflow_run_id), count) in find_started_pipeline_run_counts(
+        workflows, started_after
+    ).items():
+        run_counts[workflow_run_id] = count
+        workflow_counts[workflow_id] = workflow_counts.get(workflow_id, 0) + count
+    started = sum(run_counts.values())
+
+    pipeline_runs = []
+    for workflow_pipeline_run in find_ready_workflow_pipeline_runs(workflows):
+        if organization_limit > 0 and started >= organization_limit:
+            break
+        workflow_run_id = workflow_pipeline_run.workflow_run_id
+        workflow_id = workflow_pipeline_run.workflow_run.workflow_id
+        if workflow_limit > 0 and workflow_counts.get(workflow_id, 0) >= workflow_limit:
+            continue
+        if run_limit > 0 and run_counts.get(workflow_run_id, 0) >= run_limit:
+            continue
+
+        pipeline_runs.append(workflow_pipeline_run.pipeline_run)
+        run_counts[workflow_run_id] = run_counts.get(workflow_run_id, 0) + 1
+        workflow_counts[workflow_id] = workflow_counts.get(workflow_id, 0) + 1
+        started += 1
+
+    start_pipeline_runs(pipeline_runs)
+
+
+def schedule_workflow_runs():
+    """Start the ready PipelineRuns of every workflow with unfinished runs.
+
+    Runs are normally started as others finish: this recovers those left
+    QUEUED when that failed.
+    """
+    workflows = {
+        workflow_run.workflow_id: workflow_run.workflow
+        for workflow_run in find_workflow_runs_by_state(
+            [RunStateEnum.NOT_STARTED, RunStateEnum.RUNNING]
+        )
+    }
+    for workflow in workflows.values():
+        start_ready_workflow_pipeline_runs(workflow)
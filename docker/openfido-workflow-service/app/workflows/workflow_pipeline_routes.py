@@ -5,9 +5,11 @@ from marshmallow.exceptions import ValidationError
 
 from ..model_utils import SystemPermissionEnum
 from ..utils import permissions_required, verify_content_type
-from .schemas import WorkflowPipelineSchema
+from .queries import find_workflow_graph
+from .schemas import WorkflowGraphSchema, WorkflowPipelineSchema
 from .services import (
     create_workflow_pipeline,
+    update_workflow_graph,
     update_workflow_pipeline,
     delete_workflow_pipeline,
     find_workflow,
@@ -344,3 +346,122 @@ def delete(workflow_uuid, workflow_pipeline_uuid):
         return {
             "message": "Unable to delete workflow pipeline",
         }, 400
+
+
+@workflow_pipeline_bp.route("/<workflow_uuid>/graph", methods=["GET"])
+@permissions_required([SystemPermissionEnum.PIPELINES_CLIENT])
+def get_workflow_graph(workflow_uuid):
+    """Export the pipelines of a workflow and their dependencies.
+    ---
+
+    tags:
+      - workflow pipelines
+    parameters:
+      - in: header
+        name: Workflow-API-Key
+        description: Requires key type PIPELINES_CLIENT
+        schema:
+          type: string
+    responses:
+      "200":
+        description: "Fetched"
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                pipelines:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      pipeline_uuid:
+                        type: string
+                      workflow_pipeline_uuid:
+                        type: string
+                      dependencies:
+                        type: array
+                        items:
+                          type: string
+                        description: List of Pipeline UUIDs that feed into this.
+      "404":
+        description: "Not found"
+    """
+    workflow = find_workflow(workflow_uuid)
+    if workflow is None:
+        logger.warning("no workflow found")
+        return {}, 404
+
+    return jsonify(WorkflowGraphSchema().dump(find_workflow_graph(workflow)))
+
+
+@workflow_pipeline_bp.route("/<workflow_uuid>/graph", methods=["PUT"])
+@verify_content_type()
+@permissions_required([SystemPermissionEnum.PIPELINES_CLIENT])
+def update_graph(workflow_uuid):
+    """Replace the pipelines of a workflow and their dependencies.
+
+    Pipelines already in the workflow keep their Workflow Pipeline, the others
+    are added or removed. Nothing changes unless the whole graph is valid.
+    ---
+
+    tags:
+      - workflow pipelines
+    parameters:
+      - in: header
+        name: Workflow-API-Key
+        description: Requires key type PIPELINES_CLIENT
+        schema:
+          type: string
+    requestBody:
+      description: "pipelines and their dependencies"
+      required: true
+      content:
+        application/json:
+          schema:
+            type: object
+            properties:
+              pipelines:
+                type: array
+                items:
+                  type: object
+                  properties:
+                    pipeline_uuid:
+                      type: string
+                      example: abc123
+                    dependencies:
+                      type: array
+                      items:
+                        type: string
+                      description: List of Pipeline UUIDs that feed into this.
+    responses:
+      "200":
+        description: "Updated, with the same content as GET"
+      "400":
+        description: "Bad request"
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                message:
+                  type: string
+                errors:
+                  type: object
+            examples:
+              message_and_error:
+                value: { "message": "An error", "errors": { "pipelines": "Depending on abc123 introduces a cycle." } }
+                summary: An error with validation messages.
+    """
+    try:
+        workflow = update_workflow_graph(workflow_uuid, request.json)
+
+        return jsonify(WorkflowGraphSchema().dump(find_workflow_graph(workflow)))
+    except ValidationError as validation_err:
+        logger.warning(validation_err)
+        return {"message": "Validation error", "errors": validation_err.messages}, 400
+    except ValueError as value_err:
+        logger.warning(value_err)
+        return {
+            "message": "Unable to update workflow graph",
+        }, 400
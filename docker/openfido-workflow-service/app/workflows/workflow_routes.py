@@ -42,6 +42,9 @@ def create():
                 type: string
               description:
                 type: string
+              organization_uuid:
+                type: string
+                description: Organization that owns the workflow (its workflows share WORKFLOW_ORGANIZATION_MAX_RUNNING_PIPELINES).
     responses:
       "200":
         description: "Created"
@@ -261,6 +264,9 @@ def update(workflow_uuid):
                 type: string
               description:
                 type: string
+              organization_uuid:
+                type: string
+                description: Organization that owns the workflow (its workflows share WORKFLOW_ORGANIZATION_MAX_RUNNING_PIPELINES).
     responses:
       "200":
         description: "Updated"
@@ -22,6 +22,7 @@ logger = logging.getLogger('alembic.env')
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
 from flask import current_app
+from app.model_utils import clear_run_state_type_cache
 config.set_main_option(
     'sqlalchemy.url',
     str(current_app.extensions['migrate'].db.engine.url).replace('%', '%%'))
@@ -89,6 +90,10 @@ def run_migrations_online():
         with context.begin_transaction():
             context.run_migrations()
 
+    # migrations may add or remove RunStateTypes (other processes forget them
+    # after RUN_STATE_TYPE_CACHE_TTL).
+    clear_run_state_type_cache()
+
 
 if context.is_offline_mode():
     run_migrations_offline()
@@ -70,6 +70,7 @@ def run_worker(c, input_directory, docker_image, repository_url, repository_bran
     data provided in `input_directory` using the same logic used by the workflow
     server's celery task.
     """
+    from app import create_app
     from app.tasks import execute_pipeline
     from unittest.mock import patch
     import logging
@@ -96,7 +97,11 @@ def run_worker(c, input_directory, docker_image, repository_url, repository_bran
                          repository_url,
                          repository_branch,
                          repository_script)
-    fake_execute()
+
+    # the worker cache settings are read from the app configuration
+    (app, _, _, _) = create_app()
+    with app.app_context():
+        fake_execute()
 
 
 @task
@@ -115,3 +120,127 @@ def create_pipeline(c, name, docker_image_url, repository_ssh_url, repository_br
             'repository_script': repository_script,
         })
         print(pipeline.uuid)
+
+
+@task
+def schedule_workflow_runs(c):
+    """ Start the QUEUED pipeline runs of workflow runs that are ready to run. """
+    from app import create_app
+    from app.workflows.services import schedule_workflow_runs
+
+    (app, _, _, _) = create_app()
+    with app.app_context():
+        schedule_workflow_runs()
+
+
+@task
+def benchmark_indexes(c, pipelines=200, runs=500, lookups=200):
+    """ Time the common lookups with and without the model indexes.
+
+    Seeds a temporary sqlite database with pipelines, runs (each with states,
+    inputs and artifacts) and applications, then times each lookup with the
+    indexes dropped (before) and created again (after).
+    """
+    import os
+    import random
+    import tempfile
+    import time
+    import uuid
+    from datetime import datetime
+
+    from app import create_app
+    from app.model_utils import RunStateEnum, SystemPermissionEnum
+    from app.pipelines.models import (
+        Pipeline,
+        PipelineRun,
+        PipelineRunArtifact,
+        PipelineRunInput,
+        PipelineRunState,
+    )
+    from app.pipelines.queries import (
+        find_pipeline,
+        find_pipeline_run,
+        find_pipeline_runs_page,
+        find_run_state_type_id,
+    )
+    from app.pipelines.schemas import RunListQuerySchema
+    from application_roles.models import Application
+    from application_roles.queries import invalidate_permissions, is_permitted
+    from application_roles.services import create_application
+
+    directory = tempfile.mkdtemp()
+    (app, db, _, _) = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(directory, "benchmark.db")}',
+    })
+    with app.app_context():
+        db.create_all()
+        now = datetime.utcnow()
+        run_state_type_id = find_run_state_type_id(RunStateEnum.COMPLETED)
+        for _ in range(pipelines):
+            db.session.add(create_application('benchmark', SystemPermissionEnum.PIPELINES_CLIENT))
+        db.session.commit()
+
+        def common():
+            return {'uuid': uuid.uuid4().hex, 'created_at': now, 'updated_at': now}
+
+        pipeline_rows = [dict(common(), id=id, name=f'pipeline {id}', is_deleted=False)
+                         for id in range(1, pipelines + 1)]
+        run_rows = [dict(common(), id=(pipeline['id'] - 1) * runs + sequence,
+                         pipeline_id=pipeline['id'], sequence=sequence, is_deleted=False,
+                         current_state=RunStateEnum.COMPLETED.value, state_changed_at=now)
+                    for pipeline in pipeline_rows for sequence in range(1, runs + 1)]
+        db.session.execute(Pipeline.__table__.insert(), pipeline_rows)
+        db.session.execute(PipelineRun.__table__.insert(), run_rows)
+        for (model, rows) in (
+            (PipelineRunState, [dict(common(), name='COMPLETED', description='COMPLETED',
+                                     code=RunStateEnum.COMPLETED.value,
+                                     run_state_type_id=run_state_type_id)]),
+            (PipelineRunInput, [dict(common(), filename='input.csv', url='https://example.com/input.csv')] * 2),
+            (PipelineRunArtifact, [dict(common(), name='output.csv')] * 2),
+        ):
+            db.session.execute(model.__table__.insert(), [
+                dict(row, uuid=uuid.uuid4().hex, pipeline_run_id=run['id'])
+                for run in run_rows for row in rows
+            ])
+        db.session.commit()
+        print(f'{pipelines} pipelines, {len(run_rows)} runs')
+
+        api_keys = [application.api_key for application in Application.query]
+        page_query = RunListQuerySchema().load({'limit': 20, 'view': 'summary'})
+
+        def find_permissions():
+            # time the query rather than the permission cache.
+            invalidate_permissions()
+            return is_permitted(random.choice(api_keys), SystemPermissionEnum.PIPELINES_CLIENT)
+
+        lookups_by_name = {
+            'find_pipeline': lambda: find_pipeline(random.choice(pipeline_rows)['uuid']),
+            'find_pipeline_run': lambda: find_pipeline_run(random.choice(run_rows)['uuid']),
+            'find_pipeline_runs_page': lambda: find_pipeline_runs_page(
+                find_pipeline(random.choice(pipeline_rows)['uuid']), page_query),
+            'is_permitted': find_permissions,
+        }
+
+        def time_lookups():
+            times = {}
+            for (name, lookup) in lookups_by_name.items():
+                random.seed(0)
+                start = time.perf_counter()
+                for _ in range(lookups):
+                    lookup()
+                    db.session.expunge_all()
+                times[name] = (time.perf_counter() - start) / lookups * 1000
+            return times
+
+        db.session.commit()
+        indexes = [index for table in db.metadata.sorted_tables for index in table.indexes]
+        for index in indexes:
+            index.drop(db.engine)
+        before = time_lookups()
+        for index in indexes:
+            index.create(db.engine)
+        after = time_lookups()
+
+        print(f'{"lookup":<25} {"before":>10} {"after":>10}')
+        for name in lookups_by_name:
+            print(f'{name:<25} {before[name]:>8.3f}ms {after[name]:>8.3f}ms')
@@ -1,4 +1,8 @@
+from contextlib import contextmanager
+
 import pytest
+from sqlalchemy import event
+
 from app import create_app
 from app.constants import (
     CELERY_ALWAYS_EAGER,
@@ -8,6 +12,7 @@ from app.constants import (
     SQLALCHEMY_DATABASE_URI,
     WORKER_API_SERVER,
     WORKER_API_TOKEN,
+    WORKER_CACHE_DIR,
 )
 from app.model_utils import SystemPermissionEnum
 from app.pipelines.models import Pipeline, db
@@ -17,8 +22,23 @@ from app.workflows.services import create_workflow_pipeline
 from application_roles.services import create_application
 
 
+@contextmanager
+def count_queries():
+    """ Collect the SQL statements executed within the block. """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
 @pytest.fixture
-def app():
+def app(tmp_path):
     # create a temporary file to isolate the database for each test
     (app, db, _, _) = create_app(
         {
@@ -31,6 +51,7 @@ def app():
             S3_ENDPOINT_URL: "http://example.com",
             WORKER_API_SERVER: "http://example.com",
             WORKER_API_TOKEN: "atoken",
+            WORKER_CACHE_DIR: str(tmp_path),
         }
     )
 
@@ -1,6 +1,7 @@
 from unittest.mock import MagicMock, patch
 
 from app.pipelines.models import db, Pipeline, PipelineRun, PipelineRunArtifact
+from app.pipelines.services import create_pipeline_run_state
 from app.model_utils import RunStateEnum
 
 
@@ -27,6 +28,25 @@ def test_create_pipeline_run(app, pipeline):
     assert set(PipelineRun.query.all()) == set([pipeline_run])
 
 
+def test_add_run_state(app, pipeline):
+    pipeline_run = PipelineRun(sequence=1)
+    pipeline.pipeline_runs.append(pipeline_run)
+    pipeline_run.add_run_state(create_pipeline_run_state(RunStateEnum.QUEUED))
+    db.session.commit()
+
+    state_changed_at = pipeline_run.state_changed_at
+    pipeline_run.add_run_state(create_pipeline_run_state(RunStateEnum.NOT_STARTED))
+    db.session.commit()
+
+    assert pipeline_run.current_state == RunStateEnum.NOT_STARTED.value
+    assert pipeline_run.run_state_enum() == RunStateEnum.NOT_STARTED
+    assert pipeline_run.state_changed_at > state_changed_at
+    assert [prs.code for prs in pipeline_run.pipeline_run_states] == [
+        RunStateEnum.QUEUED.value,
+        RunStateEnum.NOT_STARTED.value,
+    ]
+
+
 @patch("app.pipelines.models.create_url")
 def test_public_url(create_url_mock, app, pipeline):
     create_url_mock.return_value = "http://example.com/presigned"
@@ -1,12 +1,20 @@
 from app.pipelines.models import Pipeline, RunStateType, db
-from app.model_utils import RunStateEnum
+from app.model_utils import (
+    RUN_STATE_TYPE_CACHE,
+    RunStateEnum,
+    clear_run_state_type_cache,
+    find_run_state_enum,
+)
 from app.pipelines.queries import (
     find_pipeline,
     find_pipelines,
     find_run_state_type,
+    find_run_state_type_id,
     find_pipeline_run,
+    find_pipeline_runs_by_state,
+    warm_run_state_type_cache,
 )
-from app.pipelines.services import create_pipeline_run
+from app.pipelines.services import create_pipeline_run, update_pipeline_run_state
 from .test_services import VALID_CALLBACK_INPUT
 
 
@@ -69,6 +77,42 @@ def test_find_run_state_type(app):
     assert set(RunStateType.query) == set([run_state_type])
 
 
+def test_find_run_state_type_id(app):
+    # new types are only cached once they're committed.
+    run_state_type_id = find_run_state_type_id(RunStateEnum.RUNNING)
+    assert app.extensions[RUN_STATE_TYPE_CACHE] == {}
+    db.session.commit()
+
+    assert find_run_state_type_id(RunStateEnum.RUNNING) == run_state_type_id
+    assert app.extensions[RUN_STATE_TYPE_CACHE] == {
+        RunStateEnum.RUNNING: run_state_type_id
+    }
+    assert find_run_state_enum(run_state_type_id) == RunStateEnum.RUNNING
+
+    clear_run_state_type_cache()
+    assert find_run_state_enum(run_state_type_id) == RunStateEnum.RUNNING
+    assert app.extensions[RUN_STATE_TYPE_CACHE] == {
+        RunStateEnum.RUNNING: run_state_type_id
+    }
+
+
+def test_warm_run_state_type_cache(app):
+    run_state_types = [find_run_state_type(rse) for rse in RunStateEnum]
+    db.session.commit()
+
+    warm_run_state_type_cache()
+    assert app.extensions[RUN_STATE_TYPE_CACHE] == {
+        RunStateEnum(int(rst.code)): rst.id for rst in run_state_types
+    }
+
+    # a database without tables leaves the cache empty.
+    clear_run_state_type_cache()
+    db.drop_all()
+    warm_run_state_type_cache()
+    assert app.extensions[RUN_STATE_TYPE_CACHE] == {}
+    db.create_all()
+
+
 def test_find_pipeline_run(app, pipeline, mock_execute_pipeline):
     assert find_pipeline_run("no-uid") is None
 
@@ -91,3 +135,27 @@ def test_find_pipeline_run_is_deleted(app, pipeline, mock_execute_pipeline):
     db.session.commit()
 
     assert find_pipeline_run(pipeline_run.uuid) is None
+
+
+def test_find_pipeline_runs_by_state(app, pipeline, mock_execute_pipeline):
+    pipeline_runs = [
+        create_pipeline_run(pipeline.uuid, VALID_CALLBACK_INPUT, queued=queued)
+        for queued in [False, True, False, True]
+    ]
+    update_pipeline_run_state(pipeline_runs[2].uuid, {"state": "RUNNING"})
+    update_pipeline_run_state(pipeline_runs[0].uuid, {"state": "RUNNING"})
+
+    assert list(find_pipeline_runs_by_state([RunStateEnum.QUEUED])) == [
+        pipeline_runs[1],
+        pipeline_runs[3],
+    ]
+    # runs are ordered by when they changed to their current state.
+    assert list(
+        find_pipeline_runs_by_state([RunStateEnum.RUNNING, RunStateEnum.FAILED])
+    ) == [pipeline_runs[2], pipeline_runs[0]]
+
+    pipeline_runs[1].is_deleted = True
+    db.session.commit()
+    assert list(find_pipeline_runs_by_state([RunStateEnum.QUEUED])) == [
+        pipeline_runs[3]
+    ]
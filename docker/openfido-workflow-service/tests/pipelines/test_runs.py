@@ -1,9 +1,19 @@
+from datetime import datetime
 from unittest.mock import Mock, patch
 
+import pytest
+from botocore.exceptions import ClientError
+
 from app.pipelines.models import db, PipelineRunArtifact
 from app.model_utils import RunStateEnum
 from app.utils import to_iso8601
-from app.pipelines.services import create_pipeline_run, find_pipeline_run
+from app.pipelines.queries import find_pipeline_run_output
+from app.pipelines.services import (
+    create_pipeline_run,
+    find_pipeline_run,
+    update_pipeline_run_output,
+    update_pipeline_run_state,
+)
 from app.pipelines import run_routes as runs_module
 from application_roles.decorators import ROLES_KEY
 
@@ -318,6 +328,117 @@ def test_list_pipeline_runs(
     ]
 
 
+def test_list_pipeline_runs_page(
+    client, pipeline, client_application, mock_execute_pipeline
+):
+    db.session.commit()
+    pipeline_runs = [
+        create_pipeline_run(pipeline.uuid, VALID_CALLBACK_INPUT) for _ in range(5)
+    ]
+    for pipeline_run in pipeline_runs[1:3]:
+        update_pipeline_run_state(pipeline_run.uuid, {"state": "RUNNING"})
+    pipeline_runs[4].created_at = datetime(2020, 1, 1)
+    db.session.commit()
+
+    def list_runs(**params):
+        result = client.get(
+            f"/v1/pipelines/{pipeline.uuid}/runs",
+            query_string=params,
+            headers={ROLES_KEY: client_application.api_key},
+        )
+        assert result.status_code == 200
+        return (
+            [pr["sequence"] for pr in result.json],
+            result.headers.get("X-Next-After"),
+        )
+
+    assert list_runs() == ([1, 2, 3, 4, 5], None)
+    assert list_runs(limit=2) == ([1, 2], "2")
+    assert list_runs(after=2, limit=2) == ([3, 4], "4")
+    assert list_runs(after=4, limit=2) == ([5], None)
+    assert list_runs(after=3, limit=2) == ([4, 5], None)
+    assert list_runs(state="RUNNING") == ([2, 3], None)
+    assert list_runs(state="NOT_STARTED", after=1) == ([4, 5], None)
+    assert list_runs(created_before="2020-01-02T00:00:00") == ([5], None)
+    assert list_runs(created_after="2020-01-02T00:00:00", limit=1) == ([1], "1")
+
+    # without after or limit every run is listed, more than a page holds.
+    with patch("app.pipelines.queries.RUN_LIST_MAX_LIMIT", 2):
+        assert list_runs() == ([1, 2, 3, 4, 5], None)
+        assert list_runs(after=0) == ([1, 2], "2")
+
+    result = client.get(
+        f"/v1/pipelines/{pipeline.uuid}/runs",
+        query_string={"view": "summary", "limit": 1, "after": 1},
+        headers={ROLES_KEY: client_application.api_key},
+    )
+    assert result.status_code == 200
+    assert result.json == [
+        {
+            "uuid": pipeline_runs[1].uuid,
+            "sequence": 2,
+            "created_at": to_iso8601(pipeline_runs[1].created_at),
+            "started_at": None,
+            "completed_at": None,
+            "state": RunStateEnum.RUNNING.name,
+        }
+    ]
+
+    for params in [
+        {"limit": 0},
+        {"limit": 1001},
+        {"after": "a"},
+        {"state": "BAD"},
+        {"view": "all"},
+    ]:
+        result = client.get(
+            f"/v1/pipelines/{pipeline.uuid}/runs",
+            query_string=params,
+            headers={ROLES_KEY: client_application.api_key},
+        )
+        assert result.status_code == 400
+
+
+def test_search_pipeline_runs(
+    client, pipeline, client_application, mock_execute_pipeline
+):
+    db.session.commit()
+    result = client.post(
+        "/v1/pipelines/runs/search",
+        content_type="application/json",
+        json={"uuids": ["badid"]},
+        headers={ROLES_KEY: client_application.api_key},
+    )
+    assert result.status_code == 400
+    assert set(result.json.keys()) == set(["message", "errors"])
+
+    pipeline_run1 = create_pipeline_run(pipeline.uuid, VALID_CALLBACK_INPUT)
+    pipeline_run2 = create_pipeline_run(pipeline.uuid, VALID_CALLBACK_INPUT)
+    create_pipeline_run(pipeline.uuid, VALID_CALLBACK_INPUT)
+    result = client.post(
+        "/v1/pipelines/runs/search",
+        content_type="application/json",
+        json={"uuids": [pipeline_run1.uuid, pipeline_run2.uuid, "a" * 32]},
+        headers={ROLES_KEY: client_application.api_key},
+    )
+    assert result.status_code == 200
+    assert sorted(pr["uuid"] for pr in result.json) == sorted(
+        [pipeline_run1.uuid, pipeline_run2.uuid]
+    )
+
+    # deleted runs are not found.
+    pipeline_run1.is_deleted = True
+    db.session.commit()
+    result = client.post(
+        "/v1/pipelines/runs/search",
+        content_type="application/json",
+        json={"uuids": [pipeline_run1.uuid]},
+        headers={ROLES_KEY: client_application.api_key},
+    )
+    assert result.status_code == 200
+    assert result.json == []
+
+
 def test_get_pipeline_run_output(
     client, pipeline, client_application, mock_execute_pipeline
 ):
@@ -337,8 +458,7 @@ def test_get_pipeline_run_output(
 
     # successfully fetch a pipeline_run
     pipeline_run = create_pipeline_run(pipeline.uuid, VALID_CALLBACK_INPUT)
-    pipeline_run.std_out = "stdout"
-    db.session.commit()
+    update_pipeline_run_output(pipeline_run.uuid, "stdout", "")
     result = client.get(
         f"/v1/pipelines/{pipeline.uuid}/runs/{pipeline_run.uuid}/console",
         headers={ROLES_KEY: client_application.api_key},
@@ -346,9 +466,59 @@ def test_get_pipeline_run_output(
     assert result.status_code == 200
     assert result.json == {
         "std_out": "stdout",
+        "std_out_offset": 0,
+        "std_out_length": 6,
         "std_err": "",
+        "std_err_offset": 0,
+        "std_err_length": 0,
+    }
+
+    # fetch only new output
+    update_pipeline_run_output(pipeline_run.uuid, " more", "stderr")
+    result = client.get(
+        f"/v1/pipelines/{pipeline.uuid}/runs/{pipeline_run.uuid}/console?stream=std_out&offset=6",
+        headers={ROLES_KEY: client_application.api_key},
+    )
+    assert result.status_code == 200
+    assert result.json == {
+        "std_out": " more",
+        "std_out_offset": 6,
+        "std_out_length": 11,
     }
 
+    result = client.get(
+        f"/v1/pipelines/{pipeline.uuid}/runs/{pipeline_run.uuid}/console?offset=2&limit=3",
+        headers={ROLES_KEY: client_application.api_key},
+    )
+    assert result.status_code == 200
+    assert result.json == {
+        "std_out": "dou",
+        "std_out_offset": 2,
+        "std_out_length": 11,
+        "std_err": "der",
+        "std_err_offset": 2,
+        "std_err_length": 6,
+    }
+
+    # fetch the end of the output
+    result = client.get(
+        f"/v1/pipelines/{pipeline.uuid}/runs/{pipeline_run.uuid}/console?tail=4",
+        headers={ROLES_KEY: client_application.api_key},
+    )
+    assert result.status_code == 200
+    assert result.json["std_out"] == "more"
+    assert result.json["std_out_offset"] == 7
+    assert result.json["std_err"] == "derr"
+    assert result.json["std_err_offset"] == 2
+
+    # invalid parameters
+    for query in ["offset=-1", "limit=a", "stream=std_in", "offset=1&tail=1"]:
+        result = client.get(
+            f"/v1/pipelines/{pipeline.uuid}/runs/{pipeline_run.uuid}/console?{query}",
+            headers={ROLES_KEY: client_application.api_key},
+        )
+        assert result.status_code == 400
+
 
 def test_update_pipeline_run_output(
     client, pipeline, worker_application, mock_execute_pipeline
@@ -390,8 +560,74 @@ def test_update_pipeline_run_output(
         headers={ROLES_KEY: worker_application.api_key},
     )
     assert result.status_code == 200
-    assert pipeline_run.std_out == "stdout"
-    assert pipeline_run.std_err == "stderr"
+    assert find_pipeline_run_output(pipeline_run, "std_out") == "stdout"
+    assert find_pipeline_run_output(pipeline_run, "std_err") == "stderr"
+
+
+def test_append_pipeline_run_output(
+    client, pipeline, worker_application, mock_execute_pipeline
+):
+    db.session.commit()
+    pipeline_run = create_pipeline_run(pipeline.uuid, VALID_CALLBACK_INPUT)
+
+    result = client.post(
+        "/v1/pipelines/no-id/runs/no-id/console/append",
+        content_type="application/json",
+        json={"std_out": "stdout", "std_err": "stderr"},
+        headers={ROLES_KEY: worker_application.api_key},
+    )
+    assert result.status_code == 404
+
+    # no such pipeline_run_id
+    result = client.post(
+        f"/v1/pipelines/{pipeline.uuid}/runs/no-id/console/append",
+        content_type="application/json",
+        json={"std_out": "stdout", "std_err": "stderr"},
+        headers={ROLES_KEY: worker_application.api_key},
+    )
+    assert result.status_code == 404
+
+    # invalid offsets
+    result = client.post(
+        f"/v1/pipelines/{pipeline.uuid}/runs/{pipeline_run.uuid}/console/append",
+        content_type="application/json",
+        json={"std_out": "stdout", "std_err": "stderr", "std_out_offset": -1},
+        headers={ROLES_KEY: worker_application.api_key},
+    )
+    assert result.status_code == 400
+    result = client.post(
+        f"/v1/pipelines/{pipeline.uuid}/runs/{pipeline_run.uuid}/console/append",
+        content_type="application/json",
+        json={"std_out": "stdout", "std_err": "stderr", "std_out_offset": 10},
+        headers={ROLES_KEY: worker_application.api_key},
+    )
+    assert result.status_code == 400
+
+    # successfully append to a pipeline_run
+    for _ in range(2):
+        result = client.post(
+            f"/v1/pipelines/{pipeline.uuid}/runs/{pipeline_run.uuid}/console/append",
+            content_type="application/json",
+            json={
+                "std_out": "stdout",
+                "std_err": "stderr",
+                "std_out_offset": 0,
+                "std_err_offset": 0,
+            },
+            headers={ROLES_KEY: worker_application.api_key},
+        )
+        assert result.status_code == 200
+        assert result.json == {"std_out_offset": 6, "std_err_offset": 6}
+
+    result = client.post(
+        f"/v1/pipelines/{pipeline.uuid}/runs/{pipeline_run.uuid}/console/append",
+        content_type="application/json",
+        json={"std_out": "\nmore", "std_err": ""},
+        headers={ROLES_KEY: worker_application.api_key},
+    )
+    assert result.status_code == 200
+    assert find_pipeline_run_output(pipeline_run, "std_out") == "stdout\nmore"
+    assert find_pipeline_run_output(pipeline_run, "std_err") == "stderr"
 
 
 def test_update_pipeline_run_state(
@@ -511,3 +747,137 @@ def test_upload_run_artifact(
         headers={ROLES_KEY: worker_application.api_key},
     )
     assert result.status_code == 200
+
+
+@patch("app.pipelines.services.abort_multipart_upload")
+@patch("app.pipelines.services.complete_multipart_upload")
+@patch("app.pipelines.services.create_upload_part_urls")
+@patch("app.pipelines.services.create_multipart_upload")
+def test_run_artifact_upload(
+    create_mock,
+    urls_mock,
+    complete_mock,
+    abort_mock,
+    client,
+    pipeline,
+    worker_application,
+    mock_execute_pipeline,
+):
+    db.session.commit()
+    pipeline_run = create_pipeline_run(pipeline.uuid, VALID_CALLBACK_INPUT)
+    create_mock.return_value = "anid"
+    urls_mock.return_value = ["http://s3/1"]
+    uploads_url = (
+        f"/v1/pipelines/{pipeline.uuid}/runs/{pipeline_run.uuid}/artifacts/uploads"
+    )
+
+    result = client.post(
+        "/v1/pipelines/no-id/runs/no-id/artifacts/uploads",
+        content_type="application/json",
+        json={"name": "a.csv", "size": 10},
+        headers={ROLES_KEY: worker_application.api_key},
+    )
+    assert result.status_code == 404
+
+    result = client.post(
+        uploads_url,
+        content_type="application/json",
+        json={"name": 256 * "X", "size": 10},
+        headers={ROLES_KEY: worker_application.api_key},
+    )
+    assert result.status_code == 400
+
+    result = client.post(
+        uploads_url,
+        content_type="application/json",
+        json={"name": "a.csv", "size": 10},
+        headers={ROLES_KEY: worker_application.api_key},
+    )
+    assert result.status_code == 200
+    assert result.json["upload_id"] == "anid"
+    assert result.json["urls"] == ["http://s3/1"]
+    artifact_uuid = result.json["uuid"]
+
+    result = client.post(
+        f"{uploads_url}/{artifact_uuid}/complete",
+        content_type="application/json",
+        json={"name": "a.csv", "upload_id": "anid", "parts": [{"etag": "etag"}]},
+        headers={ROLES_KEY: worker_application.api_key},
+    )
+    assert result.status_code == 400
+
+    result = client.post(
+        f"{uploads_url}/{artifact_uuid}/complete",
+        content_type="application/json",
+        json={
+            "name": "a.csv",
+            "upload_id": "anid",
+            "parts": [{"part_number": 1, "etag": "etag"}],
+        },
+        headers={ROLES_KEY: worker_application.api_key},
+    )
+    assert result.status_code == 200
+    assert complete_mock.call_args[0][1:] == ("anid", [(1, "etag")])
+    assert [a.uuid for a in pipeline_run.pipeline_run_artifacts] == [artifact_uuid]
+
+    result = client.post(
+        f"{uploads_url}/{artifact_uuid}/abort",
+        content_type="application/json",
+        json={"name": 256 * "X", "upload_id": "anid"},
+        headers={ROLES_KEY: worker_application.api_key},
+    )
+    assert result.status_code == 400
+
+    result = client.post(
+        f"{uploads_url}/{artifact_uuid}/abort",
+        content_type="application/json",
+        json={"name": "a.csv", "upload_id": "anid"},
+        headers={ROLES_KEY: worker_application.api_key},
+    )
+    assert result.status_code == 200
+    assert abort_mock.call_args[0][1] == "anid"
+
+    complete_mock.side_effect = ClientError(
+        {"Error": {"Code": "NoSuchUpload"}}, "CompleteMultipartUpload"
+    )
+    abort_mock.side_effect = ClientError(
+        {"Error": {"Code": "NoSuchUpload"}}, "AbortMultipartUpload"
+    )
+    for (action, data) in [
+        ("complete", {"name": "a.csv", "upload_id": "anid", "parts": []}),
+        ("abort", {"name": "a.csv", "upload_id": "anid"}),
+    ]:
+        result = client.post(
+            f"{uploads_url}/{'0' * 32}/{action}",
+            content_type="application/json",
+            json=data,
+            headers={ROLES_KEY: worker_application.api_key},
+        )
+        assert result.status_code == 400
+
+
+@pytest.mark.parametrize(
+    "action,data",
+    [
+        ("", {"name": "a.csv", "size": 10}),
+        ("/0/complete", {"name": "a.csv", "upload_id": "anid", "parts": []}),
+        ("/0/abort", {"name": "a.csv", "upload_id": "anid"}),
+    ],
+)
+def test_run_artifact_upload_not_found(
+    action, data, client, pipeline, worker_application, mock_execute_pipeline
+):
+    db.session.commit()
+    pipeline_run = create_pipeline_run(pipeline.uuid, VALID_CALLBACK_INPUT)
+
+    for url in [
+        f"/v1/pipelines/no-id/runs/{pipeline_run.uuid}/artifacts/uploads",
+        f"/v1/pipelines/{pipeline.uuid}/runs/no-id/artifacts/uploads",
+    ]:
+        result = client.post(
+            f"{url}{action}",
+            content_type="application/json",
+            json=data,
+            headers={ROLES_KEY: worker_application.api_key},
+        )
+        assert result.status_code == 404
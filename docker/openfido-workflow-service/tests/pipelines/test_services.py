@@ -1,16 +1,30 @@
 import io
 import json
+import threading
 from unittest.mock import MagicMock, patch
 from urllib.error import URLError
 
 import pytest
+from botocore.exceptions import ClientError
 from marshmallow.exceptions import ValidationError
 
-from app.constants import S3_BUCKET, CALLBACK_TIMEOUT
+from app import create_app
+from app.constants import (
+    ARTIFACT_MAX_PARTS,
+    ARTIFACT_PART_SIZE,
+    CALLBACK_TIMEOUT,
+    S3_BUCKET,
+    SQLALCHEMY_DATABASE_URI,
+)
 from app.model_utils import RunStateEnum
 from app.pipelines import services
-from app.pipelines.models import db, PipelineRunArtifact
-from app.pipelines.queries import find_pipeline
+from app.pipelines.models import (
+    db,
+    Pipeline,
+    PipelineRunArtifact,
+    PipelineRunConsoleChunk,
+)
+from app.pipelines.queries import find_pipeline, find_pipeline_run_output
 
 A_NAME = "a pipeline"
 A_DESCRIPTION = "a description"
@@ -165,6 +179,67 @@ def test_create_pipeline_run(app, pipeline, mock_execute_pipeline):
     assert pipeline_run.pipeline_run_states[1].code == RunStateEnum.NOT_STARTED
 
 
+def test_create_pipeline_run_sequence(app, pipeline, mock_execute_pipeline):
+    other_pipeline = services.create_pipeline(PIPELINE_JSON)
+    for _ in range(2):
+        services.create_pipeline_run(pipeline.uuid, VALID_CALLBACK_INPUT)
+    pipeline_run = services.create_pipeline_run(
+        other_pipeline.uuid, VALID_CALLBACK_INPUT
+    )
+    assert pipeline_run.sequence == 1
+
+    # deleted runs keep their sequence.
+    pipeline_run.is_deleted = True
+    db.session.commit()
+    pipeline_run = services.create_pipeline_run(
+        other_pipeline.uuid, VALID_CALLBACK_INPUT
+    )
+    assert pipeline_run.sequence == 2
+    assert pipeline.last_run_sequence == 2
+
+
+def test_create_pipeline_run_concurrently(tmp_path):
+    # each thread has its own connection to a database file.
+    (app, _, _, _) = create_app(
+        {SQLALCHEMY_DATABASE_URI: f"sqlite:///{tmp_path / 'runs.db'}", "TESTING": True}
+    )
+    with app.app_context():
+        db.create_all()
+        pipeline_uuid = services.create_pipeline(PIPELINE_JSON).uuid
+
+    threads_count = 8
+    runs_per_thread = 5
+    barrier = threading.Barrier(threads_count)
+    errors = []
+
+    def create_runs():
+        barrier.wait()
+        try:
+            with app.app_context():
+                for _ in range(runs_per_thread):
+                    services.create_pipeline_run(
+                        pipeline_uuid, VALID_CALLBACK_INPUT, queued=True
+                    )
+                db.session.remove()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=create_runs) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with app.app_context():
+        pipeline = Pipeline.query.filter_by(uuid=pipeline_uuid).one()
+        sequences = sorted(pr.sequence for pr in pipeline.pipeline_runs)
+        # no gaps, and no duplicates.
+        assert sequences == list(range(1, threads_count * runs_per_thread + 1))
+        assert pipeline.last_run_sequence == threads_count * runs_per_thread
+        db.session.remove()
+
+
 def test_create_queued_pipeline_run(app, pipeline):
     input1 = {
         "name": "name1.pdf",
@@ -197,8 +272,111 @@ def test_update_pipeline_run_output(app, pipeline, mock_execute_pipeline):
     pipeline_run = services.create_pipeline_run(pipeline.uuid, VALID_CALLBACK_INPUT)
 
     services.update_pipeline_run_output(pipeline_run.uuid, "stdout", "stderr")
-    assert pipeline_run.std_out == "stdout"
-    assert pipeline_run.std_err == "stderr"
+    assert find_pipeline_run_output(pipeline_run, "std_out") == "stdout"
+    assert find_pipeline_run_output(pipeline_run, "std_err") == "stderr"
+
+    # output is appended
+    assert services.update_pipeline_run_output(
+        pipeline_run.uuid, " more", "", 6, 6
+    ) == (11, 6)
+    assert find_pipeline_run_output(pipeline_run, "std_out") == "stdout more"
+    assert find_pipeline_run_output(pipeline_run, "std_err") == "stderr"
+
+    # retried (already recorded) output is skipped
+    assert services.update_pipeline_run_output(
+        pipeline_run.uuid, "more and more", "", 7, 6
+    ) == (20, 6)
+    assert find_pipeline_run_output(pipeline_run, "std_out") == "stdout more and more"
+
+    # gaps in the output are not allowed
+    with pytest.raises(ValueError):
+        services.update_pipeline_run_output(pipeline_run.uuid, "gap", "", 100, 6)
+    assert find_pipeline_run_output(pipeline_run, "std_out") == "stdout more and more"
+
+
+def test_update_pipeline_run_output_concurrent(app, pipeline, mock_execute_pipeline):
+    pipeline_run = services.create_pipeline_run(pipeline.uuid, VALID_CALLBACK_INPUT)
+    services.update_pipeline_run_output(pipeline_run.uuid, "stdout", "")
+
+    # an append that didn't see the output recorded by another one fails,
+    # rather than writing overlapping chunks.
+    with patch("app.pipelines.services.find_pipeline_run_output_length") as length_mock:
+        length_mock.return_value = 0
+        with pytest.raises(ValueError):
+            services.update_pipeline_run_output(pipeline_run.uuid, "stdout", "", 0, 0)
+    assert find_pipeline_run_output(pipeline_run, "std_out") == "stdout"
+    assert PipelineRunConsoleChunk.query.count() == 1
+
+
+def test_replace_pipeline_run_output_no_uuid(app, pipeline):
+    with pytest.raises(ValueError):
+        services.replace_pipeline_run_output(None, "stdout", "stderr")
+
+
+def test_replace_pipeline_run_output(app, pipeline, mock_execute_pipeline):
+    pipeline_run = services.create_pipeline_run(pipeline.uuid, VALID_CALLBACK_INPUT)
+
+    services.replace_pipeline_run_output(pipeline_run.uuid, "stdout", "stderr")
+    services.replace_pipeline_run_output(pipeline_run.uuid, "stdout2", "stderr2")
+    assert find_pipeline_run_output(pipeline_run, "std_out") == "stdout2"
+    assert find_pipeline_run_output(pipeline_run, "std_err") == "stderr2"
+
+
+@patch("app.pipelines.services.CONSOLE_CHUNK_SIZE", 4)
+def test_update_pipeline_run_output_chunks(app, pipeline, mock_execute_pipeline):
+    pipeline_run = services.create_pipeline_run(pipeline.uuid, VALID_CALLBACK_INPUT)
+
+    services.update_pipeline_run_output(pipeline_run.uuid, "0123456789", "")
+    services.update_pipeline_run_output(pipeline_run.uuid, "abc", "")
+    assert [
+        (c.position, c.content)
+        for c in PipelineRunConsoleChunk.query.order_by(
+            PipelineRunConsoleChunk.position
+        )
+    ] == [(0, "0123"), (4, "4567"), (8, "89"), (10, "abc")]
+
+    assert find_pipeline_run_output(pipeline_run, "std_out") == "0123456789abc"
+    assert find_pipeline_run_output(pipeline_run, "std_out", 5) == "56789abc"
+    assert find_pipeline_run_output(pipeline_run, "std_out", 5, 4) == "5678"
+    assert find_pipeline_run_output(pipeline_run, "std_out", 9, 2) == "9a"
+    assert find_pipeline_run_output(pipeline_run, "std_out", 13) == ""
+
+
+def test_get_pipeline_run_output_no_uuid(app, pipeline):
+    with pytest.raises(ValueError):
+        services.get_pipeline_run_output(None, "std_out")
+
+
+def test_get_pipeline_run_output(app, pipeline, mock_execute_pipeline):
+    pipeline_run = services.create_pipeline_run(pipeline.uuid, VALID_CALLBACK_INPUT)
+    assert services.get_pipeline_run_output(pipeline_run.uuid, "std_out") == (
+        0,
+        "",
+        0,
+    )
+
+    services.update_pipeline_run_output(pipeline_run.uuid, "stdout", "stderr")
+    assert services.get_pipeline_run_output(pipeline_run.uuid, "std_out") == (
+        0,
+        "stdout",
+        6,
+    )
+    assert services.get_pipeline_run_output(
+        pipeline_run.uuid, "std_err", offset=2, limit=3
+    ) == (2, "der", 6)
+    assert services.get_pipeline_run_output(
+        pipeline_run.uuid, "std_out", offset=10
+    ) == (6, "", 6)
+    assert services.get_pipeline_run_output(pipeline_run.uuid, "std_out", tail=3) == (
+        3,
+        "out",
+        6,
+    )
+    assert services.get_pipeline_run_output(pipeline_run.uuid, "std_out", tail=10) == (
+        0,
+        "stdout",
+        6,
+    )
 
 
 def test_update_pipeline_run_state_bad_state(app, pipeline, mock_execute_pipeline):
@@ -343,3 +521,112 @@ def test_copy_pipeline_run_artifact(
 def test_create_pipeline_run_artifact_no_pipeline(app):
     with pytest.raises(ValueError):
         services.create_pipeline_run_artifact("nosuchid", "file.name", None)
+
+
+@patch("app.pipelines.services.create_upload_part_urls")
+@patch("app.pipelines.services.create_multipart_upload")
+def test_create_artifact_upload(create_mock, urls_mock, app, pipeline):
+    pipeline_run = services.create_pipeline_run(pipeline.uuid, VALID_CALLBACK_INPUT)
+    create_mock.return_value = "anid"
+
+    upload = services.create_artifact_upload(
+        pipeline_run.uuid, {"name": "a file.csv", "size": ARTIFACT_PART_SIZE + 1}
+    )
+    assert upload["upload_id"] == "anid"
+    assert upload["part_size"] == ARTIFACT_PART_SIZE
+    key = f"{pipeline.uuid}/{pipeline_run.uuid}/{upload['uuid']}-a%20file.csv"
+    assert create_mock.call_args[0] == (key,)
+    assert urls_mock.call_args[0] == (key, "anid", 2)
+
+    # parts grow so that uploads don't need too many of them
+    upload = services.create_artifact_upload(
+        pipeline_run.uuid,
+        {"name": "a.csv", "size": ARTIFACT_PART_SIZE * ARTIFACT_MAX_PARTS * 2},
+    )
+    assert upload["part_size"] == ARTIFACT_PART_SIZE * 2
+    assert urls_mock.call_args[0][2] == ARTIFACT_MAX_PARTS
+
+    services.create_artifact_upload(pipeline_run.uuid, {"name": "a.csv", "size": 0})
+    assert urls_mock.call_args[0][2] == 1
+
+    with pytest.raises(ValueError):
+        services.create_artifact_upload("nosuchid", {"name": "a.csv", "size": 0})
+    with pytest.raises(ValidationError):
+        services.create_artifact_upload(pipeline_run.uuid, {"name": "a.csv"})
+
+
+@patch("app.pipelines.services.complete_multipart_upload")
+def test_complete_artifact_upload(complete_mock, app, pipeline):
+    pipeline_run = services.create_pipeline_run(pipeline.uuid, VALID_CALLBACK_INPUT)
+
+    artifact = services.complete_artifact_upload(
+        pipeline_run.uuid,
+        "auuid",
+        {
+            "name": "a.csv",
+            "upload_id": "anid",
+            "parts": [{"part_number": 1, "etag": "e"}],
+        },
+    )
+    assert artifact.uuid == "auuid"
+    assert pipeline_run.pipeline_run_artifacts == [artifact]
+    assert complete_mock.call_args[0] == (
+        f"{pipeline.uuid}/{pipeline_run.uuid}/auuid-a.csv",
+        "anid",
+        [(1, "e")],
+    )
+
+    # a retried complete returns the artifact of the first one.
+    complete_mock.reset_mock()
+    assert (
+        services.complete_artifact_upload(
+            pipeline_run.uuid,
+            "auuid",
+            {"name": "a.csv", "upload_id": "anid", "parts": []},
+        )
+        == artifact
+    )
+    assert not complete_mock.called
+    assert pipeline_run.pipeline_run_artifacts == [artifact]
+
+    with pytest.raises(ValueError):
+        services.complete_artifact_upload(
+            "nosuchid", "auuid", {"name": "a.csv", "upload_id": "anid", "parts": []}
+        )
+
+    complete_mock.side_effect = ClientError(
+        {"Error": {"Code": "NoSuchUpload"}}, "CompleteMultipartUpload"
+    )
+    with pytest.raises(ValueError):
+        services.complete_artifact_upload(
+            pipeline_run.uuid,
+            "buuid",
+            {"name": "a.csv", "upload_id": "anid", "parts": []},
+        )
+    assert pipeline_run.pipeline_run_artifacts == [artifact]
+
+
+@patch("app.pipelines.services.abort_multipart_upload")
+def test_abort_artifact_upload(abort_mock, app, pipeline):
+    pipeline_run = services.create_pipeline_run(pipeline.uuid, VALID_CALLBACK_INPUT)
+
+    services.abort_artifact_upload(
+        pipeline_run.uuid, "auuid", {"name": "a.csv", "upload_id": "anid"}
+    )
+    assert abort_mock.call_args[0] == (
+        f"{pipeline.uuid}/{pipeline_run.uuid}/auuid-a.csv",
+        "anid",
+    )
+
+    with pytest.raises(ValueError):
+        services.abort_artifact_upload(
+            "nosuchid", "auuid", {"name": "a.csv", "upload_id": "anid"}
+        )
+
+    abort_mock.side_effect = ClientError(
+        {"Error": {"Code": "NoSuchUpload"}}, "AbortMultipartUpload"
+    )
+    with pytest.raises(ValueError):
+        services.abort_artifact_upload(
+            pipeline_run.uuid, "auuid", {"name": "a.csv", "upload_id": "anid"}
+        )
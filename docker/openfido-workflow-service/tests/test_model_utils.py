@@ -1,6 +1,11 @@
+from unittest.mock import patch
+
 import pytest
 
-from app.model_utils import RunStateEnum
+from app.constants import RUN_STATE_TYPE_CACHE_TTL
+from app.model_utils import RunStateEnum, find_run_state_enum, run_state_type_ids
+from app.pipelines.models import db
+from app.pipelines.queries import find_run_state_type_id
 
 
 def test_run_state_is_valid_transition(app):
@@ -54,3 +59,18 @@ def test_run_state_in_final_state(app):
     assert RunStateEnum.FAILED.in_final_state()
     assert RunStateEnum.COMPLETED.in_final_state()
     assert RunStateEnum.CANCELLED.in_final_state()
+
+
+@patch("app.model_utils.time.monotonic")
+def test_run_state_type_ids_expire(monotonic_mock, app):
+    monotonic_mock.return_value = 1000
+    run_state_type_id = find_run_state_type_id(RunStateEnum.RUNNING)
+    db.session.commit()
+    assert find_run_state_enum(run_state_type_id) == RunStateEnum.RUNNING
+    assert run_state_type_ids() == {RunStateEnum.RUNNING: run_state_type_id}
+
+    # ids recreated by other processes are looked up again after a while.
+    monotonic_mock.return_value = 1000 + RUN_STATE_TYPE_CACHE_TTL - 1
+    assert run_state_type_ids() == {RunStateEnum.RUNNING: run_state_type_id}
+    monotonic_mock.return_value = 1000 + RUN_STATE_TYPE_CACHE_TTL
+    assert run_state_type_ids() == {}
@@ -0,0 +1,269 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.model_utils import RunStateEnum
+from app.pipelines.models import PipelineRunArtifact, db
+from app.pipelines.queries import find_run_state_type, warm_run_state_type_cache
+from app.pipelines.services import (
+    create_pipeline_run,
+    create_pipeline_run_state,
+    update_pipeline_run_state,
+)
+from app.workflows.services import (
+    create_workflow_pipeline,
+    create_workflow_run,
+    update_workflow_run,
+)
+from application_roles.decorators import ROLES_KEY
+from application_roles.queries import find_permission_codes
+
+from .conftest import count_queries
+from .pipelines.test_services import VALID_CALLBACK_INPUT
+
+
+@pytest.fixture(autouse=True)
+def mock_create_url():
+    with patch("app.pipelines.models.create_url") as create_url:
+        create_url.return_value = "https://example.com/artifact"
+        yield create_url
+
+
+@pytest.fixture(autouse=True)
+def first_request(client):
+    # the first request caches the RunStateTypes.
+    client.get("/healthcheck")
+
+
+def add_pipeline_runs(pipeline, count):
+    """ Add runs with a few states, inputs and artifacts to a pipeline. """
+    pipeline_runs = []
+    for _ in range(count):
+        pipeline_run = create_pipeline_run(
+            pipeline.uuid,
+            {
+                **VALID_CALLBACK_INPUT,
+                "inputs": [
+                    {"name": "a.csv", "url": "https://example.com/a.csv"},
+                    {"name": "b.csv", "url": "https://example.com/b.csv"},
+                ],
+            },
+        )
+        update_pipeline_run_state(pipeline_run.uuid, {"state": "RUNNING"})
+        pipeline_run.pipeline_run_artifacts.extend(
+            [PipelineRunArtifact(name="a.pdf"), PipelineRunArtifact(name="b.pdf")]
+        )
+        pipeline_runs.append(pipeline_run)
+    db.session.commit()
+
+    return pipeline_runs
+
+
+def count_request_queries(client, application, method, url, **kwargs):
+    """ Count the SQL statements executed by a request. """
+    # the permissions of the api key are cached by the first request.
+    find_permission_codes(application.api_key)
+    db.session.expire_all()
+    with count_queries() as statements:
+        result = client.open(
+            url,
+            method=method,
+            headers={ROLES_KEY: application.api_key},
+            **kwargs,
+        )
+    assert result.status_code == 200
+    return len(statements)
+
+
+def test_list_pipeline_runs_queries(
+    client, pipeline, client_application, mock_execute_pipeline
+):
+    url = f"/v1/pipelines/{pipeline.uuid}/runs"
+    add_pipeline_runs(pipeline, 2)
+    full = count_request_queries(client, client_application, "GET", url)
+    summary = count_request_queries(
+        client, client_application, "GET", url, query_string={"view": "summary"}
+    )
+    assert summary < full
+
+    add_pipeline_runs(pipeline, 6)
+    assert count_request_queries(client, client_application, "GET", url) == full
+    assert (
+        count_request_queries(
+            client, client_application, "GET", url, query_string={"view": "summary"}
+        )
+        == summary
+    )
+
+
+def test_search_pipeline_runs_queries(
+    client, pipeline, client_application, mock_execute_pipeline
+):
+    def search(pipeline_runs):
+        return count_request_queries(
+            client,
+            client_application,
+            "POST",
+            "/v1/pipelines/runs/search",
+            json={"uuids": [pr.uuid for pr in pipeline_runs]},
+        )
+
+    pipeline_runs = add_pipeline_runs(pipeline, 2)
+    expected = search(pipeline_runs)
+    pipeline_runs += add_pipeline_runs(pipeline, 6)
+    assert search(pipeline_runs) == expected
+
+
+def test_get_pipeline_run_queries(
+    client, pipeline, client_application, mock_execute_pipeline
+):
+    (pipeline_run,) = add_pipeline_runs(pipeline, 1)
+    url = f"/v1/pipelines/{pipeline.uuid}/runs/{pipeline_run.uuid}"
+    expected = count_request_queries(client, client_application, "GET", url)
+
+    update_pipeline_run_state(pipeline_run.uuid, {"state": "COMPLETED"})
+    pipeline_run.pipeline_run_artifacts.append(PipelineRunArtifact(name="c.pdf"))
+    add_pipeline_runs(pipeline, 3)
+    assert count_request_queries(client, client_application, "GET", url) == expected
+
+
+def test_get_workflow_run_queries(
+    client, workflow_square, client_application, mock_execute_pipeline
+):
+    def get_workflow_run(workflow_run):
+        return count_request_queries(
+            client,
+            client_application,
+            "GET",
+            f"/v1/workflows/{workflow_square.uuid}/runs/{workflow_run.uuid}",
+        )
+
+    workflow_run = create_workflow_run(
+        workflow_square.uuid, {"callback_url": "https://example.com", "inputs": []}
+    )
+    expected = get_workflow_run(workflow_run)
+
+    for _ in range(3):
+        create_workflow_run(
+            workflow_square.uuid, {"callback_url": "https://example.com", "inputs": []}
+        )
+    # failing the first pipeline run cancels the others, adding states to all.
+    for workflow_pipeline_run in workflow_run.workflow_pipeline_runs:
+        pipeline_run = workflow_pipeline_run.pipeline_run
+        if pipeline_run.run_state_enum() == RunStateEnum.NOT_STARTED:
+            update_pipeline_run_state(pipeline_run.uuid, {"state": "RUNNING"})
+            update_pipeline_run_state(pipeline_run.uuid, {"state": "FAILED"})
+    assert get_workflow_run(workflow_run) == expected
+
+
+def test_create_pipeline_run_queries(app, pipeline, mock_execute_pipeline):
+    def create():
+        db.session.expire_all()
+        with count_queries() as statements:
+            create_pipeline_run(pipeline.uuid, VALID_CALLBACK_INPUT)
+        # the other runs of the pipeline are not loaded.
+        assert not any("= pipelinerun.pipeline_id" in st for st in statements)
+        return len(statements)
+
+    for run_state_enum in RunStateEnum:
+        find_run_state_type(run_state_enum)
+    db.session.commit()
+    warm_run_state_type_cache()
+
+    add_pipeline_runs(pipeline, 1)
+    expected = create()
+
+    add_pipeline_runs(pipeline, 5)
+    assert create() == expected
+
+
+def test_find_run_state_type_queries(app, pipeline, mock_execute_pipeline):
+    add_pipeline_runs(pipeline, 1)
+    db.session.expire_all()
+    with count_queries() as statements:
+        run_state_type = find_run_state_type(RunStateEnum.RUNNING)
+    # the states of runs that have this type are not loaded.
+    assert len(statements) == 1
+
+    add_pipeline_runs(pipeline, 5)
+    db.session.expire_all()
+    with count_queries() as statements:
+        find_run_state_type(RunStateEnum.RUNNING)
+    assert len(statements) == 1
+    assert run_state_type.pipeline_run_states.count() == 6
+
+
+def test_update_pipeline_run_state_queries(app, pipeline, mock_execute_pipeline):
+    for run_state_enum in RunStateEnum:
+        find_run_state_type(run_state_enum)
+    db.session.commit()
+    warm_run_state_type_cache()
+
+    (pipeline_run,) = add_pipeline_runs(pipeline, 1)
+    db.session.expire_all()
+    with count_queries() as statements:
+        update_pipeline_run_state(pipeline_run.uuid, {"state": "COMPLETED"})
+
+    # the state's type is cached: only the new state is inserted.
+    assert not any("FROM runstatetype" in statement for statement in statements)
+    inserts = [statement for statement in statements if statement.startswith("INSERT")]
+    assert len(inserts) == 1
+    assert inserts[0].startswith("INSERT INTO pipelinerunstate")
+
+
+def test_update_workflow_run_queries(app, workflow_square, mock_execute_pipeline):
+    def complete_first():
+        workflow_run = create_workflow_run(
+            workflow_square.uuid, {"callback_url": "https://example.com", "inputs": []}
+        )
+        pipeline_run = workflow_run.workflow_pipeline_runs[0].pipeline_run
+        update_pipeline_run_state(pipeline_run.uuid, {"state": "RUNNING"})
+        pipeline_run.add_run_state(create_pipeline_run_state(RunStateEnum.COMPLETED))
+        db.session.commit()
+        db.session.expire_all()
+        with count_queries() as statements:
+            update_workflow_run(pipeline_run)
+        return len(statements)
+
+    for run_state_enum in RunStateEnum:
+        find_run_state_type(run_state_enum)
+    db.session.commit()
+    warm_run_state_type_cache()
+
+    expected = complete_first()
+    for _ in range(3):
+        complete_first()
+    # the other runs of the workflow are not loaded.
+    assert complete_first() == expected
+
+
+def test_create_workflow_pipeline_queries(app, pipeline, workflow):
+    sources = []
+    for _ in range(5):
+        workflow_pipeline = create_workflow_pipeline(
+            workflow.uuid,
+            {
+                "pipeline_uuid": pipeline.uuid,
+                "source_workflow_pipelines": sources,
+                "destination_workflow_pipelines": [],
+            },
+        )
+        sources.append(workflow_pipeline.uuid)
+
+    db.session.expire_all()
+    with count_queries() as statements:
+        create_workflow_pipeline(
+            workflow.uuid,
+            {
+                "pipeline_uuid": pipeline.uuid,
+                "source_workflow_pipelines": sources,
+                "destination_workflow_pipelines": [],
+            },
+        )
+    # the dependencies of the workflow are loaded once for every source.
+    dependency_loads = [
+        statement
+        for statement in statements
+        if "workflowpipelinedependency.from_workflow_pipeline_id IN" in statement
+    ]
+    assert len(dependency_loads) == 1
@@ -1,10 +1,16 @@
+import io
+import json
+import os
+from os.path import join
+from subprocess import PIPE
 from unittest.mock import Mock, call, patch
 from urllib.error import URLError
 
 import pytest
 
+from app.constants import ARTIFACT_UPLOAD_ATTEMPTS, CONSOLE_FLUSH_SIZE
 from app.model_utils import RunStateEnum
-from app.tasks import RunExecutor, execute_pipeline, make_celery
+from app.tasks import RunExecutor, execute_pipeline, make_celery, upload_artifacts
 from application_roles.decorators import ROLES_KEY
 
 
@@ -55,54 +61,116 @@ def test_upload_artifact(urlopen_mock, app):
 class ReturnValue:
     def __init__(self, value, stdout="", stderr=""):
         self.returncode = value
-        self.stdout = stdout.encode("ascii")
-        self.stderr = stderr.encode("ascii")
+        self.stdout = io.BytesIO(stdout.encode("utf-8"))
+        self.stderr = io.BytesIO(stderr.encode("utf-8"))
 
+    def wait(self):
+        return self.returncode
 
-@patch("app.tasks.subprocess.run")
-def test_run_failure(run_mock, app):
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        pass
+
+
+@patch("app.tasks.subprocess.Popen")
+def test_run_failure(popen_mock, app):
     executor = RunExecutor("uuid", "run_uuid")
     executor.update_run_output = Mock()
 
-    run_mock.return_value = ReturnValue(1)
+    popen_mock.return_value = ReturnValue(1)
 
     with pytest.raises(ValueError):
         executor.run("a command", "/a/dir")
 
-    run_mock.assert_called_once_with(
-        ["a", "command"], cwd="/a/dir", capture_output=True
+    popen_mock.assert_called_once_with(
+        ["a", "command"], cwd="/a/dir", stdout=PIPE, stderr=PIPE
     )
     executor.update_run_output.assert_called()
 
 
-@patch("app.tasks.subprocess.run")
-def test_run(run_mock, app):
+@patch("app.tasks.subprocess.Popen")
+def test_run(popen_mock, app):
     executor = RunExecutor("uuid", "run_uuid")
     executor.update_run_output = Mock()
 
-    run_mock.return_value = ReturnValue(0)
+    popen_mock.return_value = ReturnValue(0)
 
     executor.run("a command", "/a/dir")
-    run_mock.assert_called_once_with(
-        ["a", "command"], cwd="/a/dir", capture_output=True
+    popen_mock.assert_called_once_with(
+        ["a", "command"], cwd="/a/dir", stdout=PIPE, stderr=PIPE
     )
     executor.update_run_output.assert_called()
 
 
-@patch("app.tasks.RunExecutor._put")
+@patch("app.tasks.RunExecutor._post")
+@patch("app.tasks.subprocess.Popen")
+def test_run_streams_output(popen_mock, post_mock, app):
+    executor = RunExecutor("uuid", "run_uuid")
+
+    popen_mock.return_value = ReturnValue(0, "some output\n", "an error\n")
+
+    executor.run("a command", "/a/dir")
+    assert post_mock.call_args_list == [
+        call(
+            "console/append",
+            {
+                "std_out": "Run: a command\n",
+                "std_err": "",
+                "std_out_offset": 0,
+                "std_err_offset": 0,
+            },
+        ),
+        call(
+            "console/append",
+            {
+                "std_out": "some output\n",
+                "std_err": "an error\n",
+                "std_out_offset": 15,
+                "std_err_offset": 0,
+            },
+        ),
+    ]
+
+
+@patch("app.tasks.RunExecutor._post")
+def test_run_subprocess(post_mock, app):
+    executor = RunExecutor("uuid", "run_uuid")
+
+    executor.run("echo hello", ".")
+    assert post_mock.call_args_list[-1][0][1]["std_out"] == "hello\n"
+
+    with pytest.raises(ValueError):
+        executor.run("false", ".")
+
+
+@patch("app.tasks.RunExecutor._post")
 def test_update_run_output(request_mock, app):
     executor = RunExecutor("uuid", "run_uuid")
 
     executor.update_run_output("stdout", "stderr")
     request_mock.assert_called_once_with(
-        "console", {"std_out": "\nstdout", "std_err": "\nstderr"}
+        "console/append",
+        {
+            "std_out": "stdout\n",
+            "std_err": "stderr\n",
+            "std_out_offset": 0,
+            "std_err_offset": 0,
+        },
     )
 
-    # extra calls add data
+    # extra calls only send new data
     request_mock.reset_mock()
     executor.update_run_output("more", "and more")
     request_mock.assert_called_once_with(
-        "console", {"std_out": "\nstdout\nmore", "std_err": "\nstderr\nand more"}
+        "console/append",
+        {
+            "std_out": "more\n",
+            "std_err": "and more\n",
+            "std_out_offset": 7,
+            "std_err_offset": 7,
+        },
     )
 
     # calls that makes no call
@@ -111,18 +179,81 @@ def test_update_run_output(request_mock, app):
     assert not request_mock.called
 
 
+@patch("app.tasks.RunExecutor._post")
+def test_update_run_output_error(request_mock, app):
+    executor = RunExecutor("uuid", "run_uuid")
+
+    # failing to send output doesn't fail the run.
+    request_mock.side_effect = URLError("an http error")
+    executor.update_run_output("stdout")
+
+    # output that failed to send is sent with the next update:
+    request_mock.reset_mock()
+    request_mock.side_effect = None
+    executor.update_run_output("more")
+    request_mock.assert_called_once_with(
+        "console/append",
+        {
+            "std_out": "stdout\nmore\n",
+            "std_err": "",
+            "std_out_offset": 0,
+            "std_err_offset": 0,
+        },
+    )
+
+
+@patch("app.tasks.RunExecutor.flush_output")
+@patch("app.tasks.subprocess.Popen")
+def test_run_interrupted(popen_mock, flush_mock, app):
+    executor = RunExecutor("uuid", "run_uuid")
+    executor.update_run_output = Mock()
+    flush_mock.side_effect = KeyboardInterrupt()
+    # (the output ends when the process is killed)
+    (read_fd, write_fd) = os.pipe()
+    process = popen_mock.return_value
+    process.poll.return_value = None
+    process.kill.side_effect = lambda: os.close(write_fd)
+    process.stdout = os.fdopen(read_fd, "rb")
+    process.stderr = io.BytesIO(b"")
+
+    with pytest.raises(KeyboardInterrupt):
+        executor.run("a command", "/a/dir")
+
+    # the process is killed when the output can't be followed anymore.
+    process.kill.assert_called_once_with()
+    process.wait.assert_called_once_with()
+
+
+@patch("app.tasks.RunExecutor._post")
+def test_flush_output_batches(request_mock, app):
+    executor = RunExecutor("uuid", "run_uuid")
+
+    executor._buffer_output("std_out", "a little output")
+    executor.flush_output(force=False)
+    assert not request_mock.called
+
+    executor._buffer_output("std_out", "x" * CONSOLE_FLUSH_SIZE)
+    executor.flush_output(force=False)
+    assert request_mock.call_count == 1
+
+
 @patch("app.tasks.RunExecutor.update_run_output")
 @patch("app.tasks.RunExecutor.update_run_status")
 @patch("app.tasks.RunExecutor.run")
+@patch("app.worker_cache.DockerImageCache._inspect")
+@patch("app.worker_cache.os.rename")
 @patch("os.path.exists")
 def test_execute_pipeline_no_openfido(
     exists_mock,
+    rename_mock,
+    inspect_mock,
     run_mock,
     update_run_status_mock,
     update_run_output_mock,
     app,
 ):
     exists_mock.return_value = False
+    inspect_mock.return_value = None
 
     execute_pipeline(
         "uuid",
@@ -136,11 +267,11 @@ def test_execute_pipeline_no_openfido(
 
     assert run_mock.call_count == 3
     assert run_mock.call_args_list[0][0][0] == "docker pull python:3"
-    assert (
-        run_mock.call_args_list[1][0][0]
-        == "git clone https://github.com/example gitrepo"
+    assert run_mock.call_args_list[1][0][0].startswith(
+        "git clone --mirror https://github.com/example "
     )
-    assert run_mock.call_args_list[2][0][0] == "git checkout master"
+    assert run_mock.call_args_list[2][0][0].startswith("git worktree add --detach ")
+    assert run_mock.call_args_list[2][0][0].endswith("/gitrepo master")
 
     assert update_run_status_mock.call_count == 2
     assert update_run_status_mock.call_args_list[0] == call(RunStateEnum.RUNNING)
@@ -151,9 +282,9 @@ def test_execute_pipeline_no_openfido(
 @patch("app.tasks.RunExecutor.update_run_status")
 @patch("app.tasks.RunExecutor.run")
 @patch("os.path.exists")
-@patch("app.tasks.urllib_request.urlretrieve")
+@patch("app.tasks.InputCache.fetch")
 def test_execute_pipeline_urlerror(
-    retrieve_mock,
+    fetch_mock,
     exists_mock,
     run_mock,
     update_run_status_mock,
@@ -186,9 +317,9 @@ def test_execute_pipeline_urlerror(
 @patch("app.tasks.RunExecutor.update_run_status")
 @patch("app.tasks.RunExecutor.run")
 @patch("os.path.exists")
-@patch("app.tasks.urllib_request.urlretrieve")
+@patch("app.tasks.InputCache.fetch")
 def test_execute_pipeline_valueerror(
-    retrieve_mock,
+    fetch_mock,
     exists_mock,
     run_mock,
     update_run_status_mock,
@@ -221,9 +352,9 @@ def test_execute_pipeline_valueerror(
 @patch("app.tasks.RunExecutor.update_run_status")
 @patch("app.tasks.RunExecutor.run")
 @patch("os.path.exists")
-@patch("app.tasks.urllib_request.urlretrieve")
+@patch("app.tasks.InputCache.fetch")
 def test_execute_pipeline_unexpectederror(
-    retrieve_mock,
+    fetch_mock,
     exists_mock,
     run_mock,
     update_run_status_mock,
@@ -256,15 +387,17 @@ def test_execute_pipeline_unexpectederror(
 @patch("app.tasks.RunExecutor.update_run_status")
 @patch("app.tasks.RunExecutor.upload_artifact")
 @patch("app.tasks.RunExecutor.run")
+@patch("app.worker_cache.DockerImageCache._inspect")
 @patch("os.path.exists")
-@patch("os.listdir")
-@patch("os.path.isfile")
-@patch("app.tasks.urllib_request.urlretrieve")
+@patch("os.walk")
+@patch("os.path.getsize")
+@patch("app.tasks.InputCache.fetch")
 def test_execute_pipeline(
-    retrieve_mock,
-    isfile_mock,
-    listdir_mock,
+    fetch_mock,
+    getsize_mock,
+    walk_mock,
     exists_mock,
+    inspect_mock,
     run_mock,
     upload_artifact_mock,
     update_run_status_mock,
@@ -272,8 +405,12 @@ def test_execute_pipeline(
     app,
 ):
     exists_mock.return_value = True
-    listdir_mock.return_value = ["output.txt"]
-    isfile_mock.return_value = False
+    inspect_mock.return_value = None
+    walk_mock.side_effect = lambda outputdir: [
+        (outputdir, ["plots"], ["output.txt"]),
+        (join(outputdir, "plots"), [], ["plot.png"]),
+    ]
+    getsize_mock.return_value = 100
 
     execute_pipeline(
         "uuid",
@@ -290,25 +427,133 @@ def test_execute_pipeline(
         "script.sh",
     )
 
-    assert run_mock.call_count == 7
+    assert run_mock.call_count == 8
     assert run_mock.call_args_list[0][0][0] == "docker pull python:3"
-    assert (
-        run_mock.call_args_list[1][0][0]
-        == "git clone https://github.com/example gitrepo"
-    )
-    assert run_mock.call_args_list[2][0][0] == "git checkout master"
-    assert run_mock.call_args_list[3][0][0] == "mkdir input"
-    assert run_mock.call_args_list[4][0][0] == "mkdir output"
-    assert run_mock.call_args_list[5][0][0] == "chmod -R 777 ."
-    assert run_mock.call_args_list[6][0][0].startswith("docker run --rm")
-    assert " script.sh" in run_mock.call_args_list[6][0][0]
+    # the repository mirror is already cached (os.path.exists):
+    assert run_mock.call_args_list[1][0][0] == "git fetch --prune origin"
+    assert run_mock.call_args_list[2][0][0] == "git worktree prune"
+    assert run_mock.call_args_list[3][0][0].startswith("git worktree add --detach ")
+    assert run_mock.call_args_list[4][0][0] == "mkdir input"
+    assert run_mock.call_args_list[5][0][0] == "mkdir output"
+    assert run_mock.call_args_list[6][0][0] == "chmod -R 777 ."
+    assert run_mock.call_args_list[7][0][0].startswith("docker run --rm")
+    assert " script.sh" in run_mock.call_args_list[7][0][0]
+    # the mirror that the worktree refers to is mounted read-only.
+    mirror = run_mock.call_args_list[1][0][1]
+    assert f"-v {mirror}:{mirror}:ro " in run_mock.call_args_list[7][0][0]
+    # as are the inputs, which are linked to the files of the input cache.
+    assert ":/tmp/input:ro " in run_mock.call_args_list[7][0][0]
 
     assert update_run_status_mock.call_count == 2
     assert update_run_status_mock.call_args_list[0] == call(RunStateEnum.RUNNING)
     assert update_run_status_mock.call_args_list[1] == call(RunStateEnum.COMPLETED)
 
-    assert retrieve_mock.call_count == 1
-    assert retrieve_mock.call_args_list[0][0][0] == "https://example.com/a%20file.pdf"
+    assert fetch_mock.call_count == 1
+    assert fetch_mock.call_args_list[0][0][1] == [
+        {
+            "name": "a file.pdf",
+            "url": "https://example.com/a%20file.pdf",
+        }
+    ]
+    assert fetch_mock.call_args_list[0][0][2].endswith("/input")
+
+    uploads = sorted(c[0] for c in upload_artifact_mock.call_args_list)
+    assert len(uploads) == 2
+    assert uploads[0][0] == "output.txt"
+    assert uploads[0][1].endswith("/output/output.txt")
+    assert uploads[1][0] == "plots/plot.png"
+
+
+@patch("app.tasks.RunExecutor.update_run_output")
+@patch("app.tasks.RunExecutor.upload_artifact_multipart")
+@patch("app.tasks.RunExecutor.upload_artifact")
+@patch("app.tasks.time.sleep")
+def test_upload_artifacts(
+    sleep_mock,
+    upload_artifact_mock,
+    upload_artifact_multipart_mock,
+    update_run_output_mock,
+    app,
+    tmp_path,
+):
+    (tmp_path / "small.txt").write_text("small")
+    (tmp_path / "plots").mkdir()
+    (tmp_path / "plots" / "large.png").write_text("large" * 10)
+    upload_artifact_mock.side_effect = [URLError("an error"), None]
+
+    upload_artifacts(RunExecutor("uuid", "run_uuid"), str(tmp_path), 20)
+
+    # small files are retried
+    assert upload_artifact_mock.call_args_list == [
+        call("small.txt", str(tmp_path / "small.txt")),
+        call("small.txt", str(tmp_path / "small.txt")),
+    ]
+    assert sleep_mock.call_count == 1
+    assert upload_artifact_multipart_mock.call_args_list == [
+        call("plots/large.png", str(tmp_path / "plots" / "large.png"))
+    ]
+    assert update_run_output_mock.call_count == 2
 
-    assert upload_artifact_mock.call_count == 1
-    assert upload_artifact_mock.call_args_list[0][0][0] == "output.txt"
+
+@patch("app.tasks.RunExecutor.upload_artifact")
+@patch("app.tasks.time.sleep")
+def test_upload_artifacts_error(sleep_mock, upload_artifact_mock, app, tmp_path):
+    (tmp_path / "small.txt").write_text("small")
+    upload_artifact_mock.side_effect = URLError("an error")
+
+    with pytest.raises(URLError):
+        upload_artifacts(RunExecutor("uuid", "run_uuid"), str(tmp_path), 20)
+    assert upload_artifact_mock.call_count == ARTIFACT_UPLOAD_ATTEMPTS
+
+
+@patch("app.tasks.urllib_request.urlopen")
+@patch("app.tasks.RunExecutor._make_request")
+def test_upload_artifact_multipart(request_mock, urlopen_mock, app, tmp_path):
+    (tmp_path / "large.txt").write_text("0123456789")
+    request_mock.side_effect = [
+        b'{"uuid": "auuid", "upload_id": "anid", "part_size": 6,'
+        b' "urls": ["http://s3/1", "http://s3/2"]}',
+        b"{}",
+    ]
+    response = urlopen_mock.return_value.__enter__.return_value
+    response.headers = {"ETag": "etag"}
+
+    executor = RunExecutor("uuid", "run_uuid")
+    executor.upload_artifact_multipart("large.txt", str(tmp_path / "large.txt"))
+
+    assert request_mock.call_args_list[0][0][0] == "artifacts/uploads"
+    assert json.loads(request_mock.call_args_list[0][0][1]) == {
+        "name": "large.txt",
+        "size": 10,
+    }
+    assert [c[0][0].data for c in urlopen_mock.call_args_list] == [b"012345", b"6789"]
+    assert [c[0][0].full_url for c in urlopen_mock.call_args_list] == [
+        "http://s3/1",
+        "http://s3/2",
+    ]
+    assert request_mock.call_args_list[1][0][0] == "artifacts/uploads/auuid/complete"
+    assert json.loads(request_mock.call_args_list[1][0][1]) == {
+        "name": "large.txt",
+        "upload_id": "anid",
+        "parts": [
+            {"part_number": 1, "etag": "etag"},
+            {"part_number": 2, "etag": "etag"},
+        ],
+    }
+
+
+@patch("app.tasks.urllib_request.urlopen")
+@patch("app.tasks.RunExecutor._make_request")
+def test_upload_artifact_multipart_error(request_mock, urlopen_mock, app, tmp_path):
+    (tmp_path / "large.txt").write_text("0123456789")
+    request_mock.side_effect = [
+        b'{"uuid": "auuid", "upload_id": "anid", "part_size": 6,'
+        b' "urls": ["http://s3/1", "http://s3/2"]}',
+        b"{}",
+    ]
+    urlopen_mock.side_effect = URLError("an error")
+
+    executor = RunExecutor("uuid", "run_uuid")
+    with pytest.raises(URLError):
+        executor.upload_artifact_multipart("large.txt", str(tmp_path / "large.txt"))
+    assert request_mock.call_args_list[1][0][0] == "artifacts/uploads/auuid/abort"
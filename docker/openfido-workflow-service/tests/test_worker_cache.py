@@ -0,0 +1,302 @@
+import os
+import subprocess
+from unittest.mock import Mock, call, patch
+from urllib.error import HTTPError, URLError
+
+import pytest
+
+from app.worker_cache import DockerImageCache, GitMirrorCache, InputCache, _locked
+
+
+class LocalExecutor:
+    """ Runs commands like RunExecutor, without reporting to the server. """
+
+    def __init__(self):
+        self.commands = []
+
+    def run(self, command, directory):
+        self.commands.append(command)
+        subprocess.run(command.split(" "), cwd=directory, check=True)
+
+
+def git(directory, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=directory,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+@pytest.fixture
+def repository(tmp_path):
+    repository = tmp_path / "repository"
+    repository.mkdir()
+    git(repository, "init", "-q")
+    git(repository, "checkout", "-q", "-b", "master")
+    (repository / "openfido.sh").write_text("echo one")
+    git(repository, "add", ".")
+    git(repository, "commit", "-q", "-m", "one")
+    return repository
+
+
+def test_git_mirror_checkout(tmp_path, repository):
+    cache = GitMirrorCache(str(tmp_path / "cache"))
+    executor = LocalExecutor()
+
+    cache.checkout(executor, str(repository), "master", str(tmp_path / "run1"))
+    assert executor.commands[0].startswith("git clone --mirror ")
+    assert (tmp_path / "run1" / "openfido.sh").read_text() == "echo one"
+
+    # new commits (and branches) are fetched into the existing mirror.
+    git(repository, "checkout", "-q", "-b", "other")
+    (repository / "openfido.sh").write_text("echo two")
+    git(repository, "commit", "-q", "-am", "two")
+
+    executor.commands = []
+    cache.checkout(executor, str(repository), "other", str(tmp_path / "run2"))
+    assert executor.commands[0] == "git fetch --prune origin"
+    assert (tmp_path / "run2" / "openfido.sh").read_text() == "echo two"
+    assert (tmp_path / "run1" / "openfido.sh").read_text() == "echo one"
+    assert len(os.listdir(tmp_path / "cache" / "git")) == 2
+
+
+def test_git_mirror_checkout_failed_clone(tmp_path):
+    cache = GitMirrorCache(str(tmp_path / "cache"))
+
+    with pytest.raises(subprocess.CalledProcessError):
+        cache.checkout(
+            LocalExecutor(), str(tmp_path / "missing"), "master", str(tmp_path / "run")
+        )
+    # no partial mirror is left behind to be fetched by later runs.
+    assert os.listdir(tmp_path / "cache" / "git") == [
+        f"{os.path.basename(cache.mirror_path(str(tmp_path / 'missing')))}.lock"
+    ]
+
+
+@patch("app.worker_cache.subprocess.run")
+def test_docker_image_cache_inspect(run_mock, tmp_path):
+    cache = DockerImageCache(str(tmp_path), 60, 1000)
+
+    run_mock.return_value = subprocess.CompletedProcess([], 0, "sha256:1 1234\n")
+    assert cache._inspect("python:3") == ("sha256:1", 1234)
+    assert run_mock.call_args[0][0] == [
+        "docker",
+        "image",
+        "inspect",
+        "--format",
+        "{{.Id}} {{.Size}}",
+        "python:3",
+    ]
+
+    run_mock.return_value = subprocess.CompletedProcess([], 1, "")
+    assert cache._inspect("python:3") is None
+
+
+@patch("app.worker_cache.subprocess.run")
+@patch("app.worker_cache.DockerImageCache._inspect")
+def test_docker_image_cache_pull(inspect_mock, run_mock, tmp_path):
+    cache = DockerImageCache(str(tmp_path), 60, 1000)
+    executor = Mock()
+
+    inspect_mock.return_value = None
+    cache.pull(executor, "python:3")
+    assert executor.run.call_args_list == [call("docker pull python:3", str(tmp_path))]
+
+    # recently pulled images are not pulled again.
+    inspect_mock.return_value = ("sha256:1", 100)
+    executor.reset_mock()
+    cache.pull(executor, "python:3")
+    assert executor.run.call_count == 0
+
+    # unless they were removed from the docker host.
+    inspect_mock.return_value = None
+    cache.pull(executor, "python:3")
+    assert executor.run.call_count == 1
+
+
+@patch("app.worker_cache.subprocess.run")
+@patch("app.worker_cache.DockerImageCache._inspect")
+@patch("app.worker_cache.time.time")
+def test_docker_image_cache_ttl(time_mock, inspect_mock, run_mock, tmp_path):
+    cache = DockerImageCache(str(tmp_path), 60, 1000)
+    executor = Mock()
+    inspect_mock.return_value = ("sha256:1", 100)
+
+    time_mock.return_value = 1000
+    cache.pull(executor, "python:3")
+    cache.pull(executor, "python@sha256:abc")
+    assert executor.run.call_count == 2
+
+    time_mock.return_value = 1059
+    cache.pull(executor, "python:3")
+    assert executor.run.call_count == 2
+
+    # stale tags are refreshed, images referenced by digest never are.
+    time_mock.return_value = 1100
+    cache.pull(executor, "python:3")
+    cache.pull(executor, "python@sha256:abc")
+    assert executor.run.call_count == 3
+
+
+@patch("app.worker_cache.subprocess.run")
+@patch("app.worker_cache.DockerImageCache._inspect")
+@patch("app.worker_cache.time.time")
+def test_docker_image_cache_evict(time_mock, inspect_mock, run_mock, tmp_path):
+    cache = DockerImageCache(str(tmp_path), 60, 250)
+    executor = Mock()
+    inspect_mock.return_value = ("sha256:1", 100)
+
+    for (now, image) in enumerate(["one", "two", "one", "three"]):
+        time_mock.return_value = now
+        cache.pull(executor, image)
+
+    # "two" is the least recently used image.
+    assert run_mock.call_args_list[-1][0][0] == ["docker", "rmi", "two"]
+    assert sorted(cache._load_index().keys()) == ["one", "three"]
+
+
+@patch("app.worker_cache.subprocess.run")
+@patch("app.worker_cache.DockerImageCache._inspect")
+@patch("app.worker_cache.time.time")
+def test_docker_image_cache_evict_pulling(time_mock, inspect_mock, run_mock, tmp_path):
+    cache = DockerImageCache(str(tmp_path), 60, 150)
+    executor = Mock()
+    inspect_mock.return_value = ("sha256:1", 100)
+
+    time_mock.return_value = 1
+    cache.pull(executor, "one")
+    # images that another worker is pulling are not removed.
+    with _locked(cache._image_lock_path("one")):
+        time_mock.return_value = 2
+        cache.pull(executor, "two")
+    assert ["docker", "rmi", "one"] not in [c[0][0] for c in run_mock.call_args_list]
+    assert sorted(cache._load_index().keys()) == ["one", "two"]
+
+
+@pytest.fixture
+def input_url(tmp_path):
+    source = tmp_path / "source.csv"
+    source.write_text("a,b,c")
+    return f"file://{source}"
+
+
+@patch("app.worker_cache.InputCache._probe")
+def test_input_cache_fetch(probe_mock, tmp_path, input_url):
+    cache = InputCache(str(tmp_path / "cache"), 1000, 2)
+    executor = Mock()
+    probe_mock.return_value = ('"etag1"', 5)
+
+    for run in ["run1", "run2"]:
+        (tmp_path / run).mkdir()
+        cache.fetch(
+            executor,
+            [{"name": "a.csv", "url": input_url}, {"name": "b.csv", "url": input_url}],
+            str(tmp_path / run),
+        )
+        assert (tmp_path / run / "a.csv").read_text() == "a,b,c"
+        assert (tmp_path / run / "b.csv").read_text() == "a,b,c"
+
+    assert len(os.listdir(tmp_path / "cache" / "inputs")) == 2
+    assert executor.update_run_output.call_args_list[-1] == call("Input b.csv: cached")
+
+    # a new version of the file is downloaded again.
+    probe_mock.return_value = ('"etag2"', 5)
+    (tmp_path / "run3").mkdir()
+    cache.fetch(executor, [{"name": "a.csv", "url": input_url}], str(tmp_path / "run3"))
+    assert executor.update_run_output.call_args_list[-1] == call(
+        "Input a.csv: downloaded"
+    )
+
+
+@patch("app.worker_cache.InputCache._probe")
+def test_input_cache_fetch_size_mismatch(probe_mock, tmp_path, input_url):
+    cache = InputCache(str(tmp_path / "cache"), 1000, 2)
+    probe_mock.return_value = ('"etag1"', 100)
+
+    with pytest.raises(ValueError):
+        cache.fetch(Mock(), [{"name": "a.csv", "url": input_url}], str(tmp_path))
+    assert os.listdir(tmp_path / "cache" / "inputs") == ["evict.lock"]
+
+
+@patch("app.worker_cache.urllib_request.urlopen")
+@patch("app.worker_cache.InputCache._probe")
+def test_input_cache_fetch_error(probe_mock, urlopen_mock, tmp_path):
+    cache = InputCache(str(tmp_path / "cache"), 1000, 2)
+    probe_mock.return_value = ('"etag1"', 5)
+    # the connection is lost partway through the download.
+    response = urlopen_mock.return_value
+    response.info.return_value = {}
+    response.read.side_effect = [b"a,b", URLError("Connection reset by peer")]
+
+    with pytest.raises(URLError):
+        cache.fetch(
+            Mock(),
+            [{"name": "a.csv", "url": "https://example.com/a.csv"}],
+            str(tmp_path),
+        )
+    assert os.listdir(tmp_path / "cache" / "inputs") == ["evict.lock"]
+
+
+@patch("app.worker_cache.os.link")
+@patch("app.worker_cache.InputCache._probe")
+def test_input_cache_fetch_copy(probe_mock, link_mock, tmp_path, input_url):
+    # inputs are copied when the cache is on another file system.
+    cache = InputCache(str(tmp_path / "cache"), 1000, 2)
+    probe_mock.return_value = ('"etag1"', 5)
+    link_mock.side_effect = OSError("Invalid cross-device link")
+
+    cache.fetch(Mock(), [{"name": "a.csv", "url": input_url}], str(tmp_path))
+    assert (tmp_path / "a.csv").read_text() == "a,b,c"
+    (cached,) = [
+        name
+        for name in os.listdir(tmp_path / "cache" / "inputs")
+        if not name.endswith(".lock")
+    ]
+    assert not os.path.samefile(
+        tmp_path / "a.csv", tmp_path / "cache" / "inputs" / cached
+    )
+
+
+def test_input_cache_fetch_uncached(tmp_path, input_url):
+    # file URLs have no ETag, so they aren't cached.
+    cache = InputCache(str(tmp_path / "cache"), 1000, 2)
+
+    cache.fetch(Mock(), [{"name": "a.csv", "url": input_url}], str(tmp_path))
+    assert (tmp_path / "a.csv").read_text() == "a,b,c"
+    assert os.listdir(tmp_path / "cache" / "inputs") == ["evict.lock"]
+
+
+@patch("app.worker_cache.urllib_request.urlopen")
+def test_input_cache_probe(urlopen_mock, tmp_path):
+    cache = InputCache(str(tmp_path), 1000, 2)
+    response = urlopen_mock.return_value.__enter__.return_value
+
+    response.headers = {"ETag": '"abc"', "Content-Range": "bytes 0-0/1234"}
+    assert cache._probe("https://example.com/a.csv?sig=1") == ('"abc"', 1234)
+    assert urlopen_mock.call_args[0][0].headers == {"Range": "bytes=0-0"}
+
+    # servers that ignore the range return the whole file.
+    response.headers = {"ETag": '"abc"', "Content-Length": "99"}
+    assert cache._probe("https://example.com/a.csv") == ('"abc"', 99)
+
+    # the range of an empty file can't be satisfied.
+    urlopen_mock.side_effect = HTTPError(
+        "https://example.com/a.csv", 416, "", {"Content-Range": "bytes */0"}, None
+    )
+    assert cache._probe("https://example.com/a.csv") == (None, 0)
+
+    urlopen_mock.side_effect = HTTPError("https://example.com/a.csv", 403, "", {}, None)
+    with pytest.raises(HTTPError):
+        cache._probe("https://example.com/a.csv")
+
+
+def test_input_cache_evict(tmp_path):
+    cache = InputCache(str(tmp_path), 10, 2)
+    for (mtime, name) in enumerate(["old", "new", "newer"]):
+        path = tmp_path / "inputs" / name
+        path.write_text("12345")
+        os.utime(path, (mtime, mtime))
+
+    cache._evict()
+    assert sorted(os.listdir(tmp_path / "inputs")) == ["new", "newer"]
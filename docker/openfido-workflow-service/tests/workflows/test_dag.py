@@ -0,0 +1,29 @@
+from app.workflows.dag import WorkflowDag
+
+
+def test_compile():
+    dag = WorkflowDag.compile([1, 2, 3], [(1, 2), (1, 3), (2, 3), (3, 4)])
+    # dependencies on other nodes (deleted pipelines) are ignored.
+    assert dag.destinations == {1: [2, 3], 2: [3], 3: []}
+    assert dag.in_degrees() == {1: 0, 2: 1, 3: 2}
+
+
+def test_json():
+    dag = WorkflowDag.compile([1, 2], [(1, 2)])
+    assert dag.to_json() == {"1": [2], "2": []}
+    assert WorkflowDag.from_json(dag.to_json()).destinations == dag.destinations
+
+
+def test_add_dependency():
+    dag = WorkflowDag.compile([1, 2, 3], [(1, 2), (2, 3)])
+    assert dag.reaches(1, 3)
+    assert not dag.reaches(3, 1)
+
+    assert not dag.add_dependency(3, 1)
+    assert not dag.add_dependency(2, 2)
+    assert dag.add_dependency(1, 3)
+    assert dag.add_dependency(3, 4)
+    assert dag.destinations == {1: [2, 3], 2: [3], 3: [4], 4: []}
+
+    dag.remove_dependency(2, 3)
+    assert dag.add_dependency(3, 2)
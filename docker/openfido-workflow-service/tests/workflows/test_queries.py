@@ -1,10 +1,16 @@
+from datetime import datetime, timedelta
 from unittest.mock import patch
 
 from app import db
+from app.constants import WORKFLOW_MAX_RUNNING_PIPELINES
+from app.model_utils import RunStateEnum
 from app.pipelines.models import Pipeline
 from app.workflows import queries
 from app.workflows.models import Workflow, WorkflowPipeline, WorkflowPipelineDependency
-from app.workflows.services import create_workflow_run, delete_workflow_pipeline
+from app.workflows.services import (
+    create_workflow_run,
+    update_workflow_run_state,
+)
 
 
 def test_find_workflow_bad_id(app):
@@ -47,18 +53,6 @@ def test_find_workflows(app, workflow):
     )
 
 
-def test_is_dag(app, workflow_line, pipeline):
-    # Not adding any new edges succeeds
-    # assert queries.is_dag(workflow_line)
-
-    # adding a non cycle does nothing.
-    [a, b, c] = workflow_line.workflow_pipelines
-    assert queries.is_dag(workflow_line, a, c)
-
-    # trying to make a cycle fails
-    assert not queries.is_dag(workflow_line, c, a)
-
-
 def test_pipeline_has_workflow_pipeline(app, workflow, pipeline, workflow_pipeline):
     assert queries.pipeline_has_workflow_pipeline(pipeline.id)
 
@@ -76,54 +70,58 @@ def test_pipeline_has_workflow_pipeline(app, workflow, pipeline, workflow_pipeli
 
 
 @patch("app.pipelines.services.execute_pipeline.delay")
-def test_find_dest_workflow_runs(delay_mock, app, workflow_line):
-    workflow_run = create_workflow_run(
-        workflow_line.uuid,
-        {
-            "callback_url": "http://example.com/cb",
-            "inputs": [],
-        },
-    )
-    assert queries.find_dest_workflow_runs(workflow_run.workflow_pipeline_runs[0]) == [
-        workflow_run.workflow_pipeline_runs[1].pipeline_run
+def test_find_workflow_runs_by_state(delay_mock, app, workflow_line):
+    workflow_runs = [
+        create_workflow_run(
+            workflow_line.uuid, {"callback_url": "http://example.com/cb", "inputs": []}
+        )
+        for _ in range(3)
     ]
-    assert queries.find_dest_workflow_runs(workflow_run.workflow_pipeline_runs[1]) == [
-        workflow_run.workflow_pipeline_runs[2].pipeline_run
+    update_workflow_run_state(workflow_runs[1], RunStateEnum.RUNNING)
+
+    assert workflow_runs[1].current_state == RunStateEnum.RUNNING.value
+    assert list(queries.find_workflow_runs_by_state([RunStateEnum.NOT_STARTED])) == [
+        workflow_runs[0],
+        workflow_runs[2],
+    ]
+    assert list(queries.find_workflow_runs_by_state([RunStateEnum.RUNNING])) == [
+        workflow_runs[1]
     ]
-    assert queries.find_dest_workflow_runs(workflow_run.workflow_pipeline_runs[2]) == []
 
-    # if a workflow_pipeline is deleted it is not found/included
-    delete_workflow_pipeline(
-        workflow_run.workflow.uuid,
-        workflow_run.workflow_pipeline_runs[1].workflow_pipeline.uuid,
-    )
-    assert queries.find_dest_workflow_runs(workflow_run.workflow_pipeline_runs[0]) == []
+    workflow_line.is_deleted = True
+    db.session.commit()
+    assert list(queries.find_workflow_runs_by_state([RunStateEnum.RUNNING])) == []
 
 
 @patch("app.pipelines.services.execute_pipeline.delay")
-def test_find_source_workflow_runs(delay_mock, app, workflow_line):
-    workflow_run = create_workflow_run(
-        workflow_line.uuid,
-        {
-            "callback_url": "http://example.com/cb",
-            "inputs": [],
-        },
-    )
-    assert (
-        queries.find_source_workflow_runs(workflow_run.workflow_pipeline_runs[0]) == []
-    )
-    assert queries.find_source_workflow_runs(
-        workflow_run.workflow_pipeline_runs[1]
-    ) == [workflow_run.workflow_pipeline_runs[0].pipeline_run]
-    assert queries.find_source_workflow_runs(
-        workflow_run.workflow_pipeline_runs[2]
-    ) == [workflow_run.workflow_pipeline_runs[1].pipeline_run]
-
-    # if a workflow_pipeline is deleted it is not found/included
-    delete_workflow_pipeline(
-        workflow_run.workflow.uuid,
-        workflow_run.workflow_pipeline_runs[1].workflow_pipeline.uuid,
-    )
+def test_find_ready_workflow_pipeline_runs(delay_mock, app, workflow_line):
+    app.config[WORKFLOW_MAX_RUNNING_PIPELINES] = 1
+    (first, second) = [
+        create_workflow_run(
+            workflow_line.uuid, {"callback_url": "http://example.com/cb", "inputs": []}
+        )
+        for _ in range(2)
+    ]
+    assert queries.find_ready_workflow_pipeline_runs([workflow_line]) == [
+        second.workflow_pipeline_runs[0]
+    ]
+    assert queries.find_started_pipeline_run_counts([workflow_line]) == {
+        (workflow_line.id, first.id): 1
+    }
+
+    # runs that have been started for a long time aren't counted.
+    pipeline_run = first.workflow_pipeline_runs[0].pipeline_run
+    pipeline_run.state_changed_at = datetime.utcnow() - timedelta(days=2)
+    db.session.commit()
     assert (
-        queries.find_source_workflow_runs(workflow_run.workflow_pipeline_runs[2]) == []
+        queries.find_started_pipeline_run_counts(
+            [workflow_line], datetime.utcnow() - timedelta(days=1)
+        )
+        == {}
     )
+
+    # finished workflow runs are left out.
+    update_workflow_run_state(second, RunStateEnum.CANCELLED)
+    update_workflow_run_state(first, RunStateEnum.CANCELLED)
+    assert queries.find_ready_workflow_pipeline_runs([workflow_line]) == []
+    assert queries.find_started_pipeline_run_counts([workflow_line]) == {}
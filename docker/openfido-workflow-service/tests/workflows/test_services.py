@@ -1,7 +1,14 @@
+from datetime import datetime, timedelta
 from unittest.mock import call, patch
 
 import pytest
 from app import db
+from app.constants import (
+    WORKFLOW_MAX_RUNNING_PIPELINES,
+    WORKFLOW_ORGANIZATION_MAX_RUNNING_PIPELINES,
+    WORKFLOW_RUN_MAX_RUNNING_PIPELINES,
+    WORKFLOW_STARTED_PIPELINE_TIMEOUT,
+)
 from app.model_utils import RunStateEnum
 from app.pipelines.models import PipelineRunArtifact
 from app.pipelines.services import (
@@ -9,7 +16,7 @@ from app.pipelines.services import (
     create_pipeline_run_state,
     create_pipeline,
 )
-from app.workflows import services
+from app.workflows import queries, services
 from app.workflows.models import WorkflowPipeline
 from app.workflows.queries import find_workflow, find_workflow_pipeline
 from marshmallow.exceptions import ValidationError
@@ -59,6 +66,27 @@ def test_update_workflow_bad_params(app, workflow):
     assert workflow.description == "update desc"
 
 
+def test_workflow_organization(app):
+    workflow = services.create_workflow(
+        {"name": "a workflow", "description": "desc", "organization_uuid": "1" * 32}
+    )
+    assert workflow.organization_uuid == "1" * 32
+
+    # an update without an organization keeps it.
+    services.update_workflow(workflow.uuid, {"name": "a workflow", "description": ""})
+    assert workflow.organization_uuid == "1" * 32
+    services.update_workflow(
+        workflow.uuid,
+        {"name": "a workflow", "description": "", "organization_uuid": "2" * 32},
+    )
+    assert workflow.organization_uuid == "2" * 32
+
+    with pytest.raises(ValidationError):
+        services.create_workflow(
+            {"name": "a workflow", "description": "", "organization_uuid": "bad"}
+        )
+
+
 def test_delete_workflow_no_id(app):
     with pytest.raises(ValueError):
         services.delete_workflow("no-id")
@@ -163,9 +191,11 @@ def test_create_workflow_pipeline_no_dest(app, pipeline, workflow):
     )
 
 
-@patch("app.workflows.services.is_dag")
-def test_create_workflow_pipeline_from_cycle(is_dag_mock, app, pipeline, workflow):
-    is_dag_mock.return_value = False
+@patch("app.workflows.services.WorkflowDag.add_dependency")
+def test_create_workflow_pipeline_from_cycle(
+    add_dependency_mock, app, pipeline, workflow
+):
+    add_dependency_mock.return_value = False
 
     workflow_pipeline = services.create_workflow_pipeline(
         workflow.uuid,
@@ -197,6 +227,33 @@ def test_create_workflow_pipeline_from_cycle(is_dag_mock, app, pipeline, workflo
         )
 
 
+def test_create_workflow_pipeline_cycle(app, pipeline, workflow_line):
+    (a, b, c) = workflow_line.workflow_pipelines
+    with pytest.raises(ValidationError):
+        services.create_workflow_pipeline(
+            workflow_line.uuid,
+            _create_workflow_pipeline_json(pipeline, [c.uuid], [a.uuid]),
+        )
+    assert len(find_workflow(workflow_line.uuid).workflow_pipelines) == 3
+
+    with pytest.raises(ValidationError):
+        services.update_workflow_pipeline(
+            workflow_line.uuid,
+            a.uuid,
+            _create_workflow_pipeline_json(pipeline, [c.uuid], [b.uuid]),
+        )
+
+    # dependencies that are removed don't introduce cycles.
+    updated_pipeline = services.update_workflow_pipeline(
+        workflow_line.uuid,
+        a.uuid,
+        _create_workflow_pipeline_json(pipeline, [c.uuid], []),
+    )
+    assert [
+        wpd.from_workflow_pipeline for wpd in updated_pipeline.source_workflow_pipelines
+    ] == [c]
+
+
 def test_create_workflow_pipeline(app, pipeline, workflow):
     # Creating a workflow pipeline with no sources/destinations is possible.
     workflow_pipeline = services.create_workflow_pipeline(
@@ -452,6 +509,65 @@ def test_update_workflow_pipeline_add_dest(app, pipeline, workflow_pipeline):
     assert updated_pipeline.dest_workflow_pipelines == []
 
 
+def _graph(*pipelines):
+    return {
+        "pipelines": [
+            {"pipeline_uuid": pipeline.uuid, "dependencies": [d.uuid for d in deps]}
+            for (pipeline, *deps) in pipelines
+        ]
+    }
+
+
+def test_update_workflow_graph(app, workflow):
+    (a, b, c, d) = [create_pipeline(PIPELINE_JSON) for _ in range(4)]
+    services.update_workflow_graph(workflow.uuid, _graph((a,), (b, a), (c, a)))
+    graph = queries.find_workflow_graph(workflow)
+    assert [
+        (node["pipeline_uuid"], node["dependencies"]) for node in graph["pipelines"]
+    ] == [(a.uuid, []), (b.uuid, [a.uuid]), (c.uuid, [a.uuid])]
+    workflow_pipeline_uuids = [
+        node["workflow_pipeline_uuid"] for node in graph["pipelines"]
+    ]
+
+    # only the differences are applied.
+    services.update_workflow_graph(workflow.uuid, _graph((a,), (d, b), (b, a)))
+    graph = queries.find_workflow_graph(workflow)
+    assert [
+        (node["pipeline_uuid"], node["dependencies"]) for node in graph["pipelines"]
+    ] == [(a.uuid, []), (b.uuid, [a.uuid]), (d.uuid, [b.uuid])]
+    assert [
+        node["workflow_pipeline_uuid"] for node in graph["pipelines"][:2]
+    ] == workflow_pipeline_uuids[:2]
+    assert find_workflow_pipeline(workflow_pipeline_uuids[2]) is None
+    assert queries.find_workflow_pipeline_dependencies(workflow.uuid).count() == 2
+
+
+def test_update_workflow_graph_invalid(app, workflow):
+    (a, b, c) = [create_pipeline(PIPELINE_JSON) for _ in range(3)]
+    services.update_workflow_graph(workflow.uuid, _graph((a,), (b, a)))
+
+    with pytest.raises(ValueError):
+        services.update_workflow_graph("0" * 32, _graph((a,)))
+    with pytest.raises(ValidationError):
+        services.update_workflow_graph(workflow.uuid, {})
+    with pytest.raises(ValidationError):
+        services.update_workflow_graph(workflow.uuid, _graph((a,), (a,)))
+    with pytest.raises(ValidationError):
+        services.update_workflow_graph(workflow.uuid, _graph((a, c)))
+    with pytest.raises(ValidationError):
+        services.update_workflow_graph(workflow.uuid, _graph((a, c), (b, a), (c, b)))
+    with pytest.raises(ValueError):
+        services.update_workflow_graph(
+            workflow.uuid,
+            {"pipelines": [{"pipeline_uuid": "0" * 32, "dependencies": []}]},
+        )
+
+    graph = queries.find_workflow_graph(workflow)
+    assert [
+        (node["pipeline_uuid"], node["dependencies"]) for node in graph["pipelines"]
+    ] == [(a.uuid, []), (b.uuid, [a.uuid])]
+
+
 def test_create_workflow_run_no_workflow(app, pipeline, workflow):
     with pytest.raises(ValueError):
         services.create_workflow_run(
@@ -543,6 +659,29 @@ def test_create_workflow_run(execute_pipeline_mock, app, workflow_square):
     ]
 
 
+@patch("app.pipelines.services.execute_pipeline")
+def test_create_workflow_run_dag(execute_pipeline_mock, app, workflow_square):
+    workflow_run = services.create_workflow_run(
+        workflow_square.uuid, {"callback_url": "https://example.com", "inputs": []}
+    )
+    (a, b, c, d) = [
+        wpr.workflow_pipeline_id for wpr in workflow_run.workflow_pipeline_runs
+    ]
+    assert workflow_run.workflow_dag().destinations == {
+        a: [b, c],
+        b: [d],
+        c: [d],
+        d: [],
+    }
+    assert workflow_run.pending_pipeline_runs == 4
+    assert [wpr.pending_sources for wpr in workflow_run.workflow_pipeline_runs] == [
+        0,
+        1,
+        1,
+        2,
+    ]
+
+
 @patch("app.pipelines.services.execute_pipeline")
 def test_update_workflow_run_no_workflow(execute_pipeline_mock, app, pipeline):
     # a pipeline_run not associated with workflow_pipeline_run nothing breaks
@@ -562,9 +701,7 @@ def _configure_run_state(workflow, run_state_enum, delay_mock):
     pipeline_runs = [
         wpr.pipeline_run for wpr in workflow.workflow_runs[0].workflow_pipeline_runs
     ]
-    pipeline_runs[0].pipeline_run_states.append(
-        create_pipeline_run_state(run_state_enum)
-    )
+    pipeline_runs[0].add_run_state(create_pipeline_run_state(run_state_enum))
     pipeline_runs[0].pipeline_run_artifacts.append(
         PipelineRunArtifact(name="afile.txt")
     )
@@ -584,6 +721,7 @@ def test_update_workflow_run_state(app, workflow_pipeline):
             "inputs": [],
         },
     )
+    db.session.add(workflow_pipeline)
     workflow = workflow_pipeline.workflow
     db.session.add(workflow)
     # Setting a pipeline to its current state does nothing.
@@ -646,9 +784,7 @@ def test_update_workflow_run_RUNNING_line(
     (workflow_run, pipeline_runs) = _configure_run_state(
         workflow_line, RunStateEnum.COMPLETED, delay_mock
     )
-    workflow_run.workflow_run_states.append(
-        services.create_workflow_run_state(RunStateEnum.RUNNING)
-    )
+    workflow_run.add_run_state(services.create_workflow_run_state(RunStateEnum.RUNNING))
 
     assert workflow_run.run_state_enum() == RunStateEnum.RUNNING
     copy_mock.assert_called_once_with(
@@ -664,9 +800,7 @@ def test_update_workflow_run_RUNNING_line(
     pipeline_runs[1].pipeline_run_artifacts.append(
         PipelineRunArtifact(name="anotherfile.txt")
     )
-    pipeline_runs[1].pipeline_run_states.append(
-        create_pipeline_run_state(RunStateEnum.COMPLETED)
-    )
+    pipeline_runs[1].add_run_state(create_pipeline_run_state(RunStateEnum.COMPLETED))
     services.update_workflow_run(pipeline_runs[1])
     assert workflow_run.run_state_enum() == RunStateEnum.RUNNING
     copy_mock.assert_called_once_with(
@@ -677,9 +811,7 @@ def test_update_workflow_run_RUNNING_line(
     # Finally, when the last run finishes, the workflow is finished
     delay_mock.reset_mock()
     copy_mock.reset_mock()
-    pipeline_runs[2].pipeline_run_states.append(
-        create_pipeline_run_state(RunStateEnum.COMPLETED)
-    )
+    pipeline_runs[2].add_run_state(create_pipeline_run_state(RunStateEnum.COMPLETED))
     services.update_workflow_run(pipeline_runs[2])
     assert workflow_run.run_state_enum() == RunStateEnum.COMPLETED
     assert not copy_mock.called
@@ -693,9 +825,7 @@ def test_update_workflow_run_RUNNING_square(
     (workflow_run, pipeline_runs) = _configure_run_state(
         workflow_square, RunStateEnum.COMPLETED, delay_mock
     )
-    workflow_run.workflow_run_states.append(
-        services.create_workflow_run_state(RunStateEnum.RUNNING)
-    )
+    workflow_run.add_run_state(services.create_workflow_run_state(RunStateEnum.RUNNING))
 
     assert workflow_run.run_state_enum() == RunStateEnum.RUNNING
     copy_mock.assert_has_calls(
@@ -716,9 +846,7 @@ def test_update_workflow_run_RUNNING_square(
     pipeline_runs[1].pipeline_run_artifacts.append(
         PipelineRunArtifact(name="anotherfile.txt")
     )
-    pipeline_runs[1].pipeline_run_states.append(
-        create_pipeline_run_state(RunStateEnum.COMPLETED)
-    )
+    pipeline_runs[1].add_run_state(create_pipeline_run_state(RunStateEnum.COMPLETED))
     services.update_workflow_run(pipeline_runs[1])
     assert workflow_run.run_state_enum() == RunStateEnum.RUNNING
     copy_mock.assert_called_once_with(
@@ -732,9 +860,7 @@ def test_update_workflow_run_RUNNING_square(
     pipeline_runs[2].pipeline_run_artifacts.append(
         PipelineRunArtifact(name="anotherfile.txt")
     )
-    pipeline_runs[2].pipeline_run_states.append(
-        create_pipeline_run_state(RunStateEnum.COMPLETED)
-    )
+    pipeline_runs[2].add_run_state(create_pipeline_run_state(RunStateEnum.COMPLETED))
     services.update_workflow_run(pipeline_runs[2])
     assert workflow_run.run_state_enum() == RunStateEnum.RUNNING
     copy_mock.assert_called_once_with(
@@ -745,9 +871,163 @@ def test_update_workflow_run_RUNNING_square(
     # Finally, when the last run finishes, the workflow is finished
     delay_mock.reset_mock()
     copy_mock.reset_mock()
-    pipeline_runs[3].pipeline_run_states.append(
-        create_pipeline_run_state(RunStateEnum.COMPLETED)
-    )
+    pipeline_runs[3].add_run_state(create_pipeline_run_state(RunStateEnum.COMPLETED))
     services.update_workflow_run(pipeline_runs[3])
     assert workflow_run.run_state_enum() == RunStateEnum.COMPLETED
     assert not copy_mock.called
+
+
+@patch("app.workflows.services.copy_pipeline_run_artifact")
+@patch("app.pipelines.services.execute_pipeline.delay")
+def test_update_workflow_run_changed_workflow(
+    delay_mock, copy_mock, app, pipeline, workflow_square
+):
+    (workflow_run, pipeline_runs) = _configure_run_state(
+        workflow_square, RunStateEnum.COMPLETED, delay_mock
+    )
+    # runs keep the dependencies of their workflow when they were created.
+    c = workflow_run.workflow_pipeline_runs[2].workflow_pipeline
+    services.delete_workflow_pipeline(workflow_square.uuid, c.uuid)
+
+    pipeline_runs[1].add_run_state(create_pipeline_run_state(RunStateEnum.COMPLETED))
+    services.update_workflow_run(pipeline_runs[1])
+    assert pipeline_runs[3].run_state_enum() == RunStateEnum.QUEUED
+
+    pipeline_runs[2].add_run_state(create_pipeline_run_state(RunStateEnum.COMPLETED))
+    services.update_workflow_run(pipeline_runs[2])
+    assert pipeline_runs[3].run_state_enum() == RunStateEnum.NOT_STARTED
+    assert workflow_run.pending_pipeline_runs == 1
+
+
+@patch("app.workflows.services.copy_pipeline_run_artifact")
+@patch("app.pipelines.services.execute_pipeline.delay")
+def test_update_workflow_run_max_running_pipelines(
+    delay_mock, copy_mock, app, pipeline, workflow_square
+):
+    app.config[WORKFLOW_RUN_MAX_RUNNING_PIPELINES] = 1
+    (workflow_run, pipeline_runs) = _configure_run_state(
+        workflow_square, RunStateEnum.COMPLETED, delay_mock
+    )
+    # only one of the second ones is started, the other waits for a slot.
+    assert pipeline_runs[1].run_state_enum() == RunStateEnum.NOT_STARTED
+    assert pipeline_runs[2].run_state_enum() == RunStateEnum.QUEUED
+    assert delay_mock.call_count == 1
+
+    pipeline_runs[1].add_run_state(create_pipeline_run_state(RunStateEnum.COMPLETED))
+    services.update_workflow_run(pipeline_runs[1])
+    assert pipeline_runs[2].run_state_enum() == RunStateEnum.NOT_STARTED
+    assert pipeline_runs[3].run_state_enum() == RunStateEnum.QUEUED
+
+    pipeline_runs[2].add_run_state(create_pipeline_run_state(RunStateEnum.COMPLETED))
+    services.update_workflow_run(pipeline_runs[2])
+    assert pipeline_runs[3].run_state_enum() == RunStateEnum.NOT_STARTED
+    assert delay_mock.call_count == 3
+
+
+@patch("app.pipelines.services.execute_pipeline.delay")
+def test_create_workflow_run_workflow_max_running_pipelines(
+    delay_mock, app, workflow_square
+):
+    app.config[WORKFLOW_MAX_RUNNING_PIPELINES] = 1
+    (first, second) = [
+        services.create_workflow_run(
+            workflow_square.uuid, {"callback_url": "http://example.com", "inputs": []}
+        )
+        for _ in range(2)
+    ]
+    first_run = first.workflow_pipeline_runs[0].pipeline_run
+    second_run = second.workflow_pipeline_runs[0].pipeline_run
+    assert first_run.run_state_enum() == RunStateEnum.NOT_STARTED
+    assert second_run.run_state_enum() == RunStateEnum.QUEUED
+    assert delay_mock.call_count == 1
+
+    # the slot of a failed run is freed for the other workflow run.
+    first_run.add_run_state(create_pipeline_run_state(RunStateEnum.FAILED))
+    services.update_workflow_run(first_run)
+    assert first.run_state_enum() == RunStateEnum.CANCELLED
+    assert second_run.run_state_enum() == RunStateEnum.NOT_STARTED
+    assert delay_mock.call_count == 2
+
+
+@patch("app.pipelines.services.execute_pipeline.delay")
+def test_schedule_workflow_runs(delay_mock, app, workflow_square):
+    app.config[WORKFLOW_MAX_RUNNING_PIPELINES] = 1
+    (first, second) = [
+        services.create_workflow_run(
+            workflow_square.uuid, {"callback_url": "http://example.com", "inputs": []}
+        )
+        for _ in range(2)
+    ]
+    second_run = second.workflow_pipeline_runs[0].pipeline_run
+    services.schedule_workflow_runs()
+    assert second_run.run_state_enum() == RunStateEnum.QUEUED
+
+    app.config[WORKFLOW_MAX_RUNNING_PIPELINES] = 2
+    services.schedule_workflow_runs()
+    assert second_run.run_state_enum() == RunStateEnum.NOT_STARTED
+    assert delay_mock.call_count == 2
+
+
+@patch("app.pipelines.services.execute_pipeline.delay")
+def test_schedule_workflow_runs_started_timeout(delay_mock, app, workflow_square):
+    app.config[WORKFLOW_MAX_RUNNING_PIPELINES] = 1
+    (first, second) = [
+        services.create_workflow_run(
+            workflow_square.uuid, {"callback_url": "http://example.com", "inputs": []}
+        )
+        for _ in range(2)
+    ]
+    first_run = first.workflow_pipeline_runs[0].pipeline_run
+    second_run = second.workflow_pipeline_runs[0].pipeline_run
+
+    # a run that never finished stops holding its slot after the timeout.
+    first_run.state_changed_at = datetime.utcnow() - timedelta(
+        seconds=app.config[WORKFLOW_STARTED_PIPELINE_TIMEOUT] + 1
+    )
+    db.session.commit()
+    services.schedule_workflow_runs()
+    assert second_run.run_state_enum() == RunStateEnum.NOT_STARTED
+    assert delay_mock.call_count == 2
+
+
+@patch("app.pipelines.services.execute_pipeline.delay")
+def test_create_workflow_run_organization_max_running_pipelines(
+    delay_mock, app, pipeline, workflow_square
+):
+    app.config[WORKFLOW_ORGANIZATION_MAX_RUNNING_PIPELINES] = 1
+    workflow_square.organization_uuid = "1" * 32
+    (same_organization, other_organization) = [
+        services.create_workflow(
+            {"name": "a workflow", "description": "", "organization_uuid": uuid}
+        )
+        for uuid in ("1" * 32, "2" * 32)
+    ]
+    for workflow in (same_organization, other_organization):
+        services.create_workflow_pipeline(
+            workflow.uuid,
+            {
+                "pipeline_uuid": pipeline.uuid,
+                "source_workflow_pipelines": [],
+                "destination_workflow_pipelines": [],
+            },
+        )
+
+    (first, second, third) = [
+        services.create_workflow_run(
+            workflow.uuid, {"callback_url": "http://example.com", "inputs": []}
+        )
+        for workflow in (workflow_square, same_organization, other_organization)
+    ]
+    first_run = first.workflow_pipeline_runs[0].pipeline_run
+    second_run = second.workflow_pipeline_runs[0].pipeline_run
+    third_run = third.workflow_pipeline_runs[0].pipeline_run
+    # the workflows of an organization share its slots.
+    assert first_run.run_state_enum() == RunStateEnum.NOT_STARTED
+    assert second_run.run_state_enum() == RunStateEnum.QUEUED
+    assert third_run.run_state_enum() == RunStateEnum.NOT_STARTED
+
+    # a slot freed by one workflow is used by another one of the organization.
+    first_run.add_run_state(create_pipeline_run_state(RunStateEnum.FAILED))
+    services.update_workflow_run(first_run)
+    assert second_run.run_state_enum() == RunStateEnum.NOT_STARTED
+    assert delay_mock.call_count == 3
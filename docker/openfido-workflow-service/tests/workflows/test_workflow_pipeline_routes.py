@@ -4,9 +4,12 @@ from application_roles.decorators import ROLES_KEY
 from app.workflows.models import db, Workflow
 from app.utils import to_iso8601
 from app.workflows.queries import find_workflow_pipeline
+from app.pipelines.services import create_pipeline
 from app.workflows.services import create_workflow_pipeline
 from marshmallow.exceptions import ValidationError
 
+from ..pipelines.test_services import PIPELINE_JSON
+
 
 @patch("app.workflows.workflow_pipeline_routes.create_workflow_pipeline")
 def test_create_workflow_pipeline_failure(
@@ -239,3 +242,62 @@ def test_delete_workflow_pipeline_error(
         headers={ROLES_KEY: client_application.api_key},
     )
     assert result.status_code == 400
+
+
+def test_get_workflow_graph(client, client_application, workflow_line):
+    result = client.get(
+        f"/v1/workflows/{'0' * 32}/graph",
+        headers={ROLES_KEY: client_application.api_key},
+    )
+    assert result.status_code == 404
+
+    (a, b, c) = workflow_line.workflow_pipelines
+    result = client.get(
+        f"/v1/workflows/{workflow_line.uuid}/graph",
+        headers={ROLES_KEY: client_application.api_key},
+    )
+    assert result.status_code == 200
+    assert [
+        (node["workflow_pipeline_uuid"], node["dependencies"])
+        for node in result.json["pipelines"]
+    ] == [(a.uuid, []), (b.uuid, [a.pipeline.uuid]), (c.uuid, [b.pipeline.uuid])]
+
+
+def test_update_workflow_graph(client, client_application, pipeline, workflow):
+    another_pipeline = create_pipeline(PIPELINE_JSON)
+    graph = {
+        "pipelines": [
+            {"pipeline_uuid": pipeline.uuid},
+            {"pipeline_uuid": another_pipeline.uuid, "dependencies": [pipeline.uuid]},
+        ]
+    }
+    result = client.put(
+        f"/v1/workflows/{workflow.uuid}/graph",
+        content_type="application/json",
+        json=graph,
+        headers={ROLES_KEY: client_application.api_key},
+    )
+    assert result.status_code == 200
+    assert [
+        (node["pipeline_uuid"], node["dependencies"])
+        for node in result.json["pipelines"]
+    ] == [(pipeline.uuid, []), (another_pipeline.uuid, [pipeline.uuid])]
+    assert find_workflow_pipeline(result.json["pipelines"][0]["workflow_pipeline_uuid"])
+
+    graph["pipelines"][0]["dependencies"] = [another_pipeline.uuid]
+    result = client.put(
+        f"/v1/workflows/{workflow.uuid}/graph",
+        content_type="application/json",
+        json=graph,
+        headers={ROLES_KEY: client_application.api_key},
+    )
+    assert result.status_code == 400
+    assert "pipelines" in result.json["errors"]
+
+    result = client.put(
+        f"/v1/workflows/{'0' * 32}/graph",
+        content_type="application/json",
+        json=graph,
+        headers={ROLES_KEY: client_application.api_key},
+    )
+    assert result.status_code == 400
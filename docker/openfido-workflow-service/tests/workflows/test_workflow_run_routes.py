@@ -57,6 +57,7 @@ def test_get_workflow_run_error(client, client_application, workflow_pipeline):
         },
         headers={ROLES_KEY: client_application.api_key},
     )
+    db.session.add(workflow_pipeline)
     workflow_run = workflow_pipeline.workflow.workflow_runs[0]
     workflow_pipeline_run = workflow_run.workflow_pipeline_runs[0]
     pipeline_run = workflow_pipeline_run.pipeline_run
@@ -90,6 +91,7 @@ def test_start_workflow(client, client_application, workflow_pipeline):
         },
         headers={ROLES_KEY: client_application.api_key},
     )
+    db.session.add(workflow_pipeline)
     workflow_run = workflow_pipeline.workflow.workflow_runs[0]
     workflow_pipeline_run = workflow_run.workflow_pipeline_runs[0]
     pipeline_run = workflow_pipeline_run.pipeline_run